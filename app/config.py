@@ -1,5 +1,5 @@
 import os
-from typing import Optional
+from typing import List, Optional
 from pydantic_settings import BaseSettings
 from dotenv import load_dotenv
 
@@ -35,13 +35,24 @@ class Settings(BaseSettings):
     # ===========================
     SECRET_KEY: str = "your_secret_key_here"  # 生产环境必须修改
     ALGORITHM: str = "HS256"
-    ACCESS_TOKEN_EXPIRE_MINUTES: int = 43200  # 720小时 = 720 * 60分钟
+    ACCESS_TOKEN_EXPIRE_MINUTES: int = 43200  # 720小时 = 720 * 60分钟（刷新令牌有效期）
+    AUTH_ACCESS_TOKEN_EXPIRE_MINUTES: int = 120  # 访问令牌有效期，过期后使用刷新令牌换取
+    AUTH_CLAIMS_MODE: bool = True              # 直接使用访问令牌中的用户资料，不查询数据库
+    AUTH_LEGACY_TOKEN_CUTOFF: str = ""         # 旧格式令牌（无版本号、不过期）的接受截止时间（ISO格式，如 2026-12-31），为空表示继续接受
+    AUTH_REVOCATION_REFRESH_INTERVAL: float = 30.0  # 令牌吊销列表刷新间隔（秒）
+    AUTH_PRINCIPAL_CACHE_TTL: float = 30.0     # 登录用户缓存有效期（秒），0 表示不缓存
+    AUTH_PRINCIPAL_CACHE_MAX_ITEMS: int = 10000  # 登录用户缓存最多缓存的 token 数
     
     # ===========================
     # 数据库配置
     # ===========================
     # 方式1: 完整的DATABASE_URL (优先级最高)
     DATABASE_URL: str = ""
+    # 异步驱动URL（可选，默认由数据库URL换成 aiomysql/aiosqlite 驱动得到）
+    ASYNC_DATABASE_URL: str = ""
+    # 只读从库URL列表（逗号分隔，为空时读写都走主库）
+    DATABASE_REPLICA_URLS: str = ""
+    READ_YOUR_WRITES_WINDOW: float = 5.0  # 用户写入后读取固定走主库的时长（秒）
     
     # 方式2: 单独的数据库配置参数
     MYSQL_HOST: str = "localhost"
@@ -51,9 +62,16 @@ class Settings(BaseSettings):
     MYSQL_PASSWORD: str = ""
     
     # MySQL连接池配置
-    MYSQL_POOL_SIZE: int = 5
-    MYSQL_MAX_OVERFLOW: int = 10
+    # 未设置池大小时按 DB_MAX_CONNECTIONS / WEB_CONCURRENCY 自动分配
+    MYSQL_POOL_SIZE: Optional[int] = None
+    MYSQL_MAX_OVERFLOW: Optional[int] = None
     MYSQL_POOL_RECYCLE: int = 3600
+    WEB_CONCURRENCY: int = 1  # uvicorn/gunicorn worker 数
+    DB_MAX_CONNECTIONS: int = 60  # 本服务可使用的数据库连接总数（所有worker合计）
+    DB_ASYNC_POOL_SHARE: float = 0.5  # 异步引擎占每个worker连接预算的比例，其余归同步引擎
+    DB_POOL_TIMEOUT: float = 10.0  # 从连接池借出连接的最长等待（秒）
+    DB_CONNECT_TIMEOUT: int = 10  # 建立连接超时（秒）
+    DB_STATEMENT_TIMEOUT_MS: int = 15000  # 单条查询语句超时（毫秒），0 表示不限制
     
     # ===========================
     # LLM API配置
@@ -67,9 +85,60 @@ class Settings(BaseSettings):
     LLM_TIMEOUT: int = 30
     LLM_RATE_LIMIT_PER_MINUTE: int = 60
     
+    # 聊天上下文窗口配置（token数为本地估算值）
+    LLM_CONTEXT_MAX_TOKENS: int = 2000
+    LLM_CONTEXT_RECENT_TURNS: int = 8
+    LLM_CONTEXT_SUMMARY_MAX_TOKENS: int = 300
+    
     # 用户画像模型配置
     USER_PROFILE_MODEL_NAME: str = "ep-20251004235106-gklgg"
     
+    # 向量模型配置
+    EMBEDDING_API_URL: str = "https://ark.cn-beijing.volces.com/api/v3/embeddings/multimodal"
+    EMBEDDING_MODEL: str = "doubao-embedding-vision-251215"
+    EMBEDDING_BATCH_SIZE: int = 16        # 单批最多合并的文本条数
+    EMBEDDING_BATCH_WAIT_MS: int = 10     # 微批等待窗口（毫秒）
+    EMBEDDING_CACHE_ENABLED: bool = True
+    EMBEDDING_CACHE_MAX_ITEMS: int = 5000  # 内存层最多缓存条数
+    EMBEDDING_CACHE_DTYPE: str = "float32"  # float32 / float16
+    EMBEDDING_CACHE_PATH: str = ""        # 磁盘缓存文件，默认 BASE_DIR/cache/embeddings.sqlite3
+    EMBEDDING_CACHE_DISK_MAX_ITEMS: int = 50000  # 磁盘层最多保留条数（1024维 float32 约 4KB/条），0 表示不限制
+    EMBEDDING_CACHE_DISK_TTL: int = 2592000  # 磁盘层记录有效期（秒），默认30天，0 表示不过期
+    # 画像向量列存储格式: vector(数据库VECTOR类型) / float32 / float16 / int8(二进制存储)
+    # 切换为二进制格式前需执行 scripts/migrate_embedding_to_binary.py
+    EMBEDDING_STORAGE_FORMAT: str = "vector"
+
+    # 画像向量索引配置
+    VECTOR_INDEX_ENABLED: bool = True
+    VECTOR_INDEX_PATH: str = ""           # 索引快照目录，默认 BASE_DIR/cache/profile_vectors
+    VECTOR_INDEX_DIMENSION: int = 1024
+    VECTOR_INDEX_NPROBE: int = 8          # 近似检索扫描的分桶数
+    VECTOR_INDEX_IVF_MIN_SIZE: int = 2000  # 画像数达到该值后启用IVF分桶
+    VECTOR_INDEX_SYNC_INTERVAL: float = 30.0  # 与数据库增量同步的间隔（秒）
+
+    # 用户文本索引配置
+    USER_SEARCH_INDEX_ENABLED: bool = True
+    USER_SEARCH_INDEX_SYNC_INTERVAL: float = 30.0  # 与数据库增量同步的间隔（秒）
+
+    # 计数器写回配置（浏览数、点赞数、投票数）
+    COUNTER_WRITE_BEHIND_ENABLED: bool = True
+    COUNTER_FLUSH_INTERVAL: float = 5.0   # 定期写回间隔（秒）
+    COUNTER_FLUSH_THRESHOLD: int = 1000   # 待写回计数条数达到该值时提前写回
+    COUNTER_LOG_DIR: str = ""             # 增量日志目录，默认 BASE_DIR/cache/counters；设为 "none" 时只在内存中累加（测试环境不写日志）
+
+    # 浏览去重配置（同一用户在时间窗口内重复浏览只计一次）
+    VIEW_DEDUP_WINDOW: int = 300          # 去重时间窗口（秒）
+    VIEW_DEDUP_MAX_ITEMS: int = 100000    # 内存存储最多保留的浏览记录数
+    VIEW_DEDUP_PATH: str = ""             # 多worker共享的本地存储文件，默认 BASE_DIR/cache/view_dedup.sqlite3；设为 "memory" 时只在进程内去重
+
+    # 卡片文本索引配置（话题卡片、投票卡片搜索）
+    CARD_SEARCH_INDEX_ENABLED: bool = True
+    CARD_SEARCH_INDEX_SYNC_INTERVAL: float = 30.0  # 与数据库增量同步的间隔（秒）
+
+    # 语义搜索配置
+    SEMANTIC_SEARCH_EXPANSION_TIMEOUT: float = 4.0  # 等待LLM查询扩展的最长时间（秒），超时仅返回原始查询的结果
+    SEMANTIC_SEARCH_RRF_K: int = 60       # 倒数排名融合的平滑常数
+    
     # 兼容性字段 (将逐步废弃)
     LLM_PROVIDER_COMPAT: Optional[str] = None
     OPENAI_API_KEY: Optional[str] = None
@@ -79,6 +148,15 @@ class Settings(BaseSettings):
     # ===========================
     WECHAT_APP_ID: str = ""
     WECHAT_APP_SECRET: str = ""
+    WECHAT_TOKEN_CACHE_PATH: str = ""      # access_token 本地缓存文件，默认 BASE_DIR/cache/wechat_access_token.json
+    WECHAT_TOKEN_REFRESH_AHEAD: int = 600  # 过期前多少秒开始后台刷新 access_token
+    WECHAT_HTTP_TIMEOUT: float = 5.0       # 请求微信接口的超时（秒）
+    WECHAT_HTTP_RETRIES: int = 2           # 网络失败或微信系统繁忙时的重试次数
+    WECHAT_BREAKER_FAILURES: int = 5       # 连续失败多少次后熔断
+    WECHAT_BREAKER_RESET_TIMEOUT: float = 30.0  # 熔断持续时间（秒），之后放行一个探测请求
+    WXACODE_CACHE_DIR: str = ""            # 小程序码缓存目录，默认 UPLOAD_DIR/wxacode
+    WXACODE_CACHE_MAX_BYTES: int = 209_715_200  # 小程序码缓存总大小上限（200MB），超出后淘汰最久未使用的
+    WXACODE_CACHE_MAX_AGE: int = 86400     # 客户端缓存时间（秒）
     
     # ===========================
     # 文件上传配置
@@ -88,6 +166,11 @@ class Settings(BaseSettings):
     MAX_FILE_SIZE: int = 104_857_600      # 100MB
     MAX_IMAGE_SIZE: int = 10_485_760       # 10MB
     MAX_VIDEO_SIZE: int = 524_288_000      # 500MB
+    UPLOAD_CHUNK_SIZE: int = 262_144       # 流式上传每次读取和写入的分块大小（256KB）
+    UPLOAD_PARALLELISM: int = 4            # 批量上传时同时写入的文件数
+    IMAGE_DERIVATIVES_ENABLED: bool = True  # Feed 中的图片引用缩略图/WebP（需要安装 Pillow）
+    IMAGE_DERIVATIVE_QUALITY: int = 80     # WebP 质量
+    IMAGE_DERIVATIVE_WORKERS: int = 2      # 生成衍生图的进程数
     
     # 兼容性字段
     UPLOAD_DIR_COMPAT: str = ""
@@ -159,6 +242,20 @@ class Settings(BaseSettings):
         
         # 设置兼容性别名
         self.UPLOAD_DIR_COMPAT = self.UPLOAD_DIR
+        
+        # 设置向量磁盘缓存路径
+        if not self.EMBEDDING_CACHE_PATH:
+            self.EMBEDDING_CACHE_PATH = os.path.join(self.BASE_DIR, "cache", "embeddings.sqlite3")
+        if not self.VECTOR_INDEX_PATH:
+            self.VECTOR_INDEX_PATH = os.path.join(self.BASE_DIR, "cache", "profile_vectors")
+        if not self.COUNTER_LOG_DIR:
+            self.COUNTER_LOG_DIR = os.path.join(self.BASE_DIR, "cache", "counters")
+        if not self.WECHAT_TOKEN_CACHE_PATH:
+            self.WECHAT_TOKEN_CACHE_PATH = os.path.join(self.BASE_DIR, "cache", "wechat_access_token.json")
+        if not self.VIEW_DEDUP_PATH:
+            self.VIEW_DEDUP_PATH = os.path.join(self.BASE_DIR, "cache", "view_dedup.sqlite3")
+        if not self.WXACODE_CACHE_DIR:
+            self.WXACODE_CACHE_DIR = os.path.join(self.UPLOAD_DIR, "wxacode")
     
     # ===========================
     # 计算属性
@@ -181,6 +278,11 @@ class Settings(BaseSettings):
         else:
             return f"mysql+pymysql://{self.MYSQL_USERNAME}@{self.MYSQL_HOST}:{self.MYSQL_PORT}/{self.MYSQL_DATABASE}"
     
+    @property
+    def replica_database_urls(self) -> List[str]:
+        """只读从库URL列表"""
+        return [url.strip() for url in self.DATABASE_REPLICA_URLS.split(",") if url.strip()]
+    
     @property
     def is_production(self) -> bool:
         """是否为生产环境"""
@@ -5,16 +5,93 @@ Prompt配置管理器
 
 import json
 import logging
+import os
+import threading
+import time
+from string import Formatter
 from pathlib import Path
-from typing import Dict, Any, Optional
+from typing import Dict, Any, Optional, List, Tuple
 from datetime import datetime
 
 logger = logging.getLogger(__name__)
 
+_formatter = Formatter()
+
+
+class CompiledTemplate:
+    """预编译的提示词模板
+
+    模板只解析一次，拆分为 (字面量, 字段名, 格式说明, 转换符) 片段列表，
+    渲染时按片段拼接，不再每次调用 str.format 重新解析。
+    首个占位符之前的文本作为静态前缀预先渲染，同一模板的所有请求共享同一个前缀字符串，
+    便于提供商侧的前缀缓存命中。
+
+    除标准的 !s / !r / !a 转换外，额外支持 !j：将 dict/list 等对象序列化为JSON（ensure_ascii=False），
+    调用方可直接传入原始对象，由模板统一负责序列化。
+    """
+
+    __slots__ = ("source", "segments", "static_prefix", "fields")
+
+    def __init__(self, source: str):
+        self.source = source
+        self.segments: List[Tuple[str, Optional[str], str, Optional[str]]] = list(_formatter.parse(source))
+        self.fields = [seg[1] for seg in self.segments if seg[1] is not None]
+
+        prefix_parts = []
+        for literal, field_name, _, _ in self.segments:
+            prefix_parts.append(literal)
+            if field_name is not None:
+                break
+        self.static_prefix = "".join(prefix_parts)
+
+    def render(self, **kwargs) -> str:
+        """
+        渲染模板
+
+        Args:
+            **kwargs: 模板变量
+
+        Returns:
+            渲染后的文本
+
+        Raises:
+            KeyError: 缺少模板变量（与 str.format 行为一致）
+        """
+        if not self.fields:
+            return self.static_prefix
+        parts = []
+        for literal, field_name, format_spec, conversion in self.segments:
+            if literal:
+                parts.append(literal)
+            if field_name is None:
+                continue
+            if field_name.isidentifier():
+                value = kwargs[field_name]
+            else:
+                value, _ = _formatter.get_field(field_name, (), kwargs)
+            if conversion == "j":
+                value = value if isinstance(value, str) else json.dumps(value, ensure_ascii=False)
+            elif conversion:
+                value = _formatter.convert_field(value, conversion)
+            parts.append(format(value, format_spec) if format_spec else str(value))
+        return "".join(parts)
+
+
 class PromptConfigManager:
     """Prompt配置管理器"""
     
-    def __init__(self, config_dir: str = None):
+    CONFIG_FILES = {
+        'system_prompts': 'system_prompts.json',
+        'mock_responses': 'mock_responses.json', 
+        'scene_prompts': 'scene_prompts.json',
+        'task_prompts': 'task_prompts.json',
+        'stream_configs': 'stream_configs.json'
+    }
+    
+    # 检查配置文件修改时间的最小间隔（秒），避免每次取模板都 stat 文件
+    RELOAD_CHECK_INTERVAL = 2.0
+    
+    def __init__(self, config_dir: str = None, auto_reload: bool = True):
         """
         初始化配置管理器
         
@@ -30,38 +107,96 @@ class PromptConfigManager:
         
         self.configs = {}
         self.load_time = None
+        self.auto_reload = auto_reload
+        # 模板源文本 -> 编译结果；相同文本的模板共享同一个编译对象
+        self._compiled: Dict[str, CompiledTemplate] = {}
+        self._mtimes: Dict[str, Optional[float]] = {}
+        self._last_check = 0.0
+        self._lock = threading.Lock()
         self._load_all_configs()
     
     def _load_all_configs(self):
         """加载所有配置文件"""
+        config_files = self.CONFIG_FILES
+        configs = {}
+        mtimes = {}
         try:
-            config_files = {
-                'system_prompts': 'system_prompts.json',
-                'mock_responses': 'mock_responses.json', 
-                'scene_prompts': 'scene_prompts.json',
-                'task_prompts': 'task_prompts.json',
-                'stream_configs': 'stream_configs.json'
-            }
-            
             for config_name, filename in config_files.items():
                 config_path = self.config_dir / filename
                 if config_path.exists():
+                    mtimes[config_name] = os.path.getmtime(config_path)
                     with open(config_path, 'r', encoding='utf-8') as f:
-                        self.configs[config_name] = json.load(f)
+                        configs[config_name] = json.load(f)
                     logger.info(f"成功加载配置文件: {filename}")
                 else:
                     logger.warning(f"配置文件不存在: {config_path}")
-                    self.configs[config_name] = {}
+                    mtimes[config_name] = None
+                    configs[config_name] = {}
             
             self.load_time = datetime.now()
             logger.info("所有prompt配置文件加载完成")
             
         except Exception as e:
             logger.error(f"加载配置文件失败: {str(e)}")
-            # 确保至少有空配置可用
+            # 加载失败时保留已有配置，确保至少有空配置可用
             for config_name in config_files.keys():
-                if config_name not in self.configs:
-                    self.configs[config_name] = {}
+                if config_name not in configs:
+                    configs[config_name] = self.configs.get(config_name, {})
+        
+        # 整体替换，正在渲染的请求不会看到半更新的配置
+        self.configs = configs
+        self._mtimes.update(mtimes)
+        self._compiled = {}
+        self._last_check = time.monotonic()
+    
+    def _config_changed(self) -> bool:
+        """检查配置文件修改时间是否发生变化"""
+        for config_name, filename in self.CONFIG_FILES.items():
+            config_path = self.config_dir / filename
+            try:
+                mtime = os.path.getmtime(config_path)
+            except OSError:
+                mtime = None
+            if mtime != self._mtimes.get(config_name):
+                return True
+        return False
+    
+    def _check_reload(self):
+        """按修改时间热加载配置文件，无需重启服务"""
+        if not self.auto_reload:
+            return
+        now = time.monotonic()
+        if now - self._last_check < self.RELOAD_CHECK_INTERVAL:
+            return
+        with self._lock:
+            if now - self._last_check < self.RELOAD_CHECK_INTERVAL:
+                return
+            self._last_check = now
+            if self._config_changed():
+                logger.info("检测到prompt配置文件变更，重新加载")
+                self._load_all_configs()
+    
+    def compile(self, template: str) -> CompiledTemplate:
+        """
+        获取模板的编译结果（带缓存）
+        
+        Args:
+            template: 模板文本
+            
+        Returns:
+            编译后的模板
+        """
+        compiled = self._compiled.get(template)
+        if compiled is None:
+            compiled = CompiledTemplate(template)
+            self._compiled[template] = compiled
+        return compiled
+    
+    def _render(self, template: str, kwargs: Dict[str, Any]) -> str:
+        """渲染模板；未传入变量时与原行为一致，返回原始模板文本"""
+        if template and kwargs:
+            return self.compile(template).render(**kwargs)
+        return template
     
     def get_system_prompt(self, task_type: str) -> str:
         """
@@ -73,6 +208,7 @@ class PromptConfigManager:
         Returns:
             系统提示词，如果找不到则返回默认提示词
         """
+        self._check_reload()
         try:
             system_prompts = self.configs.get('system_prompts', {})
             task_key = task_type.upper()
@@ -98,6 +234,7 @@ class PromptConfigManager:
         Returns:
             模拟响应数据
         """
+        self._check_reload()
         try:
             mock_responses = self.configs.get('mock_responses', {})
             task_key = task_type.upper()
@@ -125,6 +262,7 @@ class PromptConfigManager:
         Returns:
             场景提示词
         """
+        self._check_reload()
         try:
             scene_prompts = self.configs.get('scene_prompts', {})
             scene_config = scene_prompts.get('scene_prompts', {}).get(scene_key, {})
@@ -142,10 +280,7 @@ class PromptConfigManager:
                 template = scene_config.get('template', '')
             
             # 替换模板变量
-            if template and kwargs:
-                template = template.format(**kwargs)
-            
-            return template
+            return self._render(template, kwargs)
             
         except Exception as e:
             logger.error(f"获取场景提示词失败: {str(e)}")
@@ -163,6 +298,7 @@ class PromptConfigManager:
         Returns:
             组件提示词
         """
+        self._check_reload()
         try:
             scene_prompts = self.configs.get('scene_prompts', {})
             components = scene_prompts.get('scene_prompts', {}).get(scene_key, {}).get('components', {})
@@ -171,10 +307,7 @@ class PromptConfigManager:
             template = component_config.get('template', '')
             
             # 替换模板变量
-            if template and kwargs:
-                template = template.format(**kwargs)
-            
-            return template
+            return self._render(template, kwargs)
             
         except Exception as e:
             logger.error(f"获取场景组件失败: {str(e)}")
@@ -191,6 +324,7 @@ class PromptConfigManager:
         Returns:
             任务提示词
         """
+        self._check_reload()
         try:
             task_prompts = self.configs.get('task_prompts', {})
             task_config = task_prompts.get(task_name, {})
@@ -198,10 +332,7 @@ class PromptConfigManager:
             template = task_config.get('prompt_template', '')
             
             # 替换模板变量
-            if template and kwargs:
-                template = template.format(**kwargs)
-            
-            return template
+            return self._render(template, kwargs)
             
         except Exception as e:
             logger.error(f"获取任务提示词失败: {str(e)}")
@@ -217,6 +348,7 @@ class PromptConfigManager:
         Returns:
             流式配置
         """
+        self._check_reload()
         try:
             stream_configs = self.configs.get('stream_configs', {})
             return stream_configs.get(config_key, {})
@@ -237,6 +369,7 @@ class PromptConfigManager:
         Returns:
             专用场景提示词
         """
+        self._check_reload()
         try:
             scene_prompts = self.configs.get('scene_prompts', {})
             specialized = scene_prompts.get('scene_prompts', {}).get(scene_key, {}).get('components', {}).get('specialized_templates', {})
@@ -245,19 +378,31 @@ class PromptConfigManager:
             template = template_config.get('template', '')
             
             # 替换模板变量
-            if template and kwargs:
-                template = template.format(**kwargs)
-            
-            return template
+            return self._render(template, kwargs)
             
         except Exception as e:
             logger.error(f"获取专用场景提示词失败: {str(e)}")
             return ""
     
+    def get_task_template(self, task_name: str) -> Optional[CompiledTemplate]:
+        """
+        获取任务提示词的编译模板
+        
+        Args:
+            task_name: 任务名称
+            
+        Returns:
+            编译后的模板，不存在时返回None
+        """
+        self._check_reload()
+        template = self.configs.get('task_prompts', {}).get(task_name, {}).get('prompt_template', '')
+        return self.compile(template) if template else None
+    
     def reload_configs(self):
         """重新加载所有配置文件"""
         logger.info("重新加载prompt配置文件")
-        self._load_all_configs()
+        with self._lock:
+            self._load_all_configs()
     
     def get_config_info(self) -> Dict[str, Any]:
         """
@@ -270,6 +415,8 @@ class PromptConfigManager:
             "config_dir": str(self.config_dir),
             "load_time": self.load_time.isoformat() if self.load_time else None,
             "loaded_configs": list(self.configs.keys()),
+            "compiled_templates": len(self._compiled),
+            "auto_reload": self.auto_reload,
             "config_status": {
                 name: "loaded" if config else "empty" 
                 for name, config in self.configs.items()
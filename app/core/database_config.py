@@ -8,10 +8,10 @@ from typing import Optional, Dict, Any, Union
 from contextlib import contextmanager
 import logging
 
-import pymysql
-from sqlalchemy import create_engine, text
+from sqlalchemy import text
 from sqlalchemy.orm import sessionmaker
 from app.config import settings
+from app.core.db_engine import create_db_engine
 
 logger = logging.getLogger(__name__)
 
@@ -31,6 +31,7 @@ class DatabaseConfig:
             'autocommit': True,
             'connect_timeout': 30,
         }
+        self._engine = None
     
     def _get_default_database_url(self) -> str:
         """获取默认数据库URL - 使用 config.py 中的配置"""
@@ -41,39 +42,33 @@ class DatabaseConfig:
         """获取数据库连接字符串"""
         return self.db_url
     
+    @property
+    def engine(self):
+        """获取引擎：默认URL复用全局引擎，其他URL通过引擎工厂单独创建"""
+        if self._engine is None:
+            if self.db_url == settings.computed_database_url:
+                from app.database import engine
+                self._engine = engine
+            else:
+                self._engine = create_db_engine(self.db_url, name=f"manager:{id(self)}")
+        return self._engine
+    
     def database_exists(self) -> bool:
-        """检查数据库是否存在 - 使用 config.py 中的配置"""
-        # MySQL需要通过连接测试
+        """检查数据库是否存在（能否建立连接）"""
         try:
-            connection = pymysql.connect(
-                host=settings.MYSQL_HOST,
-                user=settings.MYSQL_USERNAME,
-                password=settings.MYSQL_PASSWORD,
-                database=settings.MYSQL_DATABASE,
-                connect_timeout=5
-            )
-            connection.close()
+            with self.engine.connect() as conn:
+                conn.execute(text("SELECT 1"))
             return True
         except Exception:
             return False
     
     def get_db_size(self) -> int:
-        """获取数据库大小（字节） - 使用 config.py 中的配置"""
-        # MySQL数据库大小查询
+        """获取数据库大小（字节）"""
         try:
-            connection = pymysql.connect(
-                host=settings.MYSQL_HOST,
-                user=settings.MYSQL_USERNAME,
-                password=settings.MYSQL_PASSWORD,
-                database=settings.MYSQL_DATABASE,
-                connect_timeout=5
-            )
-            cursor = connection.cursor()
-            cursor.execute("SELECT SUM(data_length + index_length) FROM information_schema.tables WHERE table_schema = DATABASE()")
-            size = cursor.fetchone()[0] or 0
-            cursor.close()
-            connection.close()
-            return size
+            with self.engine.connect() as conn:
+                return conn.execute(text(
+                    "SELECT SUM(data_length + index_length) FROM information_schema.tables WHERE table_schema = DATABASE()"
+                )).scalar() or 0
         except Exception:
             return 0
     
@@ -92,64 +87,30 @@ class DatabaseManager:
             config: 数据库配置对象
         """
         self.config = config
-        self._sqlalchemy_engine = None
         self._sqlalchemy_session = None
     
     @contextmanager
     def get_connection(self):
         """
-        获取数据库连接的上下文管理器
+        获取数据库连接的上下文管理器（从连接池借出DBAPI连接，用完归还）
         
         Yields:
-            pymysql.Connection: 数据库连接对象
+            DBAPI 连接对象
         """
-        yield from self._get_mysql_connection()
-    
-
-    
-    def _get_mysql_connection(self):
-        """获取MySQL连接"""
-        
-        conn = None
+        conn = self.sqlalchemy_engine.raw_connection()
         try:
-            # 解析数据库URL
-            import re
-            pattern = r'mysql\+pymysql://([^:@]+)(?::([^@]+))?@([^:]+):(\d+)/(\w+)'
-            match = re.match(pattern, self.config.db_url)
-            
-            if not match:
-                raise ValueError(f"无效的MySQL URL格式: {self.config.db_url}")
-            
-            user, password, host, port, database = match.groups()
-            
-            conn = pymysql.connect(
-                host=host,
-                port=int(port),
-                user=user,
-                password=password or '',
-                database=database,
-                charset='utf8mb4',
-                autocommit=True,
-                connect_timeout=30
-            )
-            
             yield conn
-            
-        except Exception as e:
-            if conn:
-                conn.rollback()
-            raise e
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
         finally:
-            if conn:
-                conn.close()
+            conn.close()
     
     @property
     def sqlalchemy_engine(self):
         """获取SQLAlchemy引擎（用于高级操作）"""
-        if self._sqlalchemy_engine is None:
-            self._sqlalchemy_engine = create_engine(self.config.db_url)
-        
-        return self._sqlalchemy_engine
+        return self.config.engine
     
     @property
     def sqlalchemy_session(self):
@@ -0,0 +1,240 @@
+"""
+数据库引擎工厂
+统一创建同步/异步 SQLAlchemy 引擎：按 worker 数分配连接池大小、设置语句超时，
+并记录连接池指标（借出数、溢出数、等待时间、建连时间），供内部接口查看
+"""
+
+import threading
+import time
+from typing import Any, Dict, Optional, Tuple
+
+from sqlalchemy import create_engine, event
+from sqlalchemy import exc as sa_exc
+from sqlalchemy.engine import Engine, make_url
+from sqlalchemy.ext.asyncio import AsyncEngine, create_async_engine
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+
+from app.config import settings
+
+# 已创建的引擎：名称 -> (引擎, 指标)，用于汇总连接池指标
+_engines: Dict[str, Tuple[Engine, "PoolMetrics"]] = {}
+_engines_lock = threading.Lock()
+
+
+class _Timing:
+    """耗时统计（次数、累计、最大值）"""
+
+    __slots__ = ("count", "total", "max")
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def add(self, seconds: float):
+        self.count += 1
+        self.total += seconds
+        if seconds > self.max:
+            self.max = seconds
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "count": self.count,
+            "avg_ms": round(self.total / self.count * 1000, 3) if self.count else 0.0,
+            "max_ms": round(self.max * 1000, 3),
+        }
+
+
+class PoolMetrics:
+    """连接池指标"""
+
+    def __init__(self):
+        self.wait = _Timing()
+        self.connect = _Timing()
+        self.timeouts = 0
+        self._lock = threading.Lock()
+
+    def record_wait(self, seconds: float):
+        with self._lock:
+            self.wait.add(seconds)
+
+    def record_connect(self, seconds: float):
+        with self._lock:
+            self.connect.add(seconds)
+
+    def record_timeout(self):
+        with self._lock:
+            self.timeouts += 1
+
+    def to_dict(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "checkout_wait": self.wait.to_dict(),
+                "connect": self.connect.to_dict(),
+                "checkout_timeouts": self.timeouts,
+            }
+
+
+class _InstrumentedPoolMixin:
+    """记录借出连接等待时间的连接池（等待时间包含池满时新建溢出连接的耗时）"""
+
+    metrics: Optional[PoolMetrics] = None
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        except sa_exc.TimeoutError:
+            if self.metrics is not None:
+                self.metrics.record_timeout()
+            raise
+        finally:
+            if self.metrics is not None:
+                self.metrics.record_wait(time.perf_counter() - start)
+
+    def recreate(self):
+        # dispose() 会重建连接池，指标对象随之保留
+        pool = super().recreate()
+        pool.metrics = self.metrics
+        return pool
+
+
+class InstrumentedQueuePool(_InstrumentedPoolMixin, QueuePool):
+    pass
+
+
+class InstrumentedAsyncQueuePool(_InstrumentedPoolMixin, AsyncAdaptedQueuePool):
+    pass
+
+
+def pool_sizing(
+    workers: Optional[int] = None,
+    max_connections: Optional[int] = None,
+    share: float = 1.0
+) -> Tuple[int, int]:
+    """
+    按 worker 数分配每个进程的连接池大小
+
+    数据库总连接预算在 worker 间均分，其中约 2/3 作为常驻连接，其余作为溢出连接；
+    显式配置了 MYSQL_POOL_SIZE / MYSQL_MAX_OVERFLOW 时以配置为准
+
+    Args:
+        share: 本引擎占每个 worker 预算的比例（同一数据库的同步、异步引擎共享同一份预算）
+
+    Returns:
+        (pool_size, max_overflow)
+    """
+    workers = max(1, workers or settings.WEB_CONCURRENCY)
+    budget = max(2, int((max_connections or settings.DB_MAX_CONNECTIONS) // workers * share))
+    pool_size = max(1, budget * 2 // 3)
+    max_overflow = budget - pool_size
+    if settings.MYSQL_POOL_SIZE is not None:
+        pool_size = settings.MYSQL_POOL_SIZE
+    if settings.MYSQL_MAX_OVERFLOW is not None:
+        max_overflow = settings.MYSQL_MAX_OVERFLOW
+    return pool_size, max_overflow
+
+
+def _engine_options(url: str, is_async: bool, statement_timeout: bool = True) -> Tuple[Dict[str, Any], str]:
+    sa_url = make_url(url)
+    backend = sa_url.get_backend_name()
+    options: Dict[str, Any] = {"echo": False}
+    if backend == "sqlite":
+        # SQLite 使用默认连接池，不设置池大小
+        return options, backend
+
+    # 同一数据库的同步、异步引擎分摊每个 worker 的连接预算，两者合计不超过 DB_MAX_CONNECTIONS
+    async_share = min(max(settings.DB_ASYNC_POOL_SHARE, 0.0), 1.0)
+    pool_size, max_overflow = pool_sizing(share=async_share if is_async else 1.0 - async_share)
+    options.update(
+        poolclass=InstrumentedAsyncQueuePool if is_async else InstrumentedQueuePool,
+        pool_size=pool_size,
+        max_overflow=max_overflow,
+        pool_timeout=settings.DB_POOL_TIMEOUT,
+        pool_recycle=settings.MYSQL_POOL_RECYCLE,
+        pool_pre_ping=True,
+    )
+    if backend == "mysql":
+        connect_args: Dict[str, Any] = {"connect_timeout": settings.DB_CONNECT_TIMEOUT}
+        if statement_timeout and settings.DB_STATEMENT_TIMEOUT_MS and sa_url.get_driver_name() in ("pymysql", "mysqldb"):
+            # 套接字读超时作为语句超时的兜底（比服务端超时稍长，覆盖非 SELECT 语句）
+            connect_args["read_timeout"] = settings.DB_STATEMENT_TIMEOUT_MS / 1000 + 5
+        options["connect_args"] = connect_args
+    return options, backend
+
+
+def _instrument(
+    name: str, engine: Engine, backend: str, metrics: PoolMetrics, statement_timeout: bool = True
+):
+    """注册建连计时和语句超时"""
+
+    @event.listens_for(engine, "do_connect")
+    def _timed_connect(dialect, conn_rec, cargs, cparams):
+        start = time.perf_counter()
+        try:
+            return dialect.connect(*cargs, **cparams)
+        finally:
+            metrics.record_connect(time.perf_counter() - start)
+
+    if statement_timeout and backend == "mysql" and settings.DB_STATEMENT_TIMEOUT_MS:
+        @event.listens_for(engine, "connect")
+        def _set_statement_timeout(dbapi_connection, connection_record):
+            # max_execution_time 只约束 SELECT，超时的查询由服务端中止
+            cursor = dbapi_connection.cursor()
+            try:
+                cursor.execute(f"SET SESSION max_execution_time = {int(settings.DB_STATEMENT_TIMEOUT_MS)}")
+            finally:
+                cursor.close()
+
+    if isinstance(engine.pool, _InstrumentedPoolMixin):
+        engine.pool.metrics = metrics
+    with _engines_lock:
+        _engines[name] = (engine, metrics)
+
+
+def create_db_engine(url: str, name: str = "primary", statement_timeout: bool = True) -> Engine:
+    """
+    创建同步引擎
+
+    Args:
+        url: 数据库URL
+        name: 引擎名称（出现在连接池指标中）
+        statement_timeout: 是否设置语句超时；运维脚本的长时间 DDL / 回填应关闭
+    """
+    options, backend = _engine_options(url, is_async=False, statement_timeout=statement_timeout)
+    engine = create_engine(url, **options)
+    _instrument(name, engine, backend, PoolMetrics(), statement_timeout)
+    return engine
+
+
+def create_async_db_engine(url: str, name: str = "primary-async") -> AsyncEngine:
+    """创建异步引擎，与同一数据库的同步引擎按 DB_ASYNC_POOL_SHARE 分摊连接预算"""
+    options, backend = _engine_options(url, is_async=True)
+    engine = create_async_engine(url, **options)
+    _instrument(name, engine.sync_engine, backend, PoolMetrics())
+    return engine
+
+
+def pool_status(engine: Engine, metrics: Optional[PoolMetrics] = None) -> Dict[str, Any]:
+    """单个引擎的连接池状态"""
+    pool = engine.pool
+    status: Dict[str, Any] = {"pool": type(pool).__name__}
+    if isinstance(pool, QueuePool):
+        status.update(
+            size=pool.size(),
+            checked_out=pool.checkedout(),
+            checked_in=pool.checkedin(),
+            overflow=max(pool.overflow(), 0),
+            max_overflow=pool._max_overflow,
+            timeout=pool.timeout(),
+        )
+    if metrics is not None:
+        status.update(metrics.to_dict())
+    return status
+
+
+def get_pool_metrics() -> Dict[str, Any]:
+    """所有引擎的连接池指标"""
+    with _engines_lock:
+        engines = dict(_engines)
+    return {name: pool_status(engine, metrics) for name, (engine, metrics) in engines.items()}
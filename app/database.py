@@ -1,23 +1,28 @@
-from sqlalchemy import create_engine
+import hashlib
+import itertools
+import threading
+import time
+from typing import Dict, List, Optional
+
+from fastapi import Request
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 from app.config import settings
+from app.core.db_engine import create_async_db_engine, create_db_engine
 
 # 使用配置中的数据库URL - 优先使用computed_database_url确保配置正确应用
 DATABASE_URL = settings.computed_database_url
 
-# 基于 MySQL 配置创建引擎
-engine = create_engine(
-    DATABASE_URL,
-    pool_size=settings.MYSQL_POOL_SIZE,
-    max_overflow=settings.MYSQL_MAX_OVERFLOW,
-    pool_recycle=settings.MYSQL_POOL_RECYCLE,
-    echo=False  # 禁用SQLAlchemy SQL日志输出
-)
+# 全局唯一的同步引擎（连接池大小、超时由引擎工厂统一配置）
+engine = create_db_engine(DATABASE_URL)
 
 # 创建会话
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+_maintenance_engine = None
+
 # 基础模型
 Base = declarative_base()
 
@@ -27,4 +32,170 @@ def get_db():
     try:
         yield db
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
+
+
+def create_maintenance_session():
+    """创建运维脚本使用的会话：不设置语句超时，长时间的 DDL / 回填不会被中断（首次使用时创建引擎）"""
+    global _maintenance_engine
+    if _maintenance_engine is None:
+        _maintenance_engine = create_db_engine(DATABASE_URL, name="maintenance", statement_timeout=False)
+    return sessionmaker(autocommit=False, autoflush=False, bind=_maintenance_engine)()
+
+
+# ===========================
+# 异步数据库会话（供 async 路由使用，数据库IO不阻塞事件循环）
+# ===========================
+
+# 同步驱动 -> 异步驱动
+_ASYNC_DRIVERS = {
+    "mysql": "mysql+aiomysql",
+    "mysql+pymysql": "mysql+aiomysql",
+    "mysql+mysqlconnector": "mysql+aiomysql",
+    "sqlite": "sqlite+aiosqlite",
+    "sqlite+pysqlite": "sqlite+aiosqlite",
+}
+
+_async_engine = None
+_AsyncSessionLocal = None
+_async_read_router = None
+
+
+def to_async_database_url(url: str) -> str:
+    """将同步驱动的数据库URL转换为对应的异步驱动URL，已是异步驱动时原样返回"""
+    sa_url = make_url(url)
+    driver = _ASYNC_DRIVERS.get(sa_url.drivername)
+    if driver:
+        sa_url = sa_url.set(drivername=driver)
+    return sa_url.render_as_string(hide_password=False)
+
+
+def get_async_engine():
+    """获取异步引擎（首次使用时创建，未安装异步驱动时不影响同步引擎的使用）"""
+    global _async_engine, _AsyncSessionLocal
+    if _async_engine is None:
+        _async_engine = create_async_db_engine(settings.ASYNC_DATABASE_URL or to_async_database_url(DATABASE_URL))
+        # 提交后不过期对象，避免在异步上下文中访问属性触发隐式查询
+        _AsyncSessionLocal = async_sessionmaker(
+            _async_engine, class_=AsyncSession, autoflush=False, expire_on_commit=False
+        )
+    return _async_engine
+
+
+def _get_async_read_router() -> "ReadWriteRouter":
+    global _async_read_router
+    if _async_read_router is None:
+        get_async_engine()
+        replicas = [
+            async_sessionmaker(
+                create_async_db_engine(to_async_database_url(url), name=f"replica-{i}-async"),
+                class_=AsyncSession, autoflush=False, expire_on_commit=False
+            )
+            for i, url in enumerate(settings.replica_database_urls)
+        ]
+        _async_read_router = ReadWriteRouter(_AsyncSessionLocal, replicas, write_tracker)
+    return _async_read_router
+
+
+# 依赖注入：获取异步数据库会话
+async def get_async_db():
+    get_async_engine()
+    async with _AsyncSessionLocal() as db:
+        yield db
+
+
+# ===========================
+# 读写分离：只读查询路由到从库，用户写入后短时间内的读取固定走主库
+# ===========================
+
+class WriteTracker:
+    """记录最近发生过写入的请求方，在窗口期内其读取固定走主库（读己之写）
+
+    仅记录本进程内的写入；多 worker 部署时窗口应覆盖从库的典型复制延迟
+    """
+
+    def __init__(self, window: float = 5.0, max_entries: int = 10000):
+        """
+        Args:
+            window: 写入后固定读主库的时长（秒）
+            max_entries: 最多记录的请求方数量，超出时清理已过期的记录
+        """
+        self.window = window
+        self.max_entries = max_entries
+        self._expires: Dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def mark_write(self, key: Optional[str]):
+        """标记请求方刚刚发生写入"""
+        if not key or self.window <= 0:
+            return
+        now = time.monotonic()
+        with self._lock:
+            self._expires[key] = now + self.window
+            if len(self._expires) > self.max_entries:
+                self._expires = {k: v for k, v in self._expires.items() if v > now}
+
+    def is_pinned(self, key: Optional[str]) -> bool:
+        """请求方是否处于写后读主库的窗口期内"""
+        if not key:
+            return False
+        expires = self._expires.get(key)
+        return expires is not None and expires > time.monotonic()
+
+
+class ReadWriteRouter:
+    """只读会话路由：按轮询选择从库，未配置从库或请求方处于写后窗口期时使用主库"""
+
+    def __init__(self, primary, replicas: List, tracker: WriteTracker):
+        """
+        Args:
+            primary: 主库会话工厂
+            replicas: 从库会话工厂列表
+            tracker: 写入记录
+        """
+        self.primary = primary
+        self.replicas = replicas
+        self.tracker = tracker
+        self._cycle = itertools.cycle(replicas) if replicas else None
+        self._lock = threading.Lock()
+
+    def read_session(self, key: Optional[str] = None):
+        """创建只读查询使用的会话"""
+        if self._cycle is None or self.tracker.is_pinned(key):
+            return self.primary()
+        with self._lock:
+            factory = next(self._cycle)
+        return factory()
+
+
+def request_pin_key(request: Request) -> Optional[str]:
+    """请求方标识：使用认证头的摘要，无需解析令牌即可区分用户"""
+    credential = request.headers.get("authorization") or request.headers.get("x-test-mode")
+    if not credential:
+        return None
+    return hashlib.sha1(credential.encode("utf-8")).hexdigest()
+
+
+write_tracker = WriteTracker(window=settings.READ_YOUR_WRITES_WINDOW)
+
+ReplicaSessionLocals = [
+    sessionmaker(autocommit=False, autoflush=False, bind=create_db_engine(url, name=f"replica-{i}"))
+    for i, url in enumerate(settings.replica_database_urls)
+]
+
+read_router = ReadWriteRouter(SessionLocal, ReplicaSessionLocals, write_tracker)
+
+
+# 依赖注入：获取只读数据库会话（从库优先，写后窗口期内走主库）
+def get_read_db(request: Request):
+    db = read_router.read_session(request_pin_key(request))
+    try:
+        yield db
+    finally:
+        db.close()
+
+
+# 依赖注入：获取只读异步数据库会话
+async def get_async_read_db(request: Request):
+    async with _get_async_read_router().read_session(request_pin_key(request)) as db:
+        yield db
@@ -1,4 +1,4 @@
-from fastapi import FastAPI
+from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
 from app.routers import user_card, users, auth, membership, membership_orders, scenes, file, llm, chats, topic_cards, user_connections, vote_cards, feed, content_moderation, points, tags
@@ -6,7 +6,12 @@ from app.routers.user_profile import router as user_profile_router
 from app.routers import wxacode
 
 from app.utils.db_init import init_db
+from app.database import request_pin_key, write_tracker
 from app.config import settings
+from app.services.media_store import ImmutableStaticFiles, media_store
+from app.services.image_derivatives import DerivedStaticFiles, image_derivatives
+from app.services.card_search_index import topic_card_search_index, vote_card_search_index
+from app.services.user_search_index import user_search_index
 import os
 
 # 初始化应用
@@ -25,12 +30,35 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# 写请求成功后，该用户短时间内的只读查询固定走主库（读己之写）
+@app.middleware("http")
+async def track_writes(request: Request, call_next):
+    response = await call_next(request)
+    if request.method not in ("GET", "HEAD", "OPTIONS") and response.status_code < 400:
+        write_tracker.mark_write(request_pin_key(request))
+    return response
+
 # 初始化数据库
 init_db()
 
+# 启动后在后台构建用户文本索引，首个检索请求不必等待全量构建
+@app.on_event("startup")
+def warm_search_indexes():
+    user_search_index.warm()
+    topic_card_search_index.warm()
+    vote_card_search_index.warm()
+
 # 确保上传目录存在并挂载静态文件
 upload_path = os.path.abspath(settings.UPLOAD_DIR)
 os.makedirs(upload_path, exist_ok=True)
+# 按内容命名的文件永不变化，返回 immutable 缓存头（需要在 /uploads 之前挂载）
+blob_path = os.path.abspath(media_store.root)
+os.makedirs(blob_path, exist_ok=True)
+app.mount("/uploads/blobs", ImmutableStaticFiles(directory=blob_path), name="upload_blobs")
+# 缩略图/WebP 衍生图，首次请求时生成
+derived_path = os.path.abspath(image_derivatives.root)
+os.makedirs(derived_path, exist_ok=True)
+app.mount("/uploads/derived", DerivedStaticFiles(image_derivatives, directory=derived_path), name="upload_derived")
 app.mount("/uploads", StaticFiles(directory=upload_path), name="uploads")
 
 # 包含路由
@@ -100,6 +128,12 @@ def health_check():
         "timestamp": "2024-01-01T00:00:00Z"
     }
 
+@app.get("/internal/db/pool")
+def db_pool_metrics():
+    """数据库连接池指标（内部接口，nginx 不转发 /internal 路径）：借出/溢出连接数、借出等待时间、建连时间、等待超时次数"""
+    from app.core.db_engine import get_pool_metrics
+    return get_pool_metrics()
+
 if __name__ == "__main__":
     import uvicorn
     import sys
@@ -1,6 +1,9 @@
 # 先导入基础模型，避免循环依赖
 from .topic_card_db import TopicCard, TopicDiscussion, TopicOpinionSummary
 from .user import User
+from .user_token_version import UserTokenVersion
+from .used_refresh_token import UsedRefreshToken
+from .media_file import MediaFile
 from .user_card import Card
 from .user_card_db import UserCard
 from .order import MembershipOrder, OrderStatus
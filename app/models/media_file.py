@@ -0,0 +1,32 @@
+"""
+媒体文件记录模型（媒体目录）
+每次上传一条记录，指向按内容哈希存储的文件；同一内容被多次上传时共用一个文件，
+记录数即文件的引用计数，最后一条记录删除后回收文件。
+记录同时保存大小、类型、尺寸等信息，查询用户媒体时不需要扫描上传目录
+"""
+
+from sqlalchemy import Column, String, BigInteger, Integer, DateTime, Index
+from sqlalchemy.sql import func
+from app.database import Base
+
+
+class MediaFile(Base):
+    __tablename__ = "media_files"
+
+    id = Column(String(36), primary_key=True, comment="记录ID")
+    user_id = Column(String(36), nullable=False, comment="上传用户ID")
+    file_url = Column(String(255), nullable=False, comment="文件访问URL")
+    sha256 = Column(String(64), nullable=False, comment="文件内容SHA-256")
+    file_size = Column(BigInteger, nullable=False, default=0, comment="文件大小（字节）")
+    file_type = Column(String(20), comment="文件类型 image/video/document")
+    media_kind = Column(String(20), comment="媒体用途 avatar/image/video/house_image/house_video")
+    width = Column(Integer, comment="图片宽度（像素）")
+    height = Column(Integer, comment="图片高度（像素）")
+    content_type = Column(String(100), comment="MIME类型")
+    original_filename = Column(String(255), comment="原始文件名")
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+    __table_args__ = (
+        Index("idx_media_files_user", "user_id", "media_kind"),
+        Index("idx_media_files_url", "file_url"),
+    )
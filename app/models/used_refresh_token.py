@@ -0,0 +1,15 @@
+"""
+已使用的刷新令牌模型
+刷新令牌只能使用一次：换取新令牌时按 jti 插入记录，主键冲突说明已被使用；过期的记录定期清理
+"""
+
+from sqlalchemy import Column, String, DateTime
+from app.database import Base
+
+
+class UsedRefreshToken(Base):
+    __tablename__ = "used_refresh_tokens"
+
+    jti = Column(String(32), primary_key=True, comment="刷新令牌ID")
+    user_id = Column(String(36), nullable=False, comment="用户ID")
+    expires_at = Column(DateTime, nullable=False, index=True, comment="刷新令牌过期时间，过期后记录可清理")
@@ -7,6 +7,7 @@ from sqlalchemy import Column, String, Text, DateTime, Integer
 from sqlalchemy.sql import func
 from sqlalchemy.orm import relationship
 from app.database import Base
+from app.config import settings
 from pydantic import BaseModel, Field, field_validator
 from typing import Optional, List, Any
 from datetime import datetime
@@ -25,7 +26,11 @@ VECTOR_DIMENSION = 1024
 
 
 def get_embedding_column():
-    """获取向量列，根据 SQLAlchemy 版本选择合适的类型"""
+    """获取向量列，根据存储格式配置和 SQLAlchemy 版本选择合适的类型"""
+    storage_format = settings.EMBEDDING_STORAGE_FORMAT
+    if storage_format != "vector":
+        from app.utils.vector_codec import BinaryVector
+        return Column(BinaryVector(storage_format), nullable=True, comment=f"用户画像语义向量（{VECTOR_DIMENSION}维，{storage_format}二进制存储）")
     if VECTOR_TYPE_AVAILABLE:
         return Column(VECTOR(VECTOR_DIMENSION), nullable=True, comment=f"用户画像语义向量（{VECTOR_DIMENSION}维，豆包模型生成）")
     else:
@@ -78,6 +83,8 @@ class UserProfileBase(BaseModel):
             return None
         if isinstance(v, str):
             return v
+        if hasattr(v, "tolist"):
+            return json.dumps(v.tolist())
         try:
             return str(v)
         except Exception:
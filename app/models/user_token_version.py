@@ -0,0 +1,16 @@
+"""
+用户令牌版本模型
+只记录主动吊销过令牌的用户：令牌中的版本号小于这里的版本号即视为已吊销
+"""
+
+from sqlalchemy import Column, String, Integer, DateTime
+from sqlalchemy.sql import func
+from app.database import Base
+
+
+class UserTokenVersion(Base):
+    __tablename__ = "user_token_versions"
+
+    user_id = Column(String(36), primary_key=True, comment="用户ID")
+    token_version = Column(Integer, nullable=False, default=0, comment="当前令牌版本")
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
@@ -21,6 +21,10 @@ router = APIRouter()
 class DevQuickLoginRequest(BaseModel):
     phone: str
 
+# 刷新令牌请求模型
+class RefreshTokenRequest(BaseModel):
+    refreshToken: str
+
 @router.post("/sessions", response_model=BaseResponse, status_code=201)
 async def login(
     request: Request,
@@ -51,7 +55,7 @@ async def login(
                 pass
         
         # 验证登录请求
-        login_result = auth_service.login(
+        login_result = await auth_service.login_async(
             code=body["code"],
             user_info=user_info
         )
@@ -63,6 +67,7 @@ async def login(
             data={
                 "token": login_result["token"],
                 "expiresIn": login_result["expiresIn"],
+                "refreshToken": login_result.get("refreshToken"),
                 "isNewUser": login_result.get("isNewUser", False),
                 "userInfo": login_result["userInfo"]
             }
@@ -105,7 +110,7 @@ async def login_by_wechat_phone(
                 pass
         
         # 调用微信一键登录服务
-        login_result = auth_service.login_by_wechat_phone(
+        login_result = await auth_service.login_by_wechat_phone_async(
             code=code,
             phone_code=phone_code,
             user_info=user_info_obj,
@@ -118,6 +123,7 @@ async def login_by_wechat_phone(
             data={
                 "token": login_result["token"],
                 "expiresIn": login_result["expiresIn"],
+                "refreshToken": login_result.get("refreshToken"),
                 "isNewUser": login_result.get("isNewUser", False),
                 "userInfo": login_result["userInfo"]
             }
@@ -150,6 +156,7 @@ async def login_by_phone(
             data={
                 "token": login_result["token"],
                 "expiresIn": login_result["expiresIn"],
+                "refreshToken": login_result.get("refreshToken"),
                 "isNewUser": login_result.get("isNewUser", False),
                 "userInfo": login_result["userInfo"]
             }
@@ -286,6 +293,7 @@ async def register(
             data={
                 "token": register_result["token"],
                 "expiresIn": register_result["expiresIn"],
+                "refreshToken": register_result.get("refreshToken"),
                 "userInfo": register_result["userInfo"]
             }
         )
@@ -294,10 +302,26 @@ async def register(
     except Exception as e:
         return BaseResponse(code=1005, message=f"注册失败: {str(e)}", data={})
 
+@router.post("/sessions/refresh", response_model=BaseResponse)
+def refresh_session(
+    request: RefreshTokenRequest,
+    db: Session = Depends(get_db)
+):
+    """使用刷新令牌换取新的访问令牌"""
+    try:
+        tokens = AuthService.refresh_tokens(request.refreshToken, db)
+        return BaseResponse(code=0, message="success", data=tokens)
+    except ValueError as e:
+        raise HTTPException(status_code=401, detail=str(e))
+
 @router.delete("/sessions/current", status_code=204)
-async def logout():
+async def logout(request: Request):
     # 登出操作 - 204状态码不能有响应体
-    pass
+    auth_header = request.headers.get("authorization", "")
+    if auth_header.startswith("Bearer "):
+        user = auth_service.get_user_from_token(auth_header.split(" ", 1)[1])
+        if user:
+            auth_service.logout(str(user["id"]))
 
 @router.post("/sessions/dev-quick-login", response_model=BaseResponse, status_code=201)
 async def dev_quick_login(
@@ -328,6 +352,7 @@ async def dev_quick_login(
             data={
                 "token": login_result["token"],
                 "expiresIn": login_result["expiresIn"],
+                "refreshToken": login_result.get("refreshToken"),
                 "userInfo": login_result["userInfo"]
             }
         )
@@ -3,12 +3,14 @@
 提供聊天历史查询、消息发送等功能
 """
 from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 from typing import List, Optional, Dict, Any
 import uuid
 from datetime import datetime
 
-from app.database import get_db
+from app.database import get_db, get_async_db
 from app.models.schemas import ChatMessageResponse, ChatMessageCreate, ChatListResponse
 from app.models.chat_message import ChatSummary, ChatMessage
 from app.models.user_card import Card
@@ -44,7 +46,7 @@ async def get_chat_messages(
     card_id: str,
     page: int = Query(1, ge=1, description="页码"),
     limit: int = Query(20, ge=1, le=100, description="每页数量"),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: Optional[Dict[str, Any]] = Depends(get_current_user)
 ):
     """获取聊天历史记录
@@ -56,14 +58,14 @@ async def get_chat_messages(
             raise HTTPException(status_code=403, detail="您没有权限访问此卡片的聊天记录")
             
         # 从数据库查询消息
-        query = db.query(ChatMessage).filter(ChatMessage.card_id == card_id, ChatMessage.user_id == current_user.get("id"))
+        query = select(ChatMessage).where(ChatMessage.card_id == card_id, ChatMessage.user_id == current_user.get("id"))
         
         # 按创建时间排序
         query = query.order_by(ChatMessage.created_at.asc())
         
         # 应用分页
         offset = (page - 1) * limit
-        chat_messages = query.offset(offset).limit(limit).all()
+        chat_messages = (await db.execute(query.offset(offset).limit(limit))).scalars().all()
         
         # 转换为响应格式
         result = []
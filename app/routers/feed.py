@@ -1,9 +1,10 @@
 import random
 from typing import Optional, List, Dict, Any
 from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 from pydantic import BaseModel
-from app.database import get_db
+from app.database import get_async_read_db, get_read_db
 from app.dependencies import get_current_user
 from app.services.feed_service import FeedService
 from app.services.recommendation_service import RecommendationService
@@ -11,60 +12,18 @@ from app.services.topic_recommendation_service import TopicRecommendationService
 
 router = APIRouter()
 
-@router.get("/unified")
-async def get_unified_feed_cards(
-    limit: int = Query(default=20, ge=1, le=50, description="返回卡片数量限制"),
-    gender: Optional[str] = Query(default=None, description="性别筛选"),
-    city: Optional[str] = Query(default=None, description="城市筛选"),
-    min_age: Optional[int] = Query(default=None, ge=0, le=150, description="最小年龄"),
-    max_age: Optional[int] = Query(default=None, ge=0, le=150, description="最大年龄"),
-    include_topics: bool = Query(default=True, description="是否包含话题/投票卡片推荐"),
-    tag_id: Optional[str] = Query(default=None, description="社群标签ID，用于筛选特定社群的内容"),
-    current_user: Optional[Dict[str, Any]] = Depends(get_current_user),
-    db: Session = Depends(get_db)
-):
-    """
-    获取统一的推荐卡片流（用户推荐 + 话题/投票卡片推荐）
-
-    推荐流程：
-    1. 召回阶段：根据多种策略召回候选用户（社群标签、社交关系、用户标签等）
-       以及话题/投票卡片（基于社群标签、社交兴趣等）
-    2. 过滤阶段：应用用户设置的过滤条件（性别、城市、年龄）
-    3. 排序阶段：根据用户偏好和相关性排序
-    4. 整合输出：将话题推荐结果插入到用户推荐结果中
-
-    召回策略：
-    - 社群用户召回：召回拥有共同社群标签的用户
-    - 社交关系召回：召回长期未联络的朋友
-    - 用户标签召回：基于用户画像标签召回相似用户
-    - 活跃用户召回：补充活跃用户
-    - 社群话题/投票召回：召回社群群主发布的话题和投票卡片
-    - 社交兴趣话题/投票召回：召回用户感兴趣的人发布的内容
-
-    社群筛选模式（当传入 tag_id 时）：
-    - 只返回该社群成员的用户卡片
-    - 只返回该社群成员发布的话题和投票卡片
-    - 其他召回策略将被禁用，避免干扰社群筛选结果
-
-    排序因子：
-    - 标签匹配度（共同标签数量）
-    - 活跃度（最近更新时间）
-    - 资料完整度
-
-    Args:
-        limit: 返回卡片数量限制（1-50，默认20）
-        gender: 性别筛选（male/female/other）
-        city: 城市筛选
-        min_age: 最小年龄
-        max_age: 最大年龄
-        include_topics: 是否包含话题/投票卡片推荐（默认True）
-        tag_id: 社群标签ID，用于筛选特定社群的内容
-        current_user: 当前用户信息（可选，未登录时使用冷启动策略）
-        db: 数据库会话
-
-    Returns:
-        推荐卡片列表（包含用户卡片和话题/投票卡片）
-    """
+def _build_unified_feed(
+    db: Session,
+    limit: int,
+    gender: Optional[str],
+    city: Optional[str],
+    min_age: Optional[int],
+    max_age: Optional[int],
+    include_topics: bool,
+    tag_id: Optional[str],
+    current_user: Optional[Dict[str, Any]]
+) -> Dict[str, Any]:
+    """构建统一推荐卡片流（同步实现，由 run_sync 在异步会话的连接上执行）"""
     try:
         feed_service = FeedService(db)
         
@@ -233,11 +192,72 @@ async def get_unified_feed_cards(
         }
 
 
+@router.get("/unified")
+async def get_unified_feed_cards(
+    limit: int = Query(default=20, ge=1, le=50, description="返回卡片数量限制"),
+    gender: Optional[str] = Query(default=None, description="性别筛选"),
+    city: Optional[str] = Query(default=None, description="城市筛选"),
+    min_age: Optional[int] = Query(default=None, ge=0, le=150, description="最小年龄"),
+    max_age: Optional[int] = Query(default=None, ge=0, le=150, description="最大年龄"),
+    include_topics: bool = Query(default=True, description="是否包含话题/投票卡片推荐"),
+    tag_id: Optional[str] = Query(default=None, description="社群标签ID，用于筛选特定社群的内容"),
+    current_user: Optional[Dict[str, Any]] = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_read_db)
+):
+    """
+    获取统一的推荐卡片流（用户推荐 + 话题/投票卡片推荐）
+
+    推荐流程：
+    1. 召回阶段：根据多种策略召回候选用户（社群标签、社交关系、用户标签等）
+       以及话题/投票卡片（基于社群标签、社交兴趣等）
+    2. 过滤阶段：应用用户设置的过滤条件（性别、城市、年龄）
+    3. 排序阶段：根据用户偏好和相关性排序
+    4. 整合输出：将话题推荐结果插入到用户推荐结果中
+
+    召回策略：
+    - 社群用户召回：召回拥有共同社群标签的用户
+    - 社交关系召回：召回长期未联络的朋友
+    - 用户标签召回：基于用户画像标签召回相似用户
+    - 活跃用户召回：补充活跃用户
+    - 社群话题/投票召回：召回社群群主发布的话题和投票卡片
+    - 社交兴趣话题/投票召回：召回用户感兴趣的人发布的内容
+
+    社群筛选模式（当传入 tag_id 时）：
+    - 只返回该社群成员的用户卡片
+    - 只返回该社群成员发布的话题和投票卡片
+    - 其他召回策略将被禁用，避免干扰社群筛选结果
+
+    排序因子：
+    - 标签匹配度（共同标签数量）
+    - 活跃度（最近更新时间）
+    - 资料完整度
+
+    Args:
+        limit: 返回卡片数量限制（1-50，默认20）
+        gender: 性别筛选（male/female/other）
+        city: 城市筛选
+        min_age: 最小年龄
+        max_age: 最大年龄
+        include_topics: 是否包含话题/投票卡片推荐（默认True）
+        tag_id: 社群标签ID，用于筛选特定社群的内容
+        current_user: 当前用户信息（可选，未登录时使用冷启动策略）
+        db: 数据库会话
+
+    Returns:
+        推荐卡片列表（包含用户卡片和话题/投票卡片）
+    """
+    # FeedService 及其召回服务是同步实现，通过 run_sync 运行在异步连接上，
+    # 等待数据库返回期间事件循环可以继续处理其他请求
+    return await db.run_sync(
+        _build_unified_feed, limit, gender, city, min_age, max_age, include_topics, tag_id, current_user
+    )
+
+
 @router.get("/debug/recall")
 async def debug_recall_strategies(
     request: Request,
     current_user: Dict[str, Any] = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_read_db)
 ):
     """
     调试接口：查看各召回策略的结果
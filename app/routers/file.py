@@ -3,15 +3,21 @@
 处理文件上传相关的API请求
 """
 
+import asyncio
+import json
 import os
 import uuid
-import shutil
-from typing import List, Optional, Dict, Any
-from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Form
-from fastapi.responses import JSONResponse
+from typing import List, Optional, Dict, Any, Tuple
+from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Form, Query, Request
+from fastapi.responses import JSONResponse, StreamingResponse
 from app.models.schemas import BaseResponse
 from app.dependencies import get_current_user
 from app.config import settings
+from app.services.image_derivatives import image_derivatives
+from app.services.media_store import media_store
+from app.utils.db_config import get_db
+from app.utils.upload_stream import UploadTooLargeError, iter_upload_file
+from sqlalchemy.orm import Session
 from pathlib import Path
 
 router = APIRouter()
@@ -82,38 +88,71 @@ def generate_unique_filename(original_filename: str) -> str:
     return f"{unique_id}{ext}"
 
 
-def save_uploaded_file(file: UploadFile, user_id: str, file_type: str) -> dict:
-    """保存上传的文件"""
+def resolve_file_type(content_type: Optional[str]) -> Optional[Tuple[str, int]]:
+    """根据内容类型判断文件类型和大小限制，不支持的类型返回 None"""
+    if content_type in ALLOWED_IMAGE_TYPES:
+        return "image", settings.MAX_IMAGE_SIZE
+    if content_type in ALLOWED_VIDEO_TYPES:
+        return "video", settings.MAX_VIDEO_SIZE
+    if content_type in ALLOWED_DOCUMENT_TYPES:
+        return "document", settings.MAX_FILE_SIZE
+    return None
+
+
+def _build_file_info(stored: Dict[str, Any], original_filename: Optional[str],
+                     file_type: str, content_type: Optional[str]) -> dict:
+    return {
+        "filename": stored["filename"],
+        "original_filename": original_filename,
+        "file_path": stored["file_path"],
+        "file_url": stored["file_url"],
+        "file_size": stored["file_size"],
+        "file_type": file_type,
+        "content_type": content_type,
+        "sha256": stored["sha256"]
+    }
+
+
+def _raise_too_large(max_size: int):
+    raise HTTPException(
+        status_code=400,
+        detail=f"文件大小超过限制 ({max_size / (1024 * 1024):.1f}MB)"
+    )
+
+
+def save_uploaded_file(file: UploadFile, user_id: str, file_type: str, db: Session, max_size: Optional[int] = None) -> dict:
+    """保存上传的文件（同步，分块复制并校验大小，相同内容只存一份）"""
     try:
-        # 创建用户专属目录
-        user_dir = os.path.join(settings.UPLOAD_DIR, user_id)
-        os.makedirs(user_dir, exist_ok=True)
-        
-        # 生成唯一文件名
-        unique_filename = generate_unique_filename(file.filename or "unknown")
-        file_path = os.path.join(user_dir, unique_filename)
+        # 分块保存到内容地址，超过大小限制时中止
+        stored = media_store.store_file_object(file.file, file.filename, max_size, settings.UPLOAD_CHUNK_SIZE)
         
-        # 保存文件
-        with open(file_path, 'wb') as f:
-            shutil.copyfileobj(file.file, f)
+        # 记录上传（文件引用计数加一）
+        media_store.add_reference(db, user_id, stored, file_type, file.content_type, file.filename)
         
-        # 获取文件大小
-        file_size = os.path.getsize(file_path)
-        
-        # 生成访问URL
-        relative_path = os.path.join(user_id, unique_filename).replace('\\', '/')
-        file_url = f"/uploads/{relative_path}"
-        
-        return {
-            "filename": unique_filename,
-            "original_filename": file.filename,
-            "file_path": file_path,
-            "file_url": file_url,
-            "file_size": file_size,
-            "file_type": file_type,
-            "content_type": file.content_type
-        }
+        return _build_file_info(stored, file.filename, file_type, file.content_type)
+    
+    except UploadTooLargeError as e:
+        _raise_too_large(e.max_size)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"文件保存失败: {str(e)}")
+
+
+async def save_uploaded_file_async(file: UploadFile, user_id: str, file_type: str, db: Session,
+                                   max_size: Optional[int] = None) -> dict:
+    """保存上传的文件（异步，分块读取，磁盘和数据库操作在线程池中执行）"""
+    try:
+        stored = await media_store.store_stream(
+            iter_upload_file(file, settings.UPLOAD_CHUNK_SIZE), file.filename, max_size
+        )
+        await asyncio.to_thread(
+            media_store.add_reference, db, user_id, stored, file_type, file.content_type, file.filename
+        )
+        if file_type == "image":
+            image_derivatives.warm(stored["file_url"])
+        return _build_file_info(stored, file.filename, file_type, file.content_type)
     
+    except UploadTooLargeError as e:
+        _raise_too_large(e.max_size)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"文件保存失败: {str(e)}")
 
@@ -122,7 +161,8 @@ def save_uploaded_file(file: UploadFile, user_id: str, file_type: str) -> dict:
 async def upload_file(
     file: UploadFile = File(...),
     file_type: str = Form(default="image"),
-    current_user: Dict[str, Any] = Depends(get_current_user)
+    current_user: Dict[str, Any] = Depends(get_current_user),
+    db: Session = Depends(get_db)
 ):
     """
     上传文件
@@ -158,16 +198,9 @@ async def upload_file(
         print(f"文件内容类型: {file.content_type}")
         
         # 智能文件类型检测 - 根据实际内容类型自动判断
-        actual_file_type = None
-        if file.content_type in ALLOWED_IMAGE_TYPES:
-            actual_file_type = "image"
-            max_size = settings.MAX_IMAGE_SIZE
-        elif file.content_type in ALLOWED_VIDEO_TYPES:
-            actual_file_type = "video"
-            max_size = settings.MAX_VIDEO_SIZE
-        elif file.content_type in ALLOWED_DOCUMENT_TYPES:
-            actual_file_type = "document"
-            max_size = settings.MAX_FILE_SIZE
+        resolved = resolve_file_type(file.content_type)
+        if resolved:
+            actual_file_type, max_size = resolved
         else:
             print(f"不支持的文件类型: {file.content_type}")
             raise HTTPException(
@@ -204,8 +237,8 @@ async def upload_file(
         
         print(f"最终用户ID: {user_id}")
         
-        # 保存文件
-        file_info = save_uploaded_file(file, user_id, file_type)
+        # 流式保存文件，边写边校验大小（file.size 可能缺失）
+        file_info = await save_uploaded_file_async(file, user_id, file_type, db, max_size)
         
         return BaseResponse(
             code=0,
@@ -222,6 +255,50 @@ async def upload_file(
         raise HTTPException(status_code=500, detail=f"文件上传失败: {str(e)}")
 
 
+@router.post("/upload/stream")
+async def upload_file_stream(
+    request: Request,
+    filename: str = Query(..., description="原始文件名"),
+    file_type: str = Query(default="image"),
+    current_user: Dict[str, Any] = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """
+    流式上传文件（请求体为文件原始内容，Content-Type 为文件类型）
+    
+    直接从 ASGI 请求体按分块读取写入磁盘，不经过 multipart 解析，大视频上传不会占用 worker 内存
+    """
+    content_type = request.headers.get("content-type", "").split(";")[0].strip()
+    resolved = resolve_file_type(content_type)
+    if not resolved:
+        raise HTTPException(status_code=400, detail=f"不支持的文件格式 '{content_type}'")
+    file_type, max_size = resolved
+    
+    # 声明了 Content-Length 时在读取前拒绝超限的文件
+    content_length = request.headers.get("content-length")
+    if content_length and content_length.isdigit() and int(content_length) > max_size:
+        _raise_too_large(max_size)
+    
+    user_id = current_user.get('id') or current_user.get('user_id') or current_user.get('phone', 'anonymous')
+    try:
+        stored = await media_store.store_stream(request.stream(), filename, max_size)
+        await asyncio.to_thread(media_store.add_reference, db, user_id, stored, file_type, content_type, filename)
+    except UploadTooLargeError as e:
+        _raise_too_large(e.max_size)
+    except Exception as e:
+        print(f"流式上传异常: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"文件上传失败: {str(e)}")
+    
+    if file_type == "image":
+        image_derivatives.warm(stored["file_url"])
+    
+    return BaseResponse(
+        code=0,
+        message="文件上传成功",
+        data=_build_file_info(stored, filename, file_type, content_type)
+    )
+
+
 @router.post("/upload/simple")
 async def upload_file_simple(
     file: UploadFile = File(...),
@@ -264,18 +341,60 @@ async def upload_file_simple(
         traceback.print_exc()
         return BaseResponse(code=500, message=f"上传失败: {str(e)}", data=None)
 
+async def _save_one_of_batch(
+    index: int,
+    file: UploadFile,
+    user_id: str,
+    db: Session,
+    semaphore: asyncio.Semaphore,
+    db_lock: asyncio.Lock
+) -> Dict[str, Any]:
+    """批量上传中的单个文件：写入内容存储并记录上传，失败时返回错误信息而不是抛出"""
+    def failed(error: str) -> Dict[str, Any]:
+        return {"file_index": index, "filename": file.filename, "error": error}
+    
+    resolved = resolve_file_type(file.content_type)
+    if not resolved:
+        return failed(f"不支持的文件格式 '{file.content_type}'")
+    file_type, max_size = resolved
+    
+    async with semaphore:
+        try:
+            stored = await media_store.store_stream(
+                iter_upload_file(file, settings.UPLOAD_CHUNK_SIZE), file.filename, max_size
+            )
+            # 数据库会话不能并发使用，记录上传时串行
+            async with db_lock:
+                await asyncio.to_thread(
+                    media_store.add_reference, db, user_id, stored, file_type, file.content_type, file.filename
+                )
+        except UploadTooLargeError as e:
+            return failed(str(e))
+        except Exception as e:
+            return failed(f"文件保存失败: {str(e)}")
+    
+    if file_type == "image":
+        image_derivatives.warm(stored["file_url"])
+    return {"file_index": index, **_build_file_info(stored, file.filename, file_type, file.content_type)}
+
+
 @router.post("/upload/multiple")
-def upload_multiple_files(
+async def upload_multiple_files(
     files: List[UploadFile] = File(...),
     file_type: str = Form(default="image"),
-    current_user: Dict[str, Any] = Depends(get_current_user)
+    stream: bool = Form(default=False),
+    current_user: Dict[str, Any] = Depends(get_current_user),
+    db: Session = Depends(get_db)
 ):
     """
     批量上传文件
     
+    多个文件并发写入（同时写入的数量由 UPLOAD_PARALLELISM 限制），部分文件失败不影响其他文件
+    
     Args:
         files: 上传的文件列表
-        file_type: 文件类型
+        file_type: 文件类型（按每个文件的实际内容类型判断，保留参数兼容旧客户端）
+        stream: 为 true 时以 NDJSON 逐行返回，每个文件完成后立即返回一行，最后一行为汇总
         current_user: 当前用户
     
     Returns:
@@ -290,37 +409,43 @@ def upload_multiple_files(
         if len(files) > max_files:
             raise HTTPException(status_code=400, detail=f"一次最多上传{max_files}个文件")
         
+        user_id = current_user.get('id') or current_user.get('user_id') or current_user.get('phone', 'anonymous')
+        semaphore = asyncio.Semaphore(max(1, settings.UPLOAD_PARALLELISM))
+        db_lock = asyncio.Lock()
+        tasks = [
+            asyncio.ensure_future(_save_one_of_batch(i, file, user_id, db, semaphore, db_lock))
+            for i, file in enumerate(files)
+        ]
+        
+        def summary(results: List[Dict[str, Any]], errors: List[Dict[str, Any]]) -> Dict[str, Any]:
+            return {
+                "success_files": sorted(results, key=lambda r: r["file_index"]),
+                "failed_files": sorted(errors, key=lambda r: r["file_index"]),
+                "total": len(files),
+                "success_count": len(results),
+                "error_count": len(errors)
+            }
+        
+        if stream:
+            async def ndjson():
+                results, errors = [], []
+                for next_done in asyncio.as_completed(tasks):
+                    result = await next_done
+                    (errors if "error" in result else results).append(result)
+                    yield json.dumps(result, ensure_ascii=False) + "\n"
+                yield json.dumps({"summary": summary(results, errors)}, ensure_ascii=False) + "\n"
+            
+            return StreamingResponse(ndjson(), media_type="application/x-ndjson")
+        
         results = []
         errors = []
-        
-        for i, file in enumerate(files):
-            try:
-                # 重用单文件上传逻辑
-                user_id = current_user.get('id') or current_user.get('user_id') or current_user.get('phone', 'anonymous')
-                file_info = save_uploaded_file(
-                    file, 
-                    user_id, 
-                    file_type
-                )
-                results.append(file_info)
-                
-            except Exception as e:
-                errors.append({
-                    "file_index": i,
-                    "filename": file.filename,
-                    "error": str(e)
-                })
+        for result in await asyncio.gather(*tasks):
+            (errors if "error" in result else results).append(result)
         
         return BaseResponse(
             code=0,
             message=f"批量上传完成，成功{len(results)}个，失败{len(errors)}个",
-            data={
-                "success_files": results,
-                "failed_files": errors,
-                "total": len(files),
-                "success_count": len(results),
-                "error_count": len(errors)
-            }
+            data=summary(results, errors)
         )
         
     except HTTPException:
@@ -335,7 +460,8 @@ def upload_multiple_files(
 @router.delete("/delete/{file_path:path}")
 def delete_file(
     file_path: str,
-    current_user: Dict[str, Any] = Depends(get_current_user)
+    current_user: Dict[str, Any] = Depends(get_current_user),
+    db: Session = Depends(get_db)
 ):
     """
     删除文件
@@ -350,6 +476,18 @@ def delete_file(
     try:
         user_id = current_user.get('id') or current_user.get('user_id') or current_user.get('phone', 'anonymous')
         
+        # 按内容存储的文件：删除用户的上传记录，没有其他引用时回收文件
+        file_url = f"/uploads/{file_path.lstrip('/')}"
+        if media_store.is_blob_url(file_url):
+            collected = media_store.release(db, user_id, file_url)
+            if collected is None:
+                raise HTTPException(status_code=404, detail="文件不存在")
+            return BaseResponse(
+                code=0,
+                message="文件删除成功",
+                data={"deleted_file": file_path, "collected": collected}
+            )
+        
         # 构建完整文件路径
         full_path = os.path.join(settings.UPLOAD_DIR, file_path)
         
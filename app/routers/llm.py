@@ -14,11 +14,15 @@ from app.services.auth import auth_service
 from app.services.llm_service import LLMService
 from app.services.user_card_service import UserCardService
 from app.models.llm_schemas import ConversationSuggestionRequest, SimpleChatStreamRequest
+from app.utils.stream_json_parser import StreamingJSONFieldExtractor
 
 logger = logging.getLogger(__name__)
 
 router = APIRouter(prefix="/llm", tags=["大语言模型"])
 
+# 流式过程中一旦解析完成就提前推送的元数据字段
+_EARLY_METADATA_FIELDS = ("confidence", "is_meet_preference", "preference_judgement")
+
 
 def _infer_preference_from_content(content: str) -> bool:
     """从内容中推断是否满足偏好
@@ -76,13 +80,18 @@ async def generate_conversation_suggestions_stream(
             current_user = anonymous_user
     
     async def generate_stream():
-        """生成流式响应 - 使用真正的LLM流式调用"""
+        """生成流式响应 - 使用真正的LLM流式调用
+
+        文本块原样转发，同时经过增量JSON解析阶段：
+        confidence / is_meet_preference 等字段一旦完整立即以 field 事件推送，
+        流结束后再汇总发送 metadata（含提供商返回的真实token用量）
+        """
         import json
-        import asyncio
-        import re
+        import time
         try:
+            start_time = time.monotonic()
             # 调用专门的流式对话建议方法
-            stream_response = service.generate_conversation_suggestion_stream(
+            stream_response = await service.generate_conversation_suggestion_stream(
                 user_id=request.userId,
                 card_id=request.cardId,
                 chatId=request.chatId,
@@ -93,84 +102,62 @@ async def generate_conversation_suggestions_stream(
                 model_name=settings.LLM_MODEL
             )
             
-            # 收集完整响应用于后续处理
-            full_content = ""
+            # 增量解析器：分块保存内容，字段完成即可取出
+            extractor = StreamingJSONFieldExtractor()
+            usage = None
             
             # 流式发送文本内容
             async for chunk in stream_response:
                 if chunk["type"] == "text":
                     content = chunk["content"]
-                    full_content += content
                     data = {
                         "type": "text",
                         "content": content,
                         "finished": chunk.get("finished", False)
                     }
                     yield f"data: {json.dumps(data, ensure_ascii=False)}\n\n"
+                    
+                    for key, value in extractor.feed(content):
+                        if key in _EARLY_METADATA_FIELDS:
+                            field_data = {"type": "field", "name": key, "value": value}
+                            yield f"data: {json.dumps(field_data, ensure_ascii=False)}\n\n"
+                elif chunk["type"] in ("usage", "metadata") and chunk.get("usage"):
+                    usage = chunk["usage"]
+                elif chunk["type"] == "error":
+                    raise RuntimeError(chunk.get("message", "LLM流式调用失败"))
                 elif chunk["type"] == "end":
                     break
             
-            # 解析完整响应获取元数据
-            try:
-                # 尝试从完整内容中提取JSON部分
-                json_match = re.search(r'\{[\s\S]*\}', full_content, re.DOTALL)
-                if json_match:
-                    try:
-                        response_data = json.loads(json_match.group())
-                        
-                        # 发送元数据
-                        await asyncio.sleep(0.2)
-                        metadata = {
-                            "type": "metadata",
-                            "confidence": response_data.get("confidence", 0.8),
-                            "is_meet_preference": response_data.get("is_meet_preference", False),
-                            "preference_judgement": response_data.get("preference_judgement", ""),
-                            "usage": {"prompt_tokens": 50, "completion_tokens": len(full_content), "total_tokens": 50 + len(full_content)},
-                            "duration": 2.0
-                        }
-                        yield f"data: {json.dumps(metadata, ensure_ascii=False)}\n\n"
-                    except json.JSONDecodeError as json_error:
-                        logger.warning(f"JSON解析失败: {str(json_error)}, 内容: {json_match.group()[:200]}")
-                        # 发送默认元数据
-                        await asyncio.sleep(0.2)
-                        metadata = {
-                            "type": "metadata",
-                            "confidence": 0.7,
-                            "is_meet_preference": True,
-                            "preference_judgement": "分析完成",
-                            "usage": {"prompt_tokens": 50, "completion_tokens": len(full_content), "total_tokens": 50 + len(full_content)},
-                            "duration": 2.0
-                        }
-                        yield f"data: {json.dumps(metadata, ensure_ascii=False)}\n\n"
-                else:
-                    # 如果没有找到JSON格式，尝试查找其他模式
-                    logger.warning(f"未找到JSON格式，完整内容预览: {full_content[:300]}")
-                    
-                    # 尝试从内容中推断偏好匹配
-                    is_meet_preference = _infer_preference_from_content(full_content)
-                    
-                    await asyncio.sleep(0.2)
-                    metadata = {
-                        "type": "metadata",
-                        "confidence": 0.6,
-                        "is_meet_preference": is_meet_preference,
-                        "preference_judgement": "基于内容分析",
-                        "usage": {"prompt_tokens": 50, "completion_tokens": len(full_content), "total_tokens": 50 + len(full_content)},
-                        "duration": 2.0
-                    }
-                    yield f"data: {json.dumps(metadata, ensure_ascii=False)}\n\n"
-            except Exception as e:
-                logger.error(f"解析响应数据失败: {str(e)}")
-                # 发送默认元数据
+            # 汇总元数据
+            fields = extractor.fields
+            if fields:
                 metadata = {
                     "type": "metadata",
-                    "confidence": 0.5,
+                    "confidence": fields.get("confidence", 0.8),
+                    "is_meet_preference": fields.get("is_meet_preference", False),
+                    "preference_judgement": fields.get("preference_judgement", "")
+                }
+            elif extractor.object_started:
+                logger.warning(f"JSON解析失败, 内容: {extractor.text[:200]}")
+                metadata = {
+                    "type": "metadata",
+                    "confidence": 0.7,
                     "is_meet_preference": True,
-                    "preference_judgement": "默认分析结果",
-                    "usage": {"prompt_tokens": 50, "completion_tokens": len(full_content), "total_tokens": 50 + len(full_content)},
-                    "duration": 2.0
+                    "preference_judgement": "分析完成"
+                }
+            else:
+                # 如果没有找到JSON格式，尝试从内容中推断偏好匹配
+                full_content = extractor.text
+                logger.warning(f"未找到JSON格式，完整内容预览: {full_content[:300]}")
+                metadata = {
+                    "type": "metadata",
+                    "confidence": 0.6,
+                    "is_meet_preference": _infer_preference_from_content(full_content),
+                    "preference_judgement": "基于内容分析"
                 }
-                yield f"data: {json.dumps(metadata, ensure_ascii=False)}\n\n"
+            metadata["usage"] = usage or {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0}
+            metadata["duration"] = round(time.monotonic() - start_time, 3)
+            yield f"data: {json.dumps(metadata, ensure_ascii=False)}\n\n"
             
             # 发送结束标记
             yield f"data: {json.dumps({'type': 'end'}, ensure_ascii=False)}\n\n"
@@ -221,7 +208,7 @@ async def generate_simple_chat_stream(
         import json
         try:
             # 调用简单聊天流式方法
-            stream_response = service.generate_simple_chat_stream(
+            stream_response = await service.generate_simple_chat_stream(
                 user_id=request.userId,
                 card_id=request.cardId,
                 chat_id=request.chatId,
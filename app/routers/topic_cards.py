@@ -1,8 +1,9 @@
 from fastapi import APIRouter, Depends, HTTPException, Query, status, Request
 from pydantic import BaseModel
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 from typing import List, Optional, Dict, Any
-from app.database import get_db
+from app.database import get_db, get_read_db, get_async_read_db
 from app.models.user import User
 from app.models.topic_card_db import TopicCard, TopicDiscussion
 from app.models.topic_card import (
@@ -55,7 +56,7 @@ async def get_topic_cards(
     userId: Optional[str] = Query(None, description="用户ID，用于筛选特定用户创建的话题卡片"),
     authorId: Optional[str] = Query(None, description="作者ID，用于筛选特定用户创建的话题卡片（兼容前端参数）"),
     current_user: Dict[str, Any] = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_read_db)
 ):
     """获取话题卡片列表"""
     try:
@@ -89,13 +90,13 @@ async def get_topic_card_detail(
     card_id: str,
     invitation_id: Optional[str] = Query(None, description="邀请ID，用于显示邀请者信息"),
     current_user: Dict[str, Any] = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_read_db)
 ):
     """获取话题卡片详情"""
     try:
         user_id = str(current_user.get("id")) if current_user else None
         
-        card_detail = TopicCardService.get_topic_card_detail(db, card_id, user_id, invitation_id)
+        card_detail = await TopicCardService.get_topic_card_detail_async(db, card_id, user_id)
         if not card_detail:
             raise HTTPException(status_code=404, detail="话题卡片不存在")
         
@@ -1,3 +1,4 @@
+import asyncio
 from fastapi import APIRouter, Depends, HTTPException, status, UploadFile, File, BackgroundTasks
 from sqlalchemy.orm import Session
 from typing import List, Dict, Any, Optional
@@ -7,7 +8,7 @@ import json
 from enum import Enum
 import httpx
 import os
-from app.utils.db_config import get_db
+from app.utils.db_config import SessionLocal, get_db
 from app.models.user import User
 from sqlalchemy import func
 from app.services.data_adapter import DataService
@@ -22,8 +23,12 @@ from app.models.user_card import CardCreate
 from app.models.enums import SceneType, UserRoleType
 from app.services.embedding_service import embedding_service
 from app.services.user_profile.user_profile_service import UserProfileService
+from app.services.user_search_index import user_search_index
+from app.services.principal_cache import principal_cache
+from app.services.auth import TOKEN_PROFILE_FIELDS, AuthService
 from app.services.llm_service import LLMService
 from app.models.llm_schemas import LLMProvider, LLMRequest
+from app.config import settings
 
 router = APIRouter(
     prefix="/users",
@@ -403,6 +408,8 @@ def update_current_user(profile_data: ProfileUpdate, background_tasks: Backgroun
                 setattr(db_user, key, value)
             db.commit()
             db.refresh(db_user)
+            user_search_index.touch(user_id)
+            principal_cache.invalidate_user(user_id)
             updated_user = db_user
         except Exception as update_error:
             import traceback
@@ -439,7 +446,11 @@ def update_current_user(profile_data: ProfileUpdate, background_tasks: Backgroun
         # 移除SQLAlchemy内部字段并返回干净的用户数据
         user_dict = updated_user.__dict__.copy()
         user_dict.pop('_sa_instance_state', None)
-        return BaseResponse(code=0, message="用户信息更新成功", data=process_user_image_urls(user_dict))
+        response_data = process_user_image_urls(user_dict)
+        if settings.AUTH_CLAIMS_MODE and any(field in update_dict for field in TOKEN_PROFILE_FIELDS):
+            # 访问令牌携带昵称、头像、性别，修改后返回新令牌，客户端替换后立即生效
+            response_data.update(AuthService.issue_user_tokens(updated_user))
+        return BaseResponse(code=0, message="用户信息更新成功", data=response_data)
         
     except Exception as e:
         print(f"更新用户信息失败: {e}")
@@ -489,6 +500,8 @@ def delete_current_user(current_user: Dict[str, Any] = Depends(get_current_user)
             setattr(db_user, key, value)
         db.commit()
         db.refresh(db_user)
+        # 吊销该用户已签发的令牌（同时清除登录用户缓存）
+        AuthService.revoke_user_tokens(user_id)
         updated_user = db_user
         if not updated_user:
             raise HTTPException(status_code=500, detail="Failed to delete user account")
@@ -877,6 +890,8 @@ def update_user(user_id: str, user: ProfileUpdate, db: Session = Depends(get_db)
     
     db.commit()
     db.refresh(db_user)
+    user_search_index.touch(user_id)
+    principal_cache.invalidate_user(user_id)
     return db_user
 
 @router.delete("/{user_id}", status_code=status.HTTP_204_NO_CONTENT)
@@ -884,6 +899,9 @@ def delete_user(user_id: str, db: Session = Depends(get_db)):
     success = db_service.delete_user(db, user_id=user_id)
     if not success:
         raise HTTPException(status_code=404, detail="User not found")
+    # 吊销该用户已签发的令牌（同时清除登录用户缓存）
+    AuthService.revoke_user_tokens(user_id)
+    user_search_index.touch(user_id)
     return {"detail": "User deleted"}
 
 
@@ -1207,6 +1225,82 @@ async def generate_display_reasons(
     return {}
 
 
+def reciprocal_rank_fusion(
+    result_lists: List[List[Dict[str, Any]]],
+    k: int = 60
+) -> List[Dict[str, Any]]:
+    """
+    倒数排名融合（RRF）合并多路检索结果
+
+    每个用户的融合得分为其在各路结果中 1 / (k + 排名) 之和，
+    similarity 保留各路结果中的最大值用于展示
+
+    Args:
+        result_lists: 多路检索结果，每路按相似度降序
+        k: 平滑常数
+
+    Returns:
+        按融合得分降序的候选列表
+    """
+    fused: Dict[str, Dict[str, Any]] = {}
+    scores: Dict[str, float] = {}
+    for results in result_lists:
+        for rank, candidate in enumerate(results, start=1):
+            user_id = candidate['user_id']
+            scores[user_id] = scores.get(user_id, 0.0) + 1.0 / (k + rank)
+            existing = fused.get(user_id)
+            if existing is None or candidate['similarity'] > existing['similarity']:
+                fused[user_id] = candidate
+    return sorted(fused.values(), key=lambda c: scores[c['user_id']], reverse=True)
+
+
+async def _wait_for_expansion(expansion_task: asyncio.Task, query: str, timeout: Optional[float]) -> List[str]:
+    """
+    等待 LLM 查询扩展结果
+
+    Args:
+        timeout: 最长等待时间（秒），None 表示一直等待（还没有任何检索结果时）
+
+    Returns:
+        扩展后的查询；超时时取消扩展并只返回原始查询，调用方仅使用原始查询的结果
+    """
+    try:
+        return await asyncio.wait_for(expansion_task, timeout=timeout)
+    except asyncio.TimeoutError:
+        print(f"[SemanticSearch] LLM查询扩展超时，仅使用原始查询结果")
+        return [query]
+
+
+def _vector_search(embedding: List[float], exclude_user_ids: List[str], limit: int) -> List[Dict[str, Any]]:
+    """向量检索（在线程池中执行，使用独立的数据库会话）"""
+    db = SessionLocal()
+    try:
+        return UserProfileService(db).search_by_vector_similarity(
+            embedding=embedding,
+            exclude_user_ids=exclude_user_ids,
+            limit=limit
+        )
+    finally:
+        db.close()
+
+
+def _lexical_search(query: str, k: int, exclude_ids: List[str]):
+    """用户文本索引关键词检索（在线程池中执行，首次检索的全量构建不阻塞事件循环）"""
+    db = SessionLocal()
+    try:
+        return user_search_index.search(db, query, k=k, exclude_ids=exclude_ids)
+    finally:
+        db.close()
+
+
+def _load_users_by_ids(db: Session, user_ids: List[str]) -> Dict[str, User]:
+    """一次 IN 查询批量获取用户"""
+    if not user_ids:
+        return {}
+    users = db.query(User).filter(User.id.in_(user_ids)).all()
+    return {user.id: user for user in users}
+
+
 @router.post("/semantic-search", response_model=BaseResponse)
 async def semantic_search(
     request: SemanticSearchRequest,
@@ -1217,45 +1311,23 @@ async def semantic_search(
     对话式语义搜索用户
 
     流程：
-    1. 调用 LLM 对用户输入进行语义改写和扩展，得到 3 条近似搜索语句
-    2. 调用豆包 embedding 向量模型，得到语义对应的向量
-    3. 基于向量在用户画像数据库中进行向量检索，得到最相近的备选用户
-    4. 返回搜索结果
+    1. 后台调用 LLM 对用户输入进行语义改写和扩展，得到 3 条近似搜索语句
+    2. 扩展进行的同时，先对原始查询生成向量并执行一次向量检索（推测执行），
+       同时在用户文本索引中做关键词检索，召回昵称、职业等精确匹配的用户
+    3. 扩展完成后对扩展查询生成向量并检索，与前两路结果做倒数排名融合；
+       扩展超时或失败时直接返回已有的结果
+    4. 一次 IN 查询批量获取候选用户信息并返回
     """
     try:
         # 初始化服务
         llm_service = LLMService(db)
-        profile_service = UserProfileService(db)
 
         print(f"[SemanticSearch] 开始语义搜索，用户查询: {request.query}")
 
-        # 步骤1：使用 LLM 扩展查询
-        print(f"[SemanticSearch] 步骤1：调用LLM扩展查询...")
-        expanded_queries = await expand_query_with_llm(request.query, llm_service)
-        print(f"[SemanticSearch] 扩展后的查询: {expanded_queries}")
-
-        # 步骤2：使用 embedding 模型生成查询向量
-        print(f"[SemanticSearch] 步骤2：调用embedding模型生成向量...")
-        combined_query = f"{request.query} {' '.join(expanded_queries)}"
-        embedding = await embedding_service.generate_embedding_with_retry(combined_query)
+        # 步骤1：后台执行 LLM 查询扩展
+        expansion_task = asyncio.create_task(expand_query_with_llm(request.query, llm_service))
+        started_at = asyncio.get_running_loop().time()
 
-        if not embedding:
-            print(f"[SemanticSearch] embedding生成失败")
-            embedding = await embedding_service.generate_embedding_with_retry(request.query)
-            if not embedding:
-                return BaseResponse(
-                    code=0,
-                    message="success",
-                    data={
-                        "items": [],
-                        "expanded_queries": [request.query],
-                        "display_reasons": {},
-                        "total": 0
-                    }
-                )
-
-        # 步骤3：向量检索
-        print(f"[SemanticSearch] 步骤3：执行向量检索...")
         exclude_user_ids = []
         if current_user:
             user_id = current_user.get("id")
@@ -1266,42 +1338,83 @@ async def semantic_search(
         offset = (request.page - 1) * request.page_size
         search_limit = offset + limit + 10
 
-        candidates = profile_service.search_by_vector_similarity(
-            embedding=embedding,
-            exclude_user_ids=exclude_user_ids,
-            limit=search_limit
+        # 步骤2：原始查询的向量检索、关键词检索与扩展并行
+        print(f"[SemanticSearch] 步骤2：原始查询向量检索与关键词检索...")
+        result_lists = []
+        lexical_task = asyncio.create_task(
+            asyncio.to_thread(_lexical_search, request.query, search_limit, exclude_user_ids)
+        )
+        raw_embedding = await embedding_service.generate_embedding_with_retry(request.query)
+        if raw_embedding:
+            result_lists.append(await asyncio.to_thread(
+                _vector_search, raw_embedding, exclude_user_ids, search_limit
+            ))
+
+        lexical_hits = await lexical_task
+        if lexical_hits:
+            print(f"[SemanticSearch] 关键词检索找到 {len(lexical_hits)} 个候选用户")
+            result_lists.append([{"user_id": uid, "similarity": 0.0} for uid, _ in lexical_hits])
+
+        # 步骤3：等待扩展结果（有原始结果时最多等待配置的时长）
+        remaining = settings.SEMANTIC_SEARCH_EXPANSION_TIMEOUT - (asyncio.get_running_loop().time() - started_at)
+        expanded_queries = await _wait_for_expansion(
+            expansion_task, request.query, max(remaining, 0) if result_lists else None
         )
+        print(f"[SemanticSearch] 扩展后的查询: {expanded_queries}")
+
+        if any(q != request.query for q in expanded_queries):
+            print(f"[SemanticSearch] 步骤3：扩展查询向量检索...")
+            combined_query = f"{request.query} {' '.join(expanded_queries)}"
+            expanded_embedding = await embedding_service.generate_embedding_with_retry(combined_query)
+            if expanded_embedding:
+                result_lists.append(await asyncio.to_thread(
+                    _vector_search, expanded_embedding, exclude_user_ids, search_limit
+                ))
 
+        if not result_lists:
+            print(f"[SemanticSearch] embedding生成失败")
+            return BaseResponse(
+                code=0,
+                message="success",
+                data={
+                    "items": [],
+                    "expanded_queries": expanded_queries,
+                    "display_reasons": {},
+                    "total": 0
+                }
+            )
+
+        candidates = reciprocal_rank_fusion(result_lists, k=settings.SEMANTIC_SEARCH_RRF_K)
         print(f"[SemanticSearch] 向量检索找到 {len(candidates)} 个候选用户")
 
         paginated_candidates = candidates[offset:offset + limit]
         total = len(candidates)
 
-        # 步骤4：获取用户详细信息
+        # 步骤4：批量获取用户详细信息
         print(f"[SemanticSearch] 步骤4：获取用户详细信息...")
-        data_service = DataService()
+        users = _load_users_by_ids(db, [c['user_id'] for c in paginated_candidates])
         items = []
 
         for candidate in paginated_candidates:
             user_id = candidate['user_id']
 
-            user_data = data_service.get_user_by_id(user_id)
-            if not user_data:
+            user = users.get(user_id)
+            if not user:
                 continue
 
-            avatar_url = user_data.get('avatar_url') or user_data.get('avatarUrl', '')
+            avatar_url = user.avatar_url or ''
             if avatar_url:
                 avatar_url = ensure_full_url(avatar_url)
 
             item = SemanticSearchItem(
                 user_id=user_id,
-                name=user_data.get('nick_name') or user_data.get('nickName'),
+                name=user.nick_name,
                 avatar_url=avatar_url,
-                bio=user_data.get('bio'),
-                gender=user_data.get('gender'),
-                location=user_data.get('location'),
-                occupation=user_data.get('occupation'),
-                interests=user_data.get('interests') or [],
+                bio=user.bio,
+                gender=user.gender,
+                location=user.location,
+                occupation=user.occupation,
+                interests=user.interests or [],
                 similarity=candidate['similarity']
             )
             items.append(item)
@@ -1335,5 +1448,3 @@ async def semantic_search(
                 "total": 0
             }
         )
-
-
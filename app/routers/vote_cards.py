@@ -5,7 +5,7 @@ from pydantic import BaseModel, Field
 from datetime import datetime
 from typing import Dict, Any
 
-from app.database import get_db
+from app.database import get_db, get_read_db
 from app.services.vote_service import VoteService
 from app.dependencies import get_current_user
 
@@ -243,7 +243,7 @@ async def get_vote_card(
         vote_card = vote_results["vote_card"]
         
         # 增加浏览次数
-        vote_service.increment_view_count(vote_card_id)
+        vote_service.increment_view_count(vote_card_id, user_id)
         
         return VoteCardResponse(
             id=vote_card.id,
@@ -333,7 +333,7 @@ async def get_voted_users(
     page: int = Query(1, ge=1),
     page_size: int = Query(20, ge=1, le=100),
     current_user: Dict[str, Any] = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_read_db)
 ):
     """获取已投票用户列表"""
     try:
@@ -469,7 +469,7 @@ async def cancel_user_vote(
 async def get_vote_status(
     vote_card_id: str,
     current_user: Optional[Dict[str, Any]] = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_read_db)
 ):
     """获取用户投票状态"""
     try:
@@ -538,7 +538,7 @@ async def search_vote_cards(
     page: int = Query(1, ge=1),
     page_size: int = Query(10, ge=1, le=100),
     current_user: Optional[Dict[str, Any]] = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_read_db)
 ):
     """搜索投票卡片"""
     try:
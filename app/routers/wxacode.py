@@ -3,11 +3,15 @@
 用于生成小程序码和小程序二维码
 """
 
+import asyncio
 import httpx
 from fastapi import APIRouter, HTTPException, Request
+from fastapi.responses import Response
 from typing import Optional, Dict, Any, Union
 from pydantic import BaseModel, Field
 from app.config import settings
+from app.utils.wechat_token import INVALID_TOKEN_ERRCODES, wechat_token_manager
+from app.utils.wxacode_cache import wxacode_cache
 import json
 
 router = APIRouter()
@@ -45,51 +49,35 @@ class WxacodeParams(BaseModel):
 
 async def get_stable_access_token(force_refresh: bool = False) -> Optional[str]:
     """
-    获取微信 access_token
+    获取微信 access_token（由 access_token 管理器缓存和刷新）
     """
-    url = "https://api.weixin.qq.com/cgi-bin/token"
-    
-    params = {
-        "grant_type": "client_credential",
-        "appid": settings.WECHAT_APP_ID,
-        "secret": settings.WECHAT_APP_SECRET
-    }
-    
-    try:
-        async with httpx.AsyncClient(timeout=30) as client:
-            response = await client.get(url, params=params)
-            data = response.json()
-            
-            if "access_token" in data:
-                return data["access_token"]
-            else:
-                error_code = data.get("errcode")
-                error_msg = data.get("errmsg", "未知错误")
-                print(f"[WxacodeAPI] 获取 access_token 失败: {error_code} - {error_msg}")
-                return None
-                
-    except Exception as e:
-        print(f"[WxacodeAPI] 获取 access_token 异常: {e}")
-        return None
+    return await wechat_token_manager.get_token(force_refresh)
+
+
+def _image_response(content: bytes, cache_key: str, scene: str) -> Response:
+    return Response(
+        content=content,
+        media_type="image/png",
+        headers={
+            "Content-Disposition": f'attachment; filename="wxacode_{scene}.png"',
+            "ETag": f'"{cache_key}"',
+            "Cache-Control": f"public, max-age={settings.WXACODE_CACHE_MAX_AGE}"
+        }
+    )
 
 
 @router.post("/wechat/wxacode/getUnlimited")
 async def get_wxacode_unlimited(request: Request, params: WxacodeParams = None):
     """
     获取不限制的小程序码
+    
+    相同参数的小程序码从本地缓存返回，支持 If-None-Match 协商缓存
     """
     print(f"[WxacodeAPI] 收到请求: scene={params.scene if params else 'None'}")
     
     if params is None:
         raise HTTPException(status_code=400, detail="参数解析失败")
     
-    access_token = await get_stable_access_token()
-    
-    if not access_token:
-        raise HTTPException(status_code=500, detail="无法获取 access_token")
-    
-    url = f"https://api.weixin.qq.com/wxa/getwxacodeunlimit?access_token={access_token}"
-    
     payload = {
         "scene": params.scene,
         "page": params.page,
@@ -102,6 +90,27 @@ async def get_wxacode_unlimited(request: Request, params: WxacodeParams = None):
     if params.line_color:
         payload["line_color"] = params.line_color
     
+    cache_key = wxacode_cache.key(payload)
+    if_none_match = request.headers.get("if-none-match", "")
+    if f'"{cache_key}"' in if_none_match and wxacode_cache.exists(cache_key):
+        return Response(
+            status_code=304,
+            headers={
+                "ETag": f'"{cache_key}"',
+                "Cache-Control": f"public, max-age={settings.WXACODE_CACHE_MAX_AGE}"
+            }
+        )
+    cached = await asyncio.to_thread(wxacode_cache.get, cache_key)
+    if cached:
+        return _image_response(cached, cache_key, params.scene)
+    
+    access_token = await get_stable_access_token()
+    
+    if not access_token:
+        raise HTTPException(status_code=500, detail="无法获取 access_token")
+    
+    url = f"https://api.weixin.qq.com/wxa/getwxacodeunlimit?access_token={access_token}"
+    
     print(f"[WxacodeAPI] 调用微信 API...")
     
     async with httpx.AsyncClient(timeout=60) as client:
@@ -114,17 +123,18 @@ async def get_wxacode_unlimited(request: Request, params: WxacodeParams = None):
                 errcode = error_data.get("errcode")
                 errmsg = error_data.get("errmsg", "未知错误")
                 print(f"[WxacodeAPI] 微信错误: {errcode} - {errmsg}")
+                if errcode in INVALID_TOKEN_ERRCODES:
+                    # 缓存的 access_token 已失效，强制刷新，下次请求使用新 token
+                    await get_stable_access_token(force_refresh=True)
                 raise HTTPException(status_code=400, detail=f"微信 API 错误: {errmsg}")
         except (json.JSONDecodeError, ValueError):
             pass
         
         if len(response.content) > 0:
-            from fastapi.responses import Response
-            return Response(
-                content=response.content,
-                media_type="image/png",
-                headers={"Content-Disposition": f'attachment; filename="wxacode_{params.scene}.png"'}
-            )
+            # 只缓存成功生成的图片
+            if response.headers.get("content-type", "").startswith("image/"):
+                await asyncio.to_thread(wxacode_cache.put, cache_key, response.content)
+            return _image_response(response.content, cache_key, params.scene)
         else:
             raise HTTPException(status_code=500, detail="空响应")
 
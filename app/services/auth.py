@@ -3,6 +3,8 @@ from app.config import settings
 from app.models.schemas import UserInfo
 from fastapi import Depends, HTTPException, Header
 from sqlalchemy.orm import Session
+import asyncio
+import time
 import uuid
 from datetime import datetime
 # 实际生产环境的微信API调用
@@ -13,6 +15,16 @@ import json
 from app.models.user import User
 from sqlalchemy.orm import Session
 from app.utils.db_config import get_db
+from app.services.principal_cache import principal_cache
+from app.services.token_revocation import token_revocations
+from app.utils.wechat_token import INVALID_TOKEN_ERRCODES, wechat_token_manager
+from app.utils.wechat_client import WeChatUnavailableError, wechat_async_client
+
+# 令牌格式版本：载荷包含 ver/typ/tv/exp，旧令牌只有 user_id
+TOKEN_FORMAT_VERSION = 2
+
+# 写入访问令牌的用户资料字段（数据库列名），修改后需要重新签发令牌
+TOKEN_PROFILE_FIELDS = ("nick_name", "avatar_url", "gender")
 
 def create_user_func(db: Session, user_data: Dict[str, Any]) -> User:
     """创建用户"""
@@ -44,14 +56,7 @@ class AuthService:
         """
         # 开发模式：返回模拟数据
         if settings.DEBUG:
-            print(f"[开发模式] 模拟微信code验证，code: {code}")
-            # 模拟返回openid和session_key
-            import uuid
-            return {
-                "openid": f"debug_openid_{uuid.uuid4().hex[:16]}",
-                "session_key": f"debug_session_{uuid.uuid4().hex[:16]}",
-                "unionid": f"debug_unionid_{uuid.uuid4().hex[:16]}"
-            }
+            return AuthService._mock_wx_session(code)
         try:
             # 微信官方API: https://api.weixin.qq.com/sns/jscode2session
             url = "https://api.weixin.qq.com/sns/jscode2session"
@@ -66,33 +71,7 @@ class AuthService:
             response = httpx.get(url, params=params, timeout=10)
             result = response.json()
             
-            # 检查错误码
-            if "errcode" in result and result["errcode"] != 0:
-                error_msg = result.get("errmsg", "微信API调用失败")
-                print(f"微信API错误: {error_msg}, 错误码: {result['errcode']}")
-                
-                # 根据错误码提供具体错误信息
-                if result["errcode"] == 40163:
-                    raise ValueError("微信code已过期，请重新获取")
-                elif result["errcode"] == 40164:
-                    raise ValueError("无效的IP地址")
-                elif result["errcode"] == 40029:
-                    raise ValueError("无效的微信code")
-                elif result["errcode"] == 45011:
-                    raise ValueError("微信API调用频繁，请稍后再试")
-                else:
-                    raise ValueError(f"微信验证失败: {error_msg}")
-            
-            # 验证返回数据
-            if "openid" not in result:
-                raise ValueError("微信API返回数据异常")
-            
-            print(f"微信code验证成功，openid: {result['openid']}")
-            return {
-                "openid": result["openid"],
-                "session_key": result.get("session_key", ""),
-                "unionid": result.get("unionid", "")
-            }
+            return AuthService._parse_wx_session(result)
             
         except httpx.RequestError as e:
             print(f"微信API网络请求失败: {e}")
@@ -105,30 +84,193 @@ class AuthService:
             raise ValueError(f"微信验证失败: {str(e)}")
     
     @staticmethod
-    def create_token(user_id: str) -> str:
-        """创建用户token
+    def _mock_wx_session(code: str) -> Dict[str, str]:
+        """开发模式：模拟微信code验证结果"""
+        print(f"[开发模式] 模拟微信code验证，code: {code}")
+        # 模拟返回openid和session_key
+        return {
+            "openid": f"debug_openid_{uuid.uuid4().hex[:16]}",
+            "session_key": f"debug_session_{uuid.uuid4().hex[:16]}",
+            "unionid": f"debug_unionid_{uuid.uuid4().hex[:16]}"
+        }
+    
+    @staticmethod
+    def _parse_wx_session(result: Dict[str, Any]) -> Dict[str, str]:
+        """解析 jscode2session 返回结果"""
+        # 检查错误码
+        if "errcode" in result and result["errcode"] != 0:
+            error_msg = result.get("errmsg", "微信API调用失败")
+            print(f"微信API错误: {error_msg}, 错误码: {result['errcode']}")
+            
+            # 根据错误码提供具体错误信息
+            if result["errcode"] == 40163:
+                raise ValueError("微信code已过期，请重新获取")
+            elif result["errcode"] == 40164:
+                raise ValueError("无效的IP地址")
+            elif result["errcode"] == 40029:
+                raise ValueError("无效的微信code")
+            elif result["errcode"] == 45011:
+                raise ValueError("微信API调用频繁，请稍后再试")
+            else:
+                raise ValueError(f"微信验证失败: {error_msg}")
+        
+        # 验证返回数据
+        if "openid" not in result:
+            raise ValueError("微信API返回数据异常")
+        
+        print(f"微信code验证成功，openid: {result['openid']}")
+        return {
+            "openid": result["openid"],
+            "session_key": result.get("session_key", ""),
+            "unionid": result.get("unionid", "")
+        }
+    
+    @staticmethod
+    async def verify_wx_code_async(code: str) -> Optional[Dict[str, str]]:
+        """验证微信登录code（异步，不阻塞事件循环）"""
+        if settings.DEBUG:
+            return AuthService._mock_wx_session(code)
+        try:
+            result = await wechat_async_client.request_json("GET", "/sns/jscode2session", params={
+                "appid": settings.WECHAT_APP_ID,
+                "secret": settings.WECHAT_APP_SECRET,
+                "js_code": code,
+                "grant_type": "authorization_code"
+            })
+        except WeChatUnavailableError as e:
+            print(f"微信API请求失败: {e}")
+            raise ValueError(str(e))
+        return AuthService._parse_wx_session(result)
+    
+    @staticmethod
+    def create_token(user_id: str, profile: Optional[Dict[str, Any]] = None) -> str:
+        """创建访问令牌
         
-        使用JWT创建token
+        令牌包含格式版本、有效期和用户令牌版本；提供 profile 时同时写入昵称、头像、性别，
+        校验时可直接使用而不查询数据库
         """
         try:
             from jose import jwt
-            payload = {"user_id": user_id}
+            now = int(time.time())
+            payload = {
+                "ver": TOKEN_FORMAT_VERSION,
+                "typ": "access",
+                "user_id": user_id,
+                "tv": token_revocations.current_version(user_id),
+                "iat": now,
+                "exp": now + settings.AUTH_ACCESS_TOKEN_EXPIRE_MINUTES * 60
+            }
+            if profile:
+                payload["profile"] = {
+                    "nickName": profile.get("nickName"),
+                    "avatarUrl": profile.get("avatarUrl"),
+                    "gender": profile.get("gender") or 0
+                }
             return jwt.encode(payload, settings.SECRET_KEY, algorithm=settings.ALGORITHM)
         except ImportError:
             # 如果没有安装jose库，仍然返回用户ID作为token
             return user_id
     
     @staticmethod
-    def get_user_from_token(token: str) -> Optional[Dict[str, Any]]:
-        """从token获取用户信息"""
-        # 尝试从token解析用户ID
+    def create_refresh_token(user_id: str) -> Optional[str]:
+        """创建刷新令牌（只能用于换取新的访问令牌，且只能使用一次）"""
         try:
             from jose import jwt
+        except ImportError:
+            return None
+        now = int(time.time())
+        payload = {
+            "ver": TOKEN_FORMAT_VERSION,
+            "typ": "refresh",
+            "jti": uuid.uuid4().hex,
+            "user_id": user_id,
+            "tv": token_revocations.current_version(user_id),
+            "iat": now,
+            "exp": now + settings.ACCESS_TOKEN_EXPIRE_MINUTES * 60
+        }
+        return jwt.encode(payload, settings.SECRET_KEY, algorithm=settings.ALGORITHM)
+    
+    @staticmethod
+    def issue_tokens(user: Dict[str, Any]) -> Dict[str, Any]:
+        """签发访问令牌和刷新令牌
+        
+        Args:
+            user: 包含 id、nickName、avatarUrl、gender 的用户信息
+        """
+        user_id = str(user["id"])
+        return {
+            "token": AuthService.create_token(user_id, user),
+            "refreshToken": AuthService.create_refresh_token(user_id),
+            "expiresIn": settings.AUTH_ACCESS_TOKEN_EXPIRE_MINUTES * 60
+        }
+    
+    @staticmethod
+    def _legacy_tokens_accepted() -> bool:
+        """当前是否仍接受旧格式令牌"""
+        cutoff = settings.AUTH_LEGACY_TOKEN_CUTOFF
+        if not cutoff:
+            return True
+        try:
+            return datetime.now() < datetime.fromisoformat(cutoff)
+        except ValueError:
+            print(f"AUTH_LEGACY_TOKEN_CUTOFF 格式错误，拒绝旧格式令牌: {cutoff}")
+            return False
+    
+    @staticmethod
+    def decode_token(token: str, token_type: str = "access") -> Optional[Dict[str, Any]]:
+        """解析并校验令牌（签名、有效期、类型、吊销）
+        
+        Returns:
+            令牌载荷；旧格式令牌（没有版本号）原样返回，由调用方查询数据库校验，
+            超过 AUTH_LEGACY_TOKEN_CUTOFF 或用户吊销过令牌后旧格式令牌不再有效
+        """
+        from jose import jwt, JWTError
+        try:
             payload = jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
-            user_id = payload.get("user_id")
-            if not user_id:
+        except JWTError:
+            return None
+        if not payload.get("user_id"):
+            return None
+        if "ver" not in payload:
+            # 旧格式令牌没有有效期：只在截止时间前接受，且用户吊销过令牌后失效
+            if token_type != "access" or not AuthService._legacy_tokens_accepted():
+                return None
+            if token_revocations.is_revoked(payload["user_id"], None):
                 return None
-        except:
+            return payload
+        if payload.get("typ") != token_type:
+            return None
+        if token_revocations.is_revoked(payload["user_id"], payload.get("tv")):
+            return None
+        return payload
+    
+    @staticmethod
+    def get_user_from_token(token: str) -> Optional[Dict[str, Any]]:
+        """从token获取用户信息（令牌携带用户资料或命中登录用户缓存时不访问数据库）"""
+        cached = principal_cache.get(token)
+        if cached is not None:
+            return cached
+        
+        # 尝试从token解析用户ID
+        try:
+            payload = AuthService.decode_token(token)
+        except ImportError:
+            payload = None
+        if payload is not None:
+            user_id = payload["user_id"]
+            profile = payload.get("profile")
+            if settings.AUTH_CLAIMS_MODE and profile is not None:
+                return {
+                    "id": user_id,
+                    "nickName": profile.get("nickName"),
+                    "avatarUrl": profile.get("avatarUrl"),
+                    "gender": profile.get("gender") or 0,
+                    "phone": None
+                }
+        elif token.count(".") == 2:
+            # JWT格式但校验失败（过期、已吊销、签名错误）
+            return None
+        else:
             # 如果不是JWT格式，直接作为用户ID使用
             user_id = token
         
@@ -141,13 +283,15 @@ class AuthService:
             try:
                 user = get_user_func(db, user_id)
                 if user and user.status != 'deleted':  # 只返回非删除状态的用户
-                    return {
+                    principal = {
                         "id": user.id,
                         "nickName": user.nick_name,
                         "avatarUrl": user.avatar_url,
                         "gender": user.gender or 0,
                         "phone": user.phone
                     }
+                    principal_cache.set(token, principal)
+                    return principal
             finally:
                 db.close()
         except Exception as e:
@@ -156,6 +300,38 @@ class AuthService:
             
         return None
     
+    @staticmethod
+    def refresh_tokens(refresh_token: str, db: Session) -> Dict[str, Any]:
+        """使用刷新令牌换取新的访问令牌（同时轮换刷新令牌，并按数据库更新令牌中的用户资料）"""
+        payload = AuthService.decode_token(refresh_token, token_type="refresh")
+        if payload is None:
+            raise ValueError("刷新令牌无效或已过期")
+        # 登记后旧刷新令牌失效；没有 jti 的是轮换上线前签发的令牌，到期后自然失效
+        jti = payload.get("jti")
+        if jti and not token_revocations.consume_refresh_token(jti, payload["user_id"], payload["exp"]):
+            raise ValueError("刷新令牌已使用")
+        user = get_user_func(db, payload["user_id"])
+        if not user or user.status == 'deleted':
+            raise ValueError("用户不存在或已注销")
+        return AuthService.issue_user_tokens(user)
+    
+    @staticmethod
+    def issue_user_tokens(user: User) -> Dict[str, Any]:
+        """按数据库中的用户资料签发令牌（资料修改后令牌中的昵称、头像随之更新）"""
+        return AuthService.issue_tokens({
+            "id": user.id,
+            "nickName": user.nick_name,
+            "avatarUrl": user.avatar_url,
+            "gender": user.gender
+        })
+    
+    @staticmethod
+    def revoke_user_tokens(user_id: str) -> int:
+        """吊销用户此前签发的所有令牌"""
+        version = token_revocations.revoke_user(user_id)
+        principal_cache.invalidate_user(user_id)
+        return version
+    
     @staticmethod
     def login(code: str, user_info: Optional[UserInfo] = None) -> Dict[str, Any]:
         """微信登录
@@ -173,6 +349,18 @@ class AuthService:
         # 目前直接抛出异常，要求先注册
         raise ValueError("用户未注册，请先注册")
     
+    @staticmethod
+    async def login_async(code: str, user_info: Optional[UserInfo] = None) -> Dict[str, Any]:
+        """微信登录（异步，不阻塞事件循环）"""
+        wx_result = await AuthService.verify_wx_code_async(code)
+        if not wx_result:
+            raise ValueError("无效的微信code")
+        
+        openid = wx_result["openid"]
+        
+        # 与同步版本一致，要求先注册
+        raise ValueError("用户未注册，请先注册")
+    
     @staticmethod
     def login_by_phone(phone: str, code: str, db: Optional[Session] = None) -> Dict[str, Any]:
         """手机号登录 - 只使用数据库"""
@@ -232,11 +420,10 @@ class AuthService:
             raise ValueError("数据库连接不能为空")
         
         # 创建token
-        token = AuthService.create_token(str(user_dict["id"]))
+        tokens = AuthService.issue_tokens(user_dict)
         
         return {
-            "token": token,
-            "expiresIn": settings.ACCESS_TOKEN_EXPIRE_MINUTES * 60,
+            **tokens,
             "isNewUser": is_new_user,
             "userInfo": {
                 "id": user_dict["id"],
@@ -292,8 +479,31 @@ class AuthService:
         if not phone:
             raise ValueError("无法获取手机号")
         
-        openid = wx_result["openid"]
+        return AuthService._login_with_wechat_phone(wx_result["openid"], phone, user_info, db)
+    
+    @staticmethod
+    async def login_by_wechat_phone_async(code: str, phone_code: str, user_info: Optional[UserInfo] = None, db: Optional[Session] = None) -> Dict[str, Any]:
+        """微信一键登录（异步）：并发校验登录code和手机号code，数据库操作放到线程中执行"""
+        wx_result, phone_result = await asyncio.gather(
+            AuthService.verify_wx_code_async(code),
+            AuthService.verify_wx_phone_code_async(phone_code)
+        )
+        if not wx_result:
+            raise ValueError("无效的微信code")
+        if not phone_result:
+            raise ValueError("无效的手机号授权")
+        
+        phone = phone_result.get("phoneNumber")
+        if not phone:
+            raise ValueError("无法获取手机号")
         
+        return await asyncio.to_thread(
+            AuthService._login_with_wechat_phone, wx_result["openid"], phone, user_info, db
+        )
+    
+    @staticmethod
+    def _login_with_wechat_phone(openid: str, phone: str, user_info: Optional[UserInfo], db: Optional[Session]) -> Dict[str, Any]:
+        """按手机号查找或创建用户，并签发令牌"""
         user_dict = None
         is_new_user = None
         
@@ -361,11 +571,10 @@ class AuthService:
             raise ValueError("数据库连接不能为空")
         
         # 创建token
-        token = AuthService.create_token(str(user_dict["id"]))
+        tokens = AuthService.issue_tokens(user_dict)
         
         return {
-            "token": token,
-            "expiresIn": settings.ACCESS_TOKEN_EXPIRE_MINUTES * 60,
+            **tokens,
             "isNewUser": is_new_user,
             "userInfo": {
                 "id": user_dict["id"],
@@ -384,16 +593,7 @@ class AuthService:
         """
         # 开发模式：模拟手机号获取
         if settings.DEBUG:
-            # 模拟返回手机号，实际应该调用微信API
-            import random
-            phone_prefix = ['138', '139', '158', '159', '188', '189']
-            phone = random.choice(phone_prefix) + ''.join([str(random.randint(0, 9)) for _ in range(8)])
-            print(f"[开发模式] 模拟获取手机号: {phone}")
-            return {
-                "phoneNumber": phone,
-                "purePhoneNumber": phone,
-                "countryCode": "86"
-            }
+            return AuthService._mock_wx_phone()
         
         # 生产模式：调用微信手机号获取API
         try:
@@ -413,34 +613,11 @@ class AuthService:
             response.raise_for_status()
             
             result = response.json()
+            if result.get("errcode") in INVALID_TOKEN_ERRCODES:
+                # 缓存的 access_token 已失效，强制刷新后由客户端重试
+                AuthService._get_wx_access_token(force_refresh=True)
             
-            # 检查返回结果
-            if result.get("errcode") != 0:
-                error_msg = result.get("errmsg", "未知错误")
-                error_code = result.get("errcode")
-                
-                # 根据错误码提供更详细的错误信息
-                if error_code == 40163:
-                    raise ValueError("手机号授权码已过期，请重新获取")
-                elif error_code == 40164:
-                    raise ValueError("无效的IP地址，请检查服务器配置")
-                elif error_code == 40001:
-                    raise ValueError("无效的access_token，请重试")
-                elif error_code == 40003:
-                    raise ValueError("无效的openid，请检查用户授权")
-                else:
-                    raise ValueError(f"微信手机号获取失败: {error_msg}")
-            
-            # 返回手机号信息
-            phone_info = result.get("phone_info", {})
-            if not phone_info:
-                raise ValueError("无法从微信获取手机号信息")
-            
-            return {
-                "phoneNumber": phone_info.get("phoneNumber"),
-                "purePhoneNumber": phone_info.get("purePhoneNumber"),
-                "countryCode": phone_info.get("countryCode", "86")
-            }
+            return AuthService._parse_wx_phone(result)
             
         except httpx.RequestError as e:
             raise ValueError(f"网络请求失败: {str(e)}")
@@ -451,6 +628,76 @@ class AuthService:
         except Exception as e:
             raise ValueError(f"微信手机号获取异常: {str(e)}")
     
+    @staticmethod
+    def _mock_wx_phone() -> Dict[str, Any]:
+        """开发模式：模拟手机号获取结果"""
+        # 模拟返回手机号，实际应该调用微信API
+        import random
+        phone_prefix = ['138', '139', '158', '159', '188', '189']
+        phone = random.choice(phone_prefix) + ''.join([str(random.randint(0, 9)) for _ in range(8)])
+        print(f"[开发模式] 模拟获取手机号: {phone}")
+        return {
+            "phoneNumber": phone,
+            "purePhoneNumber": phone,
+            "countryCode": "86"
+        }
+    
+    @staticmethod
+    def _parse_wx_phone(result: Dict[str, Any]) -> Dict[str, Any]:
+        """解析 getuserphonenumber 返回结果"""
+        # 检查返回结果
+        if result.get("errcode") != 0:
+            error_msg = result.get("errmsg", "未知错误")
+            error_code = result.get("errcode")
+            
+            # 根据错误码提供更详细的错误信息
+            if error_code == 40163:
+                raise ValueError("手机号授权码已过期，请重新获取")
+            elif error_code == 40164:
+                raise ValueError("无效的IP地址，请检查服务器配置")
+            elif error_code == 40001:
+                raise ValueError("无效的access_token，请重试")
+            elif error_code == 40003:
+                raise ValueError("无效的openid，请检查用户授权")
+            else:
+                raise ValueError(f"微信手机号获取失败: {error_msg}")
+        
+        # 返回手机号信息
+        phone_info = result.get("phone_info", {})
+        if not phone_info:
+            raise ValueError("无法从微信获取手机号信息")
+        
+        return {
+            "phoneNumber": phone_info.get("phoneNumber"),
+            "purePhoneNumber": phone_info.get("purePhoneNumber"),
+            "countryCode": phone_info.get("countryCode", "86")
+        }
+    
+    @staticmethod
+    async def verify_wx_phone_code_async(phone_code: str) -> Optional[Dict[str, Any]]:
+        """验证微信手机号授权code（异步，不阻塞事件循环）"""
+        if settings.DEBUG:
+            return AuthService._mock_wx_phone()
+        
+        result: Dict[str, Any] = {}
+        for force_refresh in (False, True):
+            access_token = await wechat_token_manager.get_token(force_refresh)
+            if not access_token:
+                raise ValueError("无法获取微信访问令牌")
+            try:
+                result = await wechat_async_client.request_json(
+                    "POST",
+                    "/wxa/business/getuserphonenumber",
+                    params={"access_token": access_token},
+                    json={"code": phone_code}
+                )
+            except WeChatUnavailableError as e:
+                raise ValueError(str(e))
+            # access_token 失效时授权码尚未被消费，刷新 token 后重试一次
+            if result.get("errcode") not in INVALID_TOKEN_ERRCODES:
+                break
+        return AuthService._parse_wx_phone(result)
+    
     @staticmethod
     def register(user_data: Dict[str, Any], db: Optional[Session] = None) -> Dict[str, Any]:
         """用户注册 - 只使用数据库"""
@@ -478,17 +725,16 @@ class AuthService:
                     db.commit()
                     db.refresh(existing_user)
                 # 生成token并返回，不抛出异常
-                token = AuthService.create_token(str(existing_user.id))
+                user_info = {
+                    "id": existing_user.id,
+                    "nickName": existing_user.nick_name,
+                    "avatarUrl": existing_user.avatar_url,
+                    "gender": existing_user.gender
+                }
                 return {
-                    "token": token,
-                    "expiresIn": settings.ACCESS_TOKEN_EXPIRE_MINUTES * 60,
+                    **AuthService.issue_tokens(user_info),
                     "isNewUser": False,
-                    "userInfo": {
-                        "id": existing_user.id,
-                        "nickName": existing_user.nick_name,
-                        "avatarUrl": existing_user.avatar_url,
-                        "gender": existing_user.gender
-                    }
+                    "userInfo": user_info
                 }
             
             # 创建新用户
@@ -517,11 +763,10 @@ class AuthService:
             raise ValueError("数据库连接不能为空")
         
         # 创建token
-        token = AuthService.create_token(str(user_dict["id"]))
+        tokens = AuthService.issue_tokens(user_dict)
         
         return {
-            "token": token,
-            "expiresIn": settings.ACCESS_TOKEN_EXPIRE_MINUTES * 60,
+            **tokens,
             "isNewUser": True,
             "userInfo": {
                 "id": user_dict["id"],
@@ -535,6 +780,7 @@ class AuthService:
     def logout(user_id: str) -> bool:
         """退出登录"""
         # 生产环境中可能需要将token加入黑名单
+        principal_cache.invalidate_user(user_id)
         return True
     
     @staticmethod
@@ -576,43 +822,9 @@ class AuthService:
         }
 
     @staticmethod
-    def _get_wx_access_token() -> Optional[str]:
-        """获取微信访问令牌"""
-        try:
-            # 调用微信access_token获取API
-            url = f"https://api.weixin.qq.com/cgi-bin/token"
-            params = {
-                "grant_type": "client_credential",
-                "appid": settings.WECHAT_APP_ID,
-                "secret": settings.WECHAT_APP_SECRET
-            }
-            
-            response = httpx.get(url, params=params, timeout=10)
-            response.raise_for_status()
-            
-            result = response.json()
-            
-            # 检查返回结果
-            if "access_token" in result:
-                return result["access_token"]
-            else:
-                error_code = result.get("errcode")
-                error_msg = result.get("errmsg", "未知错误")
-                print(f"获取微信access_token失败: 错误码 {error_code}, 错误信息: {error_msg}")
-                return None
-                
-        except httpx.RequestError as e:
-            print(f"获取微信access_token网络请求失败: {str(e)}")
-            return None
-        except httpx.TimeoutException:
-            print(f"获取微信access_token请求超时")
-            return None
-        except json.JSONDecodeError:
-            print(f"获取微信access_token返回数据格式错误")
-            return None
-        except Exception as e:
-            print(f"获取微信access_token异常: {str(e)}")
-            return None
+    def _get_wx_access_token(force_refresh: bool = False) -> Optional[str]:
+        """获取微信访问令牌（由 access_token 管理器缓存和刷新）"""
+        return wechat_token_manager.get_token_sync(force_refresh)
 
     @staticmethod
     def dev_quick_login(phone: str, db: Session) -> Dict[str, Any]:
@@ -666,11 +878,10 @@ class AuthService:
                 print(f"[开发者登录] 创建新用户，手机号: {phone}, 用户ID: {user_id}")
             
             # 创建token
-            token = AuthService.create_token(str(user_dict["id"]))
+            tokens = AuthService.issue_tokens(user_dict)
             
             return {
-                "token": token,
-                "expiresIn": settings.ACCESS_TOKEN_EXPIRE_MINUTES * 60,
+                **tokens,
                 "userInfo": {
                     "id": user_dict["id"],
                     "nickName": user_dict["nickName"],
@@ -0,0 +1,312 @@
+"""
+卡片全文检索索引
+为话题卡片和投票卡片的标题、描述、标签建立 BM25 倒排索引，
+替代 LIKE '%关键词%' 全表扫描和每页一次的 count 查询
+"""
+
+import json
+import logging
+import threading
+import time
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+from app.services.text_index import InvertedIndex, covers_substring
+
+logger = logging.getLogger(__name__)
+
+# 字段权重：标题和标签通常是用户搜索的关键词，权重更高
+TOPIC_FIELD_WEIGHTS = {
+    "title": 3.0,
+    "tags": 2.0,
+    "description": 1.0,
+    "discussion_goal": 1.0,
+}
+
+VOTE_FIELD_WEIGHTS = {
+    "title": 3.0,
+    "tags": 2.0,
+    "description": 1.0,
+}
+
+# 用于检索过滤的元数据列
+_META_COLUMNS = ("user_id", "category", "visibility")
+
+# 未激活或已注销的用户（与列表查询中的 User.is_active == True、User.status != 'deleted' 对应，NULL 视为不满足）
+_HIDDEN_CREATORS_SQL = (
+    "SELECT id FROM users WHERE is_active IS NULL OR is_active = 0 OR status IS NULL OR status = 'deleted'"
+)
+
+
+def _tags_text(tags: Any) -> Optional[str]:
+    """标签可能是列表（ORM对象）或 JSON 字符串（原始查询），统一拼成文本"""
+    if not tags:
+        return None
+    if isinstance(tags, str):
+        try:
+            tags = json.loads(tags)
+        except ValueError:
+            return tags
+    if isinstance(tags, (list, tuple)):
+        return " ".join(str(tag) for tag in tags if tag)
+    return str(tags)
+
+
+def _timestamp(value: Any) -> float:
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value)
+    return value.timestamp() if value else 0.0
+
+
+class CardSearchIndex:
+    """卡片全文检索索引
+
+    - 启动时在后台线程全量构建（或首次使用时构建），构建完成前检索返回 None
+    - 本进程内的创建/更新/删除通过 index_card / remove 直接更新索引
+    - 其他worker的写入按 updated_at 水位增量同步
+    """
+
+    def __init__(
+        self,
+        table: str,
+        field_weights: Dict[str, float],
+        enabled: bool = True,
+        sync_interval: float = 30.0,
+        batch_size: int = 1000,
+        creator_filter: bool = False
+    ):
+        """
+        Args:
+            table: 卡片表名
+            field_weights: 参与检索的文本字段及权重（字段名即列名）
+            enabled: 是否启用，未启用时检索返回 None，调用方回退到数据库查询
+            sync_interval: 与数据库增量同步的最小间隔（秒）
+            batch_size: 全量构建时每批加载的卡片数量
+            creator_filter: 是否排除未激活或已注销用户创建的卡片（与调用方数据库查询的创建者条件一致）
+        """
+        self.table = table
+        self.fields = list(field_weights)
+        self.enabled = enabled
+        self.sync_interval = sync_interval
+        self.batch_size = batch_size
+        self.creator_filter = creator_filter
+        self.index = InvertedIndex(field_weights=field_weights)
+        self._meta: Dict[str, Dict[str, Any]] = {}
+        self._created: Dict[str, float] = {}
+        self._hidden_creators: Set[str] = set()
+        self._watermark: Optional[datetime] = None
+        self._loaded = False
+        self._warming = False
+        self._last_sync = 0.0
+        self._sync_lock = threading.Lock()
+        self._columns = ", ".join(
+            ["id", *self.fields, *_META_COLUMNS, "is_active", "is_deleted", "created_at",
+             "COALESCE(updated_at, created_at) AS ts"]
+        )
+
+    def __len__(self) -> int:
+        return len(self.index)
+
+    # ---------------------------------------------------------------
+    # 增量更新
+    # ---------------------------------------------------------------
+
+    def index_card(self, card: Any):
+        """
+        写入或刷新一张卡片（ORM对象或查询行均可），已删除或未激活的卡片从索引中移除
+        """
+        if card is None or card.id is None:
+            return
+        card_id = str(card.id)
+        try:
+            if card.is_deleted or (card.is_active is not None and not card.is_active):
+                self.remove(card_id)
+                return
+            fields = {}
+            for name in self.fields:
+                value = getattr(card, name, None)
+                fields[name] = _tags_text(value) if name == "tags" else value
+            self.index.upsert(card_id, fields)
+            if card_id in self.index:
+                self._meta[card_id] = {column: getattr(card, column, None) for column in _META_COLUMNS}
+                self._created[card_id] = _timestamp(card.created_at)
+            else:
+                self._meta.pop(card_id, None)
+                self._created.pop(card_id, None)
+        except Exception as e:
+            # 索引更新失败不影响业务写入，等待下次增量同步修正
+            logger.warning(f"更新卡片文本索引失败: table={self.table}, card_id={card_id}, error={e}")
+
+    def remove(self, card_id: Optional[str]):
+        """从索引中移除卡片"""
+        if card_id:
+            self.index.remove(str(card_id))
+            self._meta.pop(str(card_id), None)
+            self._created.pop(str(card_id), None)
+
+    # ---------------------------------------------------------------
+    # 数据同步
+    # ---------------------------------------------------------------
+
+    def _apply_rows(self, rows) -> Optional[datetime]:
+        latest = None
+        for row in rows:
+            self.index_card(row)
+            ts = datetime.fromisoformat(row.ts) if isinstance(row.ts, str) else row.ts
+            if ts is not None and (latest is None or ts > latest):
+                latest = ts
+        return latest
+
+    def _load_hidden_creators(self, db: Session):
+        """刷新不可见的创建者集合（用户状态变更不会更新卡片的 updated_at，每次同步全量刷新）"""
+        if self.creator_filter:
+            self._hidden_creators = {str(row.id) for row in db.execute(text(_HIDDEN_CREATORS_SQL))}
+
+    def _build(self, db: Session):
+        """全量构建（按主键分页加载）"""
+        last_id = ""
+        while True:
+            rows = db.execute(
+                text(f"SELECT {self._columns} FROM {self.table} WHERE id > :last_id ORDER BY id LIMIT :limit"),
+                {"last_id": last_id, "limit": self.batch_size}
+            ).fetchall()
+            if not rows:
+                break
+            last_id = rows[-1].id
+            latest = self._apply_rows(rows)
+            if latest is not None and (self._watermark is None or latest > self._watermark):
+                self._watermark = latest
+        self._load_hidden_creators(db)
+        logger.info(f"卡片文本索引构建完成: table={self.table}, cards={len(self.index)}")
+
+    def _sync_changes(self, db: Session):
+        """按 updated_at 水位拉取其他进程的变更"""
+        if self._watermark is None:
+            sql = f"SELECT {self._columns} FROM {self.table} WHERE COALESCE(updated_at, created_at) IS NOT NULL"
+        else:
+            sql = f"SELECT {self._columns} FROM {self.table} WHERE COALESCE(updated_at, created_at) >= :since"
+        latest = self._apply_rows(db.execute(text(sql), {"since": self._watermark}).fetchall())
+        if latest is not None and (self._watermark is None or latest > self._watermark):
+            self._watermark = latest
+        self._load_hidden_creators(db)
+
+    def sync(self, db: Session, force: bool = False) -> bool:
+        """
+        与数据库同步：首次全量构建，之后按间隔增量拉取
+
+        Returns:
+            索引是否可用于检索
+        """
+        now = time.monotonic()
+        if self._loaded and not force and now - self._last_sync < self.sync_interval:
+            return True
+        if not self._sync_lock.acquire(blocking=not self._loaded and not self._warming):
+            # 其他线程正在同步，直接使用当前索引；后台预热尚未完成时不等待
+            return self._loaded
+        try:
+            if not self._loaded:
+                self._build(db)
+                self._loaded = True
+            elif force or now - self._last_sync >= self.sync_interval:
+                self._sync_changes(db)
+            self._last_sync = now
+            return True
+        except Exception as e:
+            logger.warning(f"同步卡片文本索引失败: table={self.table}, error={e}")
+            db.rollback()
+            return self._loaded
+        finally:
+            self._sync_lock.release()
+
+    def warm(self):
+        """在后台线程中全量构建索引，不阻塞启动和请求"""
+        if not self.enabled or self._loaded or self._warming:
+            return
+        self._warming = True
+        threading.Thread(target=self._warm, name=f"{self.table}-search-index-warm", daemon=True).start()
+
+    def _warm(self):
+        from app.database import SessionLocal
+
+        db = SessionLocal()
+        try:
+            self.sync(db)
+        finally:
+            self._warming = False
+            db.close()
+
+    # ---------------------------------------------------------------
+    # 检索
+    # ---------------------------------------------------------------
+
+    def search_page(
+        self,
+        db: Session,
+        query: str,
+        page: int = 1,
+        page_size: int = 10,
+        filters: Optional[Dict[str, Any]] = None
+    ) -> Optional[Tuple[List[str], int]]:
+        """
+        分页检索卡片，按 BM25 得分排序，得分相同时新卡片在前
+
+        Args:
+            db: 数据库会话，用于同步索引
+            query: 查询语句，要求命中所有查询词
+            page: 页码（从1开始）
+            page_size: 每页数量
+            filters: 元数据过滤条件，如 {"category": "life", "visibility": "public"}
+
+        Returns:
+            (当前页卡片ID列表, 命中总数)；分页前已按元数据和创建者状态过滤。
+            索引未启用或不可用、查询包含英文或数字（需要保留子串匹配）时返回 None，调用方回退到数据库查询
+        """
+        if not self.enabled or not covers_substring(query) or not self.sync(db):
+            return None
+        conditions = {k: v for k, v in (filters or {}).items() if v is not None}
+        hidden = self._hidden_creators
+        doc_filter = None
+        if conditions or hidden:
+            def doc_filter(card_id: str) -> bool:
+                meta = self._meta.get(card_id, {})
+                if hidden and str(meta.get("user_id")) in hidden:
+                    return False
+                return all(meta.get(k) == v for k, v in conditions.items())
+        hits, total = self.index.search_page(
+            query,
+            offset=max(page - 1, 0) * page_size,
+            limit=page_size,
+            require_all=True,
+            doc_filter=doc_filter,
+            tie_breaker=lambda card_id: self._created.get(card_id, 0.0)
+        )
+        return [card_id for card_id, _ in hits], total
+
+    def stats(self) -> Dict[str, Any]:
+        """索引统计信息"""
+        return {
+            "table": self.table,
+            "loaded": self._loaded,
+            "cards": len(self.index),
+            "watermark": self._watermark.isoformat() if self._watermark else None,
+        }
+
+
+def _create_index(table: str, field_weights: Dict[str, float], creator_filter: bool = False) -> CardSearchIndex:
+    from app.config import settings
+
+    return CardSearchIndex(
+        table,
+        field_weights,
+        enabled=settings.CARD_SEARCH_INDEX_ENABLED,
+        sync_interval=settings.CARD_SEARCH_INDEX_SYNC_INTERVAL,
+        creator_filter=creator_filter,
+    )
+
+
+# 全局卡片文本索引实例（话题列表只展示状态正常的用户创建的卡片；投票搜索不限制创建者）
+topic_card_search_index = _create_index("topic_cards", TOPIC_FIELD_WEIGHTS, creator_filter=True)
+vote_card_search_index = _create_index("vote_cards", VOTE_FIELD_WEIGHTS)
@@ -0,0 +1,286 @@
+"""
+聊天上下文窗口管理服务
+按token预算裁剪聊天记录：最近若干轮原样保留，更早的对话折叠为按chatId缓存的滚动摘要，
+使长对话的提示词长度、首字延迟和成本保持稳定
+"""
+
+import asyncio
+import json
+import logging
+import re
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Any, List, Optional, Set
+
+from sqlalchemy.orm import Session
+
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+# CJK字符（含全角标点）按每字约1个token估算，其余按单词/符号估算
+_CJK_PATTERN = re.compile(r'[\u3000-\u303f\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff\uff00-\uffef]')
+_WORD_PATTERN = re.compile(r'[A-Za-z0-9_]+|[^\sA-Za-z0-9_\u3000-\u303f\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff\uff00-\uffef]')
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    本地估算文本的token数量（无需调用分词接口）
+
+    Args:
+        text: 文本内容
+
+    Returns:
+        估算的token数
+    """
+    if not text:
+        return 0
+    cjk = len(_CJK_PATTERN.findall(text))
+    tokens = cjk
+    for word in _WORD_PATTERN.findall(text):
+        # 英文单词约4个字符一个token，标点符号各算一个
+        tokens += max(1, (len(word) + 3) // 4)
+    return tokens
+
+
+def _turn_text(turn: Any) -> str:
+    """提取单轮对话的文本表示"""
+    if isinstance(turn, dict):
+        content = turn.get("content") or turn.get("message") or turn.get("text")
+        if content is not None:
+            role = turn.get("role") or turn.get("sender_type") or turn.get("sender") or ""
+            return f"{role}: {content}" if role else str(content)
+        return json.dumps(turn, ensure_ascii=False)
+    return str(turn)
+
+
+@dataclass
+class _SummaryEntry:
+    """滚动摘要缓存项"""
+    summary: str
+    folded_turns: int  # 摘要已覆盖的早期对话轮数
+
+
+@dataclass
+class ChatContextWindow:
+    """裁剪后的聊天上下文"""
+    recent_turns: List[Any] = field(default_factory=list)
+    summary: str = ""
+    folded_turns: int = 0
+    estimated_tokens: int = 0
+
+    @property
+    def summary_line(self) -> str:
+        """用于拼接提示词的摘要行，没有摘要时为空"""
+        return f"早期聊天摘要: {self.summary}\n" if self.summary else ""
+
+
+class ChatContextManager:
+    """聊天上下文窗口管理器
+
+    - 按本地估算的token数为聊天记录设定预算
+    - 从最新一轮开始原样保留，直到达到预算或轮数上限
+    - 更早的轮次折叠为滚动摘要：优先使用按chatId缓存的摘要，其次复用已有的 ChatSummary 记录，
+      都没有时先用截断的抽取式摘要，同时在后台调用LLM生成摘要，不阻塞当前请求的首字返回
+    """
+
+    def __init__(
+        self,
+        max_tokens: int = None,
+        max_recent_turns: int = None,
+        summary_max_tokens: int = None,
+        cache_size: int = 1000
+    ):
+        self.max_tokens = max_tokens or settings.LLM_CONTEXT_MAX_TOKENS
+        self.max_recent_turns = max_recent_turns or settings.LLM_CONTEXT_RECENT_TURNS
+        self.summary_max_tokens = summary_max_tokens or settings.LLM_CONTEXT_SUMMARY_MAX_TOKENS
+        self.cache_size = cache_size
+        self._summaries: "OrderedDict[str, _SummaryEntry]" = OrderedDict()
+        self._refreshing: set = set()
+        # 持有后台摘要任务的引用，避免任务在完成前被垃圾回收
+        self._tasks: Set[asyncio.Task] = set()
+        self._lock = threading.Lock()
+
+    # ---------------------------------------------------------------
+    # 摘要缓存
+    # ---------------------------------------------------------------
+
+    def get_cached_summary(self, chat_id: str) -> Optional[_SummaryEntry]:
+        """读取chatId的缓存摘要（LRU）"""
+        if not chat_id:
+            return None
+        with self._lock:
+            entry = self._summaries.get(chat_id)
+            if entry is not None:
+                self._summaries.move_to_end(chat_id)
+            return entry
+
+    def set_cached_summary(self, chat_id: str, summary: str, folded_turns: int):
+        """写入chatId的缓存摘要"""
+        if not chat_id or not summary:
+            return
+        with self._lock:
+            self._summaries[chat_id] = _SummaryEntry(summary=summary, folded_turns=folded_turns)
+            self._summaries.move_to_end(chat_id)
+            while len(self._summaries) > self.cache_size:
+                self._summaries.popitem(last=False)
+
+    def invalidate(self, chat_id: str):
+        """清除chatId的缓存摘要"""
+        with self._lock:
+            self._summaries.pop(chat_id, None)
+
+    def _load_stored_summary(self, db: Optional[Session], chat_id: str) -> Optional[str]:
+        """复用数据库中已有的聊天总结"""
+        if db is None or not chat_id:
+            return None
+        try:
+            from app.models.chat_message import ChatSummary
+
+            row = db.query(ChatSummary.summary_content).filter(
+                ChatSummary.session_id == chat_id,
+                ChatSummary.summary_type == 'chat'
+            ).order_by(ChatSummary.created_at.desc()).first()
+            if row and row[0]:
+                return row[0]
+        except Exception as e:
+            logger.warning(f"读取聊天总结失败: {e}")
+        return None
+
+    def _truncate(self, text: str, max_tokens: int) -> str:
+        """按token预算截断文本，保留结尾（更新的内容）"""
+        if estimate_tokens(text) <= max_tokens:
+            return text
+        # 二分查找满足预算的最长后缀
+        low, high = 0, len(text)
+        while low < high:
+            mid = (low + high) // 2
+            if estimate_tokens(text[mid:]) <= max_tokens:
+                high = mid
+            else:
+                low = mid + 1
+        return "…" + text[low:]
+
+    def _extractive_summary(self, turns: List[Any]) -> str:
+        """无可用摘要时的抽取式摘要：拼接早期对话并截断到摘要预算"""
+        return self._truncate(" / ".join(_turn_text(t) for t in turns), self.summary_max_tokens)
+
+    # ---------------------------------------------------------------
+    # 上下文构建
+    # ---------------------------------------------------------------
+
+    def build_window(
+        self,
+        chat_id: str,
+        history: Optional[List[Any]],
+        db: Optional[Session] = None,
+        user_id: Optional[str] = None,
+        max_tokens: int = None,
+        max_recent_turns: int = None
+    ) -> ChatContextWindow:
+        """
+        构建符合token预算的聊天上下文
+
+        Args:
+            chat_id: 聊天ID，用于缓存滚动摘要
+            history: 完整聊天记录（按时间正序）
+            db: 数据库会话，用于复用 ChatSummary 记录
+            user_id: 用户ID，后台生成摘要时记录LLM用量
+            max_tokens: 本次请求的token预算，默认使用全局配置
+            max_recent_turns: 原样保留的最大轮数，默认使用全局配置
+
+        Returns:
+            裁剪后的上下文窗口
+        """
+        history = list(history or [])
+        budget = max_tokens or self.max_tokens
+        recent_limit = max_recent_turns or self.max_recent_turns
+
+        # 从最新一轮向前保留，预留摘要预算
+        recent_budget = max(budget - self.summary_max_tokens, budget // 2)
+        used = 0
+        split = len(history)
+        while split > 0 and len(history) - split < recent_limit:
+            cost = estimate_tokens(_turn_text(history[split - 1]))
+            # 至少保留最新一轮，避免用户刚说的话被丢弃
+            if used + cost > recent_budget and split < len(history):
+                break
+            used += cost
+            split -= 1
+
+        window = ChatContextWindow(recent_turns=history[split:], estimated_tokens=used)
+        older = history[:split]
+        if not older:
+            return window
+
+        entry = self.get_cached_summary(chat_id)
+        if entry is None:
+            stored = self._load_stored_summary(db, chat_id)
+            if stored:
+                entry = _SummaryEntry(summary=self._truncate(stored, self.summary_max_tokens), folded_turns=len(older))
+                self.set_cached_summary(chat_id, entry.summary, entry.folded_turns)
+
+        if entry is not None:
+            summary = entry.summary
+            if entry.folded_turns < len(older):
+                # 摘要落后于当前对话，先使用旧摘要，后台折叠新增轮次
+                self._schedule_refresh(chat_id, user_id, entry, older)
+        else:
+            summary = self._extractive_summary(older)
+            self._schedule_refresh(chat_id, user_id, None, older)
+
+        window.summary = summary
+        window.folded_turns = len(older)
+        window.estimated_tokens += estimate_tokens(summary)
+        return window
+
+    def _schedule_refresh(
+        self,
+        chat_id: str,
+        user_id: Optional[str],
+        entry: Optional[_SummaryEntry],
+        older: List[Any]
+    ):
+        """在后台折叠新增的早期对话为滚动摘要（同一chatId同时只有一个任务）"""
+        if not chat_id:
+            return
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return
+        with self._lock:
+            if chat_id in self._refreshing:
+                return
+            self._refreshing.add(chat_id)
+
+        start = entry.folded_turns if entry else 0
+        messages = []
+        if entry:
+            messages.append(f"此前对话摘要: {entry.summary}")
+        messages.extend(_turn_text(t) for t in older[start:])
+        task = loop.create_task(self._refresh_summary(chat_id, user_id, messages, len(older)))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _refresh_summary(self, chat_id: str, user_id: Optional[str], messages: List[str], folded_turns: int):
+        """调用LLM生成滚动摘要并写入缓存"""
+        from app.database import SessionLocal
+        from app.services.llm_service import LLMService
+
+        db = SessionLocal()
+        try:
+            result = await LLMService(db).generate_chat_summary(user_id=user_id, chat_messages=messages)
+            if result.get("success") and result.get("summary"):
+                summary = self._truncate(result["summary"], self.summary_max_tokens)
+                self.set_cached_summary(chat_id, summary, folded_turns)
+        except Exception as e:
+            logger.warning(f"生成滚动聊天摘要失败: chat_id={chat_id}, error={e}")
+        finally:
+            db.close()
+            with self._lock:
+                self._refreshing.discard(chat_id)
+
+
+# 全局上下文管理器实例
+chat_context_manager = ChatContextManager()
@@ -0,0 +1,333 @@
+"""
+计数器写回服务
+浏览数、点赞数、投票数等热点计数先在内存中累加，并追加写入本地日志保证进程崩溃后可恢复，
+定期按表和列合并为批量 UPDATE ... SET x = x + delta 写回数据库，避免热点行的读改写和行锁竞争；
+读取时叠加尚未写回的增量
+"""
+
+import atexit
+import glob
+import logging
+import os
+import threading
+import time
+from typing import Any, Callable, Dict, Iterable, Optional, Set, Tuple
+
+from sqlalchemy import text
+from sqlalchemy.orm.attributes import set_committed_value
+
+logger = logging.getLogger(__name__)
+
+# 允许写回的计数列：表名 -> 列名集合
+COUNTER_COLUMNS = {
+    "topic_cards": {"view_count", "like_count"},
+    "vote_cards": {"view_count", "total_votes"},
+    "vote_options": {"vote_count"},
+    "tag_contents": {"view_count", "like_count", "share_count"},
+}
+
+CounterKey = Tuple[str, str, str]  # (表名, 行ID, 列名)
+
+# 本进程内正在重放的日志（同一进程内的多个实例不重复认领）
+_active_replays: Set[str] = set()
+
+
+class CounterService:
+    """写回计数器
+
+    - incr() 只修改内存和追加本地日志，不访问数据库
+    - 后台线程每 flush_interval 秒写回一次，累计增量条数达到 flush_threshold 时提前写回
+    - 写回前切换日志文件，写回成功后删除旧日志；启动时重放已退出进程遗留的日志
+    """
+
+    def __init__(
+        self,
+        session_factory: Optional[Callable[[], Any]] = None,
+        log_dir: Optional[str] = None,
+        flush_interval: float = 5.0,
+        flush_threshold: int = 1000,
+        enabled: bool = True,
+        auto_flush: bool = True
+    ):
+        """
+        Args:
+            session_factory: 创建数据库会话的工厂，默认使用主库 SessionLocal
+            log_dir: 增量日志目录，为空时只在内存中累加
+            flush_interval: 定期写回的间隔（秒）
+            flush_threshold: 待写回的计数条数达到该值时立即唤醒写回
+            enabled: 未启用时 incr() 立即写回数据库
+            auto_flush: 是否启动后台写回线程并在进程退出时写回；关闭时只在调用 flush() 时写回
+        """
+        self._session_factory = session_factory
+        self.log_dir = log_dir
+        self.flush_interval = flush_interval
+        self.flush_threshold = flush_threshold
+        self.enabled = enabled
+        self.auto_flush = auto_flush
+        self._pending: Dict[CounterKey, int] = {}
+        self._flushing: Dict[CounterKey, int] = {}
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._log = None
+        self._recovered = False
+        # 日志文件名带进程号和启动时间，容器重启后进程号复用也不会与旧日志混淆
+        self._log_name = f"counters-{os.getpid()}-{time.time_ns()}"
+
+    def _get_session(self):
+        if self._session_factory is None:
+            from app.database import SessionLocal
+            self._session_factory = SessionLocal
+        return self._session_factory()
+
+    # ---------------------------------------------------------------
+    # 本地日志
+    # ---------------------------------------------------------------
+
+    def _log_path(self, suffix: str = "") -> str:
+        return os.path.join(self.log_dir, f"{self._log_name}.log{suffix}")
+
+    def _append_log(self, key: CounterKey, delta: int):
+        if not self.log_dir:
+            return
+        if self._log is None:
+            os.makedirs(self.log_dir, exist_ok=True)
+            self._log = open(self._log_path(), "a", encoding="utf-8", buffering=1)
+        self._log.write(f"{key[0]}\t{key[1]}\t{key[2]}\t{delta}\n")
+
+    @staticmethod
+    def _read_log(path: str) -> Dict[CounterKey, int]:
+        deltas: Dict[CounterKey, int] = {}
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                parts = line.rstrip("\n").split("\t")
+                if len(parts) != 4:
+                    # 崩溃时写了一半的行
+                    continue
+                table, row_id, column, delta = parts
+                key = (table, row_id, column)
+                deltas[key] = deltas.get(key, 0) + int(delta)
+        return deltas
+
+    def recover(self) -> int:
+        """
+        重放已退出进程遗留的增量日志并写回数据库
+
+        多个worker同时启动时都会尝试重放同一批日志：每个文件先原子重命名为 replay-<pid>-... 认领，
+        只有重命名成功的worker重放该文件，避免计数被重复累加
+
+        Returns:
+            写回的计数条数
+        """
+        if not self.log_dir or not os.path.isdir(self.log_dir):
+            self._recovered = True
+            return 0
+        total = 0
+        paths = glob.glob(os.path.join(self.log_dir, "counters-*.log*"))
+        # 认领后未完成重放就退出的进程留下的文件
+        paths += glob.glob(os.path.join(self.log_dir, "replay-*"))
+        for path in sorted(paths):
+            name = os.path.basename(path)
+            if name.startswith(self._log_name + ".") or path in _active_replays:
+                continue
+            try:
+                pid = int(name.split("-")[1])
+            except (IndexError, ValueError):
+                continue
+            if pid != os.getpid() and _pid_alive(pid):
+                # 其他仍在运行的worker
+                continue
+            claimed = os.path.join(self.log_dir, f"replay-{os.getpid()}-{time.time_ns()}-{name}")
+            try:
+                os.rename(path, claimed)
+            except FileNotFoundError:
+                # 已被其他worker认领
+                continue
+            _active_replays.add(claimed)
+            try:
+                deltas = self._read_log(claimed)
+                if deltas:
+                    self._write(deltas)
+                    total += len(deltas)
+                os.remove(claimed)
+            finally:
+                _active_replays.discard(claimed)
+        self._recovered = True
+        if total:
+            logger.info(f"重放计数器日志完成: counters={total}")
+        return total
+
+    # ---------------------------------------------------------------
+    # 计数与读取
+    # ---------------------------------------------------------------
+
+    def incr(self, table: str, row_id: Any, column: str, delta: int = 1):
+        """累加计数（delta 可为负数，写回时结果不小于0）"""
+        if column not in COUNTER_COLUMNS.get(table, ()):
+            raise ValueError(f"不支持的计数列: {table}.{column}")
+        if not delta or row_id is None:
+            return
+        key = (table, str(row_id), column)
+        if not self.enabled:
+            self._write({key: delta})
+            return
+        with self._lock:
+            self._pending[key] = self._pending.get(key, 0) + delta
+            self._append_log(key, delta)
+            size = len(self._pending)
+        self._ensure_started()
+        if size >= self.flush_threshold:
+            self._wakeup.set()
+
+    def pending(self, table: str, row_id: Any, column: str) -> int:
+        """尚未写回数据库的增量（包括正在写回的部分）"""
+        key = (table, str(row_id), column)
+        with self._lock:
+            return self._pending.get(key, 0) + self._flushing.get(key, 0)
+
+    def overlay(self, table: str, row_id: Any, column: str, value: Optional[int]) -> int:
+        """数据库中的计数叠加尚未写回的增量"""
+        return max(0, (value or 0) + self.pending(table, row_id, column))
+
+    def apply(self, obj: Any, table: str, columns: Iterable[str]) -> Any:
+        """
+        将尚未写回的增量叠加到 ORM 对象上用于展示
+
+        以“已提交值”的方式设置，不会把对象标记为已修改，避免之后的提交把叠加值写回数据库
+        """
+        if obj is None:
+            return obj
+        for column in columns:
+            set_committed_value(obj, column, self.overlay(table, obj.id, column, getattr(obj, column)))
+        return obj
+
+    # ---------------------------------------------------------------
+    # 写回
+    # ---------------------------------------------------------------
+
+    def _write(self, deltas: Dict[CounterKey, int]):
+        """按表和列分组批量写回"""
+        grouped: Dict[Tuple[str, str], list] = {}
+        for (table, row_id, column), delta in deltas.items():
+            if delta:
+                grouped.setdefault((table, column), []).append({"id": row_id, "delta": delta})
+        if not grouped:
+            return
+        db = self._get_session()
+        try:
+            for (table, column), params in grouped.items():
+                db.execute(
+                    text(
+                        f"UPDATE {table} SET {column} = "
+                        f"CASE WHEN COALESCE({column}, 0) + :delta < 0 THEN 0 ELSE COALESCE({column}, 0) + :delta END "
+                        f"WHERE id = :id"
+                    ),
+                    params
+                )
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+
+    def flush(self) -> int:
+        """
+        将累计的增量写回数据库，失败时增量保留到下次写回
+
+        Returns:
+            写回的计数条数
+        """
+        with self._flush_lock:
+            if not self._recovered:
+                try:
+                    self.recover()
+                except Exception as e:
+                    logger.warning(f"重放计数器日志失败: {e}")
+            with self._lock:
+                if not self._pending:
+                    return 0
+                self._flushing, self._pending = self._pending, {}
+                # 切换日志：新增量写入新文件，旧文件在写回成功后删除
+                rotated = None
+                if self._log is not None:
+                    self._log.close()
+                    self._log = None
+                    rotated = self._log_path(".flushing")
+                    os.replace(self._log_path(), rotated)
+            batch = self._flushing
+            try:
+                self._write(batch)
+            except Exception as e:
+                logger.warning(f"计数器写回失败，稍后重试: counters={len(batch)}, error={e}")
+                with self._lock:
+                    for key, delta in batch.items():
+                        self._pending[key] = self._pending.get(key, 0) + delta
+                        self._append_log(key, delta)
+                    self._flushing = {}
+                if rotated:
+                    os.remove(rotated)
+                return 0
+            with self._lock:
+                self._flushing = {}
+            if rotated:
+                os.remove(rotated)
+            return len(batch)
+
+    def _ensure_started(self):
+        if self._thread is not None or not self.auto_flush:
+            return
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._thread = threading.Thread(target=self._run, name="counter-flush", daemon=True)
+            self._thread.start()
+            atexit.register(self.close)
+
+    def _run(self):
+        while True:
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            try:
+                self.flush()
+            except Exception as e:
+                logger.warning(f"计数器写回异常: {e}")
+
+    def close(self):
+        """进程退出前写回剩余增量"""
+        try:
+            self.flush()
+        finally:
+            if self._log is not None:
+                self._log.close()
+                self._log = None
+
+
+def _pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def _create_service() -> CounterService:
+    from app.config import settings
+
+    log_dir = settings.COUNTER_LOG_DIR
+    if settings.is_testing or log_dir.lower() == "none":
+        # 测试环境不写日志，避免遗留的增量在下次启动时被重放到正式数据库
+        log_dir = None
+    return CounterService(
+        log_dir=log_dir,
+        flush_interval=settings.COUNTER_FLUSH_INTERVAL,
+        flush_threshold=settings.COUNTER_FLUSH_THRESHOLD,
+        enabled=settings.COUNTER_WRITE_BEHIND_ENABLED,
+    )
+
+
+# 全局计数器实例
+counter_service = _create_service()
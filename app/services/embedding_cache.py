@@ -0,0 +1,253 @@
+"""
+向量缓存服务
+以「归一化文本 + 模型名 + 维度」的哈希为键缓存向量，
+内存层使用LRU淘汰，磁盘层使用本地SQLite文件，向量以float32/float16紧凑字节存储；
+磁盘层按条数上限和过期时间定期批量清理，异步调用方的磁盘写入在线程池中执行
+"""
+
+import asyncio
+import hashlib
+import logging
+import os
+import sqlite3
+import struct
+import sys
+import threading
+import time
+import unicodedata
+from array import array
+from collections import OrderedDict
+from typing import Iterable, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+_DTYPE_CODES = {"float32": "f", "float16": "e"}
+
+
+def normalize_text(text: str) -> str:
+    """文本归一化：NFKC、去首尾空白、合并连续空白"""
+    return " ".join(unicodedata.normalize("NFKC", text).split())
+
+
+def pack_vector(vector: List[float], dtype: str = "float32") -> bytes:
+    """将向量编码为小端紧凑字节"""
+    if dtype == "float32" and sys.byteorder == "little":
+        return array("f", vector).tobytes()
+    return struct.pack(f"<{len(vector)}{_DTYPE_CODES[dtype]}", *vector)
+
+
+def unpack_vector(data: bytes, dtype: str = "float32") -> List[float]:
+    """将紧凑字节解码为向量"""
+    if dtype == "float32" and sys.byteorder == "little":
+        values = array("f")
+        values.frombytes(data)
+        return values.tolist()
+    size = 4 if dtype == "float32" else 2
+    return list(struct.unpack(f"<{len(data) // size}{_DTYPE_CODES[dtype]}", data))
+
+
+class EmbeddingCache:
+    """两级向量缓存（内存LRU + 本地磁盘）"""
+
+    def __init__(
+        self,
+        path: Optional[str] = None,
+        max_items: int = 5000,
+        dtype: str = "float32",
+        disk_max_items: Optional[int] = 50000,
+        disk_ttl: Optional[float] = None,
+        purge_every: int = 500
+    ):
+        """
+        Args:
+            path: 磁盘缓存文件路径，为空时只使用内存缓存
+            max_items: 内存层最多缓存的向量条数
+            dtype: 存储精度 float32 / float16
+            disk_max_items: 磁盘层最多保留的向量条数（超出时删除最早写入的记录），为空时不限制
+            disk_ttl: 磁盘层记录的有效期（秒），为空时不过期
+            purge_every: 每写入多少条执行一次批量清理
+        """
+        if dtype not in _DTYPE_CODES:
+            raise ValueError(f"不支持的向量缓存精度: {dtype}")
+        self.path = path
+        self.max_items = max_items
+        self.dtype = dtype
+        self.disk_max_items = disk_max_items
+        self.disk_ttl = disk_ttl
+        self.purge_every = purge_every
+        self._memory: "OrderedDict[str, bytes]" = OrderedDict()
+        self._lock = threading.Lock()
+        # 读写使用各自的连接和锁（WAL 模式下读不被写阻塞），内存层的锁不在磁盘读写期间持有
+        self._conn: Optional[sqlite3.Connection] = None
+        self._write_conn: Optional[sqlite3.Connection] = None
+        self._read_lock = threading.Lock()
+        self._write_lock = threading.Lock()
+        self._writes = 0
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def make_key(text: str, model_name: str, dimension: int) -> str:
+        """生成缓存键"""
+        raw = f"{model_name}\x00{dimension}\x00{normalize_text(text)}"
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    # ---------------------------------------------------------------
+    # 磁盘层
+    # ---------------------------------------------------------------
+
+    def _connect(self) -> sqlite3.Connection:
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        conn = sqlite3.connect(self.path, check_same_thread=False, timeout=5)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings ("
+            "key TEXT PRIMARY KEY, dtype TEXT NOT NULL, data BLOB NOT NULL, created_at REAL NOT NULL)"
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_embeddings_created_at ON embeddings (created_at)")
+        conn.commit()
+        return conn
+
+    def _get_conn(self, writer: bool = False) -> Optional[sqlite3.Connection]:
+        if not self.path:
+            return None
+        conn = self._write_conn if writer else self._conn
+        if conn is None:
+            try:
+                conn = self._connect()
+            except (OSError, sqlite3.Error) as e:
+                logger.warning(f"向量磁盘缓存不可用，仅使用内存缓存: {e}")
+                self.path = None
+                return None
+            if writer:
+                self._write_conn = conn
+                # 首次写入前清理一次，之前版本遗留的无上限文件也会被裁剪
+                self._purge(conn)
+            else:
+                self._conn = conn
+        return conn
+
+    def _disk_get(self, key: str) -> Optional[bytes]:
+        with self._read_lock:
+            conn = self._get_conn()
+            if conn is None:
+                return None
+            cutoff = time.time() - self.disk_ttl if self.disk_ttl else 0.0
+            try:
+                row = conn.execute(
+                    "SELECT dtype, data FROM embeddings WHERE key = ? AND created_at >= ?", (key, cutoff)
+                ).fetchone()
+            except sqlite3.Error as e:
+                logger.warning(f"读取向量磁盘缓存失败: {e}")
+                return None
+        if not row:
+            return None
+        dtype, data = row
+        if dtype != self.dtype:
+            # 存储精度变更后转换为当前精度
+            data = pack_vector(unpack_vector(data, dtype), self.dtype)
+        return data
+
+    def _disk_put_many(self, items: List[Tuple[str, bytes]]):
+        """批量写入磁盘层（一次提交），写入条数累计到 purge_every 时顺带清理"""
+        if not items:
+            return
+        with self._write_lock:
+            conn = self._get_conn(writer=True)
+            if conn is None:
+                return
+            now = time.time()
+            try:
+                conn.executemany(
+                    "INSERT OR REPLACE INTO embeddings (key, dtype, data, created_at) VALUES (?, ?, ?, ?)",
+                    [(key, self.dtype, data, now) for key, data in items]
+                )
+                self._writes += len(items)
+                if self._writes >= self.purge_every:
+                    self._writes = 0
+                    self._purge(conn)
+                conn.commit()
+            except sqlite3.Error as e:
+                logger.warning(f"写入向量磁盘缓存失败: {e}")
+                try:
+                    conn.rollback()
+                except sqlite3.Error:
+                    pass
+
+    def _purge(self, conn: sqlite3.Connection):
+        """批量删除过期记录和超出条数上限的最早记录"""
+        try:
+            if self.disk_ttl:
+                conn.execute("DELETE FROM embeddings WHERE created_at < ?", (time.time() - self.disk_ttl,))
+            if self.disk_max_items:
+                count = conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+                if count > self.disk_max_items:
+                    conn.execute(
+                        "DELETE FROM embeddings WHERE key IN "
+                        "(SELECT key FROM embeddings ORDER BY created_at LIMIT ?)",
+                        (count - self.disk_max_items,)
+                    )
+            conn.commit()
+        except sqlite3.Error as e:
+            logger.warning(f"清理向量磁盘缓存失败: {e}")
+
+    # ---------------------------------------------------------------
+    # 对外接口
+    # ---------------------------------------------------------------
+
+    def get(self, key: str) -> Optional[List[float]]:
+        """读取向量，内存未命中时查磁盘并回填内存"""
+        with self._lock:
+            data = self._memory.get(key)
+            if data is not None:
+                self._memory.move_to_end(key)
+        if data is None:
+            data = self._disk_get(key)
+        with self._lock:
+            if data is None:
+                self.misses += 1
+                return None
+            self._remember(key, data)
+            self.hits += 1
+        return unpack_vector(data, self.dtype)
+
+    def _remember_many(self, items: Iterable[Tuple[str, List[float]]]) -> List[Tuple[str, bytes]]:
+        """写入内存层，返回待写入磁盘的紧凑字节"""
+        packed = [(key, pack_vector(vector, self.dtype)) for key, vector in items if vector]
+        with self._lock:
+            for key, data in packed:
+                self._remember(key, data)
+        return packed
+
+    def set(self, key: str, vector: List[float]):
+        """写入向量（内存与磁盘）"""
+        self.set_many([(key, vector)])
+
+    def set_many(self, items: Iterable[Tuple[str, List[float]]]):
+        """批量写入向量，磁盘层一次提交"""
+        self._disk_put_many(self._remember_many(items))
+
+    async def aset_many(self, items: Iterable[Tuple[str, List[float]]]):
+        """异步批量写入：内存层立即可读，磁盘写入在线程池中执行，不阻塞事件循环"""
+        packed = self._remember_many(items)
+        if packed and self.path:
+            await asyncio.to_thread(self._disk_put_many, packed)
+
+    def _remember(self, key: str, data: bytes):
+        self._memory[key] = data
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_items:
+            self._memory.popitem(last=False)
+
+    def stats(self) -> dict:
+        """缓存统计信息"""
+        return {
+            "memory_items": len(self._memory),
+            "max_items": self.max_items,
+            "disk_max_items": self.disk_max_items,
+            "disk_ttl": self.disk_ttl,
+            "dtype": self.dtype,
+            "disk_path": self.path,
+            "hits": self.hits,
+            "misses": self.misses
+        }
@@ -5,29 +5,137 @@
 
 import json
 import asyncio
-from typing import Optional, List
+from typing import Any, Dict, Optional, List, Tuple, Union
 import httpx
 import logging
 
 from app.config import settings
+from app.services.embedding_cache import EmbeddingCache
 
 logger = logging.getLogger(__name__)
 
 
+class _EmbeddingBatcher:
+    """向量请求微批队列
+
+    调用方提交单条文本后等待结果；队列在最多 max_wait 秒或攒满 max_batch_size 条时统一发送，
+    再把结果按顺序分发回各调用方。相同文本在同一批次内只请求一次。
+    """
+
+    def __init__(self, flush_fn, max_batch_size: int, max_wait: float):
+        self._flush_fn = flush_fn
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait
+        self._pending: List[Tuple[str, asyncio.Future]] = []
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    async def submit(self, text: str) -> Optional[List[float]]:
+        """提交一条文本，返回其向量"""
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            # 事件循环变化（如测试中多次 asyncio.run）时丢弃旧状态
+            self._loop = loop
+            self._pending = []
+            self._timer = None
+
+        future = loop.create_future()
+        self._pending.append((text, future))
+        if len(self._pending) >= self.max_batch_size:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.max_wait, self._flush)
+        return await future
+
+    def _flush(self):
+        """取出当前批次并异步发送"""
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch, self._pending = self._pending, []
+        if batch:
+            self._loop.create_task(self._run(batch))
+
+    async def _run(self, batch: List[Tuple[str, asyncio.Future]]):
+        """发送一个批次并分发结果"""
+        unique_texts = list(dict.fromkeys(text for text, _ in batch))
+        try:
+            embeddings = await self._flush_fn(unique_texts)
+        except Exception as e:
+            logger.error(f"批量生成向量失败: {type(e).__name__}: {e}")
+            embeddings = [None] * len(unique_texts)
+        results = dict(zip(unique_texts, embeddings))
+        for text, future in batch:
+            if not future.done():
+                future.set_result(results.get(text))
+
+
 class EmbeddingService:
     """用户画像向量嵌入服务类"""
 
     def __init__(self):
-        self.api_url = "https://ark.cn-beijing.volces.com/api/v3/embeddings/multimodal"
-        self.model_name = "doubao-embedding-vision-251215"
+        self.api_url = settings.EMBEDDING_API_URL
+        self.model_name = settings.EMBEDDING_MODEL
         self.vector_dimension = 1024
         self.encoding_format = "float"
         self.timeout = 30.0
+        # 多模态接口会把 input 中的多个元素融合为一个向量，只有文本向量接口支持一次请求多条输入
+        self.supports_batch_input = not self.api_url.rstrip("/").endswith("/multimodal")
+        self._client: Optional[httpx.AsyncClient] = None
+        self._client_loop: Optional[asyncio.AbstractEventLoop] = None
+        self.cache = EmbeddingCache(
+            path=settings.EMBEDDING_CACHE_PATH,
+            max_items=settings.EMBEDDING_CACHE_MAX_ITEMS,
+            dtype=settings.EMBEDDING_CACHE_DTYPE,
+            disk_max_items=settings.EMBEDDING_CACHE_DISK_MAX_ITEMS or None,
+            disk_ttl=settings.EMBEDDING_CACHE_DISK_TTL or None
+        ) if settings.EMBEDDING_CACHE_ENABLED else None
+        self._batcher = _EmbeddingBatcher(
+            self._embed_batch,
+            max_batch_size=settings.EMBEDDING_BATCH_SIZE,
+            max_wait=settings.EMBEDDING_BATCH_WAIT_MS / 1000.0
+        )
+
+    def _get_client(self) -> httpx.AsyncClient:
+        """获取复用的HTTP客户端（保持长连接，按事件循环惰性创建）"""
+        loop = asyncio.get_running_loop()
+        if self._client is None or self._client.is_closed or self._client_loop is not loop:
+            self._client = httpx.AsyncClient(
+                timeout=self.timeout,
+                limits=httpx.Limits(max_connections=20, max_keepalive_connections=10)
+            )
+            self._client_loop = loop
+        return self._client
+
+    async def aclose(self):
+        """关闭复用的HTTP客户端"""
+        if self._client is not None and not self._client.is_closed:
+            await self._client.aclose()
+        self._client = None
+
+    def _cache_key(self, text: str) -> str:
+        return EmbeddingCache.make_key(text, self.model_name, self.vector_dimension)
+
+    def get_cached_embedding(self, text: str) -> Optional[List[float]]:
+        """
+        读取缓存中的向量（不发起网络请求）
+
+        Args:
+            text: 文本内容
+
+        Returns:
+            缓存的向量，未命中时返回 None
+        """
+        if self.cache is None or not text or not text.strip():
+            return None
+        return self.cache.get(self._cache_key(text))
 
     async def generate_profile_embedding(self, text: str) -> Optional[List[float]]:
         """
         生成用户画像文本的语义向量
 
+        先查向量缓存，命中时直接返回；未命中的请求进入微批队列，与同一时间窗口内的其他请求合并发送
+
         Args:
             text: 用户画像文本内容
 
@@ -38,12 +146,124 @@ class EmbeddingService:
             logger.warning("输入文本为空，无法生成向量")
             return None
 
+        cached = self.get_cached_embedding(text)
+        if cached is not None:
+            logger.debug("向量缓存命中，跳过向量模型调用")
+            return cached
+
+        if not settings.LLM_API_KEY:
+            logger.error("未配置 LLM_API_KEY，无法调用豆包向量模型")
+            return None
+
+        embedding = await self._batcher.submit(text)
+        if embedding and self.cache is not None:
+            await self.cache.aset_many([(self._cache_key(text), embedding)])
+        return embedding
+
+    async def generate_embeddings(self, texts: List[str], use_cache: bool = True) -> List[Optional[List[float]]]:
+        """
+        批量生成向量（用于批量回填等场景，绕过等待窗口直接按批次发送）
+
+        Args:
+            texts: 文本列表
+            use_cache: 是否读取向量缓存（生成结果总会写入缓存）
+
+        Returns:
+            与输入顺序一致的向量列表，失败项为 None
+        """
+        results: List[Optional[List[float]]] = [None] * len(texts)
+        valid = []
+        for i, t in enumerate(texts):
+            if not t or not t.strip():
+                continue
+            cached = self.get_cached_embedding(t) if use_cache else None
+            if cached is not None:
+                results[i] = cached
+            else:
+                valid.append((i, t))
+        if not valid:
+            return results
+
+        if not settings.LLM_API_KEY:
+            logger.error("未配置 LLM_API_KEY，无法调用豆包向量模型")
+            return results
+
+        batch_size = settings.EMBEDDING_BATCH_SIZE
+        for start in range(0, len(valid), batch_size):
+            chunk = valid[start:start + batch_size]
+            try:
+                embeddings = await self._embed_batch([t for _, t in chunk])
+            except Exception as e:
+                logger.error(f"批量生成向量失败: {type(e).__name__}: {e}")
+                continue
+            for (i, _), embedding in zip(chunk, embeddings):
+                results[i] = embedding
+            if self.cache is not None:
+                await self.cache.aset_many(
+                    [(self._cache_key(t), embedding) for (_, t), embedding in zip(chunk, embeddings) if embedding]
+                )
+        return results
+
+    async def _embed_batch(self, texts: List[str]) -> List[Optional[List[float]]]:
+        """发送一个批次：文本接口一次多输入请求，多模态接口在复用连接上并发逐条请求"""
+        if not texts:
+            return []
+        if self.supports_batch_input and len(texts) > 1:
+            return await self._request_embeddings(texts)
+        return list(await asyncio.gather(*(self._request_single(t) for t in texts)))
+
+    def _headers(self) -> Dict[str, str]:
+        return {
+            "Content-Type": "application/json",
+            "Authorization": f"Bearer {settings.LLM_API_KEY}"
+        }
+
+    def _extract_embedding(self, item: Any) -> Optional[List[float]]:
+        """从响应数据项中取出向量并校验"""
+        embedding = item.get("embedding") if isinstance(item, dict) else None
+        if embedding is not None and isinstance(embedding, list) and len(embedding) > 0:
+            return embedding
+        elif embedding is None:
+            logger.warning(f"豆包向量模型返回 None embedding")
+        elif isinstance(embedding, list) and len(embedding) == 0:
+            logger.warning(f"豆包向量模型返回空列表 []")
+        else:
+            logger.warning(f"豆包向量模型返回异常 embedding: type={type(embedding)}")
+        return None
+
+    async def _request_embeddings(self, texts: List[str]) -> List[Optional[List[float]]]:
+        """文本向量接口：一次请求多条输入"""
+        payload = {
+            "model": self.model_name,
+            "input": texts,
+            "dimensions": self.vector_dimension,
+            "encoding_format": self.encoding_format
+        }
         try:
-            api_key = settings.LLM_API_KEY
-            if not api_key:
-                logger.error("未配置 LLM_API_KEY，无法调用豆包向量模型")
-                return None
+            response = await self._get_client().post(self.api_url, json=payload, headers=self._headers())
+            if response.status_code != 200:
+                logger.error(f"豆包向量模型调用失败: {response.status_code} - {response.text}")
+                return [None] * len(texts)
 
+            data_value = response.json().get("data") or []
+            results: List[Optional[List[float]]] = [None] * len(texts)
+            for position, item in enumerate(data_value):
+                index = item.get("index", position) if isinstance(item, dict) else position
+                if 0 <= index < len(texts):
+                    results[index] = self._extract_embedding(item)
+            logger.info(f"批量生成用户画像向量完成: {sum(1 for r in results if r)}/{len(texts)}")
+            return results
+        except httpx.TimeoutException:
+            logger.error("豆包向量模型调用超时")
+        except json.JSONDecodeError as e:
+            logger.error(f"解析豆包向量模型响应失败: {e}")
+        except Exception as e:
+            logger.error(f"批量生成用户画像向量时发生错误: {type(e).__name__}: {e}")
+        return [None] * len(texts)
+
+    async def _request_single(self, text: str) -> Optional[List[float]]:
+        """多模态向量接口：单条文本请求"""
+        try:
             payload = {
                 "model": self.model_name,
                 "input": [
@@ -56,49 +276,33 @@ class EmbeddingService:
                 "encoding_format": self.encoding_format
             }
 
-            headers = {
-                "Content-Type": "application/json",
-                "Authorization": f"Bearer {api_key}"
-            }
-
             logger.debug(f"调用豆包向量模型，输入文本长度: {len(text)}")
             logger.debug(f"请求参数: model={self.model_name}, dimensions={self.vector_dimension}, encoding_format={self.encoding_format}")
 
-            async with httpx.AsyncClient(timeout=self.timeout) as client:
-                response = await client.post(
-                    self.api_url,
-                    json=payload,
-                    headers=headers
-                )
+            response = await self._get_client().post(
+                self.api_url,
+                json=payload,
+                headers=self._headers()
+            )
 
-                if response.status_code != 200:
-                    logger.error(f"豆包向量模型调用失败: {response.status_code} - {response.text}")
-                    return None
-
-                result = response.json()
-
-                logger.debug(f"豆包向量模型响应类型: data={type(result.get('data'))}")
-                
-                data_value = result.get("data")
-                logger.debug(f"data_value 类型: {type(data_value)}")
-                
-                embedding = None
-                if isinstance(data_value, list) and len(data_value) > 0:
-                    embedding = data_value[0].get("embedding")
-                elif isinstance(data_value, dict):
-                    embedding = data_value.get("embedding")
-                
-                if embedding is not None and isinstance(embedding, list) and len(embedding) > 0:
-                    logger.info(f"成功生成用户画像向量，维度: {len(embedding)}")
-                    return embedding
-                elif embedding is None:
-                    logger.warning(f"豆包向量模型返回 None embedding")
-                elif isinstance(embedding, list) and len(embedding) == 0:
-                    logger.warning(f"豆包向量模型返回空列表 []")
-                else:
-                    logger.warning(f"豆包向量模型返回异常 embedding: type={type(embedding)}")
+            if response.status_code != 200:
+                logger.error(f"豆包向量模型调用失败: {response.status_code} - {response.text}")
                 return None
 
+            result = response.json()
+            data_value = result.get("data")
+            logger.debug(f"data_value 类型: {type(data_value)}")
+
+            embedding = None
+            if isinstance(data_value, list) and len(data_value) > 0:
+                embedding = self._extract_embedding(data_value[0])
+            elif isinstance(data_value, dict):
+                embedding = self._extract_embedding(data_value)
+
+            if embedding is not None:
+                logger.info(f"成功生成用户画像向量，维度: {len(embedding)}")
+            return embedding
+
         except httpx.TimeoutException:
             logger.error("豆包向量模型调用超时")
             return None
@@ -123,16 +327,21 @@ class EmbeddingService:
         """
         return json.dumps(embedding, ensure_ascii=False)
 
-    def parse_vector_from_text(self, vector_text: str) -> Optional[List[float]]:
+    def parse_vector_from_text(self, vector_text: Union[str, bytes]) -> Optional[List[float]]:
         """
-        从文本解析向量
+        从文本或二进制编码解析向量
 
         Args:
-            vector_text: 向量文本字符串，格式为 '[0.1, 0.2, ...]'
+            vector_text: 向量文本字符串，格式为 '[0.1, 0.2, ...]'，或 vector_codec 编码的字节
 
         Returns:
             向量列表
         """
+        if isinstance(vector_text, (bytes, bytearray, memoryview)):
+            from app.utils.vector_codec import decode_vector, is_encoded_vector
+
+            if is_encoded_vector(vector_text):
+                return decode_vector(bytes(vector_text)).tolist()
         try:
             return json.loads(vector_text)
         except json.JSONDecodeError as e:
@@ -9,6 +9,7 @@ from app.models.user import User
 from app.models.user_card_db import UserCard
 from app.models.tag import Tag, UserTagRel
 from app.models.user_connection import UserConnection, ConnectionType
+from app.services.image_derivatives import image_derivatives
 from app.services.topic_card_service import TopicCardService
 from app.services.vote_service import VoteService
 from app.services.user_connection_service import UserConnectionService
@@ -105,11 +106,25 @@ class FeedService:
         return viewed_subquery, connected_from_subquery, connected_to_subquery
     
     @staticmethod
-    def _process_media_url(url: str) -> str:
+    def _sized_media_url(url: Optional[str], size: str) -> Optional[str]:
+        """
+        按显示规格返回图片URL（thumb: 头像，medium: 封面和正文图片）
+        按内容存储的图片返回对应规格的 WebP 衍生图，其他URL原样返回
+        """
+        return image_derivatives.derived_url(url, size)
+    
+    @staticmethod
+    def _process_media_url(url: str, size: Optional[str] = None) -> str:
         """
         处理媒体URL，确保返回完整的URL路径
         参考前端 card-formatter.js 的 processMediaUrl 方法
+        
+        Args:
+            url: 媒体URL
+            size: 显示规格，指定时优先使用对应规格的衍生图
         """
+        if size:
+            url = FeedService._sized_media_url(url, size)
         if not url or url.startswith('http') or url.startswith('wxfile'):
             return url
         
@@ -169,7 +184,7 @@ class FeedService:
                     "id": user_card.id,
                     "user_id": user_card.user_id,
                     "display_name": user_card.display_name,
-                    "avatar_url": user_card.avatar_url,
+                    "avatar_url": self._sized_media_url(user_card.avatar_url, "thumb"),
                     "bio": user_card.bio,
                     "role_type": user_card.role_type,
                     "recommend_score": round(score, 2),
@@ -324,7 +339,7 @@ class FeedService:
                     "id": card.id,
                     "user_id": card.user_id,
                     "display_name": card.display_name,
-                    "avatar_url": card.avatar_url,
+                    "avatar_url": self._sized_media_url(card.avatar_url, "thumb"),
                     "bio": card.bio,
                     "role_type": card.role_type,
                     "is_popular": True
@@ -391,7 +406,7 @@ class FeedService:
                     "id": card.id,
                     "user_id": card.user_id,
                     "display_name": card.display_name,
-                    "avatar_url": card.avatar_url,
+                    "avatar_url": self._sized_media_url(card.avatar_url, "thumb"),
                     "bio": card.bio,
                     "role_type": card.role_type,
                     "recommend_score": 0.0,
@@ -518,12 +533,12 @@ class FeedService:
                         "created_at": card.created_at.isoformat() if hasattr(card, 'created_at') and card.created_at else None,
                         "updated_at": card.updated_at.isoformat() if hasattr(card, 'updated_at') and card.updated_at else None,
                         "user_id": card.user_id,
-                        "user_avatar": card.creator_avatar or '',
+                        "user_avatar": self._sized_media_url(card.creator_avatar, "thumb") or '',
                         "user_nickname": card.creator_nickname or '匿名用户',
                         "like_count": card.like_count or 0,
                         "comment_count": card.discussion_count or 0,
                         "has_liked": False,
-                        "images": [card.cover_image] if card.cover_image else [],
+                        "images": [self._sized_media_url(card.cover_image, "medium")] if card.cover_image else [],
                         "is_anonymous": card.is_anonymous or 0,
                         "isRecommendation": True,
                         "recommendationReason": "热门话题"
@@ -556,7 +571,7 @@ class FeedService:
                     "created_at": card.created_at.isoformat() if hasattr(card, 'created_at') and card.created_at else None,
                     "updated_at": card.updated_at.isoformat() if hasattr(card, 'updated_at') and card.updated_at else None,
                     "user_id": card.user_id,
-                    "user_avatar": user.avatar_url if user else '',
+                    "user_avatar": self._sized_media_url(user.avatar_url, "thumb") if user else '',
                     "user_nickname": user.nick_name if user else '匿名用户',
                     "vote_options": vote_results["options"],
                     "total_votes": card.total_votes or 0,
@@ -565,7 +580,7 @@ class FeedService:
                     "vote_deadline": card.end_time.isoformat() if hasattr(card, 'end_time') and card.end_time else None,
                     "max_selections": 1,
                     "allow_discussion": True,
-                    "images": [card.cover_image] if card.cover_image else [],
+                    "images": [self._sized_media_url(card.cover_image, "medium")] if card.cover_image else [],
                     "isRecommendation": True,
                     "recommendationReason": "热门投票"
                 }
@@ -624,7 +639,7 @@ class FeedService:
                     "id": str(card.id),
                     "userId": str(card.user_id),
                     "name": getattr(card, 'display_name', None),
-                    "avatar": self._process_media_url(getattr(card, 'avatar_url', None) or getattr(user, 'avatar_url', None) or ""),
+                    "avatar": self._process_media_url(getattr(card, 'avatar_url', None) or getattr(user, 'avatar_url', None) or "", "thumb"),
                     "occupation": getattr(user, 'occupation', ''),
                     "location": getattr(card, 'location', ''),
                     "bio": getattr(card, 'bio', '') or '这个人很懒，什么都没有留下...',
@@ -651,7 +666,7 @@ class FeedService:
                     "createdAt": card.created_at.isoformat() if card.created_at else "",
                     "displayName": getattr(card, 'display_name', None),
                     "creatorName": getattr(user, 'nick_name', '匿名用户'),
-                    "creatorAvatar": self._process_media_url(getattr(user, 'avatar_url', None) or ""),
+                    "creatorAvatar": self._process_media_url(getattr(user, 'avatar_url', None) or "", "thumb"),
                     "creatorOccupation": getattr(user, 'occupation', ''),
                     "cardTitle": str(card.display_name),
                     "visibility": 'everyone' if getattr(card, 'visibility', 'public') == 'public' else getattr(card, 'visibility', 'public')
@@ -718,7 +733,7 @@ class FeedService:
                 card_data = {
                     "id": str(user_card.id),
                     "userId": str(card_creator.id),
-                    "avatar": self._process_media_url(getattr(user_card, 'avatar_url', None) or getattr(card_creator, 'avatar_url', None) or ""),
+                    "avatar": self._process_media_url(getattr(user_card, 'avatar_url', None) or getattr(card_creator, 'avatar_url', None) or "", "thumb"),
                     "occupation": getattr(card_creator, 'occupation', ''),
                     "location": getattr(user_card, 'location', ''),
                     "bio": getattr(user_card, 'bio', '') or '这个人很懒，什么都没有留下...',
@@ -736,7 +751,7 @@ class FeedService:
                     "createdAt": user_card.created_at.isoformat() if user_card.created_at else "",
                     "displayName": getattr(user_card, 'display_name', None),
                     "creatorName": getattr(card_creator, 'nick_name', '匿名用户'),
-                    "creatorAvatar": self._process_media_url(getattr(card_creator, 'avatar_url', None) or ""),
+                    "creatorAvatar": self._process_media_url(getattr(card_creator, 'avatar_url', None) or "", "thumb"),
                     "creatorOccupation": getattr(card_creator, 'occupation', ''),
                     "cardTitle": str(user_card.display_name),
                     "visibility": 'everyone' if getattr(user_card, 'visibility', 'public') == 'public' else getattr(user_card, 'visibility', 'public')
@@ -875,7 +890,7 @@ class FeedService:
                     # 基础信息
                     "id": str(user_card.id),
                     "userId": str(card_creator.id),
-                    "avatar": self._process_media_url(getattr(user_card, 'avatar_url', None) or getattr(card_creator, 'avatar_url', None) or ""),
+                    "avatar": self._process_media_url(getattr(user_card, 'avatar_url', None) or getattr(card_creator, 'avatar_url', None) or "", "thumb"),
                     "occupation": getattr(card_creator, 'occupation', ''),
                     "location": getattr(user_card, 'location', ''),
                     "bio": getattr(user_card, 'bio', '') or '这个人很懒，什么都没有留下...',
@@ -902,7 +917,7 @@ class FeedService:
                     "createdAt": user_card.created_at.isoformat() if user_card.created_at else "",
                     "displayName": getattr(user_card, 'display_name', None),
                     "creatorName": getattr(card_creator, 'nick_name', '匿名用户'),
-                    "creatorAvatar": self._process_media_url(getattr(card_creator, 'avatar_url', None) or ""),
+                    "creatorAvatar": self._process_media_url(getattr(card_creator, 'avatar_url', None) or "", "thumb"),
                     "creatorOccupation": getattr(card_creator, 'occupation', ''),
                     "cardTitle": str(user_card.display_name),
                     "visibility": 'everyone' if getattr(user_card, 'visibility', 'public') == 'public' else getattr(user_card, 'visibility', 'public')
@@ -1053,12 +1068,12 @@ class FeedService:
                         "updated_at": card.updated_at.isoformat() if hasattr(card, 'updated_at') and card.updated_at else None,
                         "user_id": card.user_id,
                         "creator_id": card.user_id,
-                        "user_avatar": card.creator_avatar or '',
+                        "user_avatar": self._sized_media_url(card.creator_avatar, "thumb") or '',
                         "user_nickname": card.creator_nickname or '匿名用户',
                         "like_count": card.like_count or 0,
                         "comment_count": card.discussion_count or 0,
                         "has_liked": False,
-                        "images": [card.cover_image] if card.cover_image else [],
+                        "images": [self._sized_media_url(card.cover_image, "medium")] if card.cover_image else [],
                         "is_anonymous": card.is_anonymous or 0,
                         "is_from_tag_creator": card.user_id == tag_creator_id if tag_creator_id else False
                     }
@@ -1095,7 +1110,7 @@ class FeedService:
                     "updated_at": card.updated_at.isoformat() if hasattr(card, 'updated_at') and card.updated_at else None,
                     "user_id": card.user_id,
                     "creator_id": card.user_id,
-                    "user_avatar": user.avatar_url if user else '',
+                    "user_avatar": self._sized_media_url(user.avatar_url, "thumb") if user else '',
                     "user_nickname": user.nick_name if user else '匿名用户',
                     "vote_options": vote_results["options"],
                     "total_votes": card.total_votes or 0,
@@ -1104,7 +1119,7 @@ class FeedService:
                     "vote_deadline": card.end_time.isoformat() if hasattr(card, 'end_time') and card.end_time else None,
                     "max_selections": 1,
                     "allow_discussion": True,
-                    "images": [card.cover_image] if card.cover_image else [],
+                    "images": [self._sized_media_url(card.cover_image, "medium")] if card.cover_image else [],
                     "is_from_tag_creator": card.user_id == tag_creator_id if tag_creator_id else False
                 }
                 all_cards.append(formatted_card)
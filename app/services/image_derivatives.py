@@ -0,0 +1,182 @@
+"""
+图片衍生图（缩略图 / WebP）
+按内容存储的图片可以生成固定规格的缩小版 WebP，Feed 中的头像和封面引用缩小版，
+小程序不必为了显示小头像下载原图。
+
+衍生图在首次被请求时生成（在进程池中缩放，不占用事件循环和 GIL），之后作为静态文件直接返回；
+原图按内容寻址不会变化，衍生图路径由原图哈希和规格决定，同样可以长期缓存
+"""
+
+import asyncio
+import logging
+import multiprocessing
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Optional, Set
+
+from app.services.media_store import ImmutableStaticFiles, MediaStore, media_store
+from app.utils.image_render import Image, render_webp
+
+logger = logging.getLogger(__name__)
+
+# 规格名 -> 最长边像素
+SIZES: Dict[str, int] = {
+    "thumb": 240,    # 头像等小图
+    "medium": 750,   # 封面、正文图片（满屏宽度的 2 倍图）
+}
+
+# 可以生成衍生图的原图格式（GIF 可能是动图，保持原样）
+SOURCE_EXTS = {".jpg", ".jpeg", ".png", ".webp"}
+
+_DERIVED_NAME = re.compile(r"^(?P<size>[a-z]+)/(?P<a>[0-9a-f]{2})/(?P<b>[0-9a-f]{2})/(?P<sha>[0-9a-f]{64})(?P<ext>\.[a-z0-9]{1,10})\.webp$")
+
+
+class ImageDerivatives:
+    """图片衍生图生成与缓存"""
+
+    def __init__(
+        self,
+        store: MediaStore,
+        root: str,
+        url_prefix: str = "/uploads/derived",
+        quality: int = 80,
+        workers: int = 2,
+        enabled: bool = True
+    ):
+        """
+        Args:
+            store: 原图所在的内容存储
+            root: 衍生图缓存目录
+            url_prefix: 衍生图访问URL前缀（对应静态文件挂载路径）
+            quality: WebP 质量
+            workers: 缩放图片的进程数
+            enabled: 是否启用（未安装 Pillow 时自动关闭）
+        """
+        self.store = store
+        self.root = root
+        self.url_prefix = url_prefix.rstrip("/")
+        self.quality = quality
+        self.workers = workers
+        self.enabled = enabled and Image is not None
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self._warming: Set[asyncio.Task] = set()
+        # 原图回收后删除衍生图，避免已删除的图片仍能以缩略图形式访问
+        store.add_collect_hook(self.discard)
+
+    def _relative(self, sha256: str, ext: str, size: str) -> str:
+        return f"{size}/{sha256[:2]}/{sha256[2:4]}/{sha256}{ext}.webp"
+
+    def derived_url(self, file_url: Optional[str], size: str) -> Optional[str]:
+        """
+        原图URL对应的衍生图URL；不是按内容存储的图片、规格未知或未启用时原样返回
+        """
+        if not self.enabled or not isinstance(file_url, str) or size not in SIZES or not self.store.is_blob_url(file_url):
+            return file_url
+        name = os.path.basename(file_url)
+        sha256, ext = os.path.splitext(name)
+        if len(sha256) != 64 or ext not in SOURCE_EXTS:
+            return file_url
+        return f"{self.url_prefix}/{self._relative(sha256, ext, size)}"
+
+    def discard(self, file_url: str):
+        """删除原图的各规格衍生图"""
+        if not self.store.is_blob_url(file_url):
+            return
+        sha256, ext = os.path.splitext(os.path.basename(file_url))
+        if len(sha256) != 64:
+            return
+        for size in SIZES:
+            path = os.path.join(self.root, self._relative(sha256, ext, size))
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            except OSError as e:
+                logger.warning(f"删除衍生图失败: {path}, {e}")
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            # 主进程中有后台线程（计数写回、索引预热等），fork 可能复制到被持有的锁而死锁，
+            # 子进程改由 forkserver（不支持时用 spawn）启动
+            method = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.workers, mp_context=multiprocessing.get_context(method)
+            )
+        return self._executor
+
+    async def ensure(self, relative_path: str) -> bool:
+        """
+        确保衍生图存在，不存在时从原图生成
+
+        Args:
+            relative_path: 衍生图相对路径（size/ab/cd/<sha256><ext>.webp）
+
+        Returns:
+            衍生图是否可用
+        """
+        match = _DERIVED_NAME.match(relative_path)
+        if not self.enabled or not match or match["size"] not in SIZES or match["ext"] not in SOURCE_EXTS:
+            return False
+        target = os.path.join(self.root, relative_path)
+        if os.path.exists(target):
+            return True
+        source = self.store.blob_path(match["sha"], match["ext"])
+        if not os.path.exists(source):
+            return False
+
+        # 同一进程内并发请求同一张衍生图时只生成一次
+        future = self._inflight.get(target)
+        if future is None:
+            loop = asyncio.get_running_loop()
+            future = loop.run_in_executor(
+                self._get_executor(), render_webp, source, target, SIZES[match["size"]], self.quality
+            )
+            self._inflight[target] = future
+            future.add_done_callback(lambda _: self._inflight.pop(target, None))
+        try:
+            await asyncio.shield(future)
+        except Exception as e:
+            logger.warning(f"生成衍生图失败: {relative_path}, {e}")
+            return False
+        return True
+
+    def warm(self, file_url: Optional[str]):
+        """上传后在后台预先生成各规格衍生图（不等待结果，首次访问时不必再生成）"""
+        for size in SIZES:
+            derived_url = self.derived_url(file_url, size)
+            if derived_url == file_url:
+                return
+            task = asyncio.ensure_future(self.ensure(derived_url[len(self.url_prefix) + 1:]))
+            self._warming.add(task)
+            task.add_done_callback(self._warming.discard)
+
+
+class DerivedStaticFiles(ImmutableStaticFiles):
+    """衍生图静态文件服务：文件不存在时先生成再返回"""
+
+    def __init__(self, derivatives: ImageDerivatives, **kwargs):
+        super().__init__(**kwargs)
+        self.derivatives = derivatives
+
+    async def get_response(self, path: str, scope):
+        if not os.path.exists(os.path.join(self.derivatives.root, path)):
+            await self.derivatives.ensure(path)
+        return await super().get_response(path, scope)
+
+
+def _create_derivatives() -> ImageDerivatives:
+    from app.config import settings
+
+    return ImageDerivatives(
+        media_store,
+        os.path.join(settings.UPLOAD_DIR, "derived"),
+        quality=settings.IMAGE_DERIVATIVE_QUALITY,
+        workers=settings.IMAGE_DERIVATIVE_WORKERS,
+        enabled=settings.IMAGE_DERIVATIVES_ENABLED,
+    )
+
+
+# 全局衍生图服务
+image_derivatives = _create_derivatives()
@@ -23,6 +23,7 @@ from app.models.llm_schemas import (
     OpinionSummarizationResponse, ProfileSummaryResponse
 )
 from app.configs.prompt_config_manager import prompt_config_manager
+from app.services.chat_context_manager import chat_context_manager
 from app.models.user_card_db import UserCard
 from app.models.user_profile import UserProfile
 
@@ -251,18 +252,29 @@ class LLMService:
             messages=messages,
             max_tokens=1000,
             temperature=0.7,
-            stream=True
+            stream=True,
+            stream_options={"include_usage": True}
         )
         
         # 返回流式响应生成器
         async for chunk in stream:
-            if chunk.choices[0].delta.content is not None:
+            if chunk.choices and chunk.choices[0].delta.content is not None:
                 content = chunk.choices[0].delta.content
                 yield {
                     "type": "text",
                     "content": content,
                     "finished": False
                 }
+            # 最后一个块携带真实的token用量（choices为空）
+            if getattr(chunk, "usage", None):
+                yield {
+                    "type": "usage",
+                    "usage": {
+                        "prompt_tokens": chunk.usage.prompt_tokens,
+                        "completion_tokens": chunk.usage.completion_tokens,
+                        "total_tokens": chunk.usage.total_tokens
+                    }
+                }
         
         # 发送结束标记
         yield {"type": "end"}
@@ -278,7 +290,7 @@ class LLMService:
         # 获取模拟响应内容模板并替换变量
         mock_content_template = mock_stream_config.get('content', 
             "这是来自{provider}的{model_name}模型的模拟流式响应。我会为您提供一些有用的建议和信息。")
-        mock_content = mock_content_template.format(provider=provider.value, model_name=model_name)
+        mock_content = prompt_config_manager.compile(mock_content_template).render(provider=provider.value, model_name=model_name)
         
         # 获取配置参数
         chunk_size = mock_stream_config.get('chunk_size', 3)
@@ -463,21 +475,11 @@ class LLMService:
         existing_profile_str:str = None
     ) -> ProfileSummaryResponse:
         """分析用户资料"""
-        prompt = f"""
-        请分析提供的用户数据，得到用户画像描述（少于 1000 个字），以及用户画像总结文本（字数少于 100 字），并以 JSON 格式输出
-        要求以事实为依据，不凭空臆测，可以进行适当信息压缩。
-        最新提交的用户数据:{profile_data_str}
-
-        以 JSON 输出格式：
-        {{
-            "description": "用户画像描述",
-            "summary": "用户画像总结"
-        }}
-        """
-        if existing_profile_str:
-            prompt += f"""
-                当前的用户画像数据:{existing_profile_str}
-                """
+        prompt = prompt_config_manager.get_task_prompt(
+            "profile_summary",
+            profile_data=profile_data_str,
+            existing_profile_section=f"\n当前的用户画像数据:{existing_profile_str}" if existing_profile_str else ""
+        )
         request = LLMRequest(
             user_id=user_id,
             task_type=LLMTaskType.PROFILE_ANALYSIS,
@@ -676,19 +678,13 @@ class LLMService:
         context = params.get("context", {})
         card_id = params.get("cardId", "")
         card_preferences, card_creator_id = self._get_card_preferences(card_id)
-        preferences_str = json.dumps(card_preferences, ensure_ascii=False) if card_preferences else "{}"
 
-        prompt = f"""
-        基于以下对话历史、上下文和用户卡片偏好设置,生成3个合适的对话建议:
-        
-        用户卡片偏好设置:{preferences_str}
-        
-        对话历史:{json.dumps(conversation_history, ensure_ascii=False)}
-        
-        上下文:{json.dumps(context, ensure_ascii=False)}
-        
-        请根据用户卡片偏好设置,生成3个自然,有趣且符合上下文的对话建议,帮助用户继续对话.
-        """
+        prompt = prompt_config_manager.get_task_prompt(
+            "scene_conversation_suggestions",
+            preferences=card_preferences or {},
+            conversation_history=conversation_history,
+            context=context
+        )
         
         request = LLMRequest(
             user_id=user_id,
@@ -717,19 +713,13 @@ class LLMService:
         context = params.get("context", {})
         card_id = params.get("cardId", "")
         card_preferences, card_creator_id = self._get_card_preferences(card_id)
-        preferences_str = json.dumps(card_preferences, ensure_ascii=False) if card_preferences else "{}"
 
-        prompt = f"""
-        基于以下对话历史、上下文和用户卡片偏好设置,生成3个合适的对话建议:
-        
-        用户卡片偏好设置:{preferences_str}
-        
-        对话历史:{json.dumps(conversation_history, ensure_ascii=False)}
-        
-        上下文:{json.dumps(context, ensure_ascii=False)}
-        
-        请根据用户卡片偏好设置,生成3个自然,有趣且符合上下文的对话建议,帮助用户继续对话.
-        """
+        prompt = prompt_config_manager.get_task_prompt(
+            "scene_conversation_suggestions",
+            preferences=card_preferences or {},
+            conversation_history=conversation_history,
+            context=context
+        )
         
         request = LLMRequest(
             user_id=user_id,
@@ -774,10 +764,8 @@ class LLMService:
         chat_type = context.get("chatType", "general")
         card_id = context.get("cardId", "")
         card_preferences, card_creator_id = self._get_card_preferences(card_id)
-        preferences_str = json.dumps(card_preferences, ensure_ascii=False) if card_preferences else "{}"
 
         conversation_history = context.get("recentMessages", [])
-        conversation_context = json.dumps(conversation_history, ensure_ascii=False)
         
         # 匿名模式使用特殊的人物设定
         if is_anonymous:
@@ -790,19 +778,14 @@ class LLMService:
             system_prompt = system_prompts.get(chat_type, system_prompts['general'])
         
         character_profile = self._get_user_raw_profile(card_creator_id)
-        prompt = f"""
-        {system_prompt}
-        你的人物设定 {character_profile}
-        
-        在场景合适的情况下尝试完成的任务，如果对话场景不合适则忽略任务：{preferences_str}
-        
-        对话历史 {conversation_context}
-        
-        用户消息: {message}
-        
-        请给出自然，与设定相关的回复，不要添加你不确认的信息或者占位符在回复结果中。
-        近期正处于农历春节假期，请在对话时的合适时机，送出新春祝福。
-        """
+        prompt = prompt_config_manager.get_task_prompt(
+            "scene_simple_chat",
+            system_prompt=system_prompt,
+            character_profile=character_profile,
+            preferences=card_preferences or {},
+            conversation_history=conversation_history,
+            message=message
+        )
         request = LLMRequest(
             user_id=user_id,
             task_type=LLMTaskType.QUESTION_ANSWERING,
@@ -849,22 +832,16 @@ class LLMService:
             # 尝试从上下文中获取历史记录
             conversation_history = context.get("conversationHistory", [])
         
-        conversation_context = json.dumps(conversation_history, ensure_ascii=False)
-        
         # 匿名模式使用特殊的人物设定
         character_profile = params.get("character_profile", "")
         
-        prompt = f"""        
-        你的人物设定：{character_profile}
-
-        {system_prompt}
-
-        对话历史:{conversation_context}
-        
-        用户消息:{message}
-        
-        请结合人物设定，给出自然，像人类一样的拥有情感随机性的回复.
-        """
+        prompt = prompt_config_manager.get_task_prompt(
+            "scene_simple_chat_stream",
+            system_prompt=system_prompt,
+            character_profile=json.dumps(character_profile, ensure_ascii=False) if isinstance(character_profile, dict) else character_profile,
+            conversation_history=conversation_history,
+            message=message
+        )
         request = LLMRequest(
             user_id=user_id,
             task_type=LLMTaskType.QUESTION_ANSWERING,
@@ -888,20 +865,12 @@ class LLMService:
         conversation_history = params.get("conversation_history", [])
         topic_context = params.get("topic_context", {})
         
-        conversation_context = json.dumps(conversation_history, ensure_ascii=False)
-        topic_context_str = json.dumps(topic_context, ensure_ascii=False)
-        
-        prompt = f"""
-        你是一个话题讨论专家.请基于以下信息参与话题讨论:
-        
-        对话历史:{conversation_context}
-        
-        用户消息:{message}
-        
-        话题上下文:{topic_context_str}
-        
-        请给出有深度,有趣且能促进话题讨论继续的回复，字数限定在 200 字以内.
-        """
+        prompt = prompt_config_manager.get_task_prompt(
+            "scene_topic_discussion_stream",
+            topic_context=topic_context,
+            conversation_history=conversation_history,
+            message=message
+        )
         
         request = LLMRequest(
             user_id=user_id,
@@ -926,20 +895,12 @@ class LLMService:
         conversation_history = params.get("conversation_history", [])
         topic_context = params.get("topic_context", {})
         
-        conversation_context = json.dumps(conversation_history, ensure_ascii=False)
-        topic_context_str = json.dumps(topic_context, ensure_ascii=False)
-        
-        prompt = f"""
-        你是一个话题讨论专家.请基于以下信息参与话题讨论:
-        
-        对话历史:{conversation_context}
-        
-        用户消息:{message}
-        
-        话题上下文:{topic_context_str}
-        
-        请给出有深度,有趣且能促进话题讨论继续的回复.
-        """
+        prompt = prompt_config_manager.get_task_prompt(
+            "scene_topic_discussion",
+            topic_context=topic_context,
+            conversation_history=conversation_history,
+            message=message
+        )
         
         request = LLMRequest(
             user_id=user_id,
@@ -985,20 +946,12 @@ class LLMService:
         conversation_history = params.get("conversation_history", [])
         sports_context = params.get("sports_context", {})
         
-        conversation_context = json.dumps(conversation_history, ensure_ascii=False)
-        sports_context_str = json.dumps(sports_context, ensure_ascii=False)
-        
-        prompt = f"""
-        你是一个体育话题专家.请基于以下信息参与体育相关讨论:
-        
-        对话历史:{conversation_context}
-        
-        用户消息:{message}
-        
-        体育上下文:{sports_context_str}
-        
-        请给出专业,有趣且能促进体育话题讨论继续的回复.
-        """
+        prompt = prompt_config_manager.get_task_prompt(
+            "scene_sports_chat",
+            sports_context=sports_context,
+            conversation_history=conversation_history,
+            message=message
+        )
         
         request = LLMRequest(
             user_id=user_id,
@@ -1022,17 +975,11 @@ class LLMService:
         discussion_content = params.get("discussion_content", "")
         participants = params.get("participants", [])
         
-        participants_str = json.dumps(participants, ensure_ascii=False)
-        
-        prompt = f"""
-        你是一个观点总结专家.请基于以下讨论内容生成观点总结:
-        
-        讨论内容:{discussion_content}
-        
-        参与者:{participants_str}
-        
-        请提取关键观点,生成简洁准确的总结,帮助用户快速了解讨论的核心内容.
-        """
+        prompt = prompt_config_manager.get_task_prompt(
+            "scene_opinion_summary",
+            participants=participants,
+            discussion_content=discussion_content
+        )
         
         request = LLMRequest(
             user_id=user_id,
@@ -1095,17 +1042,20 @@ class LLMService:
         maxSuggestions: int,
         preferences: str,
         bio: str,
-        trigger_and_output: Dict[str, Any]
+        trigger_and_output: Dict[str, Any],
+        history_summary: str = ""
     ) -> str:
         """获取特定角色类型的提示词模板"""
-        # 基础信息
-        base_info_parts = [
-            f"聊天ID: {chatId}",
-            f"用户性格特点: {json.dumps(userPersonality, ensure_ascii=False)}",
-            f"聊天记录: {json.dumps(chatHistory, ensure_ascii=False)}",
-            f"建议类型: {suggestionType}"
-        ]
-        base_info = "\n".join(base_info_parts)
+        # 基础信息（编译模板渲染，稳定部分在前）
+        base_info = prompt_config_manager.get_task_prompt(
+            "conversation_base_info",
+            suggestion_type=suggestionType,
+            user_personality=userPersonality,
+            chat_id=chatId,
+            history_summary_line=f"早期聊天摘要: {history_summary}\n" if history_summary else "",
+            chat_history=chatHistory
+        )
+        trigger_and_output_str = json.dumps(trigger_and_output, ensure_ascii=False)
         
         # 根据角色类型选择不同的提示词模板
         if role_type == "trade_landlord":
@@ -1117,7 +1067,7 @@ class LLMService:
                 max_suggestions=maxSuggestions,
                 preferences=preferences if preferences else "",
                 bio=bio,
-                trigger_and_output=json.dumps(trigger_and_output, ensure_ascii=False)
+                trigger_and_output=trigger_and_output_str
             )
         else:
             # 使用通用场景提示词
@@ -1128,7 +1078,7 @@ class LLMService:
                 max_suggestions=maxSuggestions,
                 preferences=preferences if preferences else "",
                 bio=bio,
-                trigger_and_output=json.dumps(trigger_and_output, ensure_ascii=False)
+                trigger_and_output=trigger_and_output_str
             )
     
     async def generate_conversation_suggestion(
@@ -1143,9 +1093,11 @@ class LLMService:
         model_name: str = settings.LLM_MODEL
     ) -> ConversationSuggestionResponse:
         """生成对话建议"""
-        # 从上下文中提取用户性格和聊天记录
+        # 从上下文中提取用户性格和聊天记录；聊天记录按token预算裁剪，早期对话折叠为摘要
         userPersonality = context.get("userPersonality", {})
-        chatHistory = context.get("chatHistory", [])
+        history_window = chat_context_manager.build_window(
+            chatId, context.get("chatHistory", []), db=self.db, user_id=user_id
+        )
         
         # 获取卡片主人信息
         card_owner_preferences = ""
@@ -1176,12 +1128,13 @@ class LLMService:
             "normal",
             chatId,
             userPersonality,
-            chatHistory,
+            history_window.recent_turns,
             suggestionType,
             maxSuggestions,
             card_owner_preferences,
             card_bio,
-            cart_trigger_and_output
+            cart_trigger_and_output,
+            history_window.summary
         )
         
         # 创建请求对象
@@ -1248,9 +1201,11 @@ class LLMService:
         model_name: str = settings.LLM_MODEL
     ):
         """生成流式对话建议 - 真正的流式处理"""
-        # 从上下文中提取用户性格和聊天记录
+        # 从上下文中提取用户性格和聊天记录；聊天记录按token预算裁剪，早期对话折叠为摘要
         userPersonality = context.get("userPersonality", {})
-        chatHistory = context.get("chatHistory", [])
+        history_window = chat_context_manager.build_window(
+            chatId, context.get("chatHistory", []), db=self.db, user_id=user_id
+        )
         
         # 获取卡片主人信息
         card_owner_preferences = ""
@@ -1281,12 +1236,13 @@ class LLMService:
             "stream",
             chatId,
             userPersonality,
-            chatHistory,
+            history_window.recent_turns,
             suggestionType,
             maxSuggestions,
             card_owner_preferences,
             card_bio,
-            cart_trigger_and_output
+            cart_trigger_and_output,
+            history_window.summary
         )
         
         # 创建LLM请求
@@ -1312,8 +1268,11 @@ class LLMService:
     ):
         """生成简单聊天流式回复 - 仅返回纯文本"""
         
-        # 获取聊天记录和上下文
-        chat_history = context.get("chatHistory", [])
+        # 获取聊天记录和上下文：按token预算裁剪，早期对话折叠为摘要
+        history_window = chat_context_manager.build_window(
+            chat_id, context.get("chatHistory", []), db=self.db, user_id=user_id, max_recent_turns=5
+        )
+        chat_history = history_window.recent_turns
         
         # 获取卡片信息
         card_bio = ""
@@ -1333,24 +1292,16 @@ class LLMService:
             logger.warning(f"获取卡片信息失败: {str(e)}")
         
         # 构建简洁的提示词 - 专注于生成自然流畅的回复
-        prompt = f"""
-        请根据以下信息回复用户的消息:
-        聊天ID: {chat_id}
-        用户消息: {message}
-        你的身份简介: {card_bio}
-        你的偏好: {card_preferences}
-        你们的聊天历史: {json.dumps(chat_history[-5:], ensure_ascii=False) if chat_history else '无历史记录'}
-        {f'卡片主人性格: {personality}' if personality else ''}
-        
-        要求:
-        1. 回复要自然流畅, 像真人对话
-        2. 内容要积极友好
-        3. 根据卡片主人的性格和偏好来回复
-        4. 直接给出回复内容, 不要包含其他解释
-        5. 回复长度适中, 像日常聊天一样
-        
-        请直接给出回复内容:
-        """
+        prompt = prompt_config_manager.get_task_prompt(
+            "simple_chat_reply",
+            card_bio=card_bio,
+            card_preferences=card_preferences,
+            personality_line=f"卡片主人性格: {personality}\n" if personality else "",
+            chat_id=chat_id,
+            history_summary_line=history_window.summary_line,
+            chat_history=json.dumps(chat_history, ensure_ascii=False) if chat_history else '无历史记录',
+            message=message
+        )
         # 创建LLM请求
         llm_request = LLMRequest(
             user_id=user_id,
@@ -1387,27 +1338,12 @@ class LLMService:
             观点总结响应对象
         """
         # 构建用户提示词
-        user_prompt = """
-        请分析以下话题讨论中的用户观点:
-        
-        话题标题: {}
-        话题描述: {}
-        讨论内容: {}
-        
-        请提取并总结用户的观点, 包括:
-        1. 观点总结: 用简洁的语言概括用户表达的主要观点
-        2. 关键点: 列出核心要点
-        3. 情感分析: 分析用户的情感倾向(积极/中性/消极)
-        4. confidence: provide your confidence in the analysis result (0-1)
-        
-        请严格按照以下JSON格式回复:
-        {{
-            "summary": "用户的观点总结",
-            "key_points": ["要点1", "要点2", "要点3"],
-            "sentiment": "positive/neutral/negative",
-            "confidence_score": 0.85
-        }}
-        """.format(topic_title, topic_description, json.dumps(conversation_history, ensure_ascii=False))
+        user_prompt = prompt_config_manager.get_task_prompt(
+            "user_opinion_summary",
+            topic_title=topic_title,
+            topic_description=topic_description,
+            conversation_history=conversation_history
+        )
 
         # 创建LLM请求
         llm_request = LLMRequest(
@@ -1487,7 +1423,7 @@ class LLMService:
             ])
             
             # 构建总结提示词
-            prompt = f"""总结用户想要做什么，以及聊了什么，忽略 AI 的回复内容，不超过200字。用户和 AI 的聊天记录：{chat_context}"""            
+            prompt = prompt_config_manager.get_task_prompt("chat_summary", chat_context=chat_context)
             llm_request = LLMRequest(
                 user_id=user_id,
                 task_type=LLMTaskType.CHAT_SUMMARIZATION,
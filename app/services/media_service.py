@@ -3,18 +3,31 @@
 负责处理用户的多媒体数据，包括头像、图片、视频等
 """
 
-from typing import Dict, List, Any, Optional
+from typing import BinaryIO, Dict, List, Any, Optional, Union
+import hashlib
+import io
+import mimetypes
 import os
 import random
+from app.config import settings
+from app.models.media_file import MediaFile
+from app.services.media_store import media_store
 from app.utils.db_config import get_db
+from sqlalchemy import delete, select
 from sqlalchemy.orm import Session
 
+IMAGE_EXTS = ('.jpg', '.jpeg', '.png', '.webp')
+VIDEO_EXTS = ('.mp4', '.avi', '.mov')
+
+# 上传目录下不属于单个用户的子目录
+RESERVED_UPLOAD_DIRS = {"blobs", "derived", "wxacode"}
+
 class MediaService:
     """媒体服务类"""
     
     def __init__(self, db: Session = None):
         self.db = db or next(get_db())
-        self.upload_base_path = "uploads"
+        self.upload_base_path = settings.UPLOAD_DIR
     
     def get_user_media(self, user_id: str) -> Dict[str, Any]:
         """
@@ -27,35 +40,26 @@ class MediaService:
             包含用户多媒体数据的字典
         """
         try:
-            # 实际实现中应该从数据库查询用户的媒体文件
-            # 这里提供示例实现
-            
-            # 检查用户上传目录
-            user_upload_path = os.path.join(self.upload_base_path, user_id)
+            # 从媒体目录按用户索引查询，不扫描上传目录
+            records = self.db.execute(
+                select(MediaFile.file_url, MediaFile.file_type, MediaFile.media_kind)
+                .where(MediaFile.user_id == str(user_id))
+                .order_by(MediaFile.created_at)
+            ).all()
             
-            media_data = {
-                "avatar_url": "",
-                "video_url": "",
-                "images": [],
-                "house_images": [],
-                "house_video_url": ""
-            }
-            
-            if os.path.exists(user_upload_path):
-                # 扫描用户上传的文件
-                media_data = self._scan_user_media_files(user_upload_path, user_id)
-            else:
+            if not records:
                 # 如果没有上传文件，生成示例数据
-                media_data = self._generate_default_media_data(user_id)
+                return self._generate_default_media_data(user_id)
             
-            return media_data
+            return self._group_media_records(records)
             
         except Exception as e:
             print(f"获取用户媒体数据失败: {str(e)}")
             return self._generate_default_media_data(user_id)
     
-    def _scan_user_media_files(self, user_path: str, user_id: str) -> Dict[str, Any]:
-        """扫描用户上传的媒体文件"""
+    @staticmethod
+    def _group_media_records(records) -> Dict[str, Any]:
+        """按媒体用途分组（记录按上传时间升序，同一用途的单个URL取最新的）"""
         media_data = {
             "avatar_url": "",
             "video_url": "",
@@ -64,34 +68,41 @@ class MediaService:
             "house_video_url": ""
         }
         
-        try:
-            for root, dirs, files in os.walk(user_path):
-                for file in files:
-                    file_path = os.path.join(root, file)
-                    relative_path = os.path.relpath(file_path, self.upload_base_path)
-                    file_url = f"/uploads/{relative_path.replace(os.sep, '/')}"
-                    
-                    # 根据文件名和路径分类
-                    if "avatar" in file.lower():
-                        media_data["avatar_url"] = file_url
-                    elif "house" in file.lower() and file.lower().endswith(('.mp4', '.avi', '.mov')):
-                        media_data["house_video_url"] = file_url
-                    elif "house" in file.lower() and file.lower().endswith(('.jpg', '.jpeg', '.png', '.webp')):
-                        media_data["house_images"].append(file_url)
-                    elif file.lower().endswith(('.mp4', '.avi', '.mov')):
-                        media_data["video_url"] = file_url
-                    elif file.lower().endswith(('.jpg', '.jpeg', '.png', '.webp')):
-                        media_data["images"].append(file_url)
-            
-            # 如果没有头像，使用第一张图片作为头像
-            if not media_data["avatar_url"] and media_data["images"]:
-                media_data["avatar_url"] = media_data["images"][0]
-                
-        except Exception as e:
-            print(f"扫描用户媒体文件失败: {str(e)}")
+        for file_url, file_type, media_kind in records:
+            kind = media_kind or file_type
+            if kind == "avatar":
+                media_data["avatar_url"] = file_url
+            elif kind == "house_video":
+                media_data["house_video_url"] = file_url
+            elif kind == "house_image":
+                media_data["house_images"].append(file_url)
+            elif kind == "video":
+                media_data["video_url"] = file_url
+            elif kind == "image":
+                media_data["images"].append(file_url)
+        
+        # 如果没有头像，使用第一张图片作为头像
+        if not media_data["avatar_url"] and media_data["images"]:
+            media_data["avatar_url"] = media_data["images"][0]
         
         return media_data
     
+    @staticmethod
+    def classify_legacy_file(filename: str) -> Optional[str]:
+        """按文件名判断旧上传文件的媒体用途（用于回填媒体目录）"""
+        name = filename.lower()
+        if "avatar" in name:
+            return "avatar"
+        if "house" in name and name.endswith(VIDEO_EXTS):
+            return "house_video"
+        if "house" in name and name.endswith(IMAGE_EXTS):
+            return "house_image"
+        if name.endswith(VIDEO_EXTS):
+            return "video"
+        if name.endswith(IMAGE_EXTS):
+            return "image"
+        return None
+    
     def _generate_default_media_data(self, user_id: str) -> Dict[str, Any]:
         """生成默认的媒体数据"""
         return {
@@ -109,41 +120,31 @@ class MediaService:
             "house_video_url": ""
         }
     
-    def upload_media_file(self, user_id: str, file_data: bytes, filename: str, media_type: str = "image") -> str:
+    def upload_media_file(self, user_id: str, file_data: Union[bytes, BinaryIO], filename: str, media_type: str = "image",
+                          max_size: Optional[int] = None) -> str:
         """
         上传媒体文件
         
         Args:
             user_id: 用户ID
-            file_data: 文件数据
+            file_data: 文件数据，或可读的文件对象（如 UploadFile.file，按分块写入，不整体读入内存）
             filename: 文件名
             media_type: 媒体类型 (image, video, avatar, house_image, house_video)
+            max_size: 大小限制（字节），超出时抛出 UploadTooLargeError
             
         Returns:
             上传后的文件URL
         """
         try:
-            # 创建用户上传目录
-            user_upload_path = os.path.join(self.upload_base_path, user_id)
-            os.makedirs(user_upload_path, exist_ok=True)
-            
-            # 根据媒体类型确定文件路径
-            if media_type == "avatar":
-                file_path = os.path.join(user_upload_path, f"avatar_{filename}")
-            elif media_type == "house_image":
-                file_path = os.path.join(user_upload_path, f"house_{filename}")
-            elif media_type == "house_video":
-                file_path = os.path.join(user_upload_path, f"house_video_{filename}")
-            else:
-                file_path = os.path.join(user_upload_path, filename)
-            
-            # 保存文件
-            with open(file_path, 'wb') as f:
-                f.write(file_data)
-            
-            # 返回文件URL
-            relative_path = os.path.relpath(file_path, self.upload_base_path)
-            return f"/uploads/{relative_path.replace(os.sep, '/')}"
+            # 按内容存储（相同内容只存一份），并写入媒体目录
+            source = io.BytesIO(file_data) if isinstance(file_data, (bytes, bytearray)) else file_data
+            stored = media_store.store_file_object(source, filename, max_size, settings.UPLOAD_CHUNK_SIZE)
+            file_type = "video" if media_type in ("video", "house_video") else "image"
+            media_store.add_reference(
+                self.db, user_id, stored, file_type,
+                mimetypes.guess_type(filename)[0], filename, media_kind=media_type
+            )
+            return stored["file_url"]
             
         except Exception as e:
             print(f"上传媒体文件失败: {str(e)}")
@@ -161,6 +162,10 @@ class MediaService:
             是否删除成功
         """
         try:
+            # 按内容存储的文件：删除上传记录，没有其他引用时回收文件
+            if media_store.is_blob_url(file_url):
+                return media_store.release(self.db, user_id, file_url) is not None
+            
             # 从URL提取文件路径
             if file_url.startswith("/uploads/"):
                 file_path = os.path.join(self.upload_base_path, file_url[9:])
@@ -168,11 +173,16 @@ class MediaService:
                 # 验证文件属于该用户
                 if user_id in file_path and os.path.exists(file_path):
                     os.remove(file_path)
+                    self.db.execute(
+                        delete(MediaFile).where(MediaFile.user_id == str(user_id), MediaFile.file_url == file_url)
+                    )
+                    self.db.commit()
                     return True
             
             return False
             
         except Exception as e:
+            self.db.rollback()
             print(f"删除媒体文件失败: {str(e)}")
             return False
     
@@ -187,24 +197,75 @@ class MediaService:
             文件信息字典
         """
         try:
-            if file_url.startswith("/uploads/"):
-                file_path = os.path.join(self.upload_base_path, file_url[9:])
-                
-                if os.path.exists(file_path):
-                    stat = os.stat(file_path)
-                    return {
-                        "url": file_url,
-                        "size": stat.st_size,
-                        "created_time": stat.st_ctime,
-                        "modified_time": stat.st_mtime,
-                        "exists": True
-                    }
-            
+            record = self.db.execute(
+                select(MediaFile).where(MediaFile.file_url == file_url).order_by(MediaFile.created_at).limit(1)
+            ).scalar_one_or_none()
+            if record is not None:
+                created_time = record.created_at.timestamp() if record.created_at else None
+                return {
+                    "url": file_url,
+                    "size": record.file_size,
+                    "content_type": record.content_type,
+                    "media_kind": record.media_kind,
+                    "width": record.width,
+                    "height": record.height,
+                    "sha256": record.sha256,
+                    "created_time": created_time,
+                    "modified_time": created_time,
+                    "exists": True
+                }
             return {"url": file_url, "exists": False}
             
         except Exception as e:
             print(f"获取媒体文件信息失败: {str(e)}")
             return {"url": file_url, "exists": False, "error": str(e)}
+    
+    def backfill_catalog(self) -> Dict[str, int]:
+        """
+        把媒体目录上线前上传的文件（uploads/<user_id>/ 下）登记到媒体目录，已登记的跳过
+        
+        Returns:
+            {"scanned": 扫描的文件数, "added": 新登记的文件数}
+        """
+        stats = {"scanned": 0, "added": 0}
+        if not os.path.isdir(self.upload_base_path):
+            return stats
+        
+        existing = set(self.db.execute(select(MediaFile.file_url)).scalars())
+        for user_id in os.listdir(self.upload_base_path):
+            user_path = os.path.join(self.upload_base_path, user_id)
+            if not os.path.isdir(user_path) or user_id in RESERVED_UPLOAD_DIRS:
+                continue
+            for root, dirs, files in os.walk(user_path):
+                for file in files:
+                    media_kind = self.classify_legacy_file(file)
+                    if media_kind is None:
+                        continue
+                    stats["scanned"] += 1
+                    file_path = os.path.join(root, file)
+                    relative_path = os.path.relpath(file_path, self.upload_base_path)
+                    file_url = f"/uploads/{relative_path.replace(os.sep, '/')}"
+                    if file_url in existing:
+                        continue
+                    
+                    digest = hashlib.sha256()
+                    with open(file_path, "rb") as f:
+                        for chunk in iter(lambda: f.read(settings.UPLOAD_CHUNK_SIZE), b""):
+                            digest.update(chunk)
+                    sha256 = digest.hexdigest()
+                    stored = {
+                        "file_path": file_path,
+                        "file_url": file_url,
+                        "file_size": os.path.getsize(file_path),
+                        "sha256": sha256
+                    }
+                    file_type = "video" if media_kind in ("video", "house_video") else "image"
+                    media_store.add_reference(
+                        self.db, user_id, stored, file_type, mimetypes.guess_type(file)[0], file, media_kind=media_kind
+                    )
+                    existing.add(file_url)
+                    stats["added"] += 1
+        return stats
 
 # 创建全局媒体服务实例
 media_service = MediaService()
\ No newline at end of file
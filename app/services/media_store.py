@@ -0,0 +1,247 @@
+"""
+按内容寻址的媒体文件存储
+上传的文件按 SHA-256 命名，存放在 UPLOAD_DIR/blobs/ab/cd/<sha256><ext>，相同内容只存一份；
+每次上传在 media_files 表中记录一条引用，删除时移除引用，没有引用后回收文件。
+文件内容不会变化，访问时返回 immutable 缓存头，客户端和 nginx 可以长期缓存
+"""
+
+import asyncio
+import logging
+import os
+import re
+import uuid
+from typing import Any, AsyncIterator, BinaryIO, Callable, Dict, List, Optional, Tuple
+
+from fastapi.staticfiles import StaticFiles
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+
+from app.models.media_file import MediaFile
+from app.utils.upload_stream import DEFAULT_CHUNK_SIZE, ChunkedFileWriter, write_file_object, write_stream
+
+try:
+    from PIL import Image
+except ImportError:
+    Image = None
+
+logger = logging.getLogger(__name__)
+
+_EXT_PATTERN = re.compile(r"^\.[a-z0-9]{1,10}$")
+
+# 按内容命名的文件永不变化，可以缓存一年
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+
+
+def probe_image_size(path: str) -> Tuple[Optional[int], Optional[int]]:
+    """读取图片尺寸（只解析文件头）；未安装 Pillow 或无法识别时返回 (None, None)"""
+    if Image is None:
+        return None, None
+    try:
+        with Image.open(path) as img:
+            return img.size
+    except Exception:
+        return None, None
+
+
+class MediaStore:
+    """按内容寻址的媒体文件存储"""
+
+    def __init__(self, root: str, url_prefix: str = "/uploads/blobs"):
+        """
+        Args:
+            root: 存储根目录
+            url_prefix: 文件访问URL前缀（对应静态文件挂载路径）
+        """
+        self.root = root
+        self.url_prefix = url_prefix.rstrip("/")
+        self.incoming_dir = os.path.join(root, ".incoming")
+        self._collect_hooks: List[Callable[[str], None]] = []
+
+    def add_collect_hook(self, hook: Callable[[str], None]):
+        """注册文件回收后的回调（参数为文件URL），用于清理由原图派生的文件"""
+        self._collect_hooks.append(hook)
+
+    @staticmethod
+    def normalize_ext(filename: Optional[str]) -> str:
+        """取文件扩展名，不合法的扩展名丢弃"""
+        ext = os.path.splitext(filename or "")[1].lower()
+        return ext if _EXT_PATTERN.match(ext) else ""
+
+    def blob_path(self, sha256: str, ext: str = "") -> str:
+        return os.path.join(self.root, sha256[:2], sha256[2:4], f"{sha256}{ext}")
+
+    def blob_url(self, sha256: str, ext: str = "") -> str:
+        return f"{self.url_prefix}/{sha256[:2]}/{sha256[2:4]}/{sha256}{ext}"
+
+    def is_blob_url(self, file_url: str) -> bool:
+        return file_url.startswith(f"{self.url_prefix}/")
+
+    def path_for_url(self, file_url: str) -> Optional[str]:
+        """文件URL对应的本地路径，不是本存储的URL时返回 None"""
+        if not self.is_blob_url(file_url):
+            return None
+        name = os.path.basename(file_url)
+        sha256, ext = os.path.splitext(name)
+        if len(sha256) != 64:
+            return None
+        return self.blob_path(sha256, ext)
+
+    # ---------------------------------------------------------------
+    # 写入
+    # ---------------------------------------------------------------
+
+    def _publish(self, writer: ChunkedFileWriter, filename: Optional[str]) -> Dict[str, Any]:
+        """把写好的临时文件放到内容地址上；相同内容已存在时丢弃临时文件"""
+        ext = self.normalize_ext(filename)
+        path = self.blob_path(writer.sha256, ext)
+        deduplicated = os.path.exists(path)
+        if deduplicated:
+            writer.abort()
+        else:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            writer.commit(path)
+        return {
+            "filename": os.path.basename(path),
+            "file_path": path,
+            "file_url": self.blob_url(writer.sha256, ext),
+            "file_size": writer.size,
+            "sha256": writer.sha256,
+            "deduplicated": deduplicated,
+        }
+
+    async def store_stream(
+        self,
+        chunks: AsyncIterator[bytes],
+        filename: Optional[str],
+        max_size: Optional[int] = None
+    ) -> Dict[str, Any]:
+        """
+        流式保存文件
+
+        Returns:
+            {"filename", "file_path", "file_url", "file_size", "sha256", "deduplicated"}
+
+        Raises:
+            UploadTooLargeError: 超过大小上限
+        """
+        writer = await write_stream(chunks, self.incoming_dir, max_size)
+        try:
+            return await asyncio.to_thread(self._publish, writer, filename)
+        except BaseException:
+            await asyncio.to_thread(writer.abort)
+            raise
+
+    def store_file_object(
+        self,
+        source: BinaryIO,
+        filename: Optional[str],
+        max_size: Optional[int] = None,
+        chunk_size: int = DEFAULT_CHUNK_SIZE
+    ) -> Dict[str, Any]:
+        """同步版本的 store_stream"""
+        writer = write_file_object(source, self.incoming_dir, max_size, chunk_size)
+        try:
+            return self._publish(writer, filename)
+        except BaseException:
+            writer.abort()
+            raise
+
+    # ---------------------------------------------------------------
+    # 引用
+    # ---------------------------------------------------------------
+
+    def add_reference(
+        self,
+        db: Session,
+        user_id: str,
+        stored: Dict[str, Any],
+        file_type: Optional[str] = None,
+        content_type: Optional[str] = None,
+        original_filename: Optional[str] = None,
+        media_kind: Optional[str] = None
+    ) -> MediaFile:
+        """记录一次上传（文件引用计数加一），图片同时记录尺寸"""
+        width, height = None, None
+        if file_type == "image" or (content_type or "").startswith("image/"):
+            width, height = probe_image_size(stored["file_path"])
+        record = MediaFile(
+            id=str(uuid.uuid4()),
+            user_id=str(user_id),
+            file_url=stored["file_url"],
+            sha256=stored["sha256"],
+            file_size=stored["file_size"],
+            file_type=file_type,
+            media_kind=media_kind or file_type,
+            content_type=content_type,
+            original_filename=original_filename,
+            width=width,
+            height=height,
+        )
+        db.add(record)
+        try:
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+        return record
+
+    def reference_count(self, db: Session, file_url: str) -> int:
+        return db.execute(
+            select(func.count()).select_from(MediaFile).where(MediaFile.file_url == file_url)
+        ).scalar_one()
+
+    def release(self, db: Session, user_id: str, file_url: str) -> Optional[bool]:
+        """
+        删除用户的一条上传记录，文件没有其他引用时回收
+
+        Returns:
+            用户没有这个文件时返回 None；否则返回文件是否被回收
+        """
+        record = db.execute(
+            select(MediaFile)
+            .where(MediaFile.user_id == str(user_id), MediaFile.file_url == file_url)
+            .order_by(MediaFile.created_at.desc())
+            .limit(1)
+        ).scalar_one_or_none()
+        if record is None:
+            return None
+        db.delete(record)
+        db.commit()
+
+        if self.reference_count(db, file_url) > 0:
+            return False
+        path = self.path_for_url(file_url)
+        if path is None:
+            return False
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            logger.warning(f"回收媒体文件失败: {path}, {e}")
+            return False
+        for hook in self._collect_hooks:
+            try:
+                hook(file_url)
+            except Exception as e:
+                logger.warning(f"清理媒体派生文件失败: {file_url}, {e}")
+        return True
+
+
+class ImmutableStaticFiles(StaticFiles):
+    """返回 immutable 缓存头的静态文件服务（用于按内容命名的文件）"""
+
+    def file_response(self, *args, **kwargs):
+        response = super().file_response(*args, **kwargs)
+        response.headers["Cache-Control"] = IMMUTABLE_CACHE_CONTROL
+        return response
+
+
+def _create_store() -> MediaStore:
+    from app.config import settings
+
+    return MediaStore(os.path.join(settings.UPLOAD_DIR, "blobs"))
+
+
+# 全局媒体文件存储
+media_store = _create_store()
@@ -0,0 +1,120 @@
+"""
+登录用户缓存
+以 token 哈希为键缓存 token 解析出的用户信息，避免每个认证请求都打开会话查询 users 表；
+短 TTL + LRU 容量上限，用户资料变更、注销、退出登录时主动失效
+"""
+
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Set, Tuple
+
+# 缓存条目：(过期时间, 用户ID, 用户信息)
+_Entry = Tuple[float, str, Dict[str, Any]]
+
+
+def token_hash(token: str) -> str:
+    """token 的哈希（缓存中不保存原始 token）"""
+    return hashlib.sha256(token.encode("utf-8")).hexdigest()
+
+
+class PrincipalCache:
+    """登录用户缓存（进程内，TTL + LRU）"""
+
+    def __init__(self, ttl: float = 30.0, max_items: int = 10000):
+        """
+        Args:
+            ttl: 缓存有效期（秒），也是其他 worker 修改用户后本进程可能读到旧数据的最长时间；为0时不缓存
+            max_items: 最多缓存的 token 数
+        """
+        self.ttl = ttl
+        self.max_items = max_items
+        self._entries: "OrderedDict[str, _Entry]" = OrderedDict()
+        self._by_user: Dict[str, Set[str]] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, token: str) -> Optional[Dict[str, Any]]:
+        """读取缓存的用户信息，返回副本以免调用方修改缓存内容"""
+        if self.ttl <= 0:
+            return None
+        key = token_hash(token)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] <= time.monotonic():
+                if entry is not None:
+                    self._discard(key)
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return dict(entry[2])
+
+    def set(self, token: str, principal: Dict[str, Any]):
+        """缓存 token 对应的用户信息"""
+        if self.ttl <= 0 or not principal or principal.get("id") is None:
+            return
+        key = token_hash(token)
+        user_id = str(principal["id"])
+        with self._lock:
+            self._discard(key)
+            self._entries[key] = (time.monotonic() + self.ttl, user_id, dict(principal))
+            self._by_user.setdefault(user_id, set()).add(key)
+            while len(self._entries) > self.max_items:
+                self._discard(next(iter(self._entries)))
+
+    def invalidate_token(self, token: str):
+        """使单个 token 的缓存失效"""
+        with self._lock:
+            self._discard(token_hash(token))
+
+    def invalidate_user(self, user_id: Any):
+        """使某个用户所有 token 的缓存失效（用户资料变更、注销、退出登录）"""
+        if user_id is None:
+            return
+        with self._lock:
+            for key in self._by_user.pop(str(user_id), set()):
+                self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._by_user.clear()
+
+    def _discard(self, key: str):
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        keys = self._by_user.get(entry[1])
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self._by_user[entry[1]]
+
+    def stats(self) -> Dict[str, Any]:
+        """缓存统计信息"""
+        return {
+            "items": len(self._entries),
+            "max_items": self.max_items,
+            "ttl": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+        }
+
+
+def _create_cache() -> PrincipalCache:
+    from app.config import settings
+
+    return PrincipalCache(
+        ttl=settings.AUTH_PRINCIPAL_CACHE_TTL,
+        max_items=settings.AUTH_PRINCIPAL_CACHE_MAX_ITEMS,
+    )
+
+
+# 全局登录用户缓存实例
+principal_cache = _create_cache()
@@ -13,6 +13,8 @@ from app.models.tag import Tag, UserTagRel, TagType, TagStatus, UserTagRelStatus
 from app.models.schemas import BaseResponse
 from app.models.tag_content import TagContent, ContentType, ContentStatus, ContentTagInteraction
 from app.models.user_profile import UserProfile
+from app.services.counter_service import counter_service
+from app.services.view_dedup import view_deduplicator
 import math
 
 
@@ -640,6 +642,7 @@ class TagService:
         )
         
         if keyword:
+            # 只在该标签的成员中按昵称/简介做子串匹配：查询从 tag_id 出发关联用户，扫描范围限于标签成员
             query = query.join(User, UserTagRel.user_id == User.id).filter(
                 and_(
                     User.is_active == True,
@@ -961,6 +964,14 @@ class TagService:
                     "data": None
                 }
             
+            # 窗口内的重复浏览直接返回，不再查询交互记录
+            if interaction_type == "view" and not view_deduplicator.should_count("tag_content", content_id, user_id):
+                return {
+                    "code": 400,
+                    "message": "已浏览过该内容",
+                    "data": None
+                }
+            
             existing = self.db.query(ContentTagInteraction).filter(
                 and_(
                     ContentTagInteraction.content_id == content_id,
@@ -984,16 +995,13 @@ class TagService:
                 interaction_type=interaction_type
             )
             self.db.add(interaction)
-            
-            if interaction_type == "view":
-                tag_content.view_count += 1
-            elif interaction_type == "like":
-                tag_content.like_count += 1
-            elif interaction_type == "share":
-                tag_content.share_count += 1
-            
             self.db.commit()
             
+            # 计数由计数器服务批量写回，避免热点内容的行锁竞争
+            if interaction_type in ("view", "like", "share"):
+                counter_service.incr("tag_contents", content_id, f"{interaction_type}_count")
+            counter_service.apply(tag_content, "tag_contents", ("view_count", "like_count", "share_count"))
+            
             return {
                 "code": 0,
                 "message": "操作成功",
@@ -0,0 +1,239 @@
+"""
+本地倒排索引
+中文按单字+相邻二元组(bigram)切分，英文/数字按单词切分，
+使用 BM25 打分，支持按文档增量更新与删除，替代 LIKE '%关键词%' 全表扫描
+"""
+
+import heapq
+import math
+import re
+import threading
+import unicodedata
+from collections import Counter
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+_CJK_RANGES = "\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff"
+_TOKEN_PATTERN = re.compile(f"[{_CJK_RANGES}]+|[a-z0-9]+")
+_CJK_PATTERN = re.compile(f"[{_CJK_RANGES}]")
+
+
+def tokenize(text: Optional[str]) -> List[str]:
+    """
+    切分文本为索引词
+
+    中文连续片段输出单字和相邻二元组（"爬山" -> 爬, 山, 爬山），
+    英文和数字按单词输出小写形式
+
+    Args:
+        text: 文本
+
+    Returns:
+        索引词列表（保留重复，用于词频统计）
+    """
+    if not text:
+        return []
+    tokens: List[str] = []
+    for run in _TOKEN_PATTERN.findall(unicodedata.normalize("NFKC", text).lower()):
+        if _CJK_PATTERN.match(run):
+            tokens.extend(run)
+            tokens.extend(run[i:i + 2] for i in range(len(run) - 1))
+        else:
+            tokens.append(run)
+    return tokens
+
+
+def query_terms(query: Optional[str]) -> List[str]:
+    """
+    切分查询语句
+
+    多字中文只使用二元组（区分度更高），单字查询使用单字，结果去重
+    """
+    terms = []
+    for run in _TOKEN_PATTERN.findall(unicodedata.normalize("NFKC", query or "").lower()):
+        if _CJK_PATTERN.match(run) and len(run) > 1:
+            terms.extend(run[i:i + 2] for i in range(len(run) - 1))
+        else:
+            terms.append(run)
+    return list(dict.fromkeys(terms))
+
+
+def covers_substring(query: Optional[str]) -> bool:
+    """
+    倒排索引能否代替 LIKE '%查询%' 子串匹配
+
+    中文按单字/二元组切分，命中结果覆盖子串匹配；英文和数字按整词切分，
+    "run" 无法命中 "running"，这类查询应继续使用子串匹配
+    """
+    runs = _TOKEN_PATTERN.findall(unicodedata.normalize("NFKC", query or "").lower())
+    return bool(runs) and all(_CJK_PATTERN.match(run) for run in runs)
+
+
+class InvertedIndex:
+    """BM25 倒排索引
+
+    文档由多个字段组成，各字段按权重累加词频；
+    每个文档保存自己的词频表，更新/删除时只修改涉及的倒排链
+    """
+
+    def __init__(self, field_weights: Optional[Dict[str, float]] = None, k1: float = 1.2, b: float = 0.75):
+        """
+        Args:
+            field_weights: 字段权重，未配置的字段权重为 1
+            k1: BM25 词频饱和参数
+            b: BM25 文档长度归一化参数
+        """
+        self.field_weights = field_weights or {}
+        self.k1 = k1
+        self.b = b
+        self._postings: Dict[str, Dict[str, float]] = {}
+        self._doc_terms: Dict[str, Dict[str, float]] = {}
+        self._doc_len: Dict[str, float] = {}
+        self._total_len = 0.0
+        self._lock = threading.RLock()
+
+    def __len__(self) -> int:
+        return len(self._doc_terms)
+
+    def __contains__(self, doc_id: str) -> bool:
+        return doc_id in self._doc_terms
+
+    def upsert(self, doc_id: str, fields: Dict[str, Optional[str]]):
+        """
+        写入或替换文档
+
+        Args:
+            doc_id: 文档ID
+            fields: 字段名 -> 文本
+        """
+        freqs: Counter = Counter()
+        for name, value in fields.items():
+            weight = self.field_weights.get(name, 1.0)
+            for token in tokenize(value):
+                freqs[token] += weight
+        with self._lock:
+            self._remove_locked(doc_id)
+            if not freqs:
+                return
+            for term, freq in freqs.items():
+                self._postings.setdefault(term, {})[doc_id] = freq
+            length = sum(freqs.values())
+            self._doc_terms[doc_id] = dict(freqs)
+            self._doc_len[doc_id] = length
+            self._total_len += length
+
+    def remove(self, doc_id: str) -> bool:
+        """删除文档"""
+        with self._lock:
+            return self._remove_locked(doc_id)
+
+    def _remove_locked(self, doc_id: str) -> bool:
+        terms = self._doc_terms.pop(doc_id, None)
+        if terms is None:
+            return False
+        for term in terms:
+            posting = self._postings.get(term)
+            if posting is not None:
+                posting.pop(doc_id, None)
+                if not posting:
+                    del self._postings[term]
+        self._total_len -= self._doc_len.pop(doc_id, 0.0)
+        return True
+
+    def _score_terms(
+        self,
+        terms: List[str],
+        require_all: bool,
+        doc_filter: Optional[Callable[[str], bool]]
+    ) -> Dict[str, float]:
+        """累加查询词的 BM25 得分"""
+        n_docs = len(self._doc_terms)
+        if not n_docs or not terms:
+            return {}
+        postings = [(term, self._postings.get(term)) for term in terms]
+        if require_all and any(not p for _, p in postings):
+            return {}
+        avg_len = self._total_len / n_docs if self._total_len > 0 else 1.0
+
+        # 从最短的倒排链开始，AND 查询时候选集合只会缩小
+        postings = sorted(((t, p) for t, p in postings if p), key=lambda item: len(item[1]))
+        candidates = set(postings[0][1]) if require_all and postings else None
+        if candidates is not None:
+            for _, posting in postings[1:]:
+                candidates.intersection_update(posting)
+
+        scores: Dict[str, float] = {}
+        for term, posting in postings:
+            idf = math.log(1 + (n_docs - len(posting) + 0.5) / (len(posting) + 0.5))
+            for doc_id, tf in posting.items():
+                if candidates is not None and doc_id not in candidates:
+                    continue
+                norm = self.k1 * (1 - self.b + self.b * self._doc_len[doc_id] / avg_len)
+                scores[doc_id] = scores.get(doc_id, 0.0) + idf * tf * (self.k1 + 1) / (tf + norm)
+        if doc_filter is not None:
+            scores = {doc_id: s for doc_id, s in scores.items() if doc_filter(doc_id)}
+        return scores
+
+    def search(
+        self,
+        query: str,
+        k: Optional[int] = 20,
+        require_all: bool = False,
+        exclude_ids: Optional[Iterable[str]] = None,
+        doc_filter: Optional[Callable[[str], bool]] = None
+    ) -> List[Tuple[str, float]]:
+        """
+        检索文档
+
+        Args:
+            query: 查询语句
+            k: 返回数量，None 表示返回全部匹配
+            require_all: 是否要求包含所有查询词（用于替代子串匹配）
+            exclude_ids: 需要排除的文档ID
+            doc_filter: 额外的文档过滤函数
+
+        Returns:
+            [(doc_id, 得分), ...]，按得分降序
+        """
+        exclude = set(exclude_ids or [])
+        with self._lock:
+            scores = self._score_terms(query_terms(query), require_all, doc_filter)
+        for doc_id in exclude:
+            scores.pop(doc_id, None)
+        if k is None:
+            return sorted(scores.items(), key=lambda item: item[1], reverse=True)
+        return heapq.nlargest(k, scores.items(), key=lambda item: item[1])
+
+    def search_page(
+        self,
+        query: str,
+        offset: int = 0,
+        limit: int = 10,
+        require_all: bool = True,
+        doc_filter: Optional[Callable[[str], bool]] = None,
+        tie_breaker: Optional[Callable[[str], float]] = None
+    ) -> Tuple[List[Tuple[str, float]], int]:
+        """
+        分页检索文档
+
+        只用大小为 offset+limit 的堆取出前若干名，不对全部命中排序；
+        命中总数直接取候选集合大小，无需额外的 count 查询
+
+        Args:
+            query: 查询语句
+            offset: 跳过的条数
+            limit: 返回条数
+            require_all: 是否要求包含所有查询词
+            doc_filter: 额外的文档过滤函数
+            tie_breaker: 得分相同时的次序键（越大越靠前），如创建时间
+
+        Returns:
+            ([(doc_id, 得分), ...], 命中总数)
+        """
+        with self._lock:
+            scores = self._score_terms(query_terms(query), require_all, doc_filter)
+        if tie_breaker is None:
+            key = lambda item: item[1]
+        else:
+            key = lambda item: (item[1], tie_breaker(item[0]))
+        top = heapq.nlargest(offset + limit, scores.items(), key=key)
+        return top[offset:], len(scores)
@@ -0,0 +1,156 @@
+"""
+令牌吊销列表
+每个用户有一个令牌版本号，签发令牌时写入当前版本；吊销时版本号加一，之前签发的令牌全部失效。
+只有吊销过令牌的用户才有记录，全部加载到内存并定期刷新，校验令牌时不访问数据库；
+刷新令牌是一次性的，使用时按 jti 登记到数据库，多个 worker 之间同样只能使用一次
+"""
+
+import logging
+import threading
+import time
+from datetime import datetime
+from typing import Any, Callable, Dict, Optional
+
+from sqlalchemy import delete, select
+from sqlalchemy.exc import IntegrityError
+
+from app.models.used_refresh_token import UsedRefreshToken
+from app.models.user_token_version import UserTokenVersion
+
+logger = logging.getLogger(__name__)
+
+# 每登记多少次刷新令牌清理一次过期记录
+_PURGE_EVERY = 500
+
+
+class TokenRevocationList:
+    """内存中的令牌吊销列表（用户ID -> 当前令牌版本）"""
+
+    def __init__(
+        self,
+        session_factory: Optional[Callable[[], Any]] = None,
+        refresh_interval: float = 30.0
+    ):
+        """
+        Args:
+            session_factory: 创建数据库会话的工厂，默认使用主库 SessionLocal
+            refresh_interval: 从数据库重新加载的间隔（秒），也是其他 worker 吊销后本进程生效的最长延迟
+        """
+        self._session_factory = session_factory
+        self.refresh_interval = refresh_interval
+        self._versions: Dict[str, int] = {}
+        self._loaded_at: Optional[float] = None
+        self._lock = threading.Lock()
+        self._consumed = 0
+
+    def _get_session(self):
+        if self._session_factory is None:
+            from app.database import SessionLocal
+            self._session_factory = SessionLocal
+        return self._session_factory()
+
+    def refresh(self, force: bool = False):
+        """从数据库重新加载吊销列表"""
+        now = time.monotonic()
+        if not force and self._loaded_at is not None and now - self._loaded_at < self.refresh_interval:
+            return
+        if not self._lock.acquire(blocking=force or self._loaded_at is None):
+            # 其他线程正在刷新
+            return
+        try:
+            db = self._get_session()
+            try:
+                rows = db.execute(select(UserTokenVersion.user_id, UserTokenVersion.token_version)).all()
+                self._versions = {str(user_id): version or 0 for user_id, version in rows}
+            finally:
+                db.close()
+        except Exception as e:
+            logger.warning(f"加载令牌吊销列表失败，沿用当前列表: {e}")
+        finally:
+            # 失败时同样等待下一个刷新周期，避免每个请求都访问数据库
+            self._loaded_at = now
+            self._lock.release()
+
+    def current_version(self, user_id: Any) -> int:
+        """用户当前的令牌版本（签发新令牌时使用）"""
+        self.refresh()
+        return self._versions.get(str(user_id), 0)
+
+    def is_revoked(self, user_id: Any, version: Optional[int]) -> bool:
+        """令牌版本是否已被吊销"""
+        self.refresh()
+        return (version or 0) < self._versions.get(str(user_id), 0)
+
+    def revoke_user(self, user_id: Any) -> int:
+        """
+        吊销用户此前签发的所有令牌
+
+        Returns:
+            新的令牌版本
+        """
+        user_id = str(user_id)
+        db = self._get_session()
+        try:
+            for _ in range(2):
+                record = db.get(UserTokenVersion, user_id)
+                if record is None:
+                    record = UserTokenVersion(user_id=user_id, token_version=1)
+                    db.add(record)
+                else:
+                    record.token_version = (record.token_version or 0) + 1
+                try:
+                    db.commit()
+                    break
+                except IntegrityError:
+                    # 其他 worker 同时插入了记录，重新读取后递增
+                    db.rollback()
+            else:
+                raise RuntimeError(f"吊销用户令牌失败: user_id={user_id}")
+            version = record.token_version
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+        self._versions[user_id] = version
+        return version
+
+    def consume_refresh_token(self, jti: str, user_id: Any, expires_at: int) -> bool:
+        """
+        登记刷新令牌已使用
+
+        Args:
+            jti: 刷新令牌ID
+            user_id: 用户ID
+            expires_at: 刷新令牌过期时间（Unix 时间戳）
+
+        Returns:
+            首次使用返回 True，已被使用过返回 False
+        """
+        db = self._get_session()
+        try:
+            db.add(UsedRefreshToken(
+                jti=jti, user_id=str(user_id), expires_at=datetime.utcfromtimestamp(expires_at)
+            ))
+            try:
+                db.commit()
+            except IntegrityError:
+                db.rollback()
+                return False
+            self._consumed += 1
+            if self._consumed % _PURGE_EVERY == 0:
+                db.execute(delete(UsedRefreshToken).where(UsedRefreshToken.expires_at < datetime.utcnow()))
+                db.commit()
+            return True
+        finally:
+            db.close()
+
+
+def _create_revocation_list() -> TokenRevocationList:
+    from app.config import settings
+
+    return TokenRevocationList(refresh_interval=settings.AUTH_REVOCATION_REFRESH_INTERVAL)
+
+
+# 全局令牌吊销列表实例
+token_revocations = _create_revocation_list()
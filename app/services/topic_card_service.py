@@ -1,6 +1,7 @@
 from datetime import datetime, timedelta
 from sqlalchemy.orm import Session
-from sqlalchemy import and_, or_, func
+from sqlalchemy import and_, or_, func, select
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List, Optional, Dict, Any
 from datetime import datetime
 from app.models.topic_card_db import TopicCard, TopicDiscussion, TopicOpinionSummary
@@ -12,6 +13,9 @@ from app.models.topic_card import (
 from app.models.user import User
 from app.utils.logger import logger
 from app.services.points_service import PointsService
+from app.services.card_search_index import topic_card_search_index
+from app.services.counter_service import counter_service
+from app.services.view_dedup import view_deduplicator
 
 class TopicCardService:
     """话题卡片服务类"""
@@ -45,6 +49,7 @@ class TopicCardService:
             db.add(topic_card)
             db.commit()
             db.refresh(topic_card)
+            topic_card_search_index.index_card(topic_card)
             
             # 获取创建者信息
             creator = db.query(User).filter(User.id == user_id).first()
@@ -212,26 +217,40 @@ class TopicCardService:
             if category:
                 query = query.filter(TopicCard.category == category)
             
-            # 搜索筛选
+            # 搜索筛选：优先使用全文索引，只查询当前页的卡片
+            searched = None
             if search:
-                query = query.filter(
-                    or_(
-                        TopicCard.title.contains(search),
-                        TopicCard.description.contains(search),
-                        TopicCard.tags.contains([search])
-                    )
+                searched = topic_card_search_index.search_page(
+                    db, search, page, page_size,
+                    filters={"user_id": user_id, "category": category}
                 )
             
-            # 获取总数
-            total = query.count()
-            
-            # 分页查询
-            offset = (page - 1) * page_size
-            results = query.order_by(TopicCard.created_at.desc()).offset(offset).limit(page_size).all()
+            if searched is not None:
+                card_ids, total = searched
+                rows = query.filter(TopicCard.id.in_(card_ids)).all() if card_ids else []
+                rank = {card_id: i for i, card_id in enumerate(card_ids)}
+                results = sorted(rows, key=lambda row: rank[row[0].id])
+            else:
+                if search:
+                    query = query.filter(
+                        or_(
+                            TopicCard.title.contains(search),
+                            TopicCard.description.contains(search),
+                            TopicCard.tags.contains([search])
+                        )
+                    )
+                
+                # 获取总数
+                total = query.count()
+                
+                # 分页查询
+                offset = (page - 1) * page_size
+                results = query.order_by(TopicCard.created_at.desc()).offset(offset).limit(page_size).all()
             
             # 构建响应数据
             cards = []
             for topic_card, creator in results:
+                counter_service.apply(topic_card, "topic_cards", ("view_count", "like_count"))
                 card_response = TopicCardResponse(
                     id=topic_card.id,
                     user_id=topic_card.user_id,
@@ -266,6 +285,40 @@ class TopicCardService:
         except Exception as e:
             raise e
     
+    @staticmethod
+    def _should_count_view(card_id: str, user_id: Optional[str]) -> bool:
+        """判断本次浏览是否计数（窗口内同一用户重复浏览不计数，多worker共享去重记录）"""
+        return view_deduplicator.should_count("topic_card", card_id, user_id)
+    
+    @staticmethod
+    def _to_response(topic_card: TopicCard, creator: Optional[User]) -> TopicCardResponse:
+        """构建话题卡片详情响应"""
+        return TopicCardResponse(
+            id=topic_card.id,
+            user_id=topic_card.user_id,
+            title=topic_card.title,
+            description=topic_card.description,
+            discussion_goal=topic_card.discussion_goal,
+            category=topic_card.category,
+            tags=topic_card.tags or [],
+            cover_image=topic_card.cover_image,
+            visibility=topic_card.visibility,
+            is_active=topic_card.is_active,
+            is_anonymous=topic_card.is_anonymous,
+            view_count=topic_card.view_count,
+            like_count=topic_card.like_count,
+            discussion_count=topic_card.discussion_count,
+            created_at=topic_card.created_at,
+            updated_at=topic_card.updated_at,
+            # 返回创建者信息（前端会根据需要处理匿名显示）
+            creator_nickname=creator.nick_name if creator else None,
+            creator_avatar=creator.avatar_url if creator else None,
+            # 话题邀请功能已移除
+            inviter_nickname=None,
+            inviter_avatar=None,
+            is_invited=False
+        )
+    
     @staticmethod
     def get_topic_card_detail(db: Session, card_id: str, user_id: Optional[str] = None, invitation_id: Optional[str] = None) -> Optional[TopicCardResponse]:
         """获取话题卡片详情"""
@@ -286,82 +339,40 @@ class TopicCardService:
                 return None
             
             # 增加浏览次数（带防重复机制）
-            # 防止短时间内重复计数，提升用户体验
-            should_increment = True
-            if user_id:
-                # 如果有用户ID，使用简单的会话级防重机制
-                
-                
-                # 使用类变量作为简单的缓存（适用于单实例部署）
-                if not hasattr(TopicCardService, '_view_cache'):
-                    TopicCardService._view_cache = {}
-                
-                cache_key = f"{card_id}:{user_id}"
-                current_time = datetime.utcnow()
-                
-                if cache_key in TopicCardService._view_cache:
-                    last_view_time = TopicCardService._view_cache[cache_key]
-                    time_diff = current_time - last_view_time
-                    
-                    # 如果5分钟内已经浏览过，不增加计数
-                    if time_diff.total_seconds() < 300:  # 5分钟 = 300秒
-                        should_increment = False
-                    else:
-                        # 更新缓存时间
-                        TopicCardService._view_cache[cache_key] = current_time
-                else:
-                    # 记录新的浏览时间
-                    TopicCardService._view_cache[cache_key] = current_time
-                    
-                # 定期清理缓存，避免内存泄漏（每100次操作清理一次）
-                if len(TopicCardService._view_cache) > 1000:
-                    # 清理超过10分钟的旧记录
-                    ten_minutes_ago = current_time - timedelta(minutes=10)
-                    TopicCardService._view_cache = {
-                        k: v for k, v in TopicCardService._view_cache.items() 
-                        if v > ten_minutes_ago
-                    }
-            else:
-                # 对于未登录用户，每次访问都增加计数（业务决策）
-                should_increment = True
+            # 浏览数写回数据库由计数器服务批量完成
+            if TopicCardService._should_count_view(card_id, user_id):
+                counter_service.incr("topic_cards", card_id, "view_count")
+            counter_service.apply(topic_card, "topic_cards", ("view_count", "like_count"))
             
-            if should_increment:
-                topic_card.view_count += 1
-                db.commit()
-            
-            # 初始化邀请者信息（话题邀请功能已移除）
-            inviter_nickname = None
-            inviter_avatar = None
-            is_invited = False
-            
-            return TopicCardResponse(
-                id=topic_card.id,
-                user_id=topic_card.user_id,
-                title=topic_card.title,
-                description=topic_card.description,
-                discussion_goal=topic_card.discussion_goal,
-                category=topic_card.category,
-                tags=topic_card.tags or [],
-                cover_image=topic_card.cover_image,
-                visibility=topic_card.visibility,
-                is_active=topic_card.is_active,
-                is_anonymous=topic_card.is_anonymous,
-                view_count=topic_card.view_count,
-                like_count=topic_card.like_count,
-                discussion_count=topic_card.discussion_count,
-                created_at=topic_card.created_at,
-                updated_at=topic_card.updated_at,
-                # 返回创建者信息（前端会根据需要处理匿名显示）
-                creator_nickname=creator.nick_name if creator else None,
-                creator_avatar=creator.avatar_url if creator else None,
-                # 返回邀请者信息
-                inviter_nickname=inviter_nickname,
-                inviter_avatar=inviter_avatar,
-                is_invited=is_invited
-            )
+            return TopicCardService._to_response(topic_card, creator)
         except Exception as e:
             raise e
     
+    @staticmethod
+    async def get_topic_card_detail_async(db: AsyncSession, card_id: str, user_id: Optional[str] = None) -> Optional[TopicCardResponse]:
+        """获取话题卡片详情（异步会话版本，供 async 路由使用）"""
+        result = (await db.execute(
+            select(TopicCard, User).join(User, TopicCard.user_id == User.id).where(
+                TopicCard.id == card_id,
+                TopicCard.is_deleted == 0
+            )
+        )).first()
+        
+        if not result:
+            return None
+        
+        topic_card, creator = result
+        
+        # 检查可见性权限
+        if topic_card.visibility == "private" and topic_card.user_id != user_id:
+            return None
+        
+        if await view_deduplicator.should_count_async("topic_card", card_id, user_id):
+            counter_service.incr("topic_cards", card_id, "view_count")
+        counter_service.apply(topic_card, "topic_cards", ("view_count", "like_count"))
+        
+        return TopicCardService._to_response(topic_card, creator)
+    
     @staticmethod
     def update_topic_card(db: Session, card_id: str, update_data: TopicCardUpdate) -> Optional[TopicCardResponse]:
         """更新话题卡片"""
@@ -378,6 +389,7 @@ class TopicCardService:
             topic_card.updated_at = datetime.utcnow()
             db.commit()
             db.refresh(topic_card)
+            topic_card_search_index.index_card(topic_card)
             
             # 获取创建者信息
             creator = db.query(User).filter(User.id == topic_card.user_id).first()
@@ -418,6 +430,7 @@ class TopicCardService:
             topic_card.is_deleted = 1
             topic_card.updated_at = datetime.utcnow()
             db.commit()
+            topic_card_search_index.remove(card_id)
             
             return True
         except Exception as e:
@@ -534,9 +547,8 @@ class TopicCardService:
             if not topic_card:
                 return False
             
-            # 增加点赞次数
-            topic_card.like_count += 1
-            db.commit()
+            # 增加点赞次数（批量写回）
+            counter_service.incr("topic_cards", card_id, "like_count")
             
             return True
         except Exception as e:
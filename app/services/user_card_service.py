@@ -8,6 +8,7 @@ from app.models.user_card import (
     CardsResponse, AllCardsResponse, CardsByScene
 )
 from app.services.points_service import PointsService
+from app.services.user_search_index import user_search_index
 import uuid
 import json
 from datetime import datetime
@@ -48,6 +49,7 @@ class UserCardService:
         db.add(db_card)
         db.commit()
         db.refresh(db_card)
+        user_search_index.touch(user_id)
         return db_card
     
     @staticmethod
@@ -141,6 +143,7 @@ class UserCardService:
         card.updated_at = datetime.now()
         db.commit()
         db.refresh(card)
+        user_search_index.touch(card.user_id)
         
         return card
     
@@ -154,6 +157,7 @@ class UserCardService:
         card.is_deleted = 1
         card.updated_at = datetime.now()
         db.commit()
+        user_search_index.touch(card.user_id)
         
         return True
     
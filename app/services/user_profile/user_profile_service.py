@@ -9,6 +9,9 @@ from sqlalchemy import desc, text
 from app.models.user_profile import UserProfile, UserProfileCreate, UserProfileUpdate
 from app.models.user_profile_history import UserProfileHistory, UserProfileHistoryCreate
 from app.services.embedding_service import embedding_service
+from app.services.vector_index import profile_vector_index
+from app.services.user_search_index import user_search_index
+from app.config import settings
 from app.utils.logger import logger
 
 
@@ -17,6 +20,32 @@ def _embedding_to_json(embedding: List[float]) -> str:
     return json.dumps(embedding, ensure_ascii=False)
 
 
+def _embedding_sql() -> str:
+    """向量写入的SQL表达式：VECTOR 列通过 VEC_FROMTEXT 转换，二进制列直接绑定字节"""
+    if settings.EMBEDDING_STORAGE_FORMAT == "vector":
+        return "VEC_FROMTEXT(:embedding)"
+    return ":embedding"
+
+
+def _embedding_param(embedding_json: str) -> Any:
+    """向量写入的绑定参数：VECTOR 列为 JSON 文本，二进制列为编码后的字节"""
+    if settings.EMBEDDING_STORAGE_FORMAT == "vector":
+        return embedding_json
+    from app.utils.vector_codec import encode_vector
+    return encode_vector(json.loads(embedding_json), settings.EMBEDDING_STORAGE_FORMAT)
+
+
+def _update_vector_index(user_id: str, embedding_json: Optional[str]):
+    """画像写入数据库后同步到进程内索引：向量索引（零向量会从索引中移除）和用户文本索引"""
+    user_search_index.touch(user_id)
+    if not settings.VECTOR_INDEX_ENABLED:
+        return
+    try:
+        profile_vector_index.upsert(user_id, json.loads(embedding_json) if embedding_json else None)
+    except Exception as e:
+        logger.warning(f"更新画像向量索引失败: user_id={user_id}, error={str(e)}")
+
+
 class UserProfileService:
     """用户画像服务类"""
     
@@ -71,22 +100,23 @@ class UserProfileService:
 
         try:
             self.db.execute(
-                text("""
+                text(f"""
                     INSERT INTO user_profiles 
                     (id, user_id, raw_profile, raw_profile_embedding, profile_summary, update_reason, created_at, updated_at)
                     VALUES 
-                    (:id, :user_id, :raw_profile, VEC_FROMTEXT(:embedding), :summary, :reason, NOW(), NOW())
+                    (:id, :user_id, :raw_profile, {_embedding_sql()}, :summary, :reason, NOW(), NOW())
                 """),
                 {
                     "id": str(profile_data.user_id) + "-" + str(hash(profile_data.raw_profile) % 10000),
                     "user_id": profile_data.user_id,
                     "raw_profile": description_text,
-                    "embedding": embedding_json,
+                    "embedding": _embedding_param(embedding_json),
                     "summary": summary_text,
                     "reason": profile_data.update_reason or "初始创建"
                 }
             )
             self.db.commit()
+            _update_vector_index(profile_data.user_id, embedding_json)
         except Exception as e:
             self.db.rollback()
             logger.error(f"插入用户画像失败: user_id={profile_data.user_id}, error={str(e)}")
@@ -195,12 +225,10 @@ class UserProfileService:
             "summary": db_profile.profile_summary
         }
 
-        if embedding_json is not None:
-            update_fields.append("raw_profile_embedding = VEC_FROMTEXT(:embedding)")
-            update_params["embedding"] = embedding_json
-        else:
-            update_fields.append("raw_profile_embedding = VEC_FROMTEXT(:embedding)")
-            update_params["embedding"] = _embedding_to_json([0.0] * 1024)
+        if embedding_json is None:
+            embedding_json = _embedding_to_json([0.0] * 1024)
+        update_fields.append(f"raw_profile_embedding = {_embedding_sql()}")
+        update_params["embedding"] = _embedding_param(embedding_json)
 
         update_params["user_id"] = user_id
 
@@ -210,6 +238,7 @@ class UserProfileService:
                 update_params
             )
             self.db.commit()
+            _update_vector_index(user_id, embedding_json)
         except Exception as e:
             self.db.rollback()
             logger.error(f"更新用户画像失败: user_id={user_id}, error={str(e)}")
@@ -230,8 +259,12 @@ class UserProfileService:
         if not db_profile:
             return False
         
+        user_id = db_profile.user_id
         self.db.delete(db_profile)
         self.db.commit()
+        user_search_index.touch(user_id)
+        if settings.VECTOR_INDEX_ENABLED:
+            profile_vector_index.remove(user_id)
         
         logger.info(f"删除用户画像成功: profile_id={profile_id}")
         return True
@@ -523,11 +556,11 @@ class UserProfileService:
             
             # 更新 embedding
             self.db.execute(
-                text("UPDATE user_profiles SET raw_profile = :raw_profile, profile_summary = :summary, raw_profile_embedding = VEC_FROMTEXT(:embedding), updated_at = NOW() WHERE user_id = :user_id"),
+                text(f"UPDATE user_profiles SET raw_profile = :raw_profile, profile_summary = :summary, raw_profile_embedding = {_embedding_sql()}, updated_at = NOW() WHERE user_id = :user_id"),
                 {
                     "raw_profile": new_raw_profile,
                     "summary": new_profile_summary,
-                    "embedding": embedding_json,
+                    "embedding": _embedding_param(embedding_json),
                     "user_id": user_id
                 }
             )
@@ -544,15 +577,16 @@ class UserProfileService:
             
             # 更新 embedding
             self.db.execute(
-                text("UPDATE user_profiles SET raw_profile_embedding = VEC_FROMTEXT(:embedding) WHERE user_id = :user_id"),
+                text(f"UPDATE user_profiles SET raw_profile_embedding = {_embedding_sql()} WHERE user_id = :user_id"),
                 {
-                    "embedding": embedding_json,
+                    "embedding": _embedding_param(embedding_json),
                     "user_id": user_id
                 }
             )
         
         self.db.commit()
         self.db.refresh(db_profile)
+        _update_vector_index(user_id, embedding_json)
         
         logger.info(f"用户画像生成成功: user_id={user_id}")
         return db_profile
@@ -593,6 +627,52 @@ class UserProfileService:
             existing_profile=existing_raw_profile
         )
     
+    async def backfill_profile_embeddings(self, batch_size: int = 64, only_missing: bool = False) -> Dict[str, int]:
+        """
+        批量重新生成所有用户画像的向量
+
+        按主键分页读取画像，每页文本一次性提交批量向量接口，再逐条写回
+
+        Args:
+            batch_size: 每页处理的画像数量
+            only_missing: 仅处理向量为空的画像
+
+        Returns:
+            统计信息: processed / updated / failed
+        """
+        stats = {"processed": 0, "updated": 0, "failed": 0}
+        last_id = ""
+        while True:
+            query = self.db.query(UserProfile.id, UserProfile.user_id, UserProfile.raw_profile).filter(
+                UserProfile.id > last_id
+            )
+            if only_missing:
+                query = query.filter(UserProfile.raw_profile_embedding.is_(None))
+            rows = query.order_by(UserProfile.id).limit(batch_size).all()
+            if not rows:
+                break
+            last_id = rows[-1].id
+
+            embeddings = await embedding_service.generate_embeddings([row.raw_profile or "" for row in rows])
+            for row, embedding in zip(rows, embeddings):
+                stats["processed"] += 1
+                if not embedding:
+                    stats["failed"] += 1
+                    continue
+                self.db.execute(
+                    text(f"UPDATE user_profiles SET raw_profile_embedding = {_embedding_sql()}, updated_at = NOW() WHERE id = :id"),
+                    {"embedding": _embedding_param(_embedding_to_json(embedding)), "id": row.id}
+                )
+                stats["updated"] += 1
+            self.db.commit()
+            for row, embedding in zip(rows, embeddings):
+                if embedding and settings.VECTOR_INDEX_ENABLED:
+                    profile_vector_index.upsert(row.user_id, embedding)
+            logger.info(f"画像向量回填进度: {stats}")
+
+        logger.info(f"画像向量回填完成: {stats}")
+        return stats
+
     def search_by_vector_similarity(
         self,
         embedding: List[float],
@@ -602,6 +682,9 @@ class UserProfileService:
         """
         基于向量相似度搜索用户画像
 
+        优先使用进程内向量索引检索，再用一次 IN 查询补全画像信息；
+        索引不可用时回退到数据库 VEC_DISTANCE_COSINE 全表计算
+
         Args:
             embedding: 查询向量
             exclude_user_ids: 排除的用户ID列表
@@ -610,18 +693,29 @@ class UserProfileService:
         Returns:
             匹配的用户画像列表，包含用户ID、相似度分数和原始画像信息
         """
-        import json
+        if settings.VECTOR_INDEX_ENABLED and profile_vector_index.sync(self.db):
+            try:
+                hits = profile_vector_index.search(embedding, k=limit, exclude_ids=exclude_user_ids)
+                return self._hydrate_vector_matches(hits)
+            except Exception as e:
+                logger.warning(f"向量索引检索失败，回退到数据库检索: {str(e)}")
+                self.db.rollback()
+
+        if settings.EMBEDDING_STORAGE_FORMAT != "vector":
+            # 二进制存储无法在数据库中计算余弦距离，只能依赖向量索引
+            logger.warning("向量索引不可用，二进制向量存储不支持数据库检索")
+            return []
 
         # 将查询向量转换为 JSON 字符串
         embedding_json = json.dumps(embedding, ensure_ascii=False)
 
-        # 构建查询 SQL，使用 VEC_DISTANCE_COSINE 计算余弦相似度
+        # 构建查询 SQL，使用 VEC_DISTANCE_COSINE 计算余弦距离，相似度 = 1 - 距离
         sql = """
             SELECT 
                 user_id,
                 raw_profile,
                 profile_summary,
-                VEC_DISTANCE_COSINE(raw_profile_embedding, VEC_FROMTEXT(:embedding)) AS similarity
+                1 - VEC_DISTANCE_COSINE(raw_profile_embedding, VEC_FROMTEXT(:embedding)) AS similarity
             FROM user_profiles
             WHERE raw_profile_embedding IS NOT NULL
         """
@@ -643,23 +737,10 @@ class UserProfileService:
             result = self.db.execute(text(sql), params)
             rows = result.fetchall()
 
-            matches = []
-            for row in rows:
-                raw_profile = row.raw_profile
-                # 如果 raw_profile 是 JSON 字符串，尝试解析
-                profile_data = None
-                try:
-                    if raw_profile and isinstance(raw_profile, str):
-                        profile_data = json.loads(raw_profile)
-                except json.JSONDecodeError:
-                    profile_data = {"raw_profile": raw_profile}
-
-                matches.append({
-                    "user_id": row.user_id,
-                    "similarity": float(row.similarity) if row.similarity else 0.0,
-                    "profile_summary": row.profile_summary,
-                    "raw_profile": profile_data
-                })
+            matches = [
+                self._format_vector_match(row.user_id, row.similarity, row.raw_profile, row.profile_summary)
+                for row in rows
+            ]
 
             logger.info(f"向量相似度搜索完成，找到 {len(matches)} 个匹配用户")
             return matches
@@ -668,4 +749,43 @@ class UserProfileService:
             logger.error(f"向量相似度搜索失败: {str(e)}")
             import traceback
             logger.error(f"详细堆栈: {traceback.format_exc()}")
-            return []
\ No newline at end of file
+            return []
+
+    def _hydrate_vector_matches(self, hits: List[tuple]) -> List[Dict[str, Any]]:
+        """按索引检索结果的顺序，一次 IN 查询补全画像信息"""
+        if not hits:
+            return []
+        rows = self.db.query(
+            UserProfile.user_id, UserProfile.raw_profile, UserProfile.profile_summary
+        ).filter(UserProfile.user_id.in_([user_id for user_id, _ in hits])).all()
+        by_user = {row.user_id: row for row in rows}
+
+        matches = []
+        for user_id, similarity in hits:
+            row = by_user.get(user_id)
+            if row is None:
+                # 画像已被删除但索引尚未同步
+                profile_vector_index.remove(user_id)
+                continue
+            matches.append(self._format_vector_match(user_id, similarity, row.raw_profile, row.profile_summary))
+
+        logger.info(f"向量索引搜索完成，找到 {len(matches)} 个匹配用户")
+        return matches
+
+    @staticmethod
+    def _format_vector_match(user_id: str, similarity: Any, raw_profile: Any, profile_summary: Any) -> Dict[str, Any]:
+        """组装单条向量检索结果"""
+        # 如果 raw_profile 是 JSON 字符串，尝试解析
+        profile_data = None
+        try:
+            if raw_profile and isinstance(raw_profile, str):
+                profile_data = json.loads(raw_profile)
+        except json.JSONDecodeError:
+            profile_data = {"raw_profile": raw_profile}
+
+        return {
+            "user_id": user_id,
+            "similarity": float(similarity) if similarity else 0.0,
+            "profile_summary": profile_summary,
+            "raw_profile": profile_data
+        }
@@ -0,0 +1,266 @@
+"""
+用户文本检索索引
+以用户为文档，汇总昵称、职业、个人简介、画像总结和身份卡片文本建立倒排索引，
+为语义搜索提供关键词召回，并替代按昵称/简介的 LIKE 模糊查询
+"""
+
+import logging
+import threading
+import time
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+from sqlalchemy import bindparam, text
+from sqlalchemy.orm import Session
+
+from app.services.text_index import InvertedIndex
+
+logger = logging.getLogger(__name__)
+
+# 字段权重：名称和职业通常是精确词，权重更高
+USER_FIELD_WEIGHTS = {
+    "nick_name": 3.0,
+    "occupation": 2.0,
+    "bio": 1.0,
+    "profile_summary": 1.0,
+    "card_text": 1.0,
+}
+
+# 各数据源的变更检测：(表名, 用户ID列, 时间列表达式)
+_SOURCES = (
+    ("users", "id", "COALESCE(updated_at, created_at)"),
+    ("user_profiles", "user_id", "updated_at"),
+    ("user_cards", "user_id", "COALESCE(updated_at, created_at)"),
+)
+
+
+class UserSearchIndex:
+    """用户文本检索索引
+
+    - 启动时在后台线程全量构建（warm），构建完成前的检索返回 None，调用方回退到数据库查询
+    - 本进程内的写入通过 touch(user_id) 标记，下次检索前重新加载这些用户
+    - 其他worker的写入按各表的时间水位增量同步
+    """
+
+    def __init__(self, enabled: bool = True, sync_interval: float = 30.0, batch_size: int = 500):
+        """
+        Args:
+            enabled: 是否启用，未启用时检索返回 None，调用方回退到数据库查询
+            sync_interval: 与数据库增量同步的最小间隔（秒）
+            batch_size: 批量加载用户的数量
+        """
+        self.enabled = enabled
+        self.sync_interval = sync_interval
+        self.batch_size = batch_size
+        self.index = InvertedIndex(field_weights=USER_FIELD_WEIGHTS)
+        self._pending: Set[str] = set()
+        self._watermarks: Dict[str, Optional[datetime]] = {}
+        self._loaded = False
+        self._warming = False
+        self._last_sync = 0.0
+        self._lock = threading.Lock()
+        self._sync_lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self.index)
+
+    def touch(self, user_id: Optional[str]):
+        """标记用户资料已变更"""
+        if user_id:
+            with self._lock:
+                self._pending.add(user_id)
+
+    # ---------------------------------------------------------------
+    # 数据加载
+    # ---------------------------------------------------------------
+
+    def _refresh_users(self, db: Session, user_ids: List[str]):
+        """批量重新加载用户文档（3 次 IN 查询），不存在或已停用的用户从索引中移除"""
+        for start in range(0, len(user_ids), self.batch_size):
+            chunk = user_ids[start:start + self.batch_size]
+            params = {"ids": chunk}
+            users = db.execute(
+                text("SELECT id, nick_name, occupation, bio, is_active FROM users WHERE id IN :ids")
+                .bindparams(bindparam("ids", expanding=True)),
+                params
+            ).fetchall()
+            summaries = db.execute(
+                text("SELECT user_id, profile_summary FROM user_profiles WHERE user_id IN :ids")
+                .bindparams(bindparam("ids", expanding=True)),
+                params
+            ).fetchall()
+            cards = db.execute(
+                text("SELECT user_id, display_name, bio FROM user_cards WHERE user_id IN :ids AND is_deleted = 0")
+                .bindparams(bindparam("ids", expanding=True)),
+                params
+            ).fetchall()
+
+            summary_by_user: Dict[str, List[str]] = {}
+            for row in summaries:
+                if row.profile_summary:
+                    summary_by_user.setdefault(row.user_id, []).append(row.profile_summary)
+            cards_by_user: Dict[str, List[str]] = {}
+            for row in cards:
+                cards_by_user.setdefault(row.user_id, []).extend(v for v in (row.display_name, row.bio) if v)
+
+            found = set()
+            for row in users:
+                if row.is_active is not None and not row.is_active:
+                    continue
+                found.add(row.id)
+                self.index.upsert(row.id, {
+                    "nick_name": row.nick_name,
+                    "occupation": row.occupation,
+                    "bio": row.bio,
+                    "profile_summary": "\n".join(summary_by_user.get(row.id, [])),
+                    "card_text": "\n".join(cards_by_user.get(row.id, [])),
+                })
+            for user_id in chunk:
+                if user_id not in found:
+                    self.index.remove(user_id)
+
+    def _max_timestamp(self, db: Session, table: str, ts_expr: str) -> Optional[datetime]:
+        value = db.execute(text(f"SELECT MAX({ts_expr}) FROM {table}")).scalar()
+        return datetime.fromisoformat(value) if isinstance(value, str) else value
+
+    def _changed_user_ids(self, db: Session) -> Set[str]:
+        """按各表的时间水位查询变更的用户"""
+        changed: Set[str] = set()
+        for table, id_column, ts_expr in _SOURCES:
+            since = self._watermarks.get(table)
+            if since is None:
+                # 构建时表为空，之后出现的记录都视为变更
+                sql = f"SELECT {id_column} AS user_id, {ts_expr} AS ts FROM {table} WHERE {ts_expr} IS NOT NULL"
+            else:
+                sql = f"SELECT {id_column} AS user_id, {ts_expr} AS ts FROM {table} WHERE {ts_expr} >= :since"
+            rows = db.execute(text(sql), {"since": since}).fetchall()
+            for row in rows:
+                changed.add(row.user_id)
+                ts = datetime.fromisoformat(row.ts) if isinstance(row.ts, str) else row.ts
+                if ts is not None and (since is None or ts > since):
+                    since = ts
+            self._watermarks[table] = since
+        return changed
+
+    def _build(self, db: Session):
+        """全量构建（按主键分页加载所有用户）"""
+        for table, _, ts_expr in _SOURCES:
+            self._watermarks[table] = self._max_timestamp(db, table, ts_expr)
+        last_id = ""
+        while True:
+            rows = db.execute(
+                text("SELECT id FROM users WHERE id > :last_id ORDER BY id LIMIT :limit"),
+                {"last_id": last_id, "limit": self.batch_size}
+            ).fetchall()
+            if not rows:
+                break
+            last_id = rows[-1].id
+            self._refresh_users(db, [row.id for row in rows])
+        logger.info(f"用户文本索引构建完成: users={len(self.index)}")
+
+    def sync(self, db: Session, force: bool = False) -> bool:
+        """
+        与数据库同步：首次全量构建，之后处理本进程标记的变更，并按间隔增量拉取其他进程的变更
+
+        Returns:
+            索引是否可用于检索
+        """
+        now = time.monotonic()
+        due = force or not self._loaded or now - self._last_sync >= self.sync_interval
+        if not due and not self._pending:
+            return True
+        if not self._sync_lock.acquire(blocking=not self._loaded and not self._warming):
+            # 其他线程正在同步，直接使用当前索引；后台预热尚未完成时不等待
+            return self._loaded
+        with self._lock:
+            pending, self._pending = self._pending, set()
+        try:
+            if self._loaded and not force and time.monotonic() - self._last_sync < self.sync_interval:
+                due = False
+            if not self._loaded:
+                self._build(db)
+                self._loaded = True
+                self._last_sync = now
+                return True
+            if due:
+                pending |= self._changed_user_ids(db)
+                self._last_sync = now
+            if pending:
+                self._refresh_users(db, sorted(pending))
+            return True
+        except Exception as e:
+            logger.warning(f"同步用户文本索引失败: {e}")
+            db.rollback()
+            with self._lock:
+                self._pending |= pending
+            return self._loaded
+        finally:
+            self._sync_lock.release()
+
+    def warm(self):
+        """在后台线程中全量构建索引，不阻塞启动和请求"""
+        if not self.enabled or self._loaded or self._warming:
+            return
+        self._warming = True
+        threading.Thread(target=self._warm, name="user-search-index-warm", daemon=True).start()
+
+    def _warm(self):
+        from app.database import SessionLocal
+
+        db = SessionLocal()
+        try:
+            self.sync(db)
+        finally:
+            self._warming = False
+            db.close()
+
+    # ---------------------------------------------------------------
+    # 检索
+    # ---------------------------------------------------------------
+
+    def search(
+        self,
+        db: Session,
+        query: str,
+        k: Optional[int] = 20,
+        exclude_ids: Optional[Iterable[str]] = None,
+        require_all: bool = False
+    ) -> Optional[List[Tuple[str, float]]]:
+        """
+        关键词检索用户
+
+        Args:
+            db: 数据库会话，用于同步索引
+            query: 查询语句
+            k: 返回数量，None 表示返回全部匹配
+            exclude_ids: 需要排除的用户ID
+            require_all: 是否要求包含所有查询词
+
+        Returns:
+            [(user_id, BM25得分), ...]；索引未启用或不可用时返回 None
+        """
+        if not self.enabled or not self.sync(db):
+            return None
+        return self.index.search(query, k=k, require_all=require_all, exclude_ids=exclude_ids)
+
+    def stats(self) -> Dict[str, Any]:
+        """索引统计信息"""
+        return {
+            "loaded": self._loaded,
+            "users": len(self.index),
+            "pending": len(self._pending),
+            "watermarks": {k: v.isoformat() if v else None for k, v in self._watermarks.items()},
+        }
+
+
+def _create_index() -> UserSearchIndex:
+    from app.config import settings
+
+    return UserSearchIndex(
+        enabled=settings.USER_SEARCH_INDEX_ENABLED,
+        sync_interval=settings.USER_SEARCH_INDEX_SYNC_INTERVAL,
+    )
+
+
+# 全局用户文本索引实例
+user_search_index = _create_index()
@@ -0,0 +1,512 @@
+"""
+用户画像向量索引
+进程内维护预归一化的float32向量矩阵（磁盘快照以内存映射方式加载），
+数据量较大时使用IVF倒排分桶做近似检索，数据量较小或尚未训练时退化为NumPy暴力检索；
+画像写入时增量插入/删除，语义搜索不再需要在数据库中逐行计算余弦距离
+"""
+
+import json
+import logging
+import os
+import shutil
+import threading
+import time
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+logger = logging.getLogger(__name__)
+
+
+class ProfileVectorIndex:
+    """用户画像向量索引
+
+    - 向量写入前做L2归一化，余弦相似度即为矩阵与查询向量的点积
+    - 以槽位(slot)存储向量，删除时回收槽位，插入/删除均为 O(1)
+    - 画像数达到 ivf_min_size 后训练球面k-means质心，检索时只扫描最近的 nprobe 个分桶
+    - 通过 updated_at 水位增量同步数据库中的变更（包括其他worker进程的写入）
+    """
+
+    def __init__(
+        self,
+        path: Optional[str] = None,
+        dimension: int = 1024,
+        nprobe: int = 8,
+        ivf_min_size: int = 2000,
+        sync_interval: float = 30.0,
+        save_interval: float = 300.0,
+        storage_format: str = "vector"
+    ):
+        """
+        Args:
+            path: 索引快照目录，为空时只在内存中维护
+            dimension: 向量维度
+            nprobe: 近似检索时扫描的分桶数
+            ivf_min_size: 开始使用IVF分桶的最小画像数，低于该值使用暴力检索
+            sync_interval: 与数据库增量同步的最小间隔（秒）
+            save_interval: 写入快照的最小间隔（秒）
+            storage_format: 数据库向量列的存储格式，见 settings.EMBEDDING_STORAGE_FORMAT
+        """
+        self.path = path
+        self.dimension = dimension
+        self.nprobe = nprobe
+        self.ivf_min_size = ivf_min_size
+        self.sync_interval = sync_interval
+        self.save_interval = save_interval
+        self.storage_format = storage_format
+
+        self._lock = threading.RLock()
+        self._sync_lock = threading.Lock()
+        self._vector_expr: Optional[str] = None
+        self._reset()
+
+    def _reset(self):
+        self._ids: List[Optional[str]] = []
+        self._slots: Dict[str, int] = {}
+        self._free: List[int] = []
+        self._matrix = np.zeros((0, self.dimension), dtype=np.float32) if np is not None else None
+        self._assign = np.zeros(0, dtype=np.int32) if np is not None else None
+        self._centroids = None
+        self._trained_size = 0
+        self._loaded = False
+        self._dirty = False
+        self._watermark: Optional[datetime] = None
+        self._last_sync = 0.0
+        self._last_save = 0.0
+
+    @property
+    def available(self) -> bool:
+        """numpy 可用时索引才可用"""
+        return np is not None
+
+    def __len__(self) -> int:
+        return len(self._slots)
+
+    # ---------------------------------------------------------------
+    # 增量写入
+    # ---------------------------------------------------------------
+
+    def _normalize(self, vector: Any):
+        """转换为归一化的float32向量，维度不符或零向量返回 None"""
+        try:
+            v = np.asarray(vector, dtype=np.float32).reshape(-1)
+        except (TypeError, ValueError):
+            return None
+        if v.shape[0] != self.dimension:
+            return None
+        norm = float(np.linalg.norm(v))
+        if not norm or not np.isfinite(norm):
+            return None
+        return v / norm
+
+    def _ensure_capacity(self, size: int):
+        """按倍增策略扩容向量矩阵"""
+        capacity = self._matrix.shape[0]
+        if size <= capacity:
+            return
+        new_capacity = max(size, capacity * 2, 64)
+        matrix = np.zeros((new_capacity, self.dimension), dtype=np.float32)
+        matrix[:capacity] = self._matrix
+        assign = np.full(new_capacity, -1, dtype=np.int32)
+        assign[:capacity] = self._assign
+        self._matrix, self._assign = matrix, assign
+
+    def upsert(self, user_id: str, vector: Any) -> bool:
+        """
+        插入或更新用户画像向量，零向量（生成失败的占位向量）视为删除
+
+        Returns:
+            是否写入了索引
+        """
+        if not self.available or not user_id:
+            return False
+        v = self._normalize(vector)
+        if v is None:
+            self.remove(user_id)
+            return False
+        with self._lock:
+            slot = self._slots.get(user_id)
+            if slot is None:
+                if self._free:
+                    slot = self._free.pop()
+                else:
+                    slot = len(self._ids)
+                    self._ensure_capacity(slot + 1)
+                    self._ids.append(None)
+                self._ids[slot] = user_id
+                self._slots[user_id] = slot
+            self._matrix[slot] = v
+            self._assign[slot] = self._nearest_centroid(v) if self._centroids is not None else 0
+            self._dirty = True
+        return True
+
+    def remove(self, user_id: str) -> bool:
+        """删除用户画像向量"""
+        if not self.available:
+            return False
+        with self._lock:
+            slot = self._slots.pop(user_id, None)
+            if slot is None:
+                return False
+            self._ids[slot] = None
+            self._assign[slot] = -1
+            self._free.append(slot)
+            self._dirty = True
+        return True
+
+    # ---------------------------------------------------------------
+    # IVF 分桶
+    # ---------------------------------------------------------------
+
+    def _nearest_centroid(self, v) -> int:
+        return int(np.argmax(self._centroids @ v))
+
+    def train(self, iterations: int = 10, seed: int = 0):
+        """训练球面k-means质心并重新分配所有向量的分桶"""
+        with self._lock:
+            slots = np.asarray(sorted(self._slots.values()), dtype=np.int64)
+            if len(slots) < self.ivf_min_size:
+                return
+            nlist = int(min(4096, max(16, np.sqrt(len(slots)))))
+            rng = np.random.default_rng(seed)
+            sample = self._matrix[rng.choice(slots, size=min(len(slots), nlist * 64), replace=False)]
+
+        centroids = sample[rng.choice(len(sample), size=nlist, replace=False)].copy()
+        for _ in range(iterations):
+            labels = np.argmax(sample @ centroids.T, axis=1)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, labels, sample)
+            norms = np.linalg.norm(sums, axis=1)
+            # 空桶保留原质心
+            filled = norms > 0
+            centroids[filled] = sums[filled] / norms[filled, None]
+
+        with self._lock:
+            self._centroids = centroids
+            self._assign[:] = -1
+            slots = np.asarray(sorted(self._slots.values()), dtype=np.int64)
+            for start in range(0, len(slots), 4096):
+                chunk = slots[start:start + 4096]
+                self._assign[chunk] = np.argmax(self._matrix[chunk] @ centroids.T, axis=1)
+            self._trained_size = len(slots)
+            self._dirty = True
+        logger.info(f"画像向量索引训练完成: vectors={len(slots)}, nlist={nlist}")
+
+    def _maybe_train(self):
+        """数据量达到阈值或较上次训练翻倍时重新训练"""
+        size = len(self._slots)
+        if size >= self.ivf_min_size and (self._centroids is None or size >= self._trained_size * 2):
+            self.train()
+
+    # ---------------------------------------------------------------
+    # 检索
+    # ---------------------------------------------------------------
+
+    def search(
+        self,
+        query: Any,
+        k: int = 20,
+        exclude_ids: Optional[Iterable[str]] = None
+    ) -> List[Tuple[str, float]]:
+        """
+        检索与查询向量最相似的画像
+
+        Args:
+            query: 查询向量
+            k: 返回数量
+            exclude_ids: 需要排除的用户ID
+
+        Returns:
+            [(user_id, 余弦相似度), ...]，按相似度降序
+        """
+        if not self.available or k <= 0:
+            return []
+        q = self._normalize(query)
+        if q is None:
+            return []
+        exclude = set(exclude_ids or [])
+
+        with self._lock:
+            size = len(self._ids)
+            if not self._slots:
+                return []
+            want = k + len(exclude)
+
+            candidates = None
+            if self._centroids is not None and len(self._slots) > want:
+                nprobe = min(self.nprobe, len(self._centroids))
+                probes = np.argpartition(-(self._centroids @ q), nprobe - 1)[:nprobe]
+                candidates = np.nonzero(np.isin(self._assign[:size], probes))[0]
+                if len(candidates) < want:
+                    # 分桶内候选不足时退化为暴力检索
+                    candidates = None
+
+            if candidates is None:
+                candidates = np.nonzero(self._assign[:size] >= 0)[0]
+            scores = self._matrix[candidates] @ q
+
+            top = min(want, len(candidates))
+            order = np.argpartition(-scores, top - 1)[:top]
+            order = order[np.argsort(-scores[order])]
+
+            results = []
+            for i in order:
+                user_id = self._ids[candidates[i]]
+                if user_id is None or user_id in exclude:
+                    continue
+                results.append((user_id, float(scores[i])))
+                if len(results) >= k:
+                    break
+        return results
+
+    # ---------------------------------------------------------------
+    # 磁盘快照
+    # ---------------------------------------------------------------
+
+    def save(self):
+        """
+        写入快照（多个worker可共享同一目录）
+
+        每次保存写入一个新的代目录 gen-<pid>-<时间>/，写完后原子替换 current 指针文件；
+        读取方先读指针再读该代目录中的文件，不会把不同代的向量和ID拼在一起
+        """
+        if not self.available or not self.path:
+            return
+        with self._lock:
+            size = len(self._ids)
+            arrays = {
+                "vectors.npy": self._matrix[:size].copy(),
+                "assign.npy": self._assign[:size].copy(),
+                "centroids.npy": self._centroids if self._centroids is not None
+                else np.zeros((0, self.dimension), dtype=np.float32),
+            }
+            meta = {
+                "dimension": self.dimension,
+                "ids": list(self._ids),
+                "trained_size": self._trained_size,
+                "watermark": self._watermark.isoformat() if self._watermark else None,
+            }
+            self._dirty = False
+            self._last_save = time.monotonic()
+        generation = f"gen-{os.getpid()}-{time.time_ns()}"
+        meta["generation"] = generation
+        gen_dir = os.path.join(self.path, generation)
+        try:
+            os.makedirs(gen_dir)
+            for name, array in arrays.items():
+                with open(os.path.join(gen_dir, name), "wb") as f:
+                    np.save(f, array)
+            with open(os.path.join(gen_dir, "meta.json"), "w", encoding="utf-8") as f:
+                json.dump(meta, f)
+            pointer = os.path.join(self.path, "current")
+            with open(f"{pointer}.tmp{os.getpid()}", "w", encoding="utf-8") as f:
+                f.write(generation)
+            os.replace(f"{pointer}.tmp{os.getpid()}", pointer)
+        except OSError as e:
+            logger.warning(f"写入画像向量索引快照失败: {e}")
+            shutil.rmtree(gen_dir, ignore_errors=True)
+            return
+        self._prune_generations(generation)
+
+    def _prune_generations(self, current: str, keep: int = 2):
+        """删除旧的快照代目录，保留最近几代（其他worker可能正在读取上一代）"""
+        try:
+            generations = [
+                name for name in os.listdir(self.path)
+                if name.startswith("gen-") and name != current
+            ]
+            generations.sort(key=lambda name: os.path.getmtime(os.path.join(self.path, name)), reverse=True)
+        except OSError:
+            return
+        for name in generations[keep - 1:]:
+            shutil.rmtree(os.path.join(self.path, name), ignore_errors=True)
+
+    def load(self) -> bool:
+        """加载快照，向量矩阵以写时复制方式内存映射，不占用额外内存"""
+        if not self.available or not self.path:
+            return False
+        pointer = os.path.join(self.path, "current")
+        if not os.path.exists(pointer):
+            return False
+        try:
+            with open(pointer, "r", encoding="utf-8") as f:
+                generation = f.read().strip()
+            gen_dir = os.path.join(self.path, generation)
+            with open(os.path.join(gen_dir, "meta.json"), "r", encoding="utf-8") as f:
+                meta = json.load(f)
+            matrix = np.load(os.path.join(gen_dir, "vectors.npy"), mmap_mode="c")
+            assign = np.array(np.load(os.path.join(gen_dir, "assign.npy")), dtype=np.int32)
+            centroids = np.load(os.path.join(gen_dir, "centroids.npy"))
+        except (OSError, ValueError) as e:
+            logger.warning(f"读取画像向量索引快照失败，将全量重建: {e}")
+            return False
+
+        if meta.get("generation") != generation:
+            logger.warning("画像向量索引快照代号不一致，将全量重建")
+            return False
+        ids = meta.get("ids") or []
+        if meta.get("dimension") != self.dimension or matrix.shape != (len(ids), self.dimension) \
+                or assign.shape[0] != len(ids):
+            logger.warning("画像向量索引快照与当前配置不一致，将全量重建")
+            return False
+
+        with self._lock:
+            self._reset()
+            self._matrix, self._assign = matrix, assign
+            self._ids = ids
+            for slot, user_id in enumerate(ids):
+                if user_id is None:
+                    self._free.append(slot)
+                else:
+                    self._slots[user_id] = slot
+            self._centroids = centroids if len(centroids) else None
+            self._trained_size = meta.get("trained_size") or 0
+            watermark = meta.get("watermark")
+            self._watermark = datetime.fromisoformat(watermark) if watermark else None
+            self._last_save = time.monotonic()
+        logger.info(f"已加载画像向量索引快照: vectors={len(self._slots)}")
+        return True
+
+    # ---------------------------------------------------------------
+    # 数据库同步
+    # ---------------------------------------------------------------
+
+    @staticmethod
+    def _parse_vector(value: Any) -> Any:
+        if value is None:
+            return None
+        if isinstance(value, (bytes, bytearray, memoryview)):
+            from app.utils.vector_codec import decode_vector, is_encoded_vector
+
+            if is_encoded_vector(value):
+                return decode_vector(bytes(value))
+            value = bytes(value).decode("utf-8", errors="ignore")
+        if isinstance(value, str):
+            try:
+                value = json.loads(value)
+            except ValueError:
+                return None
+        return value if isinstance(value, list) else None
+
+    def _fetch_rows(self, db: Session, since: Optional[datetime], last_id: str, batch_size: int):
+        """分页读取画像向量，VECTOR 列通过 VEC_TOTEXT 转为文本，不支持时按文本列读取，二进制列直接读取字节"""
+        where = "id > :last_id AND raw_profile_embedding IS NOT NULL"
+        params: Dict[str, Any] = {"last_id": last_id, "limit": batch_size}
+        if since is not None:
+            where += " AND updated_at >= :since"
+            params["since"] = since
+
+        if self._vector_expr:
+            exprs = [self._vector_expr]
+        elif self.storage_format != "vector":
+            exprs = ["raw_profile_embedding"]
+        else:
+            exprs = ["VEC_TOTEXT(raw_profile_embedding)", "raw_profile_embedding"]
+        for i, expr in enumerate(exprs):
+            try:
+                rows = db.execute(
+                    text(f"SELECT id, user_id, {expr} AS embedding, updated_at FROM user_profiles "
+                         f"WHERE {where} ORDER BY id LIMIT :limit"),
+                    params
+                ).fetchall()
+                self._vector_expr = expr
+                return rows
+            except Exception:
+                db.rollback()
+                if i == len(exprs) - 1:
+                    raise
+        return []
+
+    def sync(self, db: Session, force: bool = False, batch_size: int = 500) -> bool:
+        """
+        与数据库同步：首次调用时加载快照（没有快照则全量构建），之后按 updated_at 水位增量拉取变更
+
+        Args:
+            db: 数据库会话
+            force: 忽略同步间隔立即同步
+
+        Returns:
+            索引是否可用于检索
+        """
+        if not self.available:
+            return False
+        now = time.monotonic()
+        if self._loaded and not force and now - self._last_sync < self.sync_interval:
+            return True
+        if not self._sync_lock.acquire(blocking=not self._loaded):
+            # 其他线程正在同步，直接使用当前索引
+            return True
+        try:
+            if not self._loaded:
+                self.load()
+            since = self._watermark
+            watermark = since
+            last_id = ""
+            fetched = 0
+            while True:
+                rows = self._fetch_rows(db, since, last_id, batch_size)
+                if not rows:
+                    break
+                last_id = rows[-1].id
+                for row in rows:
+                    self.upsert(row.user_id, self._parse_vector(row.embedding))
+                    updated_at = row.updated_at
+                    if isinstance(updated_at, str):
+                        updated_at = datetime.fromisoformat(updated_at)
+                    if updated_at is not None and (watermark is None or updated_at > watermark):
+                        watermark = updated_at
+                fetched += len(rows)
+                if len(rows) < batch_size:
+                    break
+
+            with self._lock:
+                self._watermark = watermark
+                self._loaded = True
+                self._last_sync = time.monotonic()
+            self._maybe_train()
+            if since is None:
+                logger.info(f"画像向量索引构建完成: vectors={len(self._slots)}")
+            if self._dirty and (since is None or time.monotonic() - self._last_save >= self.save_interval):
+                self.save()
+            return True
+        except Exception as e:
+            logger.warning(f"同步画像向量索引失败: {e}")
+            return self._loaded
+        finally:
+            self._sync_lock.release()
+
+    def stats(self) -> dict:
+        """索引统计信息"""
+        return {
+            "available": self.available,
+            "loaded": self._loaded,
+            "vectors": len(self._slots),
+            "capacity": len(self._ids),
+            "nlist": len(self._centroids) if self._centroids is not None else 0,
+            "watermark": self._watermark.isoformat() if self._watermark else None,
+            "path": self.path,
+        }
+
+
+def _create_index() -> ProfileVectorIndex:
+    from app.config import settings
+
+    return ProfileVectorIndex(
+        path=settings.VECTOR_INDEX_PATH or None,
+        dimension=settings.VECTOR_INDEX_DIMENSION,
+        nprobe=settings.VECTOR_INDEX_NPROBE,
+        ivf_min_size=settings.VECTOR_INDEX_IVF_MIN_SIZE,
+        sync_interval=settings.VECTOR_INDEX_SYNC_INTERVAL,
+        storage_format=settings.EMBEDDING_STORAGE_FORMAT,
+    )
+
+
+# 全局画像向量索引实例
+profile_vector_index = _create_index()
@@ -0,0 +1,189 @@
+"""
+浏览去重服务
+同一用户在时间窗口内重复浏览同一内容只计一次浏览数。
+去重记录放在可替换的存储中：进程内 TTL 缓存，或多个 worker 共享的本地 SQLite 文件
+"""
+
+import asyncio
+import logging
+import os
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Any, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class DedupStore(ABC):
+    """去重存储接口：记录在 ttl 秒后过期"""
+
+    # 写入是否涉及磁盘等阻塞操作（异步调用方据此决定是否放到线程池执行）
+    blocking = False
+
+    def __init__(self, ttl: float):
+        self.ttl = ttl
+
+    @abstractmethod
+    def add(self, key: str) -> bool:
+        """
+        记录一次访问
+
+        Returns:
+            True 表示键不存在或已过期（本次为新访问），False 表示窗口内已记录过
+        """
+
+    @abstractmethod
+    def __len__(self) -> int:
+        """未过期的记录数"""
+
+
+class MemoryDedupStore(DedupStore):
+    """进程内 TTL 缓存
+
+    所有记录的 ttl 相同，插入顺序即过期顺序：过期记录总在队首，
+    每次写入只弹出队首已过期的记录，均摊 O(1)，不需要全量重建
+    """
+
+    def __init__(self, ttl: float, max_items: int = 100000):
+        super().__init__(ttl)
+        self.max_items = max_items
+        self._expires: "OrderedDict[str, float]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def add(self, key: str) -> bool:
+        now = time.monotonic()
+        with self._lock:
+            while self._expires:
+                oldest_key, expires_at = next(iter(self._expires.items()))
+                if expires_at > now:
+                    break
+                del self._expires[oldest_key]
+            if key in self._expires:
+                return False
+            self._expires[key] = now + self.ttl
+            if len(self._expires) > self.max_items:
+                # 超出容量时淘汰最早的记录，最坏情况是多计一次浏览
+                self._expires.popitem(last=False)
+            return True
+
+    def __len__(self) -> int:
+        return len(self._expires)
+
+
+class SQLiteDedupStore(DedupStore):
+    """多个 worker 共享的本地 SQLite 存储
+
+    依靠 INSERT ... ON CONFLICT 的原子条件更新判断新访问，同一台机器上的所有 worker 共享去重结果；
+    过期记录按写入次数定期批量删除。文件不可用时退回进程内缓存
+    """
+
+    blocking = True
+
+    def __init__(self, path: str, ttl: float, purge_every: int = 1000, max_items: int = 100000):
+        super().__init__(ttl)
+        self.path = path
+        self.purge_every = purge_every
+        self._writes = 0
+        self._conn: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+        self._fallback = MemoryDedupStore(ttl, max_items=max_items)
+
+    def _get_conn(self) -> Optional[sqlite3.Connection]:
+        if not self.path:
+            return None
+        if self._conn is None:
+            try:
+                os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+                conn = sqlite3.connect(self.path, check_same_thread=False, timeout=1)
+                conn.execute("PRAGMA journal_mode=WAL")
+                conn.execute("PRAGMA synchronous=NORMAL")
+                conn.execute(
+                    "CREATE TABLE IF NOT EXISTS view_dedup (key TEXT PRIMARY KEY, expires_at REAL NOT NULL)"
+                )
+                conn.execute("CREATE INDEX IF NOT EXISTS idx_view_dedup_expires ON view_dedup (expires_at)")
+                conn.commit()
+                self._conn = conn
+            except (OSError, sqlite3.Error) as e:
+                logger.warning(f"浏览去重共享存储不可用，仅在进程内去重: {e}")
+                self.path = None
+                return None
+        return self._conn
+
+    def add(self, key: str) -> bool:
+        with self._lock:
+            conn = self._get_conn()
+            if conn is None:
+                return self._fallback.add(key)
+            # 多进程共享，使用墙上时间
+            now = time.time()
+            try:
+                cursor = conn.execute(
+                    "INSERT INTO view_dedup (key, expires_at) VALUES (?, ?) "
+                    "ON CONFLICT(key) DO UPDATE SET expires_at = excluded.expires_at "
+                    "WHERE view_dedup.expires_at <= ?",
+                    (key, now + self.ttl, now)
+                )
+                self._writes += 1
+                if self._writes % self.purge_every == 0:
+                    conn.execute("DELETE FROM view_dedup WHERE expires_at <= ?", (now,))
+                conn.commit()
+                return cursor.rowcount == 1
+            except sqlite3.Error as e:
+                logger.warning(f"浏览去重共享存储写入失败，使用进程内去重: {e}")
+                try:
+                    conn.rollback()
+                except sqlite3.Error:
+                    pass
+                return self._fallback.add(key)
+
+    def __len__(self) -> int:
+        with self._lock:
+            conn = self._get_conn()
+            if conn is None:
+                return len(self._fallback)
+            row = conn.execute("SELECT COUNT(*) FROM view_dedup WHERE expires_at > ?", (time.time(),)).fetchone()
+            return row[0]
+
+
+class ViewDeduplicator:
+    """浏览去重"""
+
+    def __init__(self, store: DedupStore):
+        self.store = store
+
+    def should_count(self, kind: str, item_id: Any, viewer_id: Optional[Any]) -> bool:
+        """
+        判断本次浏览是否计数
+
+        Args:
+            kind: 内容类型，如 topic_card / vote_card / tag_content
+            item_id: 内容ID
+            viewer_id: 浏览者ID，未登录用户每次访问都计数（业务决策）
+        """
+        if not viewer_id or item_id is None:
+            return True
+        return self.store.add(f"{kind}:{item_id}:{viewer_id}")
+
+    async def should_count_async(self, kind: str, item_id: Any, viewer_id: Optional[Any]) -> bool:
+        """异步版本：存储写入会阻塞时在线程池中执行，不占用事件循环"""
+        if not self.store.blocking:
+            return self.should_count(kind, item_id, viewer_id)
+        return await asyncio.to_thread(self.should_count, kind, item_id, viewer_id)
+
+
+def _create_deduplicator() -> ViewDeduplicator:
+    from app.config import settings
+
+    window = settings.VIEW_DEDUP_WINDOW
+    if settings.VIEW_DEDUP_PATH == "memory":
+        store: DedupStore = MemoryDedupStore(window, max_items=settings.VIEW_DEDUP_MAX_ITEMS)
+    else:
+        store = SQLiteDedupStore(settings.VIEW_DEDUP_PATH, window, max_items=settings.VIEW_DEDUP_MAX_ITEMS)
+    return ViewDeduplicator(store)
+
+
+# 全局浏览去重实例
+view_deduplicator = _create_deduplicator()
@@ -9,6 +9,9 @@ from app.models.user import User
 from app.models.user_card_db import UserCard
 from app.database import get_db
 from app.services.points_service import PointsService
+from app.services.card_search_index import vote_card_search_index
+from app.services.counter_service import counter_service
+from app.services.view_dedup import view_deduplicator
 
 logger = logging.getLogger(__name__)
 
@@ -74,6 +77,7 @@ class VoteService:
             self.db.add(relation)
         
         self.db.commit()
+        vote_card_search_index.index_card(vote_card)
         return vote_card
     
     def get_vote_card(self, vote_card_id: str, include_options: bool = True) -> Optional[VoteCard]:
@@ -165,7 +169,7 @@ class VoteService:
             # 如果已经投过票，则直接返回已投票信息，不允许重复投票
             return {
                 "vote_records": existing_votes,
-                "total_votes": vote_card.total_votes,
+                "total_votes": counter_service.overlay("vote_cards", vote_card_id, "total_votes", vote_card.total_votes),
                 "options": self._get_vote_options_with_counts(vote_card_id),
                 "message": "您已经投过票了"
             }    
@@ -183,12 +187,7 @@ class VoteService:
         self.db.add(vote_record)
         vote_records.append(vote_record)
         
-        # 更新选项投票数
-        option.vote_count += 1
-        option.updated_at = datetime.now(timezone.utc)
-        
-        # 更新投票卡片总投票数（加上新的投票数）
-        vote_card.total_votes += 1
+        # 选项投票数和投票卡片总投票数由计数器服务批量写回，避免热点行锁竞争
         
         # 创建用户关联
         existing_relation = self.db.query(UserCardVoteRelation).filter(
@@ -205,6 +204,8 @@ class VoteService:
             self.db.add(relation)
         
         self.db.commit()
+        counter_service.incr("vote_options", option_id, "vote_count")
+        counter_service.incr("vote_cards", vote_card_id, "total_votes")
         
         # 奖励投票参与积分
         try:
@@ -216,7 +217,7 @@ class VoteService:
         
         return {
             "vote_records": vote_records,
-            "total_votes": vote_card.total_votes,
+            "total_votes": counter_service.overlay("vote_cards", vote_card_id, "total_votes", vote_card.total_votes),
             "options": self._get_vote_options_with_counts(vote_card_id),
             "points_rewarded": True
         }
@@ -231,6 +232,8 @@ class VoteService:
         if not vote_card:
             raise ValueError("投票卡片不存在")
         
+        counter_service.apply(vote_card, "vote_cards", ("view_count", "total_votes"))
+        
         # 获取选项和投票数
         options = self._get_vote_options_with_counts(vote_card_id)
         
@@ -358,19 +361,22 @@ class VoteService:
             "total_pages": (total + page_size - 1) // page_size
         }
     
-    def increment_view_count(self, vote_card_id: str) -> bool:
-        """增加浏览次数"""
-        vote_card = self.db.query(VoteCard).filter(
+    def increment_view_count(self, vote_card_id: str, user_id: Optional[str] = None) -> bool:
+        """增加浏览次数（窗口内同一用户重复浏览不计数，由计数器服务批量写回）
+        
+        Returns:
+            本次浏览是否计数；卡片不存在或已删除时返回 False
+        """
+        exists = self.db.query(VoteCard.id).filter(
             VoteCard.id == vote_card_id,
             VoteCard.is_deleted == 0
         ).first()
-        
-        if vote_card:
-            vote_card.view_count += 1
-            self.db.commit()
-            return True
-        
-        return False
+        if not exists:
+            return False
+        if not view_deduplicator.should_count("vote_card", vote_card_id, user_id):
+            return False
+        counter_service.incr("vote_cards", vote_card_id, "view_count")
+        return True
     
     def add_discussion(self, vote_card_id: str, participant_id: str, host_id: str, 
                       message: str, message_type: str = "text", is_anonymous: bool = True) -> VoteDiscussion:
@@ -425,7 +431,7 @@ class VoteService:
                 "id": option.id,
                 "option_text": option.option_text,
                 "option_image": option.option_image,
-                "vote_count": option.vote_count,
+                "vote_count": counter_service.overlay("vote_options", option.id, "vote_count", option.vote_count),
                 "display_order": option.display_order
             })
         
@@ -476,6 +482,24 @@ class VoteService:
             VoteCard.visibility == "public"
         )
         
+        # 优先使用全文索引：按相关度排序，只查询当前页的卡片
+        searched = None
+        if keyword:
+            searched = vote_card_search_index.search_page(
+                self.db, keyword, page, page_size,
+                filters={"visibility": "public", "category": category}
+            )
+        if searched is not None:
+            card_ids, total = searched
+            cards = query.filter(VoteCard.id.in_(card_ids)).all() if card_ids else []
+            rank = {card_id: i for i, card_id in enumerate(card_ids)}
+            return {
+                "cards": sorted(cards, key=lambda card: rank[card.id]),
+                "total": total,
+                "page": page,
+                "page_size": page_size
+            }
+        
         if keyword:
             query = query.filter(
                 or_(
@@ -580,6 +604,7 @@ class VoteService:
             
             # 提交事务
             self.db.commit()
+            vote_card_search_index.index_card(vote_card)
             
             # 返回更新后的投票卡片
             return vote_card
@@ -637,6 +662,7 @@ class VoteService:
             ).delete()
             
             self.db.commit()
+            vote_card_search_index.remove(vote_card_id)
             return True
             
         except Exception as e:
@@ -681,24 +707,19 @@ class VoteService:
             for record in vote_records:
                 record.is_deleted = 1
             
-            # 减少投票卡片的总投票数
-            vote_card.total_votes = max(0, vote_card.total_votes - len(vote_records))
-            
-            # 减少各个选项的投票数
-            vote_options = self.db.query(VoteOption).filter(
-                VoteOption.id.in_(option_ids)
-            ).all()
-            
-            for option in vote_options:
-                option.vote_count = max(0, option.vote_count - 1)
             
             self.db.commit()
             
+            # 减少投票卡片总投票数和各选项投票数（批量写回）
+            counter_service.incr("vote_cards", vote_card_id, "total_votes", -len(vote_records))
+            for option_id in option_ids:
+                counter_service.incr("vote_options", option_id, "vote_count", -1)
+            
             # 返回更新后的投票结果
             return {
                 "success": True,
                 "message": "取消投票成功",
-                "total_votes": vote_card.total_votes,
+                "total_votes": counter_service.overlay("vote_cards", vote_card_id, "total_votes", vote_card.total_votes),
                 "options": self._get_vote_options_with_counts(vote_card_id)
             }
             
@@ -747,25 +768,19 @@ class VoteService:
             for record in vote_records:
                 record.is_deleted = 1
             
-            # 减少投票卡片的总投票数
-            vote_card.total_votes = max(0, vote_card.total_votes - len(vote_records))
-            
-            # 减少各个选项的投票数
-            vote_options = self.db.query(VoteOption).filter(
-                VoteOption.id.in_(option_ids)
-            ).all()
-            
-            for option in vote_options:
-                option.vote_count = max(0, option.vote_count - 1)
-                print(f"Option {option.id} vote_count: {option.vote_count}")
             
             self.db.commit()
             
+            # 减少投票卡片总投票数和各选项投票数（批量写回）
+            counter_service.incr("vote_cards", vote_card_id, "total_votes", -len(vote_records))
+            for option_id in option_ids:
+                counter_service.incr("vote_options", option_id, "vote_count", -1)
+            
             # 返回更新后的投票结果
             return {
                 "success": True,
                 "message": "取消投票成功",
-                "total_votes": vote_card.total_votes,
+                "total_votes": counter_service.overlay("vote_cards", vote_card_id, "total_votes", vote_card.total_votes),
                 "options": self._get_vote_options_with_counts(vote_card_id)
             }
             
@@ -1,24 +1,6 @@
-from sqlalchemy import create_engine
-from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker
-from app.config import settings
+"""
+兼容旧的导入路径：引擎、会话与 Base 统一由 app.database 提供，不再单独创建引擎
+"""
+from app.database import DATABASE_URL, Base, SessionLocal, engine, get_db
 
-# 使用 config.py 中的配置获取数据库URL
-DATABASE_URL = settings.computed_database_url
-
-# 创建数据库引擎
-engine = create_engine(DATABASE_URL)
-
-# 创建会话
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
-
-# 创建Base类
-Base = declarative_base()
-
-# 获取数据库会话
-def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
\ No newline at end of file
+__all__ = ["DATABASE_URL", "Base", "SessionLocal", "engine", "get_db"]
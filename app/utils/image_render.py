@@ -0,0 +1,31 @@
+"""
+图片缩放与 WebP 编码
+在衍生图进程池的子进程中执行；子进程以 forkserver/spawn 方式启动，只导入本模块，
+不加载应用配置、数据库连接等重量级依赖
+"""
+
+import os
+import uuid
+
+try:
+    from PIL import Image, ImageOps
+except ImportError:
+    Image = None
+    ImageOps = None
+
+
+def render_webp(source_path: str, target_path: str, max_edge: int, quality: int):
+    """缩放并转为 WebP，先写临时文件再原子替换"""
+    with Image.open(source_path) as img:
+        img = ImageOps.exif_transpose(img)
+        img.thumbnail((max_edge, max_edge))
+        if img.mode not in ("RGB", "RGBA"):
+            img = img.convert("RGBA" if img.mode in ("LA", "P", "PA") else "RGB")
+        os.makedirs(os.path.dirname(target_path), exist_ok=True)
+        tmp_path = f"{target_path}.{uuid.uuid4().hex}.tmp"
+        try:
+            img.save(tmp_path, format="WEBP", quality=quality)
+            os.replace(tmp_path, target_path)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
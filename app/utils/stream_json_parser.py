@@ -0,0 +1,159 @@
+"""
+流式JSON字段提取工具
+在LLM流式输出过程中增量解析JSON对象，顶层字段一旦完整即可取出，无需等待整个响应结束
+"""
+
+import json
+from typing import Any, Dict, List, Optional, Tuple
+
+
+class StreamingJSONFieldExtractor:
+    """增量JSON顶层字段提取器
+
+    逐块喂入文本，按字符推进状态机，只扫描一次新到达的内容。
+    识别到第一个 `{` 后开始解析顶层对象，每当一个顶层字段的值完整时即返回 (key, value)。
+    原始文本以分块列表保存，最终通过一次 join 拼接，避免字符串反复拼接带来的 O(n²) 开销。
+    """
+
+    _LITERALS = {"true": True, "false": False, "null": None}
+
+    def __init__(self):
+        self._chunks: List[str] = []
+        self.fields: Dict[str, Any] = {}
+        self.object_started = False
+        self.object_finished = False
+
+        # 对象内部状态
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        # 顶层解析阶段: key / colon / value
+        self._stage = "key"
+        self._key_chars: List[str] = []
+        self._current_key: Optional[str] = None
+        self._value_chars: List[str] = []
+        self._value_emitted = False
+
+    def feed(self, text: str) -> List[Tuple[str, Any]]:
+        """
+        喂入一段新文本
+
+        Args:
+            text: 新到达的文本块
+
+        Returns:
+            本次新完成的顶层字段列表 [(key, value), ...]
+        """
+        if not text:
+            return []
+        self._chunks.append(text)
+        if self.object_finished:
+            return []
+
+        completed: List[Tuple[str, Any]] = []
+        for ch in text:
+            if not self.object_started:
+                if ch == "{":
+                    self.object_started = True
+                    self._depth = 1
+                continue
+
+            if self._stage == "value":
+                self._consume_value_char(ch, completed)
+            else:
+                self._consume_key_char(ch)
+
+            if self.object_finished:
+                break
+        return completed
+
+    def _consume_key_char(self, ch: str):
+        """处理字段名及冒号阶段的字符"""
+        if self._in_string:
+            if self._escape:
+                self._key_chars.append(ch)
+                self._escape = False
+            elif ch == "\\":
+                self._key_chars.append(ch)
+                self._escape = True
+            elif ch == '"':
+                self._in_string = False
+                try:
+                    self._current_key = json.loads('"' + "".join(self._key_chars) + '"')
+                except ValueError:
+                    self._current_key = "".join(self._key_chars)
+                self._key_chars = []
+                self._stage = "colon"
+            else:
+                self._key_chars.append(ch)
+            return
+
+        if self._stage == "key":
+            if ch == '"':
+                self._in_string = True
+            elif ch == "}":
+                self._depth = 0
+                self.object_finished = True
+        elif self._stage == "colon" and ch == ":":
+            self._stage = "value"
+            self._value_chars = []
+            self._value_emitted = False
+
+    def _consume_value_char(self, ch: str, completed: List[Tuple[str, Any]]):
+        """处理字段值阶段的字符"""
+        if self._in_string:
+            self._value_chars.append(ch)
+            if self._escape:
+                self._escape = False
+            elif ch == "\\":
+                self._escape = True
+            elif ch == '"':
+                self._in_string = False
+                if self._depth == 1:
+                    # 顶层字符串值在闭合引号处即完整
+                    self._emit(completed)
+            return
+
+        if self._depth == 1 and ch in ",}":
+            self._emit(completed)
+            self._stage = "key"
+            if ch == "}":
+                self._depth = 0
+                self.object_finished = True
+            return
+
+        self._value_chars.append(ch)
+        if ch == '"':
+            self._in_string = True
+        elif ch in "{[":
+            self._depth += 1
+        elif ch in "}]":
+            self._depth -= 1
+            if self._depth == 1:
+                self._emit(completed)
+        elif self._depth == 1 and not self._value_emitted:
+            # 顶层字面量(true/false/null)拼写完整即可提前返回
+            if "".join(self._value_chars).strip() in self._LITERALS:
+                self._emit(completed)
+
+    def _emit(self, completed: List[Tuple[str, Any]]):
+        """解析当前字段值并记录"""
+        if self._value_emitted or self._current_key is None:
+            return
+        raw = "".join(self._value_chars).strip()
+        if not raw:
+            return
+        try:
+            value = json.loads(raw)
+        except ValueError:
+            return
+        self._value_emitted = True
+        self.fields[self._current_key] = value
+        completed.append((self._current_key, value))
+
+    @property
+    def text(self) -> str:
+        """已接收的完整文本"""
+        if len(self._chunks) > 1:
+            self._chunks = ["".join(self._chunks)]
+        return self._chunks[0] if self._chunks else ""
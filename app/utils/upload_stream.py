@@ -0,0 +1,165 @@
+"""
+流式文件上传
+按固定大小分块读取上传内容，边读边校验大小、计算哈希并写入临时文件，
+写完后原子重命名为目标文件；磁盘写入在线程池中执行，不阻塞事件循环，
+无论文件多大，单个上传占用的内存都只有一个分块
+"""
+
+import asyncio
+import hashlib
+import os
+import uuid
+from typing import Any, AsyncIterator, BinaryIO, Dict, Iterable, Optional
+
+DEFAULT_CHUNK_SIZE = 262_144  # 256KB
+
+
+class UploadTooLargeError(ValueError):
+    """上传内容超过大小限制"""
+
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        super().__init__(f"文件大小超过限制 ({max_size / (1024 * 1024):.1f}MB)")
+
+
+class ChunkedFileWriter:
+    """分块写入临时文件，完成后原子重命名"""
+
+    def __init__(self, directory: str, max_size: Optional[int] = None):
+        """
+        Args:
+            directory: 目标目录（临时文件也放在这里，保证重命名在同一文件系统内）
+            max_size: 大小上限（字节），为空时不限制
+        """
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.max_size = max_size
+        self.size = 0
+        self.temp_path = os.path.join(directory, f".{uuid.uuid4().hex}.part")
+        self._hash = hashlib.sha256()
+        self._file: Optional[BinaryIO] = open(self.temp_path, "wb")
+
+    @property
+    def sha256(self) -> str:
+        return self._hash.hexdigest()
+
+    def write(self, chunk: bytes):
+        """写入一个分块，超过大小上限时立即中止并删除临时文件"""
+        self.size += len(chunk)
+        if self.max_size is not None and self.size > self.max_size:
+            self.abort()
+            raise UploadTooLargeError(self.max_size)
+        self._hash.update(chunk)
+        self._file.write(chunk)
+
+    def commit(self, path: str) -> str:
+        """写入完成，重命名为目标文件"""
+        self._file.close()
+        self._file = None
+        os.replace(self.temp_path, path)
+        return path
+
+    def abort(self):
+        """放弃写入，删除临时文件"""
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+        try:
+            os.remove(self.temp_path)
+        except OSError:
+            pass
+
+
+async def iter_upload_file(file: Any, chunk_size: int = DEFAULT_CHUNK_SIZE) -> AsyncIterator[bytes]:
+    """按分块读取 UploadFile"""
+    while True:
+        chunk = await file.read(chunk_size)
+        if not chunk:
+            break
+        yield chunk
+
+
+async def write_stream(
+    chunks: AsyncIterator[bytes],
+    directory: str,
+    max_size: Optional[int] = None
+) -> ChunkedFileWriter:
+    """
+    将分块流写入临时文件，返回尚未提交的 writer（由调用方决定 commit 到哪里或 abort）
+
+    Raises:
+        UploadTooLargeError: 超过大小上限（已读取的部分不会留在磁盘上）
+    """
+    writer = await asyncio.to_thread(ChunkedFileWriter, directory, max_size)
+    try:
+        async for chunk in chunks:
+            await asyncio.to_thread(writer.write, chunk)
+    except BaseException:
+        await asyncio.to_thread(writer.abort)
+        raise
+    return writer
+
+
+def write_file_object(
+    source: BinaryIO,
+    directory: str,
+    max_size: Optional[int] = None,
+    chunk_size: int = DEFAULT_CHUNK_SIZE
+) -> ChunkedFileWriter:
+    """同步版本的 write_stream：分块读取文件对象写入临时文件"""
+    chunks: Iterable[bytes] = iter(lambda: source.read(chunk_size), b"")
+    writer = ChunkedFileWriter(directory, max_size)
+    try:
+        for chunk in chunks:
+            writer.write(chunk)
+    except BaseException:
+        writer.abort()
+        raise
+    return writer
+
+
+async def save_stream(
+    chunks: AsyncIterator[bytes],
+    directory: str,
+    filename: str,
+    max_size: Optional[int] = None
+) -> Dict[str, Any]:
+    """
+    将分块流保存为文件
+
+    Args:
+        chunks: 分块流（UploadFile 分块或 ASGI 请求体 request.stream()）
+        directory: 目标目录
+        filename: 目标文件名
+        max_size: 大小上限（字节）
+
+    Returns:
+        {"file_path", "file_size", "sha256"}
+
+    Raises:
+        UploadTooLargeError: 超过大小上限（已读取的部分不会留在磁盘上）
+    """
+    writer = await write_stream(chunks, directory, max_size)
+    try:
+        file_path = await asyncio.to_thread(writer.commit, os.path.join(directory, filename))
+    except BaseException:
+        await asyncio.to_thread(writer.abort)
+        raise
+    return {"file_path": file_path, "file_size": writer.size, "sha256": writer.sha256}
+
+
+def save_file_object(
+    source: BinaryIO,
+    directory: str,
+    filename: str,
+    max_size: Optional[int] = None,
+    chunk_size: int = DEFAULT_CHUNK_SIZE
+) -> Dict[str, Any]:
+    """同步版本：将文件对象分块保存为文件，返回值同 save_stream"""
+    writer = write_file_object(source, directory, max_size, chunk_size)
+    try:
+        file_path = writer.commit(os.path.join(directory, filename))
+    except BaseException:
+        writer.abort()
+        raise
+    return {"file_path": file_path, "file_size": writer.size, "sha256": writer.sha256}
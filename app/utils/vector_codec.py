@@ -0,0 +1,97 @@
+"""
+向量二进制编解码工具
+替代 JSON 文本存储的紧凑格式：float32 / float16，或按向量缩放的 int8 标量量化；
+解码时使用 numpy.frombuffer 直接映射字节，float32/float16 无需拷贝和解析
+"""
+
+import struct
+from typing import Any, Optional
+
+import numpy as np
+from sqlalchemy import types
+
+# 头部: 魔数(2字节) + 精度代码(1字节) + 保留(1字节)，保证 float32 数据按4字节对齐
+_MAGIC = b"EV"
+_HEADER_SIZE = 4
+_DTYPES = {"float32": 1, "float16": 2, "int8": 3}
+_NUMPY_DTYPES = {1: np.dtype("<f4"), 2: np.dtype("<f2")}
+
+STORAGE_FORMATS = tuple(_DTYPES)
+
+
+def is_encoded_vector(data: Any) -> bool:
+    """判断字节是否为本模块编码的向量"""
+    return isinstance(data, (bytes, bytearray, memoryview)) and bytes(data[:2]) == _MAGIC
+
+
+def encode_vector(vector: Any, dtype: str = "float32") -> bytes:
+    """
+    将向量编码为紧凑字节
+
+    Args:
+        vector: 向量（列表或numpy数组）
+        dtype: 存储精度 float32 / float16 / int8
+
+    Returns:
+        编码后的字节
+    """
+    code = _DTYPES.get(dtype)
+    if code is None:
+        raise ValueError(f"不支持的向量存储精度: {dtype}")
+    v = np.asarray(vector, dtype=np.float32).reshape(-1)
+    header = _MAGIC + bytes((code, 0))
+    if code in _NUMPY_DTYPES:
+        return header + v.astype(_NUMPY_DTYPES[code], copy=False).tobytes()
+
+    # int8 对称量化：每个向量单独记录缩放系数
+    max_abs = float(np.max(np.abs(v))) if v.size else 0.0
+    scale = max_abs / 127.0 if max_abs else 0.0
+    quantized = np.round(v / scale).astype(np.int8) if scale else np.zeros(v.shape, dtype=np.int8)
+    return header + struct.pack("<f", scale) + quantized.tobytes()
+
+
+def decode_vector(data: Any) -> Optional[np.ndarray]:
+    """
+    解码向量字节
+
+    float32/float16 返回直接引用原始字节的只读数组（零拷贝），int8 返回反量化后的 float32 数组
+
+    Args:
+        data: encode_vector 生成的字节
+
+    Returns:
+        numpy 数组，格式不识别时返回 None
+    """
+    if not is_encoded_vector(data):
+        return None
+    code = data[2]
+    if code in _NUMPY_DTYPES:
+        return np.frombuffer(data, dtype=_NUMPY_DTYPES[code], offset=_HEADER_SIZE)
+    if code == _DTYPES["int8"]:
+        scale = struct.unpack_from("<f", data, _HEADER_SIZE)[0]
+        quantized = np.frombuffer(data, dtype=np.int8, offset=_HEADER_SIZE + 4)
+        return quantized.astype(np.float32) * np.float32(scale)
+    return None
+
+
+class BinaryVector(types.TypeDecorator):
+    """二进制向量列类型，写入时编码，读取时解码为 numpy 数组"""
+
+    impl = types.LargeBinary
+    cache_ok = True
+
+    def __init__(self, dtype: str = "float32", *args, **kwargs):
+        if dtype not in _DTYPES:
+            raise ValueError(f"不支持的向量存储精度: {dtype}")
+        self.dtype = dtype
+        super().__init__(*args, **kwargs)
+
+    def process_bind_param(self, value, dialect):
+        if value is None or isinstance(value, (bytes, bytearray)):
+            return value
+        return encode_vector(value, self.dtype)
+
+    def process_result_value(self, value, dialect):
+        if value is None:
+            return None
+        return decode_vector(value)
@@ -7,6 +7,7 @@ import httpx
 import asyncio
 from typing import Dict, Any, Optional
 from app.config import settings
+from app.utils.wechat_token import INVALID_TOKEN_ERRCODES, wechat_token_manager
 import json
 
 class WeChatAPIClient:
@@ -26,21 +27,10 @@ class WeChatAPIClient:
         Raises:
             Exception: 获取access_token失败
         """
-        url = f"{self.base_url}/cgi-bin/token"
-        params = {
-            "grant_type": "client_credential",
-            "appid": settings.WECHAT_APP_ID,
-            "secret": settings.WECHAT_APP_SECRET
-        }
-        
-        async with httpx.AsyncClient(timeout=self.timeout) as client:
-            response = await client.get(url, params=params)
-            data = response.json()
-            
-            if "access_token" in data:
-                return data["access_token"]
-            else:
-                raise Exception(f"获取access_token失败: {data.get('errmsg', 'unknown error')}")
+        access_token = await wechat_token_manager.get_token()
+        if not access_token:
+            raise Exception("获取access_token失败")
+        return access_token
     
     async def media_check_async(
         self, 
@@ -92,6 +82,10 @@ class WeChatAPIClient:
                 # 记录请求信息用于调试
                 print(f"微信媒体检测API调用: url={media_url}, type={media_type}, scene={scene}, result={result}")
                 
+                if result.get("errcode") in INVALID_TOKEN_ERRCODES:
+                    # 缓存的 access_token 已失效，强制刷新
+                    await wechat_token_manager.get_token(force_refresh=True)
+                
                 return result
                 
         except Exception as e:
@@ -159,6 +153,10 @@ class WeChatAPIClient:
                 # 记录请求信息用于调试
                 print(f"微信文本检测API调用: content_length={len(content)}, scene={scene}, result={result}")
                 
+                if result.get("errcode") in INVALID_TOKEN_ERRCODES:
+                    # 缓存的 access_token 已失效，强制刷新
+                    await wechat_token_manager.get_token(force_refresh=True)
+                
                 return result
                 
         except Exception as e:
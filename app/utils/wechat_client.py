@@ -0,0 +1,209 @@
+"""
+微信接口异步客户端
+所有请求共用一个带连接池的 httpx.AsyncClient，设置超时，失败时按指数退避加随机抖动重试，
+连续失败达到阈值后熔断一段时间，直接拒绝请求，避免微信接口变慢时拖住所有 worker
+"""
+
+import asyncio
+import logging
+import random
+import threading
+import time
+from typing import Any, Dict, Optional
+
+import httpx
+
+logger = logging.getLogger(__name__)
+
+BASE_URL = "https://api.weixin.qq.com"
+
+# 微信“系统繁忙”错误码，请求未被处理，可以重试
+_BUSY_ERRCODES = {-1}
+
+# 请求未发出的网络错误，重试不会重复消费 code
+_RETRYABLE_ERRORS = (httpx.ConnectError, httpx.ConnectTimeout, httpx.PoolTimeout)
+
+
+class WeChatUnavailableError(Exception):
+    """微信接口不可用（网络失败、重试耗尽或已熔断）"""
+
+
+class _BusyError(Exception):
+    """微信系统繁忙"""
+
+
+class CircuitBreaker:
+    """熔断器
+
+    - closed: 正常放行，连续失败 failure_threshold 次后转为 open
+    - open: 拒绝所有请求，reset_timeout 秒后转为 half-open
+    - half-open: 只放行一个探测请求，成功则恢复 closed，失败则重新 open
+    """
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = "closed"
+        self.failures = 0
+        self._opened_at = 0.0
+        self._probing = False
+        self._lock = threading.Lock()
+
+    def acquire(self) -> Optional[str]:
+        """申请放行本次请求，返回放行时的状态（"closed" 或作为探测请求的 "half-open"），拒绝时返回 None"""
+        with self._lock:
+            if self.state == "closed":
+                return "closed"
+            if self.state == "open":
+                if time.monotonic() - self._opened_at < self.reset_timeout:
+                    return None
+                self.state = "half-open"
+                self._probing = False
+            if self._probing:
+                return None
+            self._probing = True
+            return "half-open"
+
+    def allow(self) -> bool:
+        """是否放行本次请求"""
+        return self.acquire() is not None
+
+    def record_success(self):
+        with self._lock:
+            self.state = "closed"
+            self.failures = 0
+            self._probing = False
+
+    def release(self):
+        """探测请求未得出结果就结束（如被取消）时释放探测名额，让后续请求重新探测"""
+        with self._lock:
+            if self.state == "half-open":
+                self._probing = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.state == "half-open" or self.failures >= self.failure_threshold:
+                if self.state != "open":
+                    logger.warning(f"微信接口熔断: failures={self.failures}")
+                self.state = "open"
+                self._opened_at = time.monotonic()
+                self._probing = False
+
+
+class WeChatAsyncClient:
+    """微信接口异步客户端"""
+
+    def __init__(
+        self,
+        timeout: float = 5.0,
+        retries: int = 2,
+        backoff: float = 0.2,
+        breaker: Optional[CircuitBreaker] = None,
+        max_connections: int = 50,
+        transport: Optional[httpx.AsyncBaseTransport] = None
+    ):
+        """
+        Args:
+            timeout: 单次请求超时（秒）
+            retries: 失败后的最大重试次数
+            backoff: 退避基数（秒），第 n 次重试前等待 [0, backoff * 2^n) 内的随机时间
+            breaker: 熔断器
+            max_connections: 连接池大小
+            transport: 自定义传输层（测试用）
+        """
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff = backoff
+        self.breaker = breaker or CircuitBreaker()
+        self.max_connections = max_connections
+        self._transport = transport
+        self._client: Optional[httpx.AsyncClient] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    def _get_client(self) -> httpx.AsyncClient:
+        loop = asyncio.get_running_loop()
+        if self._client is None or self._loop is not loop:
+            # 连接池绑定事件循环，事件循环变化时（如测试中多次 asyncio.run）重新创建
+            self._client = httpx.AsyncClient(
+                base_url=BASE_URL,
+                timeout=self.timeout,
+                limits=httpx.Limits(max_connections=self.max_connections, max_keepalive_connections=self.max_connections),
+                transport=self._transport
+            )
+            self._loop = loop
+        return self._client
+
+    async def request_json(
+        self,
+        method: str,
+        path: str,
+        params: Optional[Dict[str, Any]] = None,
+        json: Optional[Dict[str, Any]] = None,
+        retry_on_timeout: bool = False
+    ) -> Dict[str, Any]:
+        """
+        请求微信接口并返回 JSON
+
+        只在请求未发出（建连失败）、微信返回系统繁忙或 5xx 时重试；
+        读超时默认不重试，因为 code 类参数可能已被微信消费，重试只会得到“code 已使用”
+
+        Raises:
+            WeChatUnavailableError: 已熔断，或网络失败且重试耗尽
+        """
+        admitted = self.breaker.acquire()
+        if admitted is None:
+            raise WeChatUnavailableError("微信服务暂时不可用，请稍后再试")
+        retryable = _RETRYABLE_ERRORS + ((httpx.TimeoutException,) if retry_on_timeout else ())
+        attempt = 0
+        try:
+            while True:
+                try:
+                    response = await self._get_client().request(method, path, params=params, json=json)
+                    if response.status_code >= 500:
+                        raise httpx.HTTPStatusError(
+                            f"微信接口返回 {response.status_code}", request=response.request, response=response
+                        )
+                    result = response.json()
+                    if result.get("errcode") in _BUSY_ERRCODES:
+                        raise _BusyError(result.get("errmsg", "system busy"))
+                    self.breaker.record_success()
+                    return result
+                except (httpx.HTTPStatusError, _BusyError) + retryable as e:
+                    error = e
+                    can_retry = True
+                except (httpx.HTTPError, ValueError) as e:
+                    # 读超时、返回内容不是 JSON 等
+                    error = e
+                    can_retry = False
+                if not can_retry or attempt >= self.retries:
+                    self.breaker.record_failure()
+                    raise WeChatUnavailableError(f"微信服务连接失败: {error}") from error
+                await asyncio.sleep(random.uniform(0, self.backoff * (2 ** attempt)))
+                attempt += 1
+        finally:
+            # 探测请求被取消或出现未预期的异常时，不能一直占用探测名额
+            if admitted == "half-open":
+                self.breaker.release()
+
+    async def close(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+
+def _create_client() -> WeChatAsyncClient:
+    from app.config import settings
+
+    return WeChatAsyncClient(
+        timeout=settings.WECHAT_HTTP_TIMEOUT,
+        retries=settings.WECHAT_HTTP_RETRIES,
+        breaker=CircuitBreaker(
+            failure_threshold=settings.WECHAT_BREAKER_FAILURES,
+            reset_timeout=settings.WECHAT_BREAKER_RESET_TIMEOUT
+        ),
+    )
+
+
+# 全局微信接口异步客户端
+wechat_async_client = _create_client()
@@ -0,0 +1,247 @@
+"""
+微信 access_token 管理
+全进程共用一个 access_token：缓存到过期前，临近过期时后台单飞刷新，
+并写入本地文件，服务重启和同机的其他 worker 直接复用，避免每次调用微信接口前都重新获取
+"""
+
+import asyncio
+import contextlib
+import json
+import logging
+import os
+import threading
+import time
+from typing import Any, Callable, Dict, Iterator, Optional
+
+import httpx
+
+try:
+    import fcntl
+except ImportError:  # Windows 下没有文件锁，只做进程内单飞
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+TOKEN_URL = "https://api.weixin.qq.com/cgi-bin/token"
+
+# access_token 无效或过期的错误码，遇到后应强制刷新
+INVALID_TOKEN_ERRCODES = {40001, 40014, 42001}
+
+
+class WeChatTokenManager:
+    """微信 access_token 管理器"""
+
+    def __init__(
+        self,
+        app_id: str,
+        app_secret: str,
+        cache_path: Optional[str] = None,
+        refresh_ahead: int = 600,
+        expiry_margin: int = 60,
+        timeout: float = 10.0,
+        fetcher: Optional[Callable[[], Dict[str, Any]]] = None
+    ):
+        """
+        Args:
+            app_id: 小程序 AppID
+            app_secret: 小程序 AppSecret
+            cache_path: 本地缓存文件路径，为空时只缓存在内存中
+            refresh_ahead: 过期前多少秒开始后台刷新（期间继续使用当前 token）
+            expiry_margin: 过期前多少秒视为已过期，必须同步刷新
+            timeout: 请求微信接口的超时时间（秒）
+            fetcher: 获取新 token 的函数，返回 {"access_token", "expires_in"}，默认请求微信接口
+        """
+        self.app_id = app_id
+        self.app_secret = app_secret
+        self.cache_path = cache_path
+        self.refresh_ahead = refresh_ahead
+        self.expiry_margin = expiry_margin
+        self.timeout = timeout
+        self._fetcher = fetcher or self._fetch
+        self._token: Optional[str] = None
+        self._expires_at = 0.0  # 墙上时间，与其他进程共享
+        self._lock = threading.Lock()
+        self._flag_lock = threading.Lock()
+        self._refreshing = False
+        self._client: Optional[httpx.Client] = None
+        self.refresh_count = 0
+
+    # ---------------------------------------------------------------
+    # 本地文件
+    # ---------------------------------------------------------------
+
+    def _load_file(self):
+        """读取本地缓存，文件中的 token 更新时采用文件中的"""
+        if not self.cache_path or not os.path.exists(self.cache_path):
+            return
+        try:
+            with open(self.cache_path, encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError) as e:
+            logger.warning(f"读取微信 access_token 缓存失败: {e}")
+            return
+        if data.get("app_id") != self.app_id or not data.get("access_token"):
+            return
+        expires_at = float(data.get("expires_at") or 0)
+        if expires_at > self._expires_at:
+            self._token = data["access_token"]
+            self._expires_at = expires_at
+
+    def _save_file(self):
+        if not self.cache_path:
+            return
+        try:
+            os.makedirs(os.path.dirname(os.path.abspath(self.cache_path)), exist_ok=True)
+            tmp_path = f"{self.cache_path}.{os.getpid()}.tmp"
+            fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump({"app_id": self.app_id, "access_token": self._token, "expires_at": self._expires_at}, f)
+            os.replace(tmp_path, self.cache_path)
+        except OSError as e:
+            logger.warning(f"写入微信 access_token 缓存失败: {e}")
+
+    @contextlib.contextmanager
+    def _file_lock(self) -> Iterator[None]:
+        """跨进程锁，保证同一台机器上只有一个 worker 在请求微信接口"""
+        if fcntl is None or not self.cache_path:
+            yield
+            return
+        try:
+            os.makedirs(os.path.dirname(os.path.abspath(self.cache_path)), exist_ok=True)
+            lock_file = open(f"{self.cache_path}.lock", "a")
+        except OSError:
+            yield
+            return
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+            lock_file.close()
+
+    # ---------------------------------------------------------------
+    # 刷新
+    # ---------------------------------------------------------------
+
+    def _fetch(self) -> Dict[str, Any]:
+        if self._client is None:
+            self._client = httpx.Client(timeout=self.timeout)
+        response = self._client.get(TOKEN_URL, params={
+            "grant_type": "client_credential",
+            "appid": self.app_id,
+            "secret": self.app_secret
+        })
+        response.raise_for_status()
+        result = response.json()
+        if "access_token" not in result:
+            raise ValueError(f"错误码 {result.get('errcode')}, 错误信息: {result.get('errmsg', '未知错误')}")
+        return result
+
+    def _fresh(self, now: float) -> bool:
+        return self._token is not None and now < self._expires_at - self.expiry_margin
+
+    def _refresh(self, force: bool = False, stale_token: Optional[str] = None) -> Optional[str]:
+        """
+        单飞刷新：拿到锁后先读本地文件，其他线程或 worker 已经刷新过则直接使用
+
+        Args:
+            force: 强制刷新（当前 token 已被微信判定无效）
+            stale_token: 强制刷新时已知无效的 token
+        """
+        with self._lock, self._file_lock():
+            self._load_file()
+            now = time.time()
+            if self._fresh(now):
+                if force and self._token != stale_token:
+                    return self._token
+                if not force and now < self._expires_at - self.refresh_ahead:
+                    return self._token
+            try:
+                result = self._fetcher()
+            except Exception as e:
+                logger.warning(f"获取微信 access_token 失败: {e}")
+                # 后台刷新失败时，未过期的 token 仍可继续使用
+                return self._token if not force and self._fresh(now) else None
+            self._token = result["access_token"]
+            self._expires_at = now + int(result.get("expires_in") or 7200)
+            self.refresh_count += 1
+            self._save_file()
+            return self._token
+
+    def _refresh_in_background(self):
+        with self._flag_lock:
+            if self._refreshing:
+                return
+            self._refreshing = True
+
+        def run():
+            try:
+                self._refresh()
+            finally:
+                self._refreshing = False
+
+        threading.Thread(target=run, name="wechat-token-refresh", daemon=True).start()
+
+    def _cached(self, force_refresh: bool) -> Optional[str]:
+        """命中缓存时返回 token，临近过期时触发后台刷新"""
+        if force_refresh:
+            return None
+        if self._token is None:
+            self._load_file()
+        now = time.time()
+        if not self._fresh(now):
+            return None
+        if now >= self._expires_at - self.refresh_ahead:
+            self._refresh_in_background()
+        return self._token
+
+    # ---------------------------------------------------------------
+    # 对外接口
+    # ---------------------------------------------------------------
+
+    def get_token_sync(self, force_refresh: bool = False) -> Optional[str]:
+        """
+        获取 access_token（同步）
+
+        Args:
+            force_refresh: 当前 token 被微信接口判定无效时传 True
+
+        Returns:
+            access_token，获取失败时返回 None
+        """
+        token = self._cached(force_refresh)
+        if token is not None:
+            return token
+        return self._refresh(force=force_refresh, stale_token=self._token if force_refresh else None)
+
+    async def get_token(self, force_refresh: bool = False) -> Optional[str]:
+        """获取 access_token（异步，需要刷新时在线程中执行，不阻塞事件循环）"""
+        token = self._cached(force_refresh)
+        if token is not None:
+            return token
+        return await asyncio.to_thread(
+            self._refresh, force_refresh, self._token if force_refresh else None
+        )
+
+    def info(self) -> Dict[str, Any]:
+        """token 状态（不含 token 本身）"""
+        return {
+            "cached": self._token is not None,
+            "expires_in": max(0, int(self._expires_at - time.time())) if self._token else 0,
+            "refresh_count": self.refresh_count,
+        }
+
+
+def _create_manager() -> WeChatTokenManager:
+    from app.config import settings
+
+    return WeChatTokenManager(
+        settings.WECHAT_APP_ID,
+        settings.WECHAT_APP_SECRET,
+        cache_path=settings.WECHAT_TOKEN_CACHE_PATH or None,
+        refresh_ahead=settings.WECHAT_TOKEN_REFRESH_AHEAD,
+    )
+
+
+# 全局微信 access_token 管理器
+wechat_token_manager = _create_manager()
@@ -0,0 +1,139 @@
+"""
+小程序码本地缓存
+同一组参数（scene/page/width/颜色等）生成的小程序码是固定的，按规范化参数的哈希保存到本地磁盘，
+重复请求直接返回缓存的图片，不再请求微信接口；总大小超过上限时淘汰最久未使用的文件
+"""
+
+import hashlib
+import json
+import logging
+import os
+import threading
+import uuid
+from typing import Any, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+class WxacodeCache:
+    """按参数哈希寻址的小程序码磁盘缓存"""
+
+    def __init__(self, directory: str, max_bytes: int = 209_715_200, namespace: str = ""):
+        """
+        Args:
+            directory: 缓存目录，按哈希前两位分子目录
+            max_bytes: 缓存总大小上限（字节），超出后淘汰到上限的 90%
+            namespace: 参与哈希的命名空间（小程序 AppID），更换 AppID 后旧缓存不再命中
+        """
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.namespace = namespace
+        self._size: Optional[int] = None
+        self._lock = threading.Lock()
+
+    def key(self, params: Dict[str, Any]) -> str:
+        """规范化参数后计算缓存键"""
+        normalized = json.dumps(
+            {"namespace": self.namespace, "params": params},
+            sort_keys=True, ensure_ascii=False, separators=(",", ":")
+        )
+        return hashlib.sha256(normalized.encode("utf-8")).hexdigest()
+
+    def path(self, key: str) -> str:
+        return os.path.join(self.directory, key[:2], f"{key}.png")
+
+    def exists(self, key: str) -> bool:
+        return os.path.isfile(self.path(key))
+
+    def get(self, key: str) -> Optional[bytes]:
+        """读取缓存图片，未命中时返回 None"""
+        path = self.path(key)
+        try:
+            with open(path, "rb") as f:
+                data = f.read()
+            # 以修改时间记录最近使用时间，淘汰时按它排序（atime 在 noatime 挂载下不可靠）
+            os.utime(path)
+        except OSError:
+            return None
+        return data
+
+    def put(self, key: str, data: bytes):
+        """写入缓存图片（先写临时文件再原子替换，其他 worker 不会读到半个文件）"""
+        path = self.path(key)
+        tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(tmp_path, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            logger.warning(f"写入小程序码缓存失败: {e}")
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+            return
+
+        with self._lock:
+            if self._size is None:
+                self._size = self._total_size()
+            else:
+                self._size += len(data)
+            if self._size > self.max_bytes:
+                self._evict()
+
+    def _list_files(self) -> List[Tuple[float, int, str]]:
+        """所有缓存文件的 (最近使用时间, 大小, 路径)"""
+        files = []
+        if not os.path.isdir(self.directory):
+            return files
+        for shard in os.listdir(self.directory):
+            shard_dir = os.path.join(self.directory, shard)
+            if not os.path.isdir(shard_dir):
+                continue
+            for name in os.listdir(shard_dir):
+                if not name.endswith(".png"):
+                    continue
+                path = os.path.join(shard_dir, name)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                files.append((stat.st_mtime, stat.st_size, path))
+        return files
+
+    def _total_size(self) -> int:
+        return sum(size for _, size, _ in self._list_files())
+
+    def _evict(self):
+        """淘汰最久未使用的文件，直到总大小降到上限的 90%（重新统计，包含其他 worker 写入的文件）"""
+        files = sorted(self._list_files())
+        total = sum(size for _, size, _ in files)
+        target = int(self.max_bytes * 0.9)
+        removed = 0
+        for _, size, path in files:
+            if total <= target:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            total -= size
+            removed += 1
+        self._size = total
+        if removed:
+            logger.info(f"淘汰小程序码缓存 {removed} 个文件，当前大小 {total} 字节")
+
+
+def _create_cache() -> WxacodeCache:
+    from app.config import settings
+
+    return WxacodeCache(
+        settings.WXACODE_CACHE_DIR,
+        max_bytes=settings.WXACODE_CACHE_MAX_BYTES,
+        namespace=settings.WECHAT_APP_ID,
+    )
+
+
+# 全局小程序码缓存
+wxacode_cache = _create_cache()
@@ -0,0 +1,28 @@
+"""
+回填媒体目录
+把媒体目录上线前上传到 uploads/<user_id>/ 下的文件登记到 media_files 表，
+之后查询用户媒体只查表，不再扫描上传目录；可重复执行，已登记的文件会跳过
+"""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.database import create_maintenance_session
+from app.services.media_service import MediaService
+
+
+def backfill_media_catalog():
+    """回填媒体目录"""
+    db = create_maintenance_session()
+    try:
+        stats = MediaService(db).backfill_catalog()
+        print(f"回填完成: 扫描 {stats['scanned']} 个文件，新登记 {stats['added']} 个")
+        return stats
+    finally:
+        db.close()
+
+
+if __name__ == '__main__':
+    backfill_media_catalog()
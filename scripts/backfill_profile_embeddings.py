@@ -0,0 +1,39 @@
+"""
+批量回填用户画像向量
+按批次调用向量接口，为所有（或仅缺失向量的）用户画像重新生成向量
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.database import create_maintenance_session
+from app.services.embedding_service import embedding_service
+from app.services.user_profile.user_profile_service import UserProfileService
+
+
+async def backfill_profile_embeddings(batch_size: int, only_missing: bool):
+    """回填用户画像向量"""
+    db = create_maintenance_session()
+    try:
+        stats = await UserProfileService(db).backfill_profile_embeddings(
+            batch_size=batch_size,
+            only_missing=only_missing
+        )
+        print(f"回填完成: 处理 {stats['processed']} 条，更新 {stats['updated']} 条，失败 {stats['failed']} 条")
+        return stats
+    finally:
+        db.close()
+        await embedding_service.aclose()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="批量回填用户画像向量")
+    parser.add_argument("--batch-size", type=int, default=64, help="每批处理的画像数量 (默认: 64)")
+    parser.add_argument("--only-missing", action="store_true", help="仅处理向量为空的画像")
+    args = parser.parse_args()
+
+    asyncio.run(backfill_profile_embeddings(args.batch_size, args.only_missing))
@@ -0,0 +1,178 @@
+"""
+将用户画像向量列迁移为二进制存储
+把 raw_profile_embedding 从 VECTOR / JSON 文本转换为 vector_codec 编码的 BLOB（float32 / float16 / int8），
+迁移完成后需将 EMBEDDING_STORAGE_FORMAT 设置为相同的精度
+
+复制期间服务可继续写入：复制结束后按 updated_at 补齐期间更新过的画像，直到一轮没有新变更再替换列；
+最后一轮补齐与替换列之间仍有极短的窗口，要求严格一致时请在执行期间停止画像向量的写入
+"""
+
+import argparse
+import json
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import text
+
+from app.database import create_maintenance_session
+from app.utils.vector_codec import STORAGE_FORMATS, encode_vector, is_encoded_vector
+
+NEW_COLUMN = "raw_profile_embedding_bin"
+BACKUP_COLUMN = "raw_profile_embedding_json"
+# 补齐复制期间更新的画像的最大轮数
+CATCH_UP_ROUNDS = 5
+
+
+def _column_type(db, column_name: str):
+    """查询列类型，不存在时返回 None"""
+    row = db.execute(text("""
+        SELECT COLUMN_TYPE
+        FROM INFORMATION_SCHEMA.COLUMNS
+        WHERE TABLE_SCHEMA = DATABASE()
+        AND TABLE_NAME = 'user_profiles'
+        AND COLUMN_NAME = :column_name
+    """), {"column_name": column_name}).fetchone()
+    return row[0].lower() if row else None
+
+
+def _encode(value, dtype: str) -> bytes:
+    """把原列的值编码为二进制向量"""
+    if is_encoded_vector(value):
+        return bytes(value)
+    if isinstance(value, (bytes, bytearray)):
+        value = value.decode("utf-8")
+    return encode_vector(json.loads(value), dtype)
+
+
+def _copy_embeddings(db, source: str, dtype: str, batch_size: int, since=None):
+    """
+    分批把原列复制到临时列
+
+    Args:
+        since: 仅复制该时刻之后更新过的画像（包括向量被清空的画像）；为 None 时复制全部非空向量
+
+    Returns:
+        (转换条数, 跳过条数)
+    """
+    if since is None:
+        condition, params = "raw_profile_embedding IS NOT NULL", {}
+    else:
+        condition, params = "updated_at >= :since", {"since": since}
+
+    converted, skipped, last_id = 0, 0, ""
+    while True:
+        rows = db.execute(text(f"""
+            SELECT id, {source} AS embedding FROM user_profiles
+            WHERE id > :last_id AND {condition}
+            ORDER BY id LIMIT :limit
+        """), {**params, "last_id": last_id, "limit": batch_size}).fetchall()
+        if not rows:
+            break
+        last_id = rows[-1].id
+
+        for row in rows:
+            data = None
+            if row.embedding is not None:
+                try:
+                    data = _encode(row.embedding, dtype)
+                except (ValueError, TypeError) as e:
+                    print(f"跳过无法解析的向量: id={row.id}, error={e}")
+                    skipped += 1
+                    continue
+            # 显式保留 updated_at，避免复制本身刷新更新时间而被补齐轮次反复选中
+            db.execute(
+                text(f"UPDATE user_profiles SET {NEW_COLUMN} = :data, updated_at = updated_at WHERE id = :id"),
+                {"data": data, "id": row.id}
+            )
+            converted += 1
+        db.commit()
+        print(f"已转换 {converted} 条，跳过 {skipped} 条")
+    return converted, skipped
+
+
+def migrate_embedding_to_binary(dtype: str, batch_size: int, drop_old: bool):
+    """迁移画像向量列为二进制存储"""
+    db = create_maintenance_session()
+    try:
+        column_type = _column_type(db, "raw_profile_embedding")
+        if column_type is None:
+            print("错误: user_profiles.raw_profile_embedding 列不存在")
+            return False
+        if "blob" in column_type or "binary" in column_type:
+            print("raw_profile_embedding 已是二进制存储，无需迁移")
+            return True
+
+        if _column_type(db, NEW_COLUMN) is None:
+            print(f"添加临时列 {NEW_COLUMN}...")
+            db.execute(text(f"ALTER TABLE user_profiles ADD COLUMN {NEW_COLUMN} BLOB NULL"))
+            db.commit()
+
+        # VECTOR 列需转换为文本读取
+        source = "VEC_TOTEXT(raw_profile_embedding)" if "vector" in column_type else "raw_profile_embedding"
+        # 以数据库时间记录复制开始时刻，复制期间被更新的画像由补齐轮次重新复制
+        since = db.execute(text("SELECT NOW()")).scalar()
+        converted, skipped = _copy_embeddings(db, source, dtype, batch_size)
+
+        for _ in range(CATCH_UP_ROUNDS):
+            next_since = db.execute(text("SELECT NOW()")).scalar()
+            changed, changed_skipped = _copy_embeddings(db, source, dtype, batch_size, since=since)
+            print(f"补齐复制期间更新的画像 {changed} 条")
+            converted += changed
+            skipped += changed_skipped
+            since = next_since
+            if not changed:
+                break
+
+        print("替换向量列...")
+        if "vector" in column_type:
+            try:
+                db.execute(text("DROP INDEX idx_raw_profile_embedding ON user_profiles"))
+                print("已删除向量索引 idx_raw_profile_embedding")
+            except Exception as idx_error:
+                db.rollback()
+                print(f"删除索引失败（可能已不存在）: {str(idx_error)}")
+        # 两次改名放在同一条 ALTER 中原子完成，避免中途失败时 raw_profile_embedding 列缺失
+        db.execute(text(f"""
+            ALTER TABLE user_profiles
+            RENAME COLUMN raw_profile_embedding TO {BACKUP_COLUMN},
+            RENAME COLUMN {NEW_COLUMN} TO raw_profile_embedding
+        """))
+        db.commit()
+        if not drop_old:
+            print(f"原向量列已保留为 {BACKUP_COLUMN}，确认无误后可使用 --drop-old 重新执行删除")
+
+        print(f"迁移成功！共转换 {converted} 条，跳过 {skipped} 条")
+        print(f"请设置环境变量 EMBEDDING_STORAGE_FORMAT={dtype} 后重启服务")
+        return True
+
+    except Exception as e:
+        db.rollback()
+        print(f"迁移失败: {e}")
+        return False
+    finally:
+        db.close()
+
+
+def drop_backup_column():
+    """删除迁移保留的原向量列"""
+    db = create_maintenance_session()
+    try:
+        if _column_type(db, BACKUP_COLUMN) is not None:
+            db.execute(text(f"ALTER TABLE user_profiles DROP COLUMN {BACKUP_COLUMN}"))
+            db.commit()
+            print(f"已删除原向量列 {BACKUP_COLUMN}")
+    finally:
+        db.close()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="将用户画像向量列迁移为二进制存储")
+    parser.add_argument("--dtype", choices=STORAGE_FORMATS, default="float16", help="存储精度 (默认: float16)")
+    parser.add_argument("--batch-size", type=int, default=500, help="每批转换的画像数量 (默认: 500)")
+    parser.add_argument("--drop-old", action="store_true", help="迁移完成后删除原向量列")
+    args = parser.parse_args()
+
+    if migrate_embedding_to_binary(args.dtype, args.batch_size, args.drop_old) and args.drop_old:
+        drop_backup_column()
@@ -0,0 +1,51 @@
+"""
+Prompt配置管理器测试用例 - 模板预编译与热加载
+"""
+import json
+import os
+
+from app.configs.prompt_config_manager import CompiledTemplate, PromptConfigManager
+
+
+class TestCompiledTemplate:
+    """预编译模板测试类"""
+
+    def test_render_matches_str_format(self):
+        """测试渲染结果与 str.format 一致"""
+        source = "静态说明 {{固定}}\n名称: {name:>4}\n数据: {data!r}"
+        compiled = CompiledTemplate(source)
+        kwargs = {"name": "ab", "data": [1, 2]}
+        assert compiled.render(**kwargs) == source.format(**kwargs)
+        assert compiled.static_prefix == "静态说明 {固定}\n名称: "
+        assert compiled.fields == ["name", "data"]
+
+    def test_json_conversion(self):
+        """测试 !j 转换将对象序列化为JSON"""
+        compiled = CompiledTemplate("历史: {history!j} 文本: {text!j}")
+        assert compiled.render(history=[{"role": "用户"}], text="原样") == '历史: [{"role": "用户"}] 文本: 原样'
+
+
+class TestPromptConfigManagerReload:
+    """配置热加载测试类"""
+
+    def _write(self, path, template):
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump({"greeting": {"prompt_template": template}}, f, ensure_ascii=False)
+
+    def test_hot_reload_on_mtime_change(self, tmp_path):
+        """测试配置文件修改后无需重启即可生效"""
+        task_file = tmp_path / "task_prompts.json"
+        self._write(task_file, "你好 {name}")
+        manager = PromptConfigManager(config_dir=str(tmp_path))
+        manager.RELOAD_CHECK_INTERVAL = 0
+
+        first = manager.get_task_template("greeting")
+        assert manager.get_task_prompt("greeting", name="小明") == "你好 小明"
+        # 同一模板复用同一个编译对象
+        assert manager.get_task_template("greeting") is first
+
+        self._write(task_file, "欢迎 {name}")
+        stat = os.stat(task_file)
+        os.utime(task_file, (stat.st_atime, stat.st_mtime + 5))
+
+        assert manager.get_task_prompt("greeting", name="小明") == "欢迎 小明"
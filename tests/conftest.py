@@ -0,0 +1,22 @@
+"""
+测试公共配置
+"""
+import pytest
+
+from app.services import tag_service, topic_card_service, vote_service
+from app.services.counter_service import CounterService
+from app.services.view_dedup import MemoryDedupStore, ViewDeduplicator
+
+# 引用了全局计数器和浏览去重实例的模块
+_COUNTER_MODULES = (tag_service, topic_card_service, vote_service)
+
+
+@pytest.fixture(autouse=True)
+def isolated_counters(monkeypatch):
+    """每个测试使用独立的计数器和浏览去重实例：不写增量日志、不启动写回线程、不访问正式数据库"""
+    counters = CounterService(log_dir=None, auto_flush=False)
+    deduplicator = ViewDeduplicator(MemoryDedupStore(ttl=300))
+    for module in _COUNTER_MODULES:
+        monkeypatch.setattr(module, "counter_service", counters)
+        monkeypatch.setattr(module, "view_deduplicator", deduplicator)
+    yield counters
@@ -0,0 +1,50 @@
+"""
+异步数据库会话测试用例
+"""
+import pytest
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+from app.database import to_async_database_url
+from app.models.topic_card_db import TopicCard
+from app.models.user import User
+from app.services import topic_card_service
+from app.services.topic_card_service import TopicCardService
+from app.services.view_dedup import MemoryDedupStore, ViewDeduplicator
+
+
+def test_to_async_database_url():
+    """测试同步驱动URL转换为异步驱动"""
+    assert to_async_database_url("mysql+pymysql://root:pw@db:3306/vmatch") == "mysql+aiomysql://root:pw@db:3306/vmatch"
+    assert to_async_database_url("sqlite:///./test.db") == "sqlite+aiosqlite:///./test.db"
+    assert to_async_database_url("mysql+asyncmy://root@db/vmatch") == "mysql+asyncmy://root@db/vmatch"
+
+
+@pytest.mark.asyncio
+async def test_topic_card_detail_async(monkeypatch):
+    """测试异步会话读取话题详情并累加浏览次数"""
+    monkeypatch.setattr(topic_card_service, "view_deduplicator", ViewDeduplicator(MemoryDedupStore(ttl=300)))
+    engine = create_async_engine("sqlite+aiosqlite://")
+    async with engine.begin() as conn:
+        await conn.run_sync(lambda sync_conn: User.__table__.create(sync_conn))
+        await conn.run_sync(lambda sync_conn: TopicCard.__table__.create(sync_conn))
+    session_factory = async_sessionmaker(engine, expire_on_commit=False)
+
+    async with session_factory() as db:
+        db.add(User(id="u1", nick_name="小王", phone="13800000000"))
+        db.add(TopicCard(id="t1", user_id="u1", title="周末爬山", view_count=0, like_count=0,
+                         discussion_count=0, is_active=1, is_deleted=0, is_anonymous=0, visibility="public"))
+        db.add(TopicCard(id="t2", user_id="u1", title="私密话题", view_count=0, like_count=0,
+                         discussion_count=0, is_active=1, is_deleted=0, is_anonymous=0, visibility="private"))
+        await db.commit()
+
+    async with session_factory() as db:
+        detail = await TopicCardService.get_topic_card_detail_async(db, "t1", "async-test-user")
+        assert detail.title == "周末爬山"
+        assert detail.creator_nickname == "小王"
+        assert detail.view_count == 1
+        # 5分钟内重复浏览不计数
+        detail = await TopicCardService.get_topic_card_detail_async(db, "t1", "async-test-user")
+        assert detail.view_count == 1
+        assert await TopicCardService.get_topic_card_detail_async(db, "t2", "async-test-user") is None
+        assert await TopicCardService.get_topic_card_detail_async(db, "missing") is None
+    await engine.dispose()
@@ -0,0 +1,90 @@
+"""
+批量上传测试用例
+"""
+import asyncio
+import io
+import json
+import os
+from types import SimpleNamespace
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+from starlette.datastructures import Headers, UploadFile
+
+from app.config import settings
+from app.models.media_file import MediaFile
+from app.routers import file as file_router
+from app.services.media_store import MediaStore
+
+
+@pytest.fixture
+def db():
+    # 上传记录在线程池中写入，内存数据库需在线程间共享同一连接
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    MediaFile.__table__.create(engine)
+    session = sessionmaker(bind=engine)()
+    yield session
+    session.close()
+
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    store = MediaStore(str(tmp_path))
+    monkeypatch.setattr(file_router, "media_store", store)
+    monkeypatch.setattr(file_router, "image_derivatives", SimpleNamespace(warm=lambda file_url: None))
+    monkeypatch.setattr(settings, "MAX_IMAGE_SIZE", 4096)
+    return store
+
+
+def _upload(filename: str, content_type: str, data: bytes) -> UploadFile:
+    return UploadFile(io.BytesIO(data), filename=filename, headers=Headers({"content-type": content_type}))
+
+
+def _mixed_batch():
+    return [
+        _upload("a.png", "image/png", os.urandom(1000)),
+        _upload("big.jpg", "image/jpeg", os.urandom(10000)),
+        _upload("run.exe", "application/x-msdownload", b"MZ"),
+        _upload("notes.txt", "text/plain", b"hello"),
+    ]
+
+
+class TestBatchUpload:
+    """批量上传测试类"""
+
+    def test_mixed_batch_keeps_valid_files(self, store, db):
+        """测试批次中有超限和不支持的文件时，其余文件仍然保存并记录"""
+        response = asyncio.run(file_router.upload_multiple_files(
+            files=_mixed_batch(), file_type="image", stream=False, current_user={"id": "u1"}, db=db
+        ))
+        data = response.data
+        assert (data["total"], data["success_count"], data["error_count"]) == (4, 2, 2)
+        assert [f["original_filename"] for f in data["success_files"]] == ["a.png", "notes.txt"]
+        assert [f["file_index"] for f in data["failed_files"]] == [1, 2]
+        for info in data["success_files"]:
+            assert os.path.exists(info["file_path"])
+
+        records = db.query(MediaFile).all()
+        assert sorted(r.original_filename for r in records) == ["a.png", "notes.txt"]
+        assert all(r.user_id == "u1" for r in records)
+        # 超限文件的临时文件已清理
+        assert os.listdir(store.incoming_dir) == []
+
+    def test_stream_ndjson(self, store, db):
+        """测试 stream=true 时逐行返回每个文件的结果，最后一行为汇总"""
+        async def scenario():
+            response = await file_router.upload_multiple_files(
+                files=_mixed_batch(), file_type="image", stream=True, current_user={"id": "u1"}, db=db
+            )
+            assert response.media_type == "application/x-ndjson"
+            return [chunk async for chunk in response.body_iterator]
+
+        lines = [json.loads(line) for line in "".join(asyncio.run(scenario())).splitlines()]
+        assert len(lines) == 5
+        per_file, summary = lines[:-1], lines[-1]["summary"]
+        assert sorted(line["file_index"] for line in per_file) == [0, 1, 2, 3]
+        assert sorted(line["file_index"] for line in per_file if "error" in line) == [1, 2]
+        assert (summary["success_count"], summary["error_count"]) == (2, 2)
+        assert db.query(MediaFile).count() == 2
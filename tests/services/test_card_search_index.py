@@ -0,0 +1,115 @@
+"""
+卡片全文检索索引测试用例
+"""
+from types import SimpleNamespace
+
+import pytest
+from sqlalchemy import create_engine, text
+from sqlalchemy.orm import sessionmaker
+
+from app.services.card_search_index import CardSearchIndex, VOTE_FIELD_WEIGHTS
+
+
+@pytest.fixture
+def db():
+    engine = create_engine("sqlite://")
+    with engine.begin() as conn:
+        conn.execute(text(
+            "CREATE TABLE vote_cards (id TEXT PRIMARY KEY, user_id TEXT, title TEXT, description TEXT, "
+            "tags TEXT, category TEXT, visibility TEXT, is_active INTEGER, is_deleted INTEGER, "
+            "created_at DATETIME, updated_at DATETIME)"
+        ))
+        conn.execute(text(
+            "INSERT INTO vote_cards VALUES "
+            "('v1', 'u1', '周末去哪爬山', '推荐路线', '[\"户外\"]', 'life', 'public', 1, 0, '2025-01-01 00:00:00', NULL), "
+            "('v2', 'u1', '最喜欢的编程语言', '后端选型', '[\"编程\", \"户外\"]', 'tech', 'public', 1, 0, '2025-01-02 00:00:00', NULL), "
+            "('v3', 'u2', '爬山装备', NULL, NULL, 'life', 'private', 1, 0, '2025-01-03 00:00:00', NULL), "
+            "('v4', 'u2', '爬山已删除', NULL, NULL, 'life', 'public', 1, 1, '2025-01-04 00:00:00', NULL)"
+        ))
+    session = sessionmaker(bind=engine)()
+    yield session
+    session.close()
+
+
+class TestCardSearchIndex:
+    """卡片全文检索索引测试类"""
+
+    def test_build_and_filters(self, db):
+        """测试全量构建跳过已删除卡片，标签参与检索并按元数据过滤"""
+        index = CardSearchIndex("vote_cards", VOTE_FIELD_WEIGHTS, sync_interval=3600)
+        assert index.search_page(db, "爬山") == (["v3", "v1"], 2)
+        assert index.search_page(db, "爬山", filters={"visibility": "public"}) == (["v1"], 1)
+        # 标签参与检索，值为 None 的过滤条件被忽略
+        assert index.search_page(db, "户外", filters={"category": "tech", "user_id": None}) == (["v2"], 1)
+        assert index.search_page(db, "爬山 编程") == ([], 0)
+
+    def test_pagination(self, db):
+        """测试分页只返回当前页，总数为全部命中数"""
+        index = CardSearchIndex("vote_cards", VOTE_FIELD_WEIGHTS, sync_interval=3600)
+        assert index.search_page(db, "户外", page=1, page_size=1)[1] == 2
+        first, _ = index.search_page(db, "户外", page=1, page_size=1)
+        second, _ = index.search_page(db, "户外", page=2, page_size=1)
+        assert len(first) == len(second) == 1 and first != second
+        assert index.search_page(db, "户外", page=3, page_size=1) == ([], 2)
+
+    def test_incremental_update(self, db):
+        """测试本进程写入直接更新索引"""
+        index = CardSearchIndex("vote_cards", VOTE_FIELD_WEIGHTS, sync_interval=3600)
+        index.sync(db)
+        index.index_card(SimpleNamespace(
+            id="v5", user_id="u3", title="露营", description=None, tags=["户外", "爬山"],
+            category="life", visibility="public", is_active=1, is_deleted=0, created_at=None
+        ))
+        assert "v5" in index.search_page(db, "爬山")[0]
+        index.remove("v1")
+        index.index_card(SimpleNamespace(
+            id="v3", user_id="u2", title="爬山装备", description=None, tags=None,
+            category="life", visibility="public", is_active=0, is_deleted=0, created_at=None
+        ))
+        assert index.search_page(db, "爬山") == (["v5"], 1)
+
+    def test_watermark_sync(self, db):
+        """测试按 updated_at 水位同步其他进程的写入"""
+        index = CardSearchIndex("vote_cards", VOTE_FIELD_WEIGHTS, sync_interval=3600)
+        index.sync(db)
+        db.execute(text("UPDATE vote_cards SET is_deleted = 1, updated_at = '2025-02-01 00:00:00' WHERE id = 'v1'"))
+        db.execute(text(
+            "INSERT INTO vote_cards VALUES ('v6', 'u3', '徒步爬山', NULL, NULL, 'life', 'public', 1, 0, "
+            "'2025-02-02 00:00:00', NULL)"
+        ))
+        db.commit()
+        assert index.search_page(db, "爬山", filters={"visibility": "public"}) == (["v1"], 1)
+        index.sync(db, force=True)
+        assert index.search_page(db, "爬山", filters={"visibility": "public"}) == (["v6"], 1)
+
+    def test_creator_filter_before_paging(self, db):
+        """测试未激活或已注销用户的卡片在分页前排除，总数不包含这些卡片"""
+        db.execute(text("CREATE TABLE users (id TEXT PRIMARY KEY, is_active INTEGER, status TEXT)"))
+        db.execute(text("INSERT INTO users VALUES ('u1', 1, 'active'), ('u2', 1, 'deleted')"))
+        db.commit()
+        index = CardSearchIndex("vote_cards", VOTE_FIELD_WEIGHTS, sync_interval=3600, creator_filter=True)
+        assert index.search_page(db, "爬山", page_size=1) == (["v1"], 1)
+
+        db.execute(text("UPDATE users SET status = 'active' WHERE id = 'u2'"))
+        db.commit()
+        index.sync(db, force=True)
+        assert index.search_page(db, "爬山", page_size=1) == (["v3"], 2)
+
+    def test_latin_query_falls_back(self, db):
+        """测试包含英文或数字的查询回退到数据库子串匹配"""
+        index = CardSearchIndex("vote_cards", VOTE_FIELD_WEIGHTS, sync_interval=3600)
+        assert index.search_page(db, "run") is None
+        assert index.search_page(db, "爬山 2025") is None
+
+    def test_search_during_warm_up(self, db):
+        """测试后台预热构建期间检索不等待，返回 None 由调用方回退到数据库查询"""
+        index = CardSearchIndex("vote_cards", VOTE_FIELD_WEIGHTS, sync_interval=3600)
+        index._warming = True
+        with index._sync_lock:
+            assert index.search_page(db, "爬山") is None
+        index._warming = False
+        assert index.search_page(db, "爬山") == (["v3", "v1"], 2)
+
+    def test_disabled(self, db):
+        """测试未启用时返回 None"""
+        assert CardSearchIndex("vote_cards", VOTE_FIELD_WEIGHTS, enabled=False).search_page(db, "爬山") is None
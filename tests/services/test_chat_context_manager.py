@@ -0,0 +1,61 @@
+"""
+聊天上下文窗口管理测试用例
+"""
+from unittest.mock import Mock
+
+from sqlalchemy.orm import Session
+
+from app.services.chat_context_manager import ChatContextManager, estimate_tokens
+
+
+class TestEstimateTokens:
+    """token估算测试类"""
+
+    def test_cjk_and_ascii(self):
+        """测试中英文混合文本估算"""
+        assert estimate_tokens("") == 0
+        assert estimate_tokens("你好") == 2
+        assert estimate_tokens("hello world") == 4
+        assert estimate_tokens("你好, world!") == 2 + 1 + 2 + 1
+
+
+class TestChatContextManager:
+    """聊天上下文窗口管理测试类"""
+
+    def _history(self, n):
+        return [{"role": "user" if i % 2 == 0 else "ai", "content": f"第{i}条消息" * 10} for i in range(n)]
+
+    def test_short_history_kept_verbatim(self):
+        """测试短对话原样保留，不生成摘要"""
+        manager = ChatContextManager(max_tokens=2000, max_recent_turns=8, summary_max_tokens=100)
+        history = self._history(4)
+        window = manager.build_window("chat_1", history)
+        assert window.recent_turns == history
+        assert window.summary == ""
+        assert window.summary_line == ""
+
+    def test_long_history_bounded(self):
+        """测试长对话的上下文长度保持稳定"""
+        manager = ChatContextManager(max_tokens=300, max_recent_turns=6, summary_max_tokens=80)
+        small = manager.build_window("chat_2", self._history(20))
+        large = manager.build_window("chat_3", self._history(2000))
+        assert large.recent_turns[-1]["content"].startswith("第1999条消息")
+        assert len(large.recent_turns) <= 6
+        assert large.estimated_tokens <= 300
+        assert large.summary
+        assert abs(large.estimated_tokens - small.estimated_tokens) <= 20
+
+    def test_reuse_cached_and_stored_summary(self):
+        """测试优先复用缓存摘要，其次复用 ChatSummary 记录"""
+        manager = ChatContextManager(max_tokens=200, max_recent_turns=2, summary_max_tokens=50)
+        db = Mock(spec=Session)
+        query = db.query.return_value.filter.return_value.order_by.return_value
+        query.first.return_value = ("用户在咨询租房",)
+
+        window = manager.build_window("chat_4", self._history(10), db=db)
+        assert window.summary == "用户在咨询租房"
+        assert manager.get_cached_summary("chat_4").folded_turns == 8
+
+        db.query.reset_mock()
+        manager.build_window("chat_4", self._history(10), db=db)
+        db.query.assert_not_called()
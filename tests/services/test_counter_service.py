@@ -0,0 +1,150 @@
+"""
+计数器写回服务测试用例
+"""
+import os
+
+import pytest
+from sqlalchemy import Column, Integer, String, create_engine, text
+from sqlalchemy.orm import declarative_base, sessionmaker
+
+from app.services.counter_service import CounterService
+
+Base = declarative_base()
+
+
+class _TopicCard(Base):
+    __tablename__ = "topic_cards"
+
+    id = Column(String, primary_key=True)
+    view_count = Column(Integer)
+    like_count = Column(Integer)
+
+
+@pytest.fixture
+def session_factory():
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(engine)
+    with engine.begin() as conn:
+        conn.execute(text("INSERT INTO topic_cards VALUES ('t1', 10, 0), ('t2', NULL, 1)"))
+    return sessionmaker(bind=engine)
+
+
+def _counts(session_factory, card_id):
+    db = session_factory()
+    try:
+        row = db.execute(
+            text("SELECT view_count, like_count FROM topic_cards WHERE id = :id"), {"id": card_id}
+        ).one()
+        return tuple(row)
+    finally:
+        db.close()
+
+
+class TestCounterService:
+    """计数器写回服务测试类"""
+
+    def test_incr_overlay_and_flush(self, session_factory):
+        """测试增量先叠加在读取结果上，写回后合并为一次批量更新"""
+        service = CounterService(session_factory, flush_interval=3600)
+        for _ in range(3):
+            service.incr("topic_cards", "t1", "view_count")
+        service.incr("topic_cards", "t2", "view_count", 2)
+        assert _counts(session_factory, "t1") == (10, 0)
+        assert service.overlay("topic_cards", "t1", "view_count", 10) == 13
+
+        assert service.flush() == 2
+        assert _counts(session_factory, "t1") == (13, 0)
+        assert _counts(session_factory, "t2") == (2, 1)
+        assert service.pending("topic_cards", "t1", "view_count") == 0
+        assert service.flush() == 0
+
+    def test_negative_delta_clamped(self, session_factory):
+        """测试负增量写回后不小于0"""
+        service = CounterService(session_factory, flush_interval=3600)
+        service.incr("topic_cards", "t2", "like_count", -3)
+        assert service.overlay("topic_cards", "t2", "like_count", 1) == 0
+        service.flush()
+        assert _counts(session_factory, "t2") == (None, 0)
+
+    def test_unknown_column_rejected(self, session_factory):
+        """测试只允许白名单内的计数列"""
+        service = CounterService(session_factory)
+        with pytest.raises(ValueError):
+            service.incr("topic_cards", "t1", "title")
+
+    def test_disabled_writes_through(self, session_factory):
+        """测试未启用时立即写回数据库"""
+        service = CounterService(session_factory, enabled=False)
+        service.incr("topic_cards", "t1", "like_count")
+        assert _counts(session_factory, "t1") == (10, 1)
+
+    def test_apply_does_not_dirty_object(self, session_factory):
+        """测试叠加到 ORM 对象上的计数不会在提交时写回"""
+        service = CounterService(session_factory, flush_interval=3600)
+        service.incr("topic_cards", "t1", "view_count", 5)
+        db = session_factory()
+        try:
+            card = db.get(_TopicCard, "t1")
+            service.apply(card, "topic_cards", ("view_count", "like_count"))
+            assert card.view_count == 15
+            assert card not in db.dirty
+            db.commit()
+        finally:
+            db.close()
+        assert _counts(session_factory, "t1") == (10, 0)
+
+    def test_recover_log_of_exited_process(self, session_factory, tmp_path):
+        """测试重放已退出进程遗留的日志，忽略写了一半的行"""
+        crashed = CounterService(session_factory, log_dir=str(tmp_path), flush_interval=3600)
+        crashed._thread = object()  # 不启动后台线程，模拟进程崩溃前未写回
+        crashed.incr("topic_cards", "t1", "view_count", 4)
+        crashed.incr("topic_cards", "t1", "like_count")
+        crashed._log.write("topic_cards\tt2\tview")
+        crashed._log.close()
+        # 换成一个不存在的进程号
+        old_path = crashed._log_path()
+        dead_path = os.path.join(str(tmp_path), "counters-999999999-1.log")
+        os.replace(old_path, dead_path)
+
+        service = CounterService(session_factory, log_dir=str(tmp_path), flush_interval=3600)
+        assert service.recover() == 2
+        assert _counts(session_factory, "t1") == (14, 1)
+        assert not os.path.exists(dead_path)
+
+    def test_concurrent_recover_replays_once(self, session_factory, tmp_path):
+        """测试多个worker同时重放同一份日志时只有认领成功的一个写回"""
+        dead_path = os.path.join(str(tmp_path), "counters-999999999-1.log")
+        with open(dead_path, "w", encoding="utf-8") as f:
+            f.write("topic_cards\tt1\tview_count\t3\n")
+
+        first = CounterService(session_factory, log_dir=str(tmp_path), flush_interval=3600)
+        second = CounterService(session_factory, log_dir=str(tmp_path), flush_interval=3600)
+        read_log = first._read_log
+        replayed_by_second = []
+
+        def interleaved(path):
+            # 第一个worker读取日志时，第二个worker开始重放
+            replayed_by_second.append(second.recover())
+            return read_log(path)
+
+        first._read_log = interleaved
+        assert first.recover() == 1
+        assert replayed_by_second == [0]
+        assert _counts(session_factory, "t1") == (13, 0)
+        assert os.listdir(str(tmp_path)) == []
+
+    def test_failed_flush_keeps_deltas(self, session_factory, tmp_path):
+        """测试写回失败时增量保留到下次写回"""
+        service = CounterService(session_factory, log_dir=str(tmp_path), flush_interval=3600)
+        service._thread = object()
+        service.incr("topic_cards", "t1", "view_count", 2)
+
+        original = service._write
+        service._write = lambda deltas: (_ for _ in ()).throw(RuntimeError("db down"))
+        assert service.flush() == 0
+        assert service.pending("topic_cards", "t1", "view_count") == 2
+
+        service._write = original
+        assert service.flush() == 1
+        assert _counts(session_factory, "t1") == (12, 0)
+        assert os.listdir(str(tmp_path)) == []
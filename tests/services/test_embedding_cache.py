@@ -0,0 +1,78 @@
+"""
+向量缓存测试用例
+"""
+import pytest
+
+from app.services.embedding_cache import EmbeddingCache, pack_vector, unpack_vector
+
+
+class TestEmbeddingCache:
+    """向量缓存测试类"""
+
+    def test_key_normalizes_text_and_includes_model(self):
+        """测试缓存键对空白/全角归一化，且区分模型与维度"""
+        key = EmbeddingCache.make_key("  喜欢  爬山\n", "m1", 1024)
+        assert key == EmbeddingCache.make_key("喜欢 爬山", "m1", 1024)
+        assert key == EmbeddingCache.make_key("喜欢　爬山", "m1", 1024)
+        assert key != EmbeddingCache.make_key("喜欢 爬山", "m2", 1024)
+        assert key != EmbeddingCache.make_key("喜欢 爬山", "m1", 512)
+
+    @pytest.mark.parametrize("dtype,size", [("float32", 4), ("float16", 2)])
+    def test_compact_encoding(self, dtype, size):
+        """测试向量紧凑编码"""
+        vector = [0.5, -0.25, 1.0]
+        data = pack_vector(vector, dtype)
+        assert len(data) == len(vector) * size
+        assert unpack_vector(data, dtype) == vector
+
+    def test_lru_eviction_and_disk_tier(self, tmp_path):
+        """测试内存LRU淘汰后仍可从磁盘层读回"""
+        path = str(tmp_path / "embeddings.sqlite3")
+        cache = EmbeddingCache(path=path, max_items=2)
+        for i in range(3):
+            cache.set(f"k{i}", [float(i)] * 4)
+        assert "k0" not in cache._memory
+        assert cache.get("k0") == [0.0] * 4
+
+        # 新实例（如服务重启后）直接命中磁盘层
+        restarted = EmbeddingCache(path=path, max_items=2, dtype="float16")
+        assert restarted.get("k2") == [2.0] * 4
+        assert restarted.get("missing") is None
+        assert restarted.stats()["hits"] == 1
+
+    def test_disk_tier_bounded(self, tmp_path, monkeypatch):
+        """测试磁盘层按条数上限批量删除最早记录，过期记录不再命中"""
+        from app.services import embedding_cache
+
+        clock = [1000.0]
+        monkeypatch.setattr(embedding_cache.time, "time", lambda: clock[0])
+        cache = EmbeddingCache(path=str(tmp_path / "e.sqlite3"), max_items=1, disk_max_items=3, disk_ttl=60, purge_every=2)
+        for i in range(5):
+            clock[0] += 1
+            cache.set(f"k{i}", [float(i)])
+        rows = cache._write_conn.execute("SELECT key FROM embeddings ORDER BY created_at").fetchall()
+        assert [row[0] for row in rows] == ["k1", "k2", "k3", "k4"]
+        assert cache.get("k0") is None
+        assert cache.get("k1") == [1.0]
+
+        clock[0] += 120
+        cache._memory.clear()
+        assert cache.get("k4") is None
+
+    def test_async_write_off_event_loop(self, tmp_path, monkeypatch):
+        """测试异步批量写入：内存层立即可读，磁盘写入放到线程池执行"""
+        import asyncio
+
+        from app.services import embedding_cache
+
+        offloaded = []
+
+        async def fake_to_thread(func, *args):
+            offloaded.append(len(args[0]))
+            return func(*args)
+
+        monkeypatch.setattr(embedding_cache.asyncio, "to_thread", fake_to_thread)
+        cache = EmbeddingCache(path=str(tmp_path / "e.sqlite3"))
+        asyncio.run(cache.aset_many([("a", [1.0]), ("b", [2.0]), ("c", [])]))
+        assert offloaded == [2]
+        assert EmbeddingCache(path=str(tmp_path / "e.sqlite3")).get("b") == [2.0]
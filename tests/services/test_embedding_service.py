@@ -0,0 +1,53 @@
+"""
+向量嵌入服务测试用例
+"""
+import asyncio
+
+import pytest
+
+from app.services.embedding_service import _EmbeddingBatcher
+
+
+class TestEmbeddingBatcher:
+    """向量请求微批队列测试类"""
+
+    @pytest.mark.asyncio
+    async def test_concurrent_requests_share_one_batch(self):
+        """测试并发请求合并为一次发送，并按文本分发结果"""
+        calls = []
+
+        async def flush(texts):
+            calls.append(list(texts))
+            return [[float(len(t))] for t in texts]
+
+        batcher = _EmbeddingBatcher(flush, max_batch_size=16, max_wait=0.01)
+        results = await asyncio.gather(*(batcher.submit(t) for t in ["a", "bb", "a", "ccc"]))
+
+        assert calls == [["a", "bb", "ccc"]]
+        assert results == [[1.0], [2.0], [1.0], [3.0]]
+
+    @pytest.mark.asyncio
+    async def test_full_batch_flushes_immediately(self):
+        """测试攒满批次后立即发送"""
+        calls = []
+
+        async def flush(texts):
+            calls.append(len(texts))
+            return [None] * len(texts)
+
+        batcher = _EmbeddingBatcher(flush, max_batch_size=2, max_wait=10)
+        results = await asyncio.wait_for(
+            asyncio.gather(*(batcher.submit(str(i)) for i in range(4))), timeout=1
+        )
+
+        assert calls == [2, 2]
+        assert results == [None] * 4
+
+    @pytest.mark.asyncio
+    async def test_failed_batch_resolves_to_none(self):
+        """测试批次失败时所有调用方得到 None 而不是挂起"""
+        async def flush(texts):
+            raise RuntimeError("boom")
+
+        batcher = _EmbeddingBatcher(flush, max_batch_size=8, max_wait=0.001)
+        assert await batcher.submit("x") is None
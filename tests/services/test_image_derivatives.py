@@ -0,0 +1,114 @@
+"""
+图片衍生图测试用例
+"""
+import asyncio
+import io
+import os
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.models.media_file import MediaFile
+from app.services import feed_service as feed_module
+from app.services.feed_service import FeedService
+from app.services.image_derivatives import ImageDerivatives
+from app.services.media_store import MediaStore
+
+SHA = "ab" * 32
+
+
+def _derivatives(tmp_path) -> ImageDerivatives:
+    derivatives = ImageDerivatives(MediaStore(str(tmp_path / "blobs")), str(tmp_path / "derived"), workers=1)
+    # 未安装 Pillow 时会自动关闭，URL 映射不依赖 Pillow
+    derivatives.enabled = True
+    return derivatives
+
+
+class TestImageDerivatives:
+    """图片衍生图测试类"""
+
+    def test_derived_url(self, tmp_path):
+        """测试按内容存储的图片映射到衍生图URL，其他URL原样返回"""
+        derivatives = _derivatives(tmp_path)
+        blob_url = f"/uploads/blobs/ab/ab/{SHA}.jpg"
+        assert derivatives.derived_url(blob_url, "thumb") == f"/uploads/derived/thumb/ab/ab/{SHA}.jpg.webp"
+        assert derivatives.derived_url(blob_url, "unknown") == blob_url
+        assert derivatives.derived_url(f"/uploads/blobs/ab/ab/{SHA}.gif", "thumb").endswith(".gif")
+        assert derivatives.derived_url("/uploads/u1/a.jpg", "thumb") == "/uploads/u1/a.jpg"
+        assert derivatives.derived_url("https://example.com/a.jpg", "thumb") == "https://example.com/a.jpg"
+        assert derivatives.derived_url(None, "thumb") is None
+
+        derivatives.enabled = False
+        assert derivatives.derived_url(blob_url, "thumb") == blob_url
+
+    def test_reject_invalid_path(self, tmp_path):
+        """测试不合法的衍生图路径不会生成文件"""
+        derivatives = _derivatives(tmp_path)
+        assert asyncio.run(derivatives.ensure("../../etc/passwd.webp")) is False
+        assert asyncio.run(derivatives.ensure(f"thumb/ab/ab/{SHA}.jpg.webp")) is False
+
+    def test_feed_uses_sized_url(self, tmp_path, monkeypatch):
+        """测试 Feed 头像使用缩略图URL"""
+        monkeypatch.setattr(feed_module, "image_derivatives", _derivatives(tmp_path))
+        url = FeedService._process_media_url(f"/uploads/blobs/ab/ab/{SHA}.png", "thumb")
+        assert url == f"http://47.117.95.151:8000/uploads/derived/thumb/ab/ab/{SHA}.png.webp"
+        assert FeedService._process_media_url("/uploads/image.jpg", "thumb") == "http://47.117.95.151:8000/uploads/image.jpg"
+
+    def test_generate_on_first_request(self, tmp_path):
+        """测试首次请求时生成缩略图"""
+        Image = pytest.importorskip("PIL.Image")
+        store = MediaStore(str(tmp_path / "blobs"))
+        buffer = io.BytesIO()
+        Image.new("RGB", (1200, 800), "red").save(buffer, format="JPEG")
+        buffer.seek(0)
+        stored = store.store_file_object(buffer, "photo.jpg")
+
+        derivatives = ImageDerivatives(store, str(tmp_path / "derived"), workers=1)
+        derived_url = derivatives.derived_url(stored["file_url"], "thumb")
+        relative_path = derived_url[len("/uploads/derived/"):]
+        assert asyncio.run(derivatives.ensure(relative_path)) is True
+        with Image.open(os.path.join(derivatives.root, relative_path)) as img:
+            assert img.format == "WEBP"
+            assert max(img.size) == 240
+
+    def test_warm_after_upload(self, tmp_path):
+        """测试上传后在后台预先生成各规格衍生图"""
+        Image = pytest.importorskip("PIL.Image")
+        store = MediaStore(str(tmp_path / "blobs"))
+        buffer = io.BytesIO()
+        Image.new("RGB", (300, 300), "blue").save(buffer, format="PNG")
+        buffer.seek(0)
+        stored = store.store_file_object(buffer, "photo.png")
+        derivatives = ImageDerivatives(store, str(tmp_path / "derived"), workers=1)
+
+        async def scenario():
+            derivatives.warm(stored["file_url"])
+            assert len(derivatives._warming) == 2
+            await asyncio.gather(*derivatives._warming)
+
+        asyncio.run(scenario())
+        assert sorted(os.listdir(derivatives.root)) == ["medium", "thumb"]
+
+    def test_release_removes_derivatives(self, tmp_path):
+        """测试原图回收时一并删除各规格衍生图"""
+        Image = pytest.importorskip("PIL.Image")
+        engine = create_engine("sqlite://")
+        MediaFile.__table__.create(engine)
+        db = sessionmaker(bind=engine)()
+        store = MediaStore(str(tmp_path / "blobs"))
+        buffer = io.BytesIO()
+        Image.new("RGB", (300, 300), "blue").save(buffer, format="PNG")
+        buffer.seek(0)
+        stored = store.store_file_object(buffer, "photo.png")
+        store.add_reference(db, "u1", stored, "image", "image/png", "photo.png")
+        derivatives = ImageDerivatives(store, str(tmp_path / "derived"), workers=1)
+        for size in ("thumb", "medium"):
+            relative_path = derivatives.derived_url(stored["file_url"], size)[len("/uploads/derived/"):]
+            assert asyncio.run(derivatives.ensure(relative_path)) is True
+
+        assert store.release(db, "u1", stored["file_url"]) is True
+        for size in ("thumb", "medium"):
+            relative_path = derivatives.derived_url(stored["file_url"], size)[len("/uploads/derived/"):]
+            assert not os.path.exists(os.path.join(derivatives.root, relative_path))
+        db.close()
@@ -0,0 +1,92 @@
+"""
+媒体服务（媒体目录）测试用例
+"""
+import os
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.models.media_file import MediaFile
+from app.services import media_service as media_module
+from app.services.media_service import MediaService
+from app.services.media_store import MediaStore
+
+
+@pytest.fixture
+def service(tmp_path, monkeypatch):
+    engine = create_engine("sqlite://")
+    MediaFile.__table__.create(engine)
+    db = sessionmaker(bind=engine)()
+    monkeypatch.setattr(media_module, "media_store", MediaStore(str(tmp_path / "blobs")))
+    service = MediaService(db)
+    service.upload_base_path = str(tmp_path)
+    yield service
+    db.close()
+
+
+def _png_bytes(width: int, height: int) -> bytes:
+    Image = pytest.importorskip("PIL.Image")
+    import io
+
+    buffer = io.BytesIO()
+    Image.new("RGB", (width, height), "green").save(buffer, format="PNG")
+    return buffer.getvalue()
+
+
+class TestMediaCatalog:
+    """媒体目录测试类"""
+
+    def test_listing_from_catalog(self, service, monkeypatch):
+        """测试用户媒体从媒体目录查询，不扫描上传目录"""
+        avatar = service.upload_media_file("u1", b"avatar", "me.jpg", "avatar")
+        photo = service.upload_media_file("u1", b"photo", "p.jpg", "image")
+        video = service.upload_media_file("u1", b"video", "v.mp4", "video")
+        house = service.upload_media_file("u1", b"house", "h.png", "house_image")
+        service.upload_media_file("u2", b"other", "o.jpg", "image")
+
+        def no_walk(*args, **kwargs):
+            raise AssertionError("不应扫描上传目录")
+
+        monkeypatch.setattr(media_module.os, "walk", no_walk)
+        monkeypatch.setattr(media_module.os, "listdir", no_walk)
+        media = service.get_user_media("u1")
+        assert media["avatar_url"] == avatar
+        assert media["images"] == [photo]
+        assert media["video_url"] == video
+        assert media["house_images"] == [house]
+
+    def test_file_info_and_delete(self, service):
+        """测试文件信息来自媒体目录，删除后同步移除"""
+        url = service.upload_media_file("u1", b"photo", "p.jpg", "image")
+        info = service.get_media_file_info(url)
+        assert info["exists"] is True
+        assert info["size"] == 5
+        assert info["content_type"] == "image/jpeg"
+        assert len(info["sha256"]) == 64
+
+        assert service.delete_media_file("u2", url) is False
+        assert service.delete_media_file("u1", url) is True
+        assert service.get_media_file_info(url)["exists"] is False
+        assert service.get_user_media("u1")["avatar_url"].startswith("https://")
+
+    def test_image_dimensions(self, service):
+        """测试上传图片时记录尺寸"""
+        url = service.upload_media_file("u1", _png_bytes(320, 200), "p.png", "image")
+        info = service.get_media_file_info(url)
+        assert (info["width"], info["height"]) == (320, 200)
+
+    def test_backfill_legacy_files(self, service, tmp_path):
+        """测试回填旧上传目录中的文件，重复执行不会重复登记"""
+        user_dir = tmp_path / "u1"
+        user_dir.mkdir()
+        (user_dir / "avatar_me.jpg").write_bytes(b"a")
+        (user_dir / "house_1.png").write_bytes(b"h")
+        (user_dir / "notes.txt").write_bytes(b"n")
+
+        assert service.backfill_catalog() == {"scanned": 2, "added": 2}
+        assert service.backfill_catalog() == {"scanned": 2, "added": 0}
+        media = service.get_user_media("u1")
+        assert media["avatar_url"] == "/uploads/u1/avatar_me.jpg"
+        assert media["house_images"] == ["/uploads/u1/house_1.png"]
+        assert os.path.exists(user_dir / "avatar_me.jpg")
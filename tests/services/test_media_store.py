@@ -0,0 +1,81 @@
+"""
+按内容寻址的媒体存储测试用例
+"""
+import asyncio
+import hashlib
+import io
+import os
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.models.media_file import MediaFile
+from app.services.media_store import IMMUTABLE_CACHE_CONTROL, ImmutableStaticFiles, MediaStore
+
+
+@pytest.fixture
+def db():
+    engine = create_engine("sqlite://")
+    MediaFile.__table__.create(engine)
+    session = sessionmaker(bind=engine)()
+    yield session
+    session.close()
+
+
+async def _chunks(data: bytes):
+    for i in range(0, len(data), 1000):
+        yield data[i:i + 1000]
+
+
+class TestMediaStore:
+    """媒体存储测试类"""
+
+    def test_same_content_stored_once(self, tmp_path, db):
+        """测试相同内容只存一份，文件按哈希分目录命名"""
+        store = MediaStore(str(tmp_path))
+        data = os.urandom(5000)
+        sha256 = hashlib.sha256(data).hexdigest()
+
+        first = asyncio.run(store.store_stream(_chunks(data), "photo.JPG"))
+        second = store.store_file_object(io.BytesIO(data), "copy.jpg")
+        assert first["file_url"] == second["file_url"] == f"/uploads/blobs/{sha256[:2]}/{sha256[2:4]}/{sha256}.jpg"
+        assert first["deduplicated"] is False
+        assert second["deduplicated"] is True
+        assert store.path_for_url(first["file_url"]) == first["file_path"]
+        with open(first["file_path"], "rb") as f:
+            assert f.read() == data
+        assert os.listdir(store.incoming_dir) == []
+
+    def test_release_collects_last_reference(self, tmp_path, db):
+        """测试最后一条引用删除后回收文件"""
+        store = MediaStore(str(tmp_path))
+        stored = store.store_file_object(io.BytesIO(b"avatar"), "a.png")
+        store.add_reference(db, "u1", stored, "image", "image/png", "a.png")
+        store.add_reference(db, "u2", stored, "image", "image/png", "b.png")
+        assert store.reference_count(db, stored["file_url"]) == 2
+
+        # 其他用户的文件不能删除
+        assert store.release(db, "u3", stored["file_url"]) is None
+        assert store.release(db, "u1", stored["file_url"]) is False
+        assert os.path.exists(stored["file_path"])
+        assert store.release(db, "u2", stored["file_url"]) is True
+        assert not os.path.exists(stored["file_path"])
+        assert store.release(db, "u2", stored["file_url"]) is None
+
+    def test_immutable_cache_header(self, tmp_path):
+        """测试按内容命名的文件返回 immutable 缓存头"""
+        import httpx
+
+        (tmp_path / "x.png").write_bytes(b"png")
+        app = ImmutableStaticFiles(directory=str(tmp_path))
+
+        async def fetch():
+            transport = httpx.ASGITransport(app=app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+                return await client.get("/x.png")
+
+        response = asyncio.run(fetch())
+        assert response.status_code == 200
+        assert response.headers["cache-control"] == IMMUTABLE_CACHE_CONTROL
+        assert "etag" in response.headers
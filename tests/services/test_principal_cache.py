@@ -0,0 +1,69 @@
+"""
+登录用户缓存测试用例
+"""
+from app.services import principal_cache as principal_cache_module
+from app.services.principal_cache import PrincipalCache
+
+
+class _FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def monotonic(self):
+        return self.now
+
+
+class TestPrincipalCache:
+    """登录用户缓存测试类"""
+
+    def test_get_returns_copy(self):
+        """测试命中时返回副本，调用方修改不影响缓存"""
+        cache = PrincipalCache(ttl=30)
+        cache.set("token-a", {"id": "u1", "nickName": "小王"})
+        user = cache.get("token-a")
+        user["nickName"] = "改名"
+        assert cache.get("token-a")["nickName"] == "小王"
+        assert cache.get("token-b") is None
+        assert (cache.hits, cache.misses) == (2, 1)
+
+    def test_ttl_expiry(self, monkeypatch):
+        """测试过期后不再命中"""
+        clock = _FakeClock()
+        monkeypatch.setattr(principal_cache_module, "time", clock)
+        cache = PrincipalCache(ttl=30)
+        cache.set("token-a", {"id": "u1"})
+        clock.now += 29
+        assert cache.get("token-a") is not None
+        clock.now += 2
+        assert cache.get("token-a") is None
+        assert len(cache) == 0
+
+    def test_lru_bound(self):
+        """测试超出容量时淘汰最久未使用的 token"""
+        cache = PrincipalCache(ttl=30, max_items=2)
+        cache.set("token-a", {"id": "u1"})
+        cache.set("token-b", {"id": "u2"})
+        cache.get("token-a")
+        cache.set("token-c", {"id": "u3"})
+        assert cache.get("token-b") is None
+        assert cache.get("token-a") is not None
+        assert "u2" not in cache._by_user
+
+    def test_invalidate_user(self):
+        """测试用户状态变更时使该用户的所有 token 失效"""
+        cache = PrincipalCache(ttl=30)
+        cache.set("token-a", {"id": "u1"})
+        cache.set("token-b", {"id": "u1"})
+        cache.set("token-c", {"id": "u2"})
+        cache.invalidate_user("u1")
+        assert cache.get("token-a") is None
+        assert cache.get("token-b") is None
+        assert cache.get("token-c") is not None
+        cache.invalidate_token("token-c")
+        assert len(cache) == 0
+
+    def test_disabled(self):
+        """测试 TTL 为0时不缓存"""
+        cache = PrincipalCache(ttl=0)
+        cache.set("token-a", {"id": "u1"})
+        assert cache.get("token-a") is None
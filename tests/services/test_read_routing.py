@@ -0,0 +1,58 @@
+"""
+读写分离路由测试用例
+"""
+from unittest.mock import patch
+
+from sqlalchemy import create_engine, text
+from sqlalchemy.orm import sessionmaker
+from starlette.requests import Request
+
+from app.database import ReadWriteRouter, WriteTracker, request_pin_key
+
+
+def _factory(name):
+    engine = create_engine("sqlite://")
+    with engine.begin() as conn:
+        conn.execute(text("CREATE TABLE source (name TEXT)"))
+        conn.execute(text("INSERT INTO source VALUES (:name)"), {"name": name})
+    return sessionmaker(bind=engine)
+
+
+def _source(session):
+    try:
+        return session.execute(text("SELECT name FROM source")).scalar()
+    finally:
+        session.close()
+
+
+def test_round_robin_replicas_and_pinning():
+    """测试从库轮询，写入后窗口期内固定走主库"""
+    tracker = WriteTracker(window=5.0)
+    router = ReadWriteRouter(_factory("primary"), [_factory("r1"), _factory("r2")], tracker)
+
+    assert [_source(router.read_session("u1")) for _ in range(3)] == ["r1", "r2", "r1"]
+
+    tracker.mark_write("u1")
+    assert _source(router.read_session("u1")) == "primary"
+    # 其他用户不受影响
+    assert _source(router.read_session("u2")) == "r2"
+
+    with patch("app.database.time.monotonic", return_value=10 ** 9):
+        assert tracker.is_pinned("u1") is False
+
+
+def test_without_replicas_uses_primary():
+    """测试未配置从库时读请求走主库"""
+    router = ReadWriteRouter(_factory("primary"), [], WriteTracker())
+    assert _source(router.read_session(None)) == "primary"
+
+
+def test_request_pin_key():
+    """测试按认证头区分请求方"""
+    def request(headers):
+        return Request({"type": "http", "headers": [(k.lower().encode(), v.encode()) for k, v in headers.items()]})
+
+    assert request_pin_key(request({})) is None
+    key = request_pin_key(request({"Authorization": "Bearer abc"}))
+    assert key == request_pin_key(request({"Authorization": "Bearer abc"}))
+    assert key != request_pin_key(request({"Authorization": "Bearer xyz"}))
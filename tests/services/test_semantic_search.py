@@ -0,0 +1,70 @@
+"""
+语义搜索结果融合与查询扩展超时测试用例
+"""
+import asyncio
+
+from app.routers.users import _wait_for_expansion, reciprocal_rank_fusion
+
+
+class TestReciprocalRankFusion:
+    """倒数排名融合测试类"""
+
+    def test_fusion_order(self):
+        """测试多路结果中都靠前的用户排在最前，只出现在一路的按排名排序"""
+        vector_hits = [
+            {"user_id": "a", "similarity": 0.9},
+            {"user_id": "b", "similarity": 0.8},
+            {"user_id": "c", "similarity": 0.7},
+        ]
+        lexical_hits = [
+            {"user_id": "b", "similarity": 0.0},
+            {"user_id": "d", "similarity": 0.0},
+        ]
+        fused = reciprocal_rank_fusion([vector_hits, lexical_hits], k=60)
+        assert [c["user_id"] for c in fused] == ["b", "a", "d", "c"]
+
+    def test_similarity_keeps_max(self):
+        """测试融合后保留各路结果中的最大相似度"""
+        fused = reciprocal_rank_fusion([
+            [{"user_id": "a", "similarity": 0.0}],
+            [{"user_id": "a", "similarity": 0.75}],
+            [{"user_id": "a", "similarity": 0.5}],
+        ])
+        assert fused == [{"user_id": "a", "similarity": 0.75}]
+
+    def test_empty(self):
+        """测试没有任何结果时返回空列表"""
+        assert reciprocal_rank_fusion([[], []]) == []
+
+
+class TestExpansionTimeout:
+    """查询扩展等待测试类"""
+
+    def test_timeout_returns_raw_query_only(self):
+        """测试扩展超时时只返回原始查询，并取消扩展任务"""
+        async def scenario():
+            async def slow_expansion():
+                await asyncio.sleep(10)
+                return ["扩展1", "扩展2", "扩展3"]
+
+            task = asyncio.create_task(slow_expansion())
+            queries = await _wait_for_expansion(task, "喜欢爬山的人", timeout=0.01)
+            await asyncio.sleep(0)
+            return queries, task.cancelled()
+
+        queries, cancelled = asyncio.run(scenario())
+        assert queries == ["喜欢爬山的人"]
+        assert cancelled
+
+    def test_expansion_in_time(self):
+        """测试扩展按时完成时返回扩展查询；没有已有结果时不设超时"""
+        async def scenario():
+            async def expansion():
+                await asyncio.sleep(0.01)
+                return ["扩展1", "扩展2", "扩展3"]
+
+            in_time = await _wait_for_expansion(asyncio.create_task(expansion()), "q", timeout=1)
+            unbounded = await _wait_for_expansion(asyncio.create_task(expansion()), "q", timeout=None)
+            return in_time, unbounded
+
+        assert asyncio.run(scenario()) == (["扩展1", "扩展2", "扩展3"], ["扩展1", "扩展2", "扩展3"])
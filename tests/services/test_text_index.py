@@ -0,0 +1,78 @@
+"""
+本地倒排索引测试用例
+"""
+from app.services.text_index import InvertedIndex, covers_substring, query_terms, tokenize
+
+
+class TestTokenize:
+    """分词测试类"""
+
+    def test_cjk_bigrams_and_words(self):
+        """测试中文输出单字与二元组，英文按单词小写"""
+        assert tokenize("爬山 Python") == ["爬", "山", "爬山", "python"]
+        assert tokenize("ＡＩ工程师") == ["ai", "工", "程", "师", "工程", "程师"]
+        assert tokenize(None) == []
+
+    def test_query_terms(self):
+        """测试查询多字中文只用二元组并去重"""
+        assert query_terms("程序员 程序") == ["程序", "序员"]
+        assert query_terms("猫") == ["猫"]
+
+    def test_covers_substring(self):
+        """测试只有中文查询可以用索引代替子串匹配"""
+        assert covers_substring("爬山 徒步") is True
+        assert covers_substring("run") is False
+        assert covers_substring("iPhone 推荐") is False
+        assert covers_substring("！？") is False
+
+
+class TestInvertedIndex:
+    """倒排索引测试类"""
+
+    def _build(self):
+        index = InvertedIndex(field_weights={"name": 3.0})
+        index.upsert("u1", {"name": "小王", "bio": "后端程序员，喜欢爬山"})
+        index.upsert("u2", {"name": "阿明", "bio": "产品经理，周末爬山徒步"})
+        index.upsert("u3", {"name": "程序猿老李", "bio": "摄影"})
+        return index
+
+    def test_bm25_ranking_and_field_weight(self):
+        """测试BM25排序与字段权重"""
+        index = self._build()
+        hits = index.search("爬山")
+        assert {doc_id for doc_id, _ in hits} == {"u1", "u2"}
+
+        # 名称字段权重更高
+        hits = index.search("程序")
+        assert hits[0][0] == "u3"
+
+    def test_require_all_and_exclude(self):
+        """测试全部命中（替代子串匹配）与排除"""
+        index = self._build()
+        assert [d for d, _ in index.search("程序员", require_all=True)] == ["u1"]
+        assert index.search("程序员 摄影", require_all=True) == []
+        assert [d for d, _ in index.search("爬山", exclude_ids=["u1"])] == ["u2"]
+
+    def test_incremental_update_and_remove(self):
+        """测试增量更新与删除只影响对应文档"""
+        index = self._build()
+        index.upsert("u2", {"name": "阿明", "bio": "游泳"})
+        assert [d for d, _ in index.search("爬山")] == ["u1"]
+        assert index.remove("u1") is True
+        assert index.search("爬山") == []
+        assert "爬山" not in index._postings
+        assert len(index) == 2
+        index.upsert("u3", {"name": None})
+        assert "u3" not in index
+
+    def test_search_page(self):
+        """测试堆分页返回当前页与命中总数，同分按次序键排序"""
+        index = InvertedIndex()
+        for i in range(5):
+            index.upsert(f"d{i}", {"title": "周末爬山"})
+        order = {f"d{i}": i for i in range(5)}
+        hits, total = index.search_page("爬山", offset=1, limit=2, tie_breaker=order.get)
+        assert total == 5
+        assert [d for d, _ in hits] == ["d3", "d2"]
+        hits, total = index.search_page("爬山", offset=4, limit=2, doc_filter=lambda d: d != "d0")
+        assert (hits, total) == ([], 4)
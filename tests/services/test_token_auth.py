@@ -0,0 +1,132 @@
+"""
+版本化令牌与吊销列表测试用例
+"""
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.config import settings
+from app.models.user import User
+from app.models.used_refresh_token import UsedRefreshToken
+from app.models.user_token_version import UserTokenVersion
+from app.services import auth as auth_module
+from app.services.auth import AuthService
+from app.services.principal_cache import PrincipalCache
+from app.services.token_revocation import TokenRevocationList
+
+
+@pytest.fixture
+def session_factory(monkeypatch):
+    engine = create_engine("sqlite://")
+    User.__table__.create(engine)
+    UserTokenVersion.__table__.create(engine)
+    UsedRefreshToken.__table__.create(engine)
+    factory = sessionmaker(bind=engine)
+    db = factory()
+    db.add(User(id="u1", nick_name="小王", avatar_url="a.png", gender=1, status="active"))
+    db.commit()
+    db.close()
+    monkeypatch.setattr(auth_module, "token_revocations", TokenRevocationList(factory, refresh_interval=3600))
+    monkeypatch.setattr(auth_module, "principal_cache", PrincipalCache(ttl=30))
+    return factory
+
+
+def _no_db(*args, **kwargs):
+    raise AssertionError("不应查询数据库")
+
+
+class TestVersionedToken:
+    """版本化令牌测试类"""
+
+    def test_claims_mode_without_db(self, session_factory, monkeypatch):
+        """测试访问令牌携带用户资料，校验时不查询数据库"""
+        tokens = AuthService.issue_tokens({"id": "u1", "nickName": "小王", "avatarUrl": "a.png", "gender": 1})
+        assert tokens["expiresIn"] == settings.AUTH_ACCESS_TOKEN_EXPIRE_MINUTES * 60
+        monkeypatch.setattr(auth_module, "get_user_func", _no_db)
+        user = AuthService.get_user_from_token(tokens["token"])
+        assert user == {"id": "u1", "nickName": "小王", "avatarUrl": "a.png", "gender": 1, "phone": None}
+        # 刷新令牌不能当作访问令牌使用
+        assert AuthService.get_user_from_token(tokens["refreshToken"]) is None
+
+    def test_expired_token_rejected(self, session_factory, monkeypatch):
+        """测试过期的访问令牌不再有效"""
+        monkeypatch.setattr(settings, "AUTH_ACCESS_TOKEN_EXPIRE_MINUTES", -1)
+        token = AuthService.create_token("u1", {"nickName": "小王"})
+        assert AuthService.get_user_from_token(token) is None
+
+    def test_revoke_and_refresh(self, session_factory):
+        """测试吊销后旧令牌失效，刷新令牌换取的新令牌带有最新资料"""
+        tokens = AuthService.issue_tokens({"id": "u1", "nickName": "旧昵称"})
+        assert AuthService.revoke_user_tokens("u1") == 1
+        assert AuthService.get_user_from_token(tokens["token"]) is None
+        db = session_factory()
+        try:
+            with pytest.raises(ValueError):
+                AuthService.refresh_tokens(tokens["refreshToken"], db)
+        finally:
+            db.close()
+
+        tokens = AuthService.issue_tokens({"id": "u1", "nickName": "旧昵称"})
+        db = session_factory()
+        try:
+            refreshed = AuthService.refresh_tokens(tokens["refreshToken"], db)
+        finally:
+            db.close()
+        assert AuthService.get_user_from_token(refreshed["token"])["nickName"] == "小王"
+
+    def test_refresh_token_single_use(self, session_factory, monkeypatch):
+        """测试刷新令牌轮换后旧刷新令牌不能再次使用（其他 worker 同样拒绝）"""
+        tokens = AuthService.issue_tokens({"id": "u1", "nickName": "小王"})
+        db = session_factory()
+        try:
+            refreshed = AuthService.refresh_tokens(tokens["refreshToken"], db)
+            with pytest.raises(ValueError):
+                AuthService.refresh_tokens(tokens["refreshToken"], db)
+
+            monkeypatch.setattr(auth_module, "token_revocations", TokenRevocationList(session_factory, refresh_interval=3600))
+            with pytest.raises(ValueError):
+                AuthService.refresh_tokens(tokens["refreshToken"], db)
+            assert AuthService.refresh_tokens(refreshed["refreshToken"], db)["token"]
+        finally:
+            db.close()
+
+    def test_legacy_token_uses_db(self, session_factory, monkeypatch):
+        """测试旧格式令牌（只有 user_id）仍按数据库校验"""
+        from jose import jwt
+
+        token = jwt.encode({"user_id": "u1"}, settings.SECRET_KEY, algorithm=settings.ALGORITHM)
+        monkeypatch.setattr("app.utils.db_config.SessionLocal", session_factory)
+        assert AuthService.get_user_from_token(token)["nickName"] == "小王"
+
+    def test_legacy_token_cutoff_and_revocation(self, session_factory, monkeypatch):
+        """测试旧格式令牌超过截止时间或用户吊销令牌后失效"""
+        from jose import jwt
+
+        token = jwt.encode({"user_id": "u1"}, settings.SECRET_KEY, algorithm=settings.ALGORITHM)
+        monkeypatch.setattr(settings, "AUTH_LEGACY_TOKEN_CUTOFF", "2999-01-01")
+        assert AuthService.decode_token(token) is not None
+        monkeypatch.setattr(settings, "AUTH_LEGACY_TOKEN_CUTOFF", "2000-01-01")
+        assert AuthService.decode_token(token) is None
+
+        monkeypatch.setattr(settings, "AUTH_LEGACY_TOKEN_CUTOFF", "")
+        AuthService.revoke_user_tokens("u1")
+        assert AuthService.decode_token(token) is None
+
+
+class TestTokenRevocationList:
+    """令牌吊销列表测试类"""
+
+    def test_other_worker_sees_revocation_after_refresh(self, session_factory):
+        """测试其他 worker 的吊销在刷新吊销列表后生效"""
+        worker_a = TokenRevocationList(session_factory, refresh_interval=3600)
+        worker_b = TokenRevocationList(session_factory, refresh_interval=3600)
+        assert worker_b.is_revoked("u1", 0) is False
+
+        worker_a.revoke_user("u1")
+        worker_a.revoke_user("u1")
+        assert worker_a.current_version("u1") == 2
+        assert worker_b.is_revoked("u1", 1) is False
+        worker_b.refresh(force=True)
+        assert worker_b.is_revoked("u1", 1) is True
+        assert worker_b.is_revoked("u1", 2) is False
+        assert worker_b.is_revoked("u2", None) is False
@@ -0,0 +1,80 @@
+"""
+用户文本检索索引测试用例
+"""
+import pytest
+from sqlalchemy import create_engine, text
+from sqlalchemy.orm import sessionmaker
+
+from app.services.user_search_index import UserSearchIndex
+
+
+@pytest.fixture
+def db():
+    engine = create_engine("sqlite://")
+    with engine.begin() as conn:
+        conn.execute(text(
+            "CREATE TABLE users (id TEXT PRIMARY KEY, nick_name TEXT, occupation TEXT, bio TEXT, "
+            "is_active BOOLEAN, created_at DATETIME, updated_at DATETIME)"
+        ))
+        conn.execute(text("CREATE TABLE user_profiles (id TEXT PRIMARY KEY, user_id TEXT, profile_summary TEXT, updated_at DATETIME)"))
+        conn.execute(text(
+            "CREATE TABLE user_cards (id TEXT PRIMARY KEY, user_id TEXT, display_name TEXT, bio TEXT, "
+            "is_deleted INTEGER, created_at DATETIME, updated_at DATETIME)"
+        ))
+        conn.execute(text(
+            "INSERT INTO users VALUES "
+            "('u1', '小王', '程序员', '喜欢爬山', 1, '2025-01-01 00:00:00', NULL), "
+            "('u2', '阿明', '设计师', NULL, 1, '2025-01-01 00:00:00', NULL), "
+            "('u3', '停用用户', '程序员', NULL, 0, '2025-01-01 00:00:00', NULL)"
+        ))
+        conn.execute(text("INSERT INTO user_profiles VALUES ('p2', 'u2', '热爱徒步和爬山', '2025-01-01 00:00:00')"))
+        conn.execute(text("INSERT INTO user_cards VALUES ('c1', 'u1', '摄影达人', '胶片摄影', 0, '2025-01-01 00:00:00', NULL)"))
+    session = sessionmaker(bind=engine)()
+    yield session
+    session.close()
+
+
+class TestUserSearchIndex:
+    """用户文本检索索引测试类"""
+
+    def test_build_from_all_sources(self, db):
+        """测试汇总用户、画像与卡片文本，并跳过停用用户"""
+        index = UserSearchIndex(sync_interval=3600)
+        assert {uid for uid, _ in index.search(db, "爬山")} == {"u1", "u2"}
+        assert [uid for uid, _ in index.search(db, "摄影")] == ["u1"]
+        assert [uid for uid, _ in index.search(db, "程序员")] == ["u1"]
+        assert index.search(db, "爬山", exclude_ids=["u1"])[0][0] == "u2"
+
+    def test_touch_refreshes_user(self, db):
+        """测试本进程写入后标记的用户在下次检索前重新加载"""
+        index = UserSearchIndex(sync_interval=3600)
+        index.sync(db)
+        db.execute(text("UPDATE user_cards SET is_deleted = 1 WHERE id = 'c1'"))
+        db.commit()
+        assert index.search(db, "摄影") != []
+
+        index.touch("u1")
+        assert index.search(db, "摄影") == []
+
+    def test_watermark_sync(self, db):
+        """测试按时间水位增量同步其他进程的写入"""
+        index = UserSearchIndex(sync_interval=3600)
+        index.sync(db)
+        db.execute(text("INSERT INTO users VALUES ('u4', '新用户', '厨师', NULL, 1, '2025-02-01 00:00:00', NULL)"))
+        db.commit()
+        assert index.search(db, "厨师") == []
+        index.sync(db, force=True)
+        assert [uid for uid, _ in index.search(db, "厨师")] == ["u4"]
+
+    def test_search_during_warm_up(self, db):
+        """测试后台预热构建期间检索不等待，返回 None 由调用方回退到数据库查询"""
+        index = UserSearchIndex(sync_interval=3600)
+        index._warming = True
+        with index._sync_lock:
+            assert index.search(db, "爬山") is None
+        index._warming = False
+        assert index.search(db, "爬山") is not None
+
+    def test_disabled(self, db):
+        """测试未启用时返回 None"""
+        assert UserSearchIndex(enabled=False).search(db, "爬山") is None
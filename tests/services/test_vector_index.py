@@ -0,0 +1,176 @@
+"""
+画像向量索引测试用例
+"""
+import json
+import os
+from datetime import datetime, timedelta
+
+import numpy as np
+
+import pytest
+from sqlalchemy import create_engine, text
+from sqlalchemy.orm import sessionmaker
+
+from app.services.vector_index import ProfileVectorIndex
+
+
+def _random_vectors(n, dim, seed=0):
+    return np.random.default_rng(seed).normal(size=(n, dim)).astype(np.float32)
+
+
+class TestProfileVectorIndex:
+    """画像向量索引测试类"""
+
+    def test_brute_force_search_and_exclude(self):
+        """测试暴力检索按余弦相似度排序并支持排除用户"""
+        index = ProfileVectorIndex(dimension=3)
+        index.upsert("a", [1, 0, 0])
+        index.upsert("b", [1, 1, 0])
+        index.upsert("c", [0, 0, 1])
+
+        hits = index.search([2, 0, 0], k=2)
+        assert [user_id for user_id, _ in hits] == ["a", "b"]
+        assert hits[0][1] == pytest.approx(1.0)
+        assert hits[1][1] == pytest.approx(np.sqrt(0.5))
+
+        hits = index.search([1, 0, 0], k=2, exclude_ids=["a"])
+        assert [user_id for user_id, _ in hits] == ["b", "c"]
+
+    def test_update_remove_and_zero_vector(self):
+        """测试更新、删除以及零向量占位被移出索引"""
+        index = ProfileVectorIndex(dimension=2)
+        index.upsert("a", [1, 0])
+        index.upsert("a", [0, 1])
+        assert len(index) == 1
+        assert index.search([0, 1], k=1)[0][0] == "a"
+
+        assert index.upsert("a", [0, 0]) is False
+        assert len(index) == 0
+        assert index.search([0, 1], k=1) == []
+
+        # 回收的槽位会被复用
+        index.upsert("b", [1, 0])
+        assert len(index._ids) == 1
+        assert index.remove("b") is True
+        assert index.remove("b") is False
+
+    def test_ivf_recall(self):
+        """测试IVF分桶检索与暴力检索结果基本一致"""
+        vectors = _random_vectors(600, 16)
+        index = ProfileVectorIndex(dimension=16, ivf_min_size=200, nprobe=8)
+        for i, v in enumerate(vectors):
+            index.upsert(f"u{i}", v)
+        index.train()
+        assert index._centroids is not None
+
+        brute = ProfileVectorIndex(dimension=16)
+        for i, v in enumerate(vectors):
+            brute.upsert(f"u{i}", v)
+
+        recall = 0
+        queries = _random_vectors(20, 16, seed=1)
+        for q in queries:
+            expected = {user_id for user_id, _ in brute.search(q, k=10)}
+            recall += len(expected & {user_id for user_id, _ in index.search(q, k=10)})
+        assert recall / (len(queries) * 10) >= 0.7
+
+        # 训练后插入的向量直接分配到最近的分桶
+        index.upsert("new", queries[0])
+        assert index.search(queries[0], k=1)[0][0] == "new"
+
+    def test_snapshot_roundtrip(self, tmp_path):
+        """测试快照保存后以内存映射方式加载"""
+        index = ProfileVectorIndex(path=str(tmp_path), dimension=4)
+        index.upsert("a", [1, 0, 0, 0])
+        index.upsert("b", [0, 1, 0, 0])
+        index.remove("a")
+        index.save()
+
+        restored = ProfileVectorIndex(path=str(tmp_path), dimension=4)
+        assert restored.load() is True
+        assert isinstance(restored._matrix, np.memmap)
+        assert len(restored) == 1
+        assert restored.search([0, 1, 0, 0], k=5) == [("b", pytest.approx(1.0))]
+
+        # 写时复制：加载后的增量写入不修改快照文件
+        restored.upsert("c", [0, 0, 1, 0])
+        assert ProfileVectorIndex(path=str(tmp_path), dimension=4).load() is True
+
+        assert ProfileVectorIndex(path=str(tmp_path), dimension=8).load() is False
+
+    def test_snapshot_generations(self, tmp_path):
+        """测试每次保存写入新的代目录，只通过 current 指针读取完整的一代"""
+        first = ProfileVectorIndex(path=str(tmp_path), dimension=4)
+        first.upsert("a", [1, 0, 0, 0])
+        first.save()
+        second = ProfileVectorIndex(path=str(tmp_path), dimension=4)
+        second.upsert("b", [0, 1, 0, 0])
+        for _ in range(3):
+            second.save()
+
+        generations = sorted(name for name in os.listdir(tmp_path) if name.startswith("gen-"))
+        assert len(generations) == 2
+        restored = ProfileVectorIndex(path=str(tmp_path), dimension=4)
+        assert restored.load() is True
+        assert restored.search([0, 1, 0, 0], k=5) == [("b", pytest.approx(1.0))]
+
+        # 指针指向的代目录与其中的元数据不一致时拒绝加载
+        current = (tmp_path / "current").read_text()
+        meta_path = tmp_path / current / "meta.json"
+        meta_path.write_text(meta_path.read_text().replace(current, "gen-other"))
+        assert ProfileVectorIndex(path=str(tmp_path), dimension=4).load() is False
+
+    def test_sync_from_database(self):
+        """测试首次全量构建与按 updated_at 水位增量同步"""
+        engine = create_engine("sqlite://")
+        with engine.begin() as conn:
+            conn.execute(text(
+                "CREATE TABLE user_profiles (id TEXT PRIMARY KEY, user_id TEXT, "
+                "raw_profile_embedding TEXT, updated_at DATETIME)"
+            ))
+        db = sessionmaker(bind=engine)()
+        base = datetime(2025, 1, 1)
+
+        def write(profile_id, user_id, vector, minutes):
+            db.execute(
+                text("INSERT OR REPLACE INTO user_profiles VALUES (:id, :user_id, :embedding, :updated_at)"),
+                {"id": profile_id, "user_id": user_id, "embedding": json.dumps(vector),
+                 "updated_at": base + timedelta(minutes=minutes)}
+            )
+            db.commit()
+
+        write("p1", "u1", [1, 0], 0)
+        write("p2", "u2", [0, 0], 1)
+        index = ProfileVectorIndex(dimension=2, sync_interval=3600)
+        assert index.sync(db, batch_size=1) is True
+        assert len(index) == 1
+
+        # 同步间隔内不再查询数据库
+        write("p2", "u2", [0, 1], 2)
+        index.sync(db)
+        assert len(index) == 1
+
+        index.sync(db, force=True)
+        assert len(index) == 2
+        assert index.search([0, 1], k=1)[0][0] == "u2"
+        db.close()
+
+    def test_sync_binary_storage(self):
+        """测试从二进制向量列同步"""
+        from app.utils.vector_codec import encode_vector
+
+        engine = create_engine("sqlite://")
+        with engine.begin() as conn:
+            conn.execute(text(
+                "CREATE TABLE user_profiles (id TEXT PRIMARY KEY, user_id TEXT, "
+                "raw_profile_embedding BLOB, updated_at DATETIME)"
+            ))
+            conn.execute(
+                text("INSERT INTO user_profiles VALUES ('p1', 'u1', :embedding, '2025-01-01 00:00:00')"),
+                {"embedding": encode_vector([0, 3, 4], "float16")}
+            )
+        db = sessionmaker(bind=engine)()
+        index = ProfileVectorIndex(dimension=3, storage_format="float16")
+        assert index.sync(db) is True
+        assert index.search([0, 3, 4], k=1) == [("u1", pytest.approx(1.0))]
+        db.close()
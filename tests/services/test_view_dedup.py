@@ -0,0 +1,115 @@
+"""
+浏览去重服务测试用例
+"""
+import pytest
+
+from app.services import view_dedup
+from app.services.view_dedup import MemoryDedupStore, SQLiteDedupStore, ViewDeduplicator
+
+
+class _FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def monotonic(self):
+        return self.now
+
+    def time(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    fake = _FakeClock()
+    monkeypatch.setattr(view_dedup, "time", fake)
+    return fake
+
+
+class TestMemoryDedupStore:
+    """进程内去重存储测试类"""
+
+    def test_window_and_expiry(self, clock):
+        """测试窗口内重复访问不计数，过期后重新计数并弹出过期记录"""
+        store = MemoryDedupStore(ttl=300)
+        assert store.add("a") is True
+        assert store.add("a") is False
+        clock.now += 200
+        assert store.add("b") is True
+        clock.now += 100
+        assert store.add("a") is True
+        # a 已过期后重新写入，b 仍在窗口内
+        assert len(store) == 2
+        assert store.add("b") is False
+
+    def test_capacity_bound(self, clock):
+        """测试超出容量时淘汰最早的记录"""
+        store = MemoryDedupStore(ttl=300, max_items=2)
+        for key in ("a", "b", "c"):
+            store.add(key)
+        assert len(store) == 2
+        assert store.add("a") is True
+
+
+class TestSQLiteDedupStore:
+    """共享存储去重测试类"""
+
+    def test_shared_between_workers(self, clock, tmp_path):
+        """测试两个 worker 使用同一文件时共享去重结果"""
+        path = str(tmp_path / "dedup.sqlite3")
+        worker_a = SQLiteDedupStore(path, ttl=300, purge_every=2)
+        worker_b = SQLiteDedupStore(path, ttl=300, purge_every=2)
+        assert worker_a.add("topic_card:t1:u1") is True
+        assert worker_b.add("topic_card:t1:u1") is False
+        clock.now += 301
+        assert worker_b.add("topic_card:t1:u1") is True
+        assert worker_a.add("topic_card:t1:u1") is False
+
+    def test_purge_expired(self, clock, tmp_path):
+        """测试定期删除过期记录"""
+        store = SQLiteDedupStore(str(tmp_path / "dedup.sqlite3"), ttl=10, purge_every=2)
+        store.add("a")
+        clock.now += 11
+        store.add("b")
+        count = store._conn.execute("SELECT COUNT(*) FROM view_dedup").fetchone()[0]
+        assert count == 1
+
+    def test_fallback_to_memory(self, clock, tmp_path):
+        """测试共享文件不可用时退回进程内去重"""
+        blocker = tmp_path / "file"
+        blocker.write_text("")
+        store = SQLiteDedupStore(str(blocker / "dedup.sqlite3"), ttl=300)
+        assert store.add("a") is True
+        assert store.add("a") is False
+
+
+class TestViewDeduplicator:
+    """浏览去重测试类"""
+
+    def test_anonymous_always_counted(self, clock):
+        """测试未登录用户每次都计数，不同内容类型互不影响"""
+        dedup = ViewDeduplicator(MemoryDedupStore(ttl=300))
+        assert dedup.should_count("topic_card", "c1", None) is True
+        assert dedup.should_count("topic_card", "c1", None) is True
+        assert dedup.should_count("topic_card", "c1", "u1") is True
+        assert dedup.should_count("topic_card", "c1", "u1") is False
+        assert dedup.should_count("vote_card", "c1", "u1") is True
+
+    def test_async_shared_store_runs_in_thread(self, clock, tmp_path, monkeypatch):
+        """测试异步调用时共享存储的写入放到线程池执行"""
+        import asyncio
+
+        offloaded = []
+
+        async def fake_to_thread(func, *args):
+            offloaded.append(func)
+            return func(*args)
+
+        monkeypatch.setattr(view_dedup.asyncio, "to_thread", fake_to_thread)
+        shared = ViewDeduplicator(SQLiteDedupStore(str(tmp_path / "dedup.sqlite3"), ttl=300))
+        assert asyncio.run(shared.should_count_async("topic_card", "c1", "u1")) is True
+        assert asyncio.run(shared.should_count_async("topic_card", "c1", "u1")) is False
+        assert len(offloaded) == 2
+
+        memory = ViewDeduplicator(MemoryDedupStore(ttl=300))
+        assert asyncio.run(memory.should_count_async("topic_card", "c1", "u1")) is True
+        assert len(offloaded) == 2
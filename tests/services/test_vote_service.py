@@ -314,4 +314,28 @@ class TestVoteLogicIssues:
         assert option_id_param.annotation == str
         
         # 这里应该修改为支持多个选项取消
-        # 建议修改为: option_ids: List[str]
\ No newline at end of file
+        # 建议修改为: option_ids: List[str]
+
+class TestIncrementViewCount:
+    """浏览计数测试类"""
+    
+    @pytest.fixture
+    def mock_db(self):
+        """创建模拟数据库会话"""
+        return Mock(spec=Session)
+    
+    def test_missing_card_not_counted(self, mock_db, isolated_counters):
+        """测试卡片不存在或已删除时不计数"""
+        mock_db.query.return_value.filter.return_value.first.return_value = None
+        
+        assert VoteService(mock_db).increment_view_count("missing_card", "u1") is False
+        assert isolated_counters.pending("vote_cards", "missing_card", "view_count") == 0
+    
+    def test_existing_card_counted_once(self, mock_db, isolated_counters):
+        """测试卡片存在时计数，窗口内重复浏览不计数"""
+        mock_db.query.return_value.filter.return_value.first.return_value = ("card_1",)
+        service = VoteService(mock_db)
+        
+        assert service.increment_view_count("card_1", "u1") is True
+        assert service.increment_view_count("card_1", "u1") is False
+        assert isolated_counters.pending("vote_cards", "card_1", "view_count") == 1
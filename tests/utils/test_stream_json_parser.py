@@ -0,0 +1,42 @@
+"""
+流式JSON字段提取器测试用例
+"""
+from app.utils.stream_json_parser import StreamingJSONFieldExtractor
+
+
+class TestStreamingJSONFieldExtractor:
+    """流式JSON字段提取器测试类"""
+
+    def test_fields_emitted_as_soon_as_complete(self):
+        """测试字段在完整时立即返回，不等待后续内容"""
+        extractor = StreamingJSONFieldExtractor()
+        assert extractor.feed('好的```json\n{"confid') == []
+        assert extractor.feed('ence": 0.9') == []
+        assert extractor.feed(', "is_meet_preference": tr') == [("confidence", 0.9)]
+        assert extractor.feed('ue') == [("is_meet_preference", True)]
+        assert extractor.feed(', "preference_judgement": "符合"') == [("preference_judgement", "符合")]
+        assert extractor.feed('}```') == []
+        assert extractor.object_finished
+
+    def test_nested_values_and_escapes(self):
+        """测试嵌套结构与转义字符"""
+        extractor = StreamingJSONFieldExtractor()
+        content = '{"suggestions": ["a}", "b\\"c"], "meta": {"x": [1, {"y": 2}]}, "n": null}'
+        completed = []
+        for ch in content:
+            completed.extend(extractor.feed(ch))
+        assert completed == [
+            ("suggestions", ["a}", 'b"c']),
+            ("meta", {"x": [1, {"y": 2}]}),
+            ("n", None),
+        ]
+        assert extractor.text == content
+
+    def test_plain_text_without_json(self):
+        """测试没有JSON对象的纯文本"""
+        extractor = StreamingJSONFieldExtractor()
+        extractor.feed("你好，")
+        extractor.feed("很高兴认识你")
+        assert not extractor.object_started
+        assert extractor.fields == {}
+        assert extractor.text == "你好，很高兴认识你"
@@ -0,0 +1,71 @@
+"""
+流式文件上传测试用例
+"""
+import asyncio
+import hashlib
+import io
+import os
+
+import pytest
+
+from app.utils.upload_stream import UploadTooLargeError, iter_upload_file, save_file_object, save_stream
+
+
+async def _chunks(data: bytes, size: int):
+    for i in range(0, len(data), size):
+        yield data[i:i + size]
+
+
+class _UploadFile:
+    """模拟 UploadFile 的异步 read 接口"""
+
+    def __init__(self, data: bytes):
+        self._buffer = io.BytesIO(data)
+        self.reads = []
+
+    async def read(self, size: int = -1) -> bytes:
+        self.reads.append(size)
+        return self._buffer.read(size)
+
+
+class TestUploadStream:
+    """流式文件上传测试类"""
+
+    def test_save_stream(self, tmp_path):
+        """测试分块写入后原子重命名，并计算哈希"""
+        data = os.urandom(100_000)
+        result = asyncio.run(save_stream(_chunks(data, 4096), str(tmp_path), "a.png", max_size=len(data)))
+        assert result["file_size"] == len(data)
+        assert result["sha256"] == hashlib.sha256(data).hexdigest()
+        with open(result["file_path"], "rb") as f:
+            assert f.read() == data
+        assert os.listdir(tmp_path) == ["a.png"]
+
+    def test_abort_when_too_large(self, tmp_path):
+        """测试超过大小限制时中止，不读取剩余内容，不留下临时文件"""
+        consumed = []
+
+        async def chunks():
+            for i in range(100):
+                consumed.append(i)
+                yield b"x" * 1024
+
+        with pytest.raises(UploadTooLargeError):
+            asyncio.run(save_stream(chunks(), str(tmp_path), "big.mp4", max_size=4096))
+        assert len(consumed) == 5
+        assert os.listdir(tmp_path) == []
+
+    def test_upload_file_read_in_chunks(self, tmp_path):
+        """测试 UploadFile 按固定分块读取"""
+        upload = _UploadFile(b"y" * 10_000)
+        result = asyncio.run(save_stream(iter_upload_file(upload, 4096), str(tmp_path), "b.txt"))
+        assert result["file_size"] == 10_000
+        assert upload.reads == [4096, 4096, 4096, 4096]
+
+    def test_save_file_object(self, tmp_path):
+        """测试同步版本分块保存文件对象"""
+        result = save_file_object(io.BytesIO(b"z" * 5000), str(tmp_path), "c.jpg", chunk_size=1024)
+        assert result["file_size"] == 5000
+        with pytest.raises(UploadTooLargeError):
+            save_file_object(io.BytesIO(b"z" * 5000), str(tmp_path), "d.jpg", max_size=1000, chunk_size=1024)
+        assert sorted(os.listdir(tmp_path)) == ["c.jpg"]
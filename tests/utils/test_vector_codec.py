@@ -0,0 +1,60 @@
+"""
+向量二进制编解码测试用例
+"""
+import json
+
+import numpy as np
+import pytest
+
+from app.utils.vector_codec import BinaryVector, decode_vector, encode_vector, is_encoded_vector
+
+
+class TestVectorCodec:
+    """向量编解码测试类"""
+
+    @pytest.mark.parametrize("dtype,size", [("float32", 4), ("float16", 2), ("int8", 1)])
+    def test_encoded_size(self, dtype, size):
+        """测试编码后的体积远小于JSON文本"""
+        vector = np.random.default_rng(0).normal(size=1024).tolist()
+        data = encode_vector(vector, dtype)
+        assert is_encoded_vector(data)
+        assert len(data) <= 1024 * size + 8
+        assert len(data) < len(json.dumps(vector)) / 4
+
+    def test_float_roundtrip_is_zero_copy(self):
+        """测试 float32 原样还原且解码结果直接引用原始字节"""
+        vector = [0.5, -0.25, 1.0]
+        data = encode_vector(vector, "float32")
+        decoded = decode_vector(data)
+        assert decoded.tolist() == vector
+        assert decoded.base is not None
+        assert not decoded.flags.writeable
+
+        assert decode_vector(encode_vector(vector, "float16")).tolist() == vector
+
+    def test_int8_quantization(self):
+        """测试 int8 量化误差与零向量"""
+        vector = np.random.default_rng(1).normal(size=256).astype(np.float32)
+        decoded = decode_vector(encode_vector(vector, "int8"))
+        assert decoded.dtype == np.float32
+        assert np.max(np.abs(decoded - vector)) <= np.max(np.abs(vector)) / 127
+        cosine = float(decoded @ vector / (np.linalg.norm(decoded) * np.linalg.norm(vector)))
+        assert cosine > 0.999
+
+        assert decode_vector(encode_vector([0.0] * 4, "int8")).tolist() == [0.0] * 4
+
+    def test_invalid_input(self):
+        """测试非法精度与非编码字节"""
+        with pytest.raises(ValueError):
+            encode_vector([1.0], "float64")
+        assert decode_vector(b"[0.1, 0.2]") is None
+        assert decode_vector(None) is None
+
+    def test_column_type(self):
+        """测试二进制向量列类型的编解码"""
+        column_type = BinaryVector("float16")
+        data = column_type.process_bind_param([1.0, 2.0], None)
+        assert is_encoded_vector(data)
+        assert column_type.process_bind_param(data, None) is data
+        assert column_type.process_result_value(data, None).tolist() == [1.0, 2.0]
+        assert column_type.process_result_value(None, None) is None
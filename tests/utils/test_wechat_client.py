@@ -0,0 +1,148 @@
+"""
+微信接口异步客户端测试用例
+"""
+import asyncio
+import time
+
+import httpx
+import pytest
+
+from app.utils.wechat_client import CircuitBreaker, WeChatAsyncClient, WeChatUnavailableError
+
+
+def _client(handler, retries=2, breaker=None):
+    return WeChatAsyncClient(
+        retries=retries,
+        backoff=0.001,
+        breaker=breaker,
+        transport=httpx.MockTransport(handler)
+    )
+
+
+class TestWeChatAsyncClient:
+    """微信接口异步客户端测试类"""
+
+    def test_retry_on_busy_and_server_error(self):
+        """测试系统繁忙和 5xx 时重试"""
+        responses = [
+            httpx.Response(502),
+            httpx.Response(200, json={"errcode": -1, "errmsg": "system busy"}),
+            httpx.Response(200, json={"openid": "o1", "session_key": "k"}),
+        ]
+        calls = []
+
+        def handler(request):
+            calls.append(request)
+            return responses[len(calls) - 1]
+
+        client = _client(handler)
+        result = asyncio.run(client.request_json("GET", "/sns/jscode2session", params={"js_code": "c"}))
+        assert result["openid"] == "o1"
+        assert len(calls) == 3
+        assert calls[0].url.params["js_code"] == "c"
+
+    def test_no_retry_on_read_timeout(self):
+        """测试读超时不重试，避免重复消费 code"""
+        calls = []
+
+        def handler(request):
+            calls.append(request)
+            raise httpx.ReadTimeout("timeout", request=request)
+
+        client = _client(handler)
+        with pytest.raises(WeChatUnavailableError):
+            asyncio.run(client.request_json("GET", "/sns/jscode2session"))
+        assert len(calls) == 1
+
+    def test_business_error_returned(self):
+        """测试业务错误码直接返回给调用方，不重试也不计入熔断"""
+        calls = []
+
+        def handler(request):
+            calls.append(request)
+            return httpx.Response(200, json={"errcode": 40029, "errmsg": "invalid code"})
+
+        breaker = CircuitBreaker(failure_threshold=1)
+        client = _client(handler, breaker=breaker)
+        assert asyncio.run(client.request_json("GET", "/sns/jscode2session"))["errcode"] == 40029
+        assert len(calls) == 1
+        assert breaker.state == "closed"
+
+    def test_breaker_opens_and_recovers(self):
+        """测试连续失败后熔断，超时后放行探测请求并恢复"""
+        healthy = False
+        calls = []
+
+        def handler(request):
+            calls.append(request)
+            if not healthy:
+                raise httpx.ConnectError("refused", request=request)
+            return httpx.Response(200, json={"errcode": 0})
+
+        breaker = CircuitBreaker(failure_threshold=2, reset_timeout=0.05)
+        client = _client(handler, retries=0, breaker=breaker)
+
+        async def scenario():
+            for _ in range(2):
+                with pytest.raises(WeChatUnavailableError):
+                    await client.request_json("GET", "/path")
+            assert breaker.state == "open"
+            # 熔断期间直接拒绝，不再请求微信
+            with pytest.raises(WeChatUnavailableError):
+                await client.request_json("GET", "/path")
+            assert len(calls) == 2
+
+            time.sleep(0.06)
+            nonlocal healthy
+            healthy = True
+            assert (await client.request_json("GET", "/path"))["errcode"] == 0
+            assert breaker.state == "closed"
+            await client.close()
+
+        asyncio.run(scenario())
+
+    def test_half_open_failure_reopens(self):
+        """测试半开状态下探测失败重新熔断"""
+        breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0.01)
+        breaker.record_failure()
+        assert breaker.allow() is False
+        time.sleep(0.02)
+        assert breaker.allow() is True
+        # 半开状态只放行一个探测请求
+        assert breaker.allow() is False
+        breaker.record_failure()
+        assert breaker.state == "open"
+        assert breaker.allow() is False
+
+    def test_cancelled_probe_releases_half_open(self):
+        """测试半开状态的探测请求被取消后释放探测名额，后续请求可以重新探测"""
+        started = None
+        hang = True
+
+        async def handler(request):
+            if hang:
+                started.set()
+                await asyncio.sleep(10)
+            return httpx.Response(200, json={"errcode": 0})
+
+        breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0.01)
+        breaker.record_failure()
+        client = _client(handler, retries=0, breaker=breaker)
+
+        async def scenario():
+            nonlocal started, hang
+            started = asyncio.Event()
+            await asyncio.sleep(0.02)
+            probe = asyncio.create_task(client.request_json("GET", "/path"))
+            await started.wait()
+            assert breaker.allow() is False
+            probe.cancel()
+            with pytest.raises(asyncio.CancelledError):
+                await probe
+
+            hang = False
+            assert (await client.request_json("GET", "/path"))["errcode"] == 0
+            assert breaker.state == "closed"
+            await client.close()
+
+        asyncio.run(scenario())
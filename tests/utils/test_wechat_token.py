@@ -0,0 +1,91 @@
+"""
+微信 access_token 管理测试用例
+"""
+import asyncio
+import threading
+import time
+
+from app.utils import wechat_token
+from app.utils.wechat_token import WeChatTokenManager
+
+
+class _Fetcher:
+    def __init__(self, expires_in=7200, delay=0.0):
+        self.calls = 0
+        self.expires_in = expires_in
+        self.delay = delay
+
+    def __call__(self):
+        self.calls += 1
+        time.sleep(self.delay)
+        return {"access_token": f"token-{self.calls}", "expires_in": self.expires_in}
+
+
+class TestWeChatTokenManager:
+    """微信 access_token 管理测试类"""
+
+    def test_cached_until_expiry(self):
+        """测试有效期内复用 token，不重复请求微信"""
+        fetcher = _Fetcher()
+        manager = WeChatTokenManager("app", "secret", fetcher=fetcher)
+        assert manager.get_token_sync() == "token-1"
+        assert manager.get_token_sync() == "token-1"
+        assert asyncio.run(manager.get_token()) == "token-1"
+        assert fetcher.calls == 1
+
+    def test_single_flight(self):
+        """测试并发获取时只请求一次"""
+        fetcher = _Fetcher(delay=0.05)
+        manager = WeChatTokenManager("app", "secret", fetcher=fetcher)
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(manager.get_token_sync())) for _ in range(8)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        assert results == ["token-1"] * 8
+        assert fetcher.calls == 1
+
+    def test_force_refresh(self):
+        """测试 token 被判定无效后强制刷新"""
+        fetcher = _Fetcher()
+        manager = WeChatTokenManager("app", "secret", fetcher=fetcher)
+        manager.get_token_sync()
+        assert manager.get_token_sync(force_refresh=True) == "token-2"
+        assert manager.get_token_sync() == "token-2"
+
+    def test_background_refresh_before_expiry(self, monkeypatch):
+        """测试临近过期时继续返回当前 token 并在后台刷新"""
+        fetcher = _Fetcher(expires_in=7200)
+        manager = WeChatTokenManager("app", "secret", refresh_ahead=600, fetcher=fetcher)
+        manager.get_token_sync()
+        now = time.time()
+        monkeypatch.setattr(wechat_token.time, "time", lambda: now + 6700)
+        assert manager.get_token_sync() == "token-1"
+        for _ in range(100):
+            if fetcher.calls == 2 and not manager._refreshing:
+                break
+            time.sleep(0.01)
+        assert manager.get_token_sync() == "token-2"
+
+    def test_shared_file_between_workers(self, tmp_path):
+        """测试重启或其他 worker 通过本地文件复用 token"""
+        path = str(tmp_path / "wechat_access_token.json")
+        fetcher_a, fetcher_b = _Fetcher(), _Fetcher()
+        worker_a = WeChatTokenManager("app", "secret", cache_path=path, fetcher=fetcher_a)
+        worker_b = WeChatTokenManager("app", "secret", cache_path=path, fetcher=fetcher_b)
+        assert worker_a.get_token_sync() == "token-1"
+        assert worker_b.get_token_sync() == "token-1"
+        assert fetcher_b.calls == 0
+        # 其他 AppID 的缓存不会被使用
+        other = WeChatTokenManager("other", "secret", cache_path=path, fetcher=_Fetcher())
+        other.get_token_sync()
+        assert other._fetcher.calls == 1
+
+    def test_fetch_failure(self):
+        """测试获取失败时返回 None"""
+        def failing():
+            raise ValueError("errcode 40013")
+
+        manager = WeChatTokenManager("app", "secret", fetcher=failing)
+        assert manager.get_token_sync() is None
@@ -0,0 +1,47 @@
+"""
+小程序码缓存测试用例
+"""
+import os
+import time
+
+from app.utils.wxacode_cache import WxacodeCache
+
+
+class TestWxacodeCache:
+    """小程序码缓存测试类"""
+
+    def test_key_normalized(self):
+        """测试参数顺序不影响缓存键，参数或 AppID 不同则缓存键不同"""
+        cache = WxacodeCache("/tmp/unused", namespace="app")
+        key = cache.key({"scene": "u1", "width": 430, "line_color": {"r": 0, "g": 0, "b": 0}})
+        assert key == cache.key({"line_color": {"b": 0, "g": 0, "r": 0}, "width": 430, "scene": "u1"})
+        assert key != cache.key({"scene": "u2", "width": 430, "line_color": {"r": 0, "g": 0, "b": 0}})
+        other_app = WxacodeCache("/tmp/unused", namespace="other")
+        assert key != other_app.key({"scene": "u1", "width": 430, "line_color": {"r": 0, "g": 0, "b": 0}})
+
+    def test_put_and_get(self, tmp_path):
+        """测试写入后命中，其他 worker 共享同一目录"""
+        cache = WxacodeCache(str(tmp_path))
+        key = cache.key({"scene": "u1"})
+        assert cache.get(key) is None
+        assert cache.exists(key) is False
+        cache.put(key, b"png-data")
+        assert cache.get(key) == b"png-data"
+        assert WxacodeCache(str(tmp_path)).get(key) == b"png-data"
+        assert not [name for name in os.listdir(os.path.dirname(cache.path(key))) if name.endswith(".tmp")]
+
+    def test_evict_least_recently_used(self, tmp_path):
+        """测试超出大小上限时淘汰最久未使用的图片"""
+        cache = WxacodeCache(str(tmp_path), max_bytes=250)
+        keys = [cache.key({"scene": f"u{i}"}) for i in range(3)]
+        now = time.time()
+        for i, key in enumerate(keys[:2]):
+            cache.put(key, b"x" * 100)
+            os.utime(cache.path(key), (now - 100 + i, now - 100 + i))
+        # 读取第一张图片，使其成为最近使用的
+        assert cache.get(keys[0]) is not None
+
+        cache.put(keys[2], b"x" * 100)
+        assert cache.exists(keys[0])
+        assert not cache.exists(keys[1])
+        assert cache.exists(keys[2])